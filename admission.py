@@ -0,0 +1,164 @@
+"""
+Admission Control
+Load-aware toelating voor de prediction endpoints: per worker een limiet op
+requests in behandeling en op de wachttijd in de inference queue. Daarboven
+volgt direct een 429/503 met Retry-After in plaats van een onbegrensde
+wachtrij in uvicorn. Interne sensors (Suricata blocker, realtime engine)
+hebben ruimere limieten dan dashboards en ad-hoc clients.
+"""
+
+import hmac
+import json
+import math
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import metrics
+from cidr_table import CidrTable
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+SENSOR = 'sensor'
+DEFAULT = 'default'
+
+DEFAULT_LIMITS = {
+    SENSOR: {'max_in_flight': 256, 'max_queue_delay': 2.0},
+    DEFAULT: {'max_in_flight': 32, 'max_queue_delay': 0.5},
+}
+
+
+class AdmissionController:
+    """
+    Beslist per request: toelaten, 429 (te veel requests van deze klasse in
+    behandeling) of 503 (inference queue loopt achter)
+
+    Klasse 'sensor': bron IP in sensor_networks of een geldige
+    X-Sensor-Token header; al het andere is 'default'.
+    """
+
+    def __init__(self, queue_delay: Callable[[], float],
+                 limits: Optional[Dict[str, Dict]] = None,
+                 sensor_networks: Iterable[str] = (),
+                 sensor_token: Optional[str] = None,
+                 retry_after: float = 1.0):
+        """
+        Args:
+            queue_delay: Huidige wachttijd in de inference queue (seconden)
+            limits: Per klasse max_in_flight en max_queue_delay
+            sensor_networks: IP's/CIDR's van interne sensors
+            sensor_token: Gedeeld geheim voor X-Sensor-Token (None = alleen netwerken)
+            retry_after: Retry-After (seconden) bij een 429
+        """
+        self.queue_delay = queue_delay
+        self.limits = {name: {**DEFAULT_LIMITS[name], **(limits or {}).get(name, {})}
+                       for name in DEFAULT_LIMITS}
+        self.sensor_networks = CidrTable(sensor_networks)
+        self.sensor_token = sensor_token.encode() if sensor_token else None
+        self.retry_after = retry_after
+
+        self.in_flight = {name: 0 for name in DEFAULT_LIMITS}
+        self.stats = {name: {'admitted': 0, 'rejected_in_flight': 0, 'rejected_queue_delay': 0}
+                      for name in DEFAULT_LIMITS}
+
+    def classify(self, client_ip: Optional[str], token: Optional[bytes]) -> str:
+        if token and self.sensor_token and hmac.compare_digest(token, self.sensor_token):
+            return SENSOR
+        if client_ip and client_ip in self.sensor_networks:
+            return SENSOR
+        return DEFAULT
+
+    def admit(self, client_class: str) -> Optional[Tuple[int, int, str]]:
+        """
+        Returns:
+            None = toegelaten (release() na afloop), anders (status, retry_after, reden)
+        """
+        limits = self.limits[client_class]
+        stats = self.stats[client_class]
+
+        if self.in_flight[client_class] >= limits['max_in_flight']:
+            stats['rejected_in_flight'] += 1
+            metrics.inc('admission_rejects_total', (client_class, 'in_flight'))
+            return 429, math.ceil(self.retry_after), 'in_flight'
+
+        delay = self.queue_delay()
+        if delay > limits['max_queue_delay']:
+            stats['rejected_queue_delay'] += 1
+            metrics.inc('admission_rejects_total', (client_class, 'queue_delay'))
+            # Ongeveer de tijd die de huidige wachtrij nog nodig heeft
+            return 503, max(1, math.ceil(delay)), 'queue_delay'
+
+        self.in_flight[client_class] += 1
+        stats['admitted'] += 1
+        return None
+
+    def release(self, client_class: str):
+        self.in_flight[client_class] -= 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'queue_delay_seconds': round(self.queue_delay(), 3),
+            'classes': {
+                name: {**self.stats[name], 'in_flight': self.in_flight[name], **self.limits[name]}
+                for name in DEFAULT_LIMITS
+            }
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware: admission control voor requests op de gegeven paden
+
+    Een toegelaten request telt als in behandeling tot de response volledig
+    verstuurd is (ook bij streaming responses).
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str] = ()):
+        """
+        Args:
+            app: ASGI app
+            controller: AdmissionController
+            paths: Exacte paden of prefixes eindigend op '/' (bijv. '/predict/')
+        """
+        self.app = app
+        self.controller = controller
+        self.paths = tuple(paths)
+
+    def _applies(self, scope) -> bool:
+        if scope['type'] != 'http' or scope['method'] != 'POST':
+            return False
+        path = scope['path']
+        return any(path == p or (p.endswith('/') and path.startswith(p)) for p in self.paths)
+
+    async def __call__(self, scope, receive, send):
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope.get('headers') or []).get(b'x-sensor-token')
+        client = scope.get('client')
+        client_class = self.controller.classify(client[0] if client else None, token)
+
+        rejection = self.controller.admit(client_class)
+        if rejection is not None:
+            status, retry_after, reason = rejection
+            body = json.dumps({
+                'detail': 'Too many requests' if status == 429 else 'Inference queue overloaded',
+                'reason': reason,
+                'retry_after': retry_after
+            }).encode('utf-8')
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode()),
+                    (b'retry-after', str(retry_after).encode()),
+                ]
+            })
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(client_class)
@@ -3,21 +3,37 @@ FastAPI Web Server voor AI-Firewall
 Real-time inference API + WebSocket streaming
 """
 
-from fastapi import FastAPI, File, UploadFile, WebSocket, HTTPException
+from fastapi import FastAPI, WebSocket, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import asyncio
 import json
 import uuid
+import time
 import os
+import threading
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
 from inference import AIFirewallInference
 from utils import Config, Logger
+from block_log import tail_records
+from json_stream import JsonStreamError, aiter_records
+from shared_state import SharedPredictionRing, open_shared_state
+from prediction_stream import PredictionBroadcaster
+from redis_hub import RedisFanoutHub
+from inference_executor import InferenceExecutor, LoopLagMonitor
+from csv_stream import CsvChunker, CsvStreamError, CsvUploadTooLarge, MultipartFileReader
+from job_manager import FINISHED, COMPLETED, JobManager, check_input_name
+from admission import AdmissionController, AdmissionMiddleware
+from ingest_channel import IngestSession
+import metrics
+from metrics import timed
+import wire_format
 
 # Initialisatie
 app = FastAPI(
@@ -26,7 +42,52 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS voor dashboard
+# Globals
+config = Config()
+logger = Logger(__name__).logger  # Get actual logger instance
+firewall = None
+blocker = None
+blocker_lock = threading.Lock()  # Firewall endpoints draaien in de threadpool
+
+# Ring buffer met recent predictions (dashboard polling, ?since=seq) en rolling
+# counters; met api.shared_state.backend mmap gedeeld door alle workers
+MAX_RECENT_PREDICTIONS = config.get('api.recent_predictions', 100)
+recent_predictions, prediction_counters = open_shared_state(config)
+
+# Push van nieuwe predictions naar dashboards (/predictions/stream)
+prediction_broadcaster = PredictionBroadcaster(
+    recent_predictions,
+    queue_size=config.get('api.stream.queue_size', 1000),
+    counters=prediction_counters,
+    shared=isinstance(recent_predictions, SharedPredictionRing)
+)
+stream_follower: Optional[asyncio.Task] = None
+
+# Model calls draaien in een eigen pool; de event loop blijft vrij
+inference = InferenceExecutor(
+    workers=config.get('api.inference.workers', 0),
+    model_threads=config.get('api.inference.model_threads', 0),
+    limits=config.get('api.inference.limits', {})
+)
+loop_lag = LoopLagMonitor(interval=config.get('api.inference.lag_interval', 0.5))
+
+# Admission control: boven de limieten direct 429/503 met Retry-After;
+# sensors (netwerken of X-Sensor-Token) krijgen ruimere limieten
+admission = AdmissionController(
+    queue_delay=inference.queue_delay,
+    limits=config.get('api.admission.limits', {}),
+    sensor_networks=config.get('api.admission.sensor_networks', []),
+    sensor_token=os.getenv('AI_FIREWALL_SENSOR_TOKEN'),
+    retry_after=config.get('api.admission.retry_after', 1.0)
+)
+if config.get('api.admission.enabled', True):
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        paths=config.get('api.admission.paths', ['/predict', '/predict/', '/jobs'])
+    )
+
+# CORS voor dashboard (buitenste middleware: ook 429/503 krijgen CORS headers)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In productie: specificeer domains
@@ -35,14 +96,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Globals
-config = Config()
-logger = Logger(__name__).logger  # Get actual logger instance
-firewall = None
+# Eén Redis subscription per worker voor alle /ws clients
+ws_hub = RedisFanoutHub(
+    redis_url=os.getenv('REDIS_URL', 'redis://localhost:6379'),
+    channel=config.get('api.websocket.channel', 'firewall_events'),
+    queue_size=config.get('api.websocket.queue_size', 1000),
+    batch_max=config.get('api.websocket.batch_max', 100),
+    batch_window=config.get('api.websocket.batch_window', 0.02)
+)
+
+# Open /ingest sessies (persistente sensor verbindingen) van deze worker
+ingest_sessions: List[IngestSession] = []
 
-# In-memory storage for recent predictions (for dashboard polling)
-recent_predictions = []
-MAX_RECENT_PREDICTIONS = 100
+# Offline classificatie jobs (process pool, state in SQLite); aangemaakt bij startup
+jobs: Optional[JobManager] = None
+
+# Ververst de queue gauges van deze worker voor /metrics (zie metrics.py)
+metrics_task: Optional[asyncio.Task] = None
+
+def update_queue_gauges():
+    registry = metrics.registry()
+    endpoints = inference.get_stats()['endpoints'].values()
+    registry.set_gauge('queue_depth', 'inference_waiting', sum(e['waiting'] for e in endpoints))
+    registry.set_gauge('queue_depth', 'inference_active', sum(e['active'] for e in endpoints))
+    registry.set_gauge('queue_depth', 'sse_clients', len(prediction_broadcaster.subscribers))
+    registry.set_gauge('queue_depth', 'ws_clients', len(ws_hub.clients))
+    registry.set_gauge('queue_depth', 'ingest_sessions', len(ingest_sessions))
+    registry.set_gauge('queue_depth', 'jobs_active', len(jobs._futures) if jobs else 0)
+    for client_class, count in admission.in_flight.items():
+        registry.set_gauge('queue_depth', f'in_flight_{client_class}', count)
 
 # Pydantic models
 class FlowInput(BaseModel):
@@ -73,6 +155,15 @@ class BatchPredictionResponse(BaseModel):
     malicious_count: int
     predictions: List[PredictionResponse]
 
+class BulkBlockRequest(BaseModel):
+    """Bulk block input"""
+    ips: List[str]
+    reason: str = "Manual block"
+
+class BulkUnblockRequest(BaseModel):
+    """Bulk unblock input"""
+    ips: List[str]
+
 class StatsResponse(BaseModel):
     """System statistics"""
     model_loaded: bool
@@ -80,25 +171,66 @@ class StatsResponse(BaseModel):
     uptime_seconds: float
     cpu_percent: float
     memory_percent: float
+    event_loop_lag_ms: float = 0.0
+    rolling: Dict[str, Any] = {}
+    inference: Dict[str, Any] = {}
 
 # Startup/Shutdown
 @app.on_event("startup")
 async def startup_event():
     """Laad modellen bij startup"""
-    global firewall
+    global firewall, jobs, metrics_task, stream_follower
     logger.info("🚀 Starting AI-Firewall API...")
+    prediction_broadcaster.bind(asyncio.get_running_loop())
+    if prediction_broadcaster.shared:
+        stream_follower = asyncio.create_task(
+            prediction_broadcaster.follow(config.get('api.shared_state.follow_interval', 0.05))
+        )
+    loop_lag.start()
+    metrics.registry().gauge_callback(update_queue_gauges)
+    metrics_task = asyncio.create_task(metrics.run_gauge_updates(config.get('metrics.gauge_interval', 2.0)))
     
     try:
         firewall = AIFirewallInference()
+        firewall.set_threads(inference.model_threads)
         logger.info("✓ Models loaded successfully")
     except Exception as e:
         logger.error(f"Failed to load models: {e}")
         raise
+    
+    try:
+        get_blocker().reconcile()
+        get_blocker().start_expiry()
+    except Exception as e:
+        logger.error(f"Failed to reconcile firewall state: {e}")
+    
+    jobs = JobManager.from_config(config, model_threads=inference.model_threads)
+    jobs.recover()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup bij shutdown"""
     logger.info("Shutting down AI-Firewall API...")
+    await ws_hub.stop()
+    await loop_lag.stop()
+    if metrics_task is not None:
+        metrics_task.cancel()
+    if stream_follower is not None:
+        stream_follower.cancel()
+    inference.shutdown()
+    if jobs is not None:
+        jobs.shutdown()
+    if blocker is not None:
+        blocker.close()
+
+def get_blocker():
+    """Eén FirewallBlocker per worker (store mirror en backend blijven warm)"""
+    global blocker
+    with blocker_lock:
+        if blocker is None:
+            from firewall_blocker import FirewallBlocker
+            blocker = FirewallBlocker(reload_config=False)
+    return blocker
 
 # Health check
 @app.get("/health")
@@ -124,7 +256,8 @@ async def root():
             "predict_batch": "/predict/batch",
             "predict_csv": "/predict/csv",
             "stats": "/stats",
-            "websocket": "/ws"
+            "websocket": "/ws",
+            "stream": "/predictions/stream"
         }
     }
 
@@ -139,8 +272,6 @@ async def predict_single_flow(flow: FlowInput):
     Returns:
         Prediction met confidence scores
     """
-    global recent_predictions
-    
     if firewall is None:
         raise HTTPException(status_code=503, detail="Models not loaded")
     
@@ -149,7 +280,7 @@ async def predict_single_flow(flow: FlowInput):
         flow_dict = flow.dict()
         
         # Voer inferentie uit
-        result = firewall.predict_single_flow(flow_dict)
+        result = await inference.run('predict', firewall.predict_single_flow, flow_dict)
         
         # Bepaal risk level
         risk_level = "HIGH" if result['ensemble_score'] > 0.7 else \
@@ -165,17 +296,13 @@ async def predict_single_flow(flow: FlowInput):
             risk_level=risk_level
         )
         
-        # Store in recent predictions for dashboard polling
-        recent_predictions.append({
+        # Store in recent predictions + push naar dashboard streams
+        prediction_broadcaster.publish([{
             "prediction": result['prediction'].upper(),
             "ensemble_score": result['ensemble_score'],
             "timestamp": response.timestamp,
             "risk_level": risk_level
-        })
-        
-        # Keep only last N predictions
-        if len(recent_predictions) > MAX_RECENT_PREDICTIONS:
-            recent_predictions = recent_predictions[-MAX_RECENT_PREDICTIONS:]
+        }])
         
         return response
         
@@ -195,8 +322,6 @@ async def predict_raw_flow(flow: Dict):
     Returns:
         Prediction met confidence scores
     """
-    global recent_predictions
-    
     if firewall is None:
         raise HTTPException(status_code=503, detail="Models not loaded")
     
@@ -209,7 +334,7 @@ async def predict_raw_flow(flow: Dict):
         dst_port = flow.get(" Destination Port", flow.get("Destination Port", None))
         
         # Voer inferentie uit
-        result = firewall.predict_single_flow(flow)
+        result = await inference.run('predict_raw', firewall.predict_single_flow, flow)
         
         # Bepaal risk level
         risk_level = "HIGH" if result['ensemble_score'] > 0.7 else \
@@ -217,8 +342,8 @@ async def predict_raw_flow(flow: Dict):
         
         timestamp = datetime.now().isoformat()
         
-        # Store in recent predictions for dashboard polling (with attack type!)
-        recent_predictions.append({
+        # Store in recent predictions + push naar dashboard streams (with attack type!)
+        prediction_broadcaster.publish([{
             "prediction": result['prediction'].upper(),
             "ensemble_score": result['ensemble_score'],
             "timestamp": timestamp,
@@ -228,11 +353,7 @@ async def predict_raw_flow(flow: Dict):
             "dst_ip": dst_ip,
             "src_port": src_port,
             "dst_port": dst_port
-        })
-        
-        # Keep only last N predictions
-        if len(recent_predictions) > MAX_RECENT_PREDICTIONS:
-            recent_predictions = recent_predictions[-MAX_RECENT_PREDICTIONS:]
+        }])
         
         return {
             "prediction": result['prediction'],
@@ -250,6 +371,272 @@ async def predict_raw_flow(flow: Dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse voor generators die zelf nog de request body lezen
+    
+    De standaard StreamingResponse luistert parallel op receive() voor een
+    disconnect en zou daarbij body chunks opeten; request.stream() merkt een
+    disconnect zelf op (ClientDisconnect).
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def risk_level_for(score: float) -> str:
+    return "HIGH" if score > 0.7 else "MEDIUM" if score > 0.4 else "LOW"
+
+def score_raw_chunk(flows: List[Dict]) -> List[Dict]:
+    """
+    Scoor een chunk raw flows met één vectorized model call
+    
+    Metadata (src_ip, dst_ip, attack_type) wordt per flow afgesplitst zoals bij
+    /predict/raw; de verdicts komen in dezelfde volgorde terug.
+    """
+    metadata = []
+    for flow in flows:
+        metadata.append({
+            "attack_type": flow.pop("attack_type", "Unknown Attack"),
+            "src_ip": flow.pop("src_ip", None),
+            "dst_ip": flow.pop("dst_ip", None),
+            "src_port": flow.get(" Source Port", flow.get("Source Port", None)),
+            "dst_port": flow.get(" Destination Port", flow.get("Destination Port", None))
+        })
+    
+    results = firewall.predict_flows(flows)
+    timestamp = datetime.now().isoformat()
+    
+    verdicts = []
+    entries = []
+    for meta, result in zip(metadata, results):
+        risk_level = risk_level_for(result['ensemble_score'])
+        malicious = result['prediction'].upper() == "MALICIOUS"
+        
+        entries.append({
+            "prediction": result['prediction'].upper(),
+            "ensemble_score": result['ensemble_score'],
+            "timestamp": timestamp,
+            "risk_level": risk_level,
+            "attack_type": meta["attack_type"] if malicious else "BENIGN",
+            "src_ip": meta["src_ip"],
+            "dst_ip": meta["dst_ip"],
+            "src_port": meta["src_port"],
+            "dst_port": meta["dst_port"]
+        })
+        verdicts.append({
+            "prediction": result['prediction'],
+            "confidence": result['confidence'],
+            "xgb_score": result['xgb_score'],
+            "if_score": result['if_score'],
+            "ensemble_score": result['ensemble_score'],
+            "timestamp": timestamp,
+            "risk_level": risk_level,
+            "attack_type": meta["attack_type"],
+            "src_ip": meta["src_ip"],
+            "dst_ip": meta["dst_ip"]
+        })
+    
+    prediction_broadcaster.publish(entries)
+    return verdicts
+
+# Kolommen (en Arrow types) van columnar verdicts
+VERDICT_COLUMNS = {
+    "prediction": "string",
+    "ensemble_score": "float64",
+    "confidence": "float64",
+    "xgb_score": "float64",
+    "if_score": "float64",
+    "is_alert": "bool",
+    "risk_level": "string",
+    "src_ip": "string",
+    "dst_ip": "string",
+    "attack_type": "string"
+}
+
+def score_columnar_chunk(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Scoor een DataFrame chunk zonder per-flow dicts
+    
+    Returns:
+        Verdict kolommen (VERDICT_COLUMNS), zelfde rij volgorde als df
+    """
+    features, metadata = wire_format.split_metadata(df)
+    columns = firewall.predict_columns(features)
+    scores = columns['ensemble_score']
+    columns['risk_level'] = np.select([scores > 0.7, scores > 0.4], ["HIGH", "MEDIUM"], "LOW")
+    for name in wire_format.METADATA_COLUMNS:
+        columns[name] = metadata[name].tolist() if name in metadata else [None] * len(df)
+    
+    # Dashboard ziet alleen de laatste N: alleen die rijen als dict opbouwen
+    timestamp = datetime.now().isoformat()
+    entries = []
+    for i in range(max(0, len(df) - MAX_RECENT_PREDICTIONS), len(df)):
+        malicious = columns['prediction'][i] == "malicious"
+        entries.append({
+            "prediction": str(columns['prediction'][i]).upper(),
+            "ensemble_score": float(scores[i]),
+            "timestamp": timestamp,
+            "risk_level": str(columns['risk_level'][i]),
+            "attack_type": (columns['attack_type'][i] or "Unknown Attack") if malicious else "BENIGN",
+            "src_ip": columns['src_ip'][i],
+            "dst_ip": columns['dst_ip'][i],
+            "src_port": None,
+            "dst_port": None
+        })
+    # Stats delta telt de hele chunk, niet alleen de entries in de ring
+    prediction_broadcaster.publish(
+        entries, total=len(df), malicious=int(np.count_nonzero(columns['prediction'] == "malicious"))
+    )
+    
+    return columns
+
+async def predict_columnar_batch(request: Request, fmt: str, chunk_size: int):
+    """
+    Arrow IPC / msgpack variant van /predict/raw/batch
+    
+    Kolommen gaan direct het model in (geen dict per flow); het antwoord is
+    columnar in het format uit Accept (default: hetzelfde als de request).
+    De body wordt per frame gedecodeerd terwijl hij binnenkomt, dus memory
+    blijft begrensd tot één frame. Het laatste frame is een summary (zie
+    wire_format.SUMMARY_KEY), met "error" als het scoren halverwege faalt.
+    """
+    try:
+        decoder = wire_format.FrameDecoder(
+            fmt, max_frame_bytes=config.get('api.batch.max_frame_bytes', 64 * 1024 * 1024)
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    # Eerste frame vóór de response: een onleesbare body is dan nog een 400
+    body = request.stream()
+    first = []
+    try:
+        while not first:
+            try:
+                data = await body.__anext__()
+            except StopAsyncIteration:
+                decoder.close()
+                break
+            with timed('parse'):
+                first = decoder.feed(data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {fmt} body: {e}")
+    
+    accept = wire_format.media_type(request.headers.get("accept"))
+    out = accept if accept in wire_format.BINARY_FORMATS else fmt
+    
+    async def chunks():
+        frames = first
+        while True:
+            for frame in frames:
+                for start in range(0, len(frame), chunk_size):
+                    yield frame.iloc[start:start + chunk_size]
+            try:
+                data = await body.__anext__()
+            except StopAsyncIteration:
+                decoder.close()
+                return
+            with timed('parse'):
+                frames = decoder.feed(data)
+    
+    async def encoded():
+        started = time.perf_counter()
+        summary = {"total_flows": 0, "malicious_count": 0, "chunks": 0}
+        encoder = wire_format.ArrowStreamEncoder(VERDICT_COLUMNS) if out == wire_format.ARROW else None
+        try:
+            async for chunk in chunks():
+                columns = await inference.run('predict_raw_batch', score_columnar_chunk, chunk)
+                summary["total_flows"] += len(chunk)
+                summary["malicious_count"] += int(np.count_nonzero(columns['prediction'] == "malicious"))
+                summary["chunks"] += 1
+                if encoder:
+                    yield encoder.write(columns)
+                else:
+                    yield wire_format.encode_columns(columns, out)
+        except Exception as e:
+            # Status is al verstuurd: de fout gaat in het summary frame
+            logger.error(f"Columnar batch prediction error: {e}")
+            summary["error"] = str(e)
+        
+        elapsed = time.perf_counter() - started
+        summary["benign_count"] = summary["total_flows"] - summary["malicious_count"]
+        summary["elapsed_ms"] = round(elapsed * 1000, 1)
+        summary["flows_per_sec"] = round(summary["total_flows"] / elapsed, 1) if elapsed else 0.0
+        yield encoder.close(summary) if encoder else wire_format.encode_summary(summary, out)
+    
+    return BodyStreamingResponse(encoded(), media_type=out)
+
+@app.post("/predict/raw/batch")
+async def predict_raw_batch(request: Request, chunk_size: int = 0):
+    """
+    Classificeer een stream raw flows (JSON array of NDJSON body)
+    
+    De body wordt incrementeel geparsed; per chunk van chunk_size flows volgt
+    één vectorized model call en de verdicts worden direct als NDJSON
+    teruggestuurd. Memory blijft begrensd tot één chunk, ongeacht de lengte
+    van de upload. De laatste regel is een summary.
+    
+    Met Content-Type application/vnd.apache.arrow.stream of
+    application/msgpack is de body columnar en het antwoord ook (zie
+    wire_format.py).
+    
+    Args:
+        chunk_size: Flows per model call (default: api.batch.chunk_size)
+        
+    Returns:
+        application/x-ndjson stream: één verdict per flow + {"summary": {...}}
+    """
+    if firewall is None:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    
+    chunk_size = chunk_size or config.get('api.batch.chunk_size', 1000)
+    
+    fmt = wire_format.media_type(request.headers.get("content-type"))
+    if fmt in wire_format.BINARY_FORMATS:
+        return await predict_columnar_batch(request, fmt, chunk_size)
+    
+    max_record_bytes = config.get('api.batch.max_record_bytes', 1024 * 1024)
+    
+    async def verdicts():
+        started = time.perf_counter()
+        summary = {"total_flows": 0, "malicious_count": 0, "chunks": 0}
+        chunk = []
+        
+        async def flush():
+            lines = await inference.run('predict_raw_batch', score_raw_chunk, list(chunk))
+            chunk.clear()
+            summary["total_flows"] += len(lines)
+            summary["malicious_count"] += sum(1 for v in lines if v["prediction"] == "malicious")
+            summary["chunks"] += 1
+            return "".join(json.dumps(v) + "\n" for v in lines)
+        
+        try:
+            async for flow in aiter_records(request.stream(), max_record_bytes):
+                chunk.append(flow)
+                if len(chunk) >= chunk_size:
+                    yield await flush()
+            if chunk:
+                yield await flush()
+        except JsonStreamError as e:
+            # Status is al verstuurd: geldige records nog scoren, fout in de summary
+            logger.warning(f"Raw batch stream error: {e}")
+            summary["error"] = str(e)
+            if chunk:
+                yield await flush()
+        except Exception as e:
+            logger.error(f"Raw batch prediction error: {e}")
+            summary["error"] = str(e)
+        
+        elapsed = time.perf_counter() - started
+        summary["benign_count"] = summary["total_flows"] - summary["malicious_count"]
+        summary["elapsed_ms"] = round(elapsed * 1000, 1)
+        summary["flows_per_sec"] = round(summary["total_flows"] / elapsed, 1) if elapsed else 0.0
+        yield json.dumps({"summary": summary}) + "\n"
+    
+    return BodyStreamingResponse(verdicts(), media_type="application/x-ndjson")
+
 @app.post("/predict/batch")
 async def predict_batch(flows: List[FlowInput]):
     """
@@ -269,7 +656,7 @@ async def predict_batch(flows: List[FlowInput]):
         df = pd.DataFrame([f.dict() for f in flows])
         
         # Batch inferentie
-        results_df = firewall.predict_batch(df)
+        results_df = await inference.run('predict_batch', firewall.predict_batch, df)
         
         # Converteer naar response format
         predictions = []
@@ -300,48 +687,264 @@ async def predict_batch(flows: List[FlowInput]):
         logger.error(f"Batch prediction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def score_csv_chunk(df: pd.DataFrame, header: bool) -> Dict[str, Any]:
+    """Annoteer een CSV chunk en serialiseer hem (beide CPU-bound, in de inference pool)"""
+    annotated = firewall.annotate_frame(df)
+    return {
+        "csv": annotated.to_csv(index=False, header=header),
+        "rows": len(annotated),
+        "malicious": int(annotated['Prediction'].sum())
+    }
+
+# Totalen van /predict/csv uploads (ook in /stats)
+csv_stream_stats = {"uploads": 0, "rows": 0, "bytes": 0, "seconds": 0.0, "last_mb_per_s": 0.0}
+
 @app.post("/predict/csv")
-async def predict_csv_file(file: UploadFile = File(...)):
+async def predict_csv_file(request: Request, chunk_rows: int = 0):
     """
-    Classificeer flows van uploaded CSV
+    Classificeer flows van een CSV upload
+    
+    De upload (multipart/form-data veld 'file' of een raw text/csv body)
+    wordt geparsed terwijl hij binnenkomt; per chunk_rows rijen volgt één
+    model call en de geannoteerde rijen gaan direct terug. Er komt niets op
+    disk en memory blijft begrensd tot één chunk.
     
     Args:
-        file: CSV bestand met network flows
+        chunk_rows: Rijen per model call (default: api.csv.chunk_rows)
         
     Returns:
-        CSV bestand met predictions
+        text/csv stream: originele kolommen + XGBoost_Score, IF_Score,
+        Ensemble_Score, Prediction, Prediction_Label
     """
     if firewall is None:
         raise HTTPException(status_code=503, detail="Models not loaded")
     
+    max_bytes = config.get('api.csv.max_upload_bytes', 1024 * 1024 * 1024)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+    
+    content_type = request.headers.get("content-type", "")
     try:
-        # Save uploaded file
-        temp_path = Path("data") / f"upload_{datetime.now().timestamp()}.csv"
-        temp_path.parent.mkdir(exist_ok=True)
-        
-        with temp_path.open("wb") as f:
-            f.write(await file.read())
+        reader = MultipartFileReader(content_type) if content_type.startswith("multipart/") else None
+    except RuntimeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except CsvStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    chunker = CsvChunker(
+        chunk_rows=chunk_rows or config.get('api.csv.chunk_rows', 5000),
+        max_line_bytes=config.get('api.batch.max_record_bytes', 1024 * 1024)
+    )
+    
+    async def annotated():
+        started = time.perf_counter()
+        received = 0
+        malicious = 0
+        chunks = 0
         
-        # Predict
-        output_path = Path("predictions") / f"prediction_{datetime.now().timestamp()}.csv"
-        output_path.parent.mkdir(exist_ok=True)
+        async def score(frames):
+            nonlocal malicious, chunks
+            for frame in frames:
+                # CSV header alleen boven de eerste chunk
+                result = await inference.run('predict_csv', score_csv_chunk, frame, chunks == 0)
+                chunks += 1
+                malicious += result["malicious"]
+                yield result["csv"]
         
-        firewall.predict_from_csv(str(temp_path), str(output_path))
+        async for data in request.stream():
+            received += len(data)
+            if received > max_bytes:
+                raise CsvUploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            with timed('parse'):
+                frames = chunker.feed(reader.feed(data) if reader else data)
+            async for text in score(frames):
+                yield text
+        if reader is not None and not reader.found:
+            raise CsvStreamError("Multipart body has no 'file' field")
+        async for text in score(chunker.feed(b"", final=True)):
+            yield text
         
-        # Return file
-        return FileResponse(
-            path=output_path,
-            filename=output_path.name,
-            media_type="text/csv"
-        )
-        
-    except Exception as e:
-        logger.error(f"CSV prediction error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Cleanup
-        if temp_path.exists():
-            temp_path.unlink()
+        elapsed = time.perf_counter() - started
+        mb_per_s = received / 1e6 / elapsed if elapsed else 0.0
+        csv_stream_stats["uploads"] += 1
+        csv_stream_stats["rows"] += chunker.rows
+        csv_stream_stats["bytes"] += received
+        csv_stream_stats["seconds"] += elapsed
+        csv_stream_stats["last_mb_per_s"] = round(mb_per_s, 2)
+        logger.info(f"CSV upload: {chunker.rows} flows ({malicious} malicious), "
+                    f"{received / 1e6:.1f} MB in {elapsed:.2f}s ({mb_per_s:.1f} MB/s)")
+    
+    # Eerste chunk vóór de response: fouten in header/eerste rijen worden nog een 4xx
+    body = annotated()
+    try:
+        first = await body.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=400, detail="No flows in CSV upload")
+    except CsvUploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except CsvStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def stream():
+        yield first
+        async for text in body:
+            yield text
+    
+    return BodyStreamingResponse(
+        stream(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="predictions.csv"'}
+    )
+
+# === Offline classificatie jobs ===
+
+class JobRequest(BaseModel):
+    """Job op een bestand dat al op de server staat (binnen api.jobs.allowed_dirs)"""
+    path: str
+
+def get_jobs() -> JobManager:
+    if jobs is None:
+        raise HTTPException(status_code=503, detail="Job manager not started")
+    return jobs
+
+async def save_upload(request: Request, target: Path, max_bytes: int):
+    """Schrijf een upload (multipart veld 'file' of raw body) in stukken naar disk"""
+    content_type = request.headers.get("content-type", "")
+    try:
+        reader = MultipartFileReader(content_type) if content_type.startswith("multipart/") else None
+    except RuntimeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except CsvStreamError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    received = 0
+    try:
+        with open(target, "wb") as out:
+            async for data in request.stream():
+                received += len(data)
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+                out.write(reader.feed(data) if reader else data)
+        if reader is not None and not reader.found:
+            raise HTTPException(status_code=400, detail="Multipart body has no 'file' field")
+        if target.stat().st_size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+    except (HTTPException, CsvStreamError) as e:
+        target.unlink(missing_ok=True)
+        if isinstance(e, CsvStreamError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request):
+    """
+    Start een offline classificatie job
+    
+    Input is een CSV flow export: als upload (multipart/form-data veld 'file'
+    of raw text/csv body, wordt naar disk gestreamd) of als JSON
+    {"path": "..."} naar een bestand op de server. De job draait in een
+    process pool; volg hem via GET /jobs/{id}.
+    
+    Returns:
+        Job status met job_id
+    """
+    manager = get_jobs()
+    content_type = request.headers.get("content-type", "")
+    
+    if content_type.startswith("application/json"):
+        try:
+            job_request = JobRequest(**(await request.json()))
+            path = manager.resolve_path(job_request.path)
+        except PermissionError as e:
+            raise HTTPException(status_code=403, detail=str(e))
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return manager.create(path, source=str(path), uploaded=False)
+    
+    filename = request.headers.get("x-filename", "upload.csv")
+    try:
+        check_input_name(filename)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    max_bytes = config.get('api.jobs.max_upload_bytes', 10 * 1024 * 1024 * 1024)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+    
+    job_id = uuid.uuid4().hex
+    target = manager.new_upload_path(job_id)
+    await save_upload(request, target, max_bytes)
+    return manager.create(target, source=f"upload:{filename}", uploaded=True, job_id=job_id)
+
+@app.get("/jobs")
+async def list_jobs(limit: int = 50):
+    """Recente jobs, nieuwste eerst"""
+    return {"jobs": get_jobs().list(limit)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, voortgang (0-1), rows/s en ETA van een job"""
+    status = get_jobs().status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Annuleer een job; een lopende job stopt na de huidige chunk"""
+    status = get_jobs().cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, follow: bool = False, poll: float = 0.5):
+    """
+    Resultaat CSV van een job (originele kolommen + scores en Prediction_Label)
+    
+    Args:
+        follow: Stream al tijdens de job: geannoteerde rijen komen door zodra
+            een chunk klaar is, tot de job afgelopen is
+        poll: Seconden tussen checks op nieuwe rijen bij follow
+    """
+    manager = get_jobs()
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job['status'] != COMPLETED and not (follow and job['status'] not in FINISHED):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    
+    result_path = job['result_path']
+    block_size = 1024 * 1024
+    
+    async def tail():
+        offset = 0
+        while True:
+            current = manager.get(job_id)
+            path = result_path if current['status'] == COMPLETED else result_path + '.part'
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    while data := f.read(block_size):
+                        offset += len(data)
+                        yield data
+            if current['status'] in FINISHED:
+                return
+            await asyncio.sleep(poll)
+    
+    async def read_file():
+        with open(result_path, 'rb') as f:
+            while data := f.read(block_size):
+                yield data
+    
+    return StreamingResponse(
+        tail() if follow else read_file(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="job-{job_id}.csv"'}
+    )
 
 @app.get("/stats", response_model=StatsResponse)
 async def get_stats():
@@ -353,88 +956,173 @@ async def get_stats():
     
     return StatsResponse(
         model_loaded=firewall is not None,
-        total_predictions=len(recent_predictions),
-        uptime_seconds=process.create_time(),
+        # Gedeelde counters: alle workers samen
+        total_predictions=prediction_counters.totals()['predictions'],
+        rolling={
+            'last_minute': prediction_counters.rolling(60),
+            'last_5_minutes': prediction_counters.rolling(300),
+            'workers': prediction_counters.workers()
+        },
+        uptime_seconds=round(time.time() - process.create_time(), 1),
         cpu_percent=process.cpu_percent(),
-        memory_percent=process.memory_percent()
+        memory_percent=process.memory_percent(),
+        event_loop_lag_ms=loop_lag.get_stats()['lag_ewma_ms'],
+        inference={**inference.get_stats(), 'event_loop': loop_lag.get_stats(), 'csv': csv_stream_stats,
+                   'admission': admission.get_stats()}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus metrics (text format 0.0.4)
+    
+    Counters en latency histogrammen per stage zijn opgeteld over alle
+    workers; model info en event loop lag komen van de worker die antwoordt.
+    """
+    lag = loop_lag.get_stats()
+    extra = [
+        "# HELP ai_firewall_model_info Geladen model versie (mtime van het XGBoost model)",
+        "# TYPE ai_firewall_model_info gauge",
+        f'ai_firewall_model_info{{version="{metrics.escape(getattr(firewall, "model_version", "unknown") if firewall else "none")}"}} '
+        f'{int(firewall is not None)}',
+        "# HELP ai_firewall_event_loop_lag_seconds Event loop lag (EWMA) van deze worker",
+        "# TYPE ai_firewall_event_loop_lag_seconds gauge",
+        f"ai_firewall_event_loop_lag_seconds {lag['lag_ewma_ms'] / 1000!r}",
+    ]
+    return PlainTextResponse(
+        metrics.registry().render(extra),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
     )
 
 @app.get("/predictions/recent")
-async def get_recent_predictions(since: int = 0, initial: bool = False):
+async def get_recent_predictions(since: int = 0, initial: bool = False, limit: Optional[int] = None):
     """
     Get recent predictions for dashboard polling
     
     Args:
-        since: Only return predictions after this index
+        since: Laatst geziene sequence number; alleen nieuwere predictions
         initial: If True, return last 20 for initial load
+        limit: Maximaal aantal predictions (oudste eerst)
         
     Returns:
-        List of recent predictions
+        predictions (met 'seq'), next_index (= since voor de volgende poll) en
+        fell_behind/missed als since al uit de ring verdwenen is
     """
-    global recent_predictions
-    
     # Initial load - return last 20
     if initial:
         return {
-            "predictions": recent_predictions[-20:] if recent_predictions else [],
+            "predictions": recent_predictions.latest(20),
             "total": len(recent_predictions),
-            "next_index": len(recent_predictions)
-        }
-    
-    # Polling - only return NEW predictions after since index
-    if since >= len(recent_predictions):
-        # No new predictions
-        return {
-            "predictions": [],
-            "total": len(recent_predictions),
-            "next_index": len(recent_predictions)
+            "next_index": recent_predictions.last_seq,
+            "fell_behind": False,
+            "missed": 0
         }
     
+    result = recent_predictions.since(since, limit)
     return {
-        "predictions": recent_predictions[since:],
+        "predictions": result['entries'],
         "total": len(recent_predictions),
-        "next_index": len(recent_predictions)
+        "next_index": result['last_seq'],
+        "oldest_index": result['oldest_seq'],
+        "fell_behind": result['fell_behind'],
+        "missed": result['missed']
     }
 
+@app.get("/predictions/stream")
+async def stream_predictions(request: Request, since: Optional[int] = None):
+    """
+    Server-Sent Events stream van nieuwe predictions (vervangt polling)
+    
+    Events: 'prediction' (id = seq), 'stats' (delta per gescoorde batch),
+    'gap' (resume ouder dan de ring: missed predictions) en 'evicted' (client
+    hield de queue niet bij; EventSource reconnect daarna zelf).
+    
+    Args:
+        since: Laatst geziene sequence number; de Last-Event-ID header van een
+               EventSource reconnect heeft voorrang
+        
+    Returns:
+        text/event-stream
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    return StreamingResponse(
+        prediction_broadcaster.stream(
+            since,
+            heartbeat=config.get('api.stream.heartbeat', 15.0),
+            retry_ms=config.get('api.stream.retry_ms', 3000)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # WebSocket voor real-time streaming
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint voor real-time flow streaming
     
-    Connects to Redis channel 'firewall_events' and pushes updates to client
+    Alle clients van deze worker delen één subscription op het Redis channel
+    'firewall_events' (zie redis_hub.py). Een burst gaat als JSON array van
+    berichten in één frame; een client die niet bijhoudt wordt gesloten met
+    code 1013 en moet reconnecten.
     """
     await websocket.accept()
     logger.info("WebSocket client connected")
     
-    import redis.asyncio as redis
-    
-    redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
-    r = redis.from_url(redis_url, decode_responses=True)
-    pubsub = r.pubsub()
-    await pubsub.subscribe('firewall_events')
-    
     try:
-        while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True)
-            if message:
-                await websocket.send_text(message['data'])
-            await asyncio.sleep(0.01)
+        await ws_hub.serve(websocket)
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
-        await pubsub.unsubscribe('firewall_events')
-        await r.close()
         logger.info("WebSocket client disconnected")
 
+@app.websocket("/ingest")
+async def ingest_endpoint(websocket: WebSocket):
+    """
+    Persistente ingest verbinding voor sensors
+    
+    Flow batches met een sequence id gaan over één WebSocket; verdicts komen
+    terug zodra een batch gescoord is (niet per se in volgorde). Credits
+    begrenzen het aantal open batches per verbinding, zie ingest_channel.py
+    voor het protocol.
+    """
+    await websocket.accept()
+    if firewall is None:
+        await websocket.close(code=1011, reason="Models not loaded")
+        return
+    
+    async def score(flows: List[Dict]) -> List[Dict]:
+        return await inference.run('ingest', score_raw_chunk, flows)
+    
+    session = IngestSession(
+        websocket,
+        score,
+        credits=config.get('api.ingest.credits', 8),
+        max_batch=config.get('api.ingest.max_batch', 1000)
+    )
+    ingest_sessions.append(session)
+    logger.info("Ingest session opened")
+    try:
+        await session.serve()
+    except Exception as e:
+        logger.error(f"Ingest session error: {e}")
+    finally:
+        ingest_sessions.remove(session)
+        logger.info(f"Ingest session closed: {session.stats}")
+
 # === FIREWALL BLOCKING ENDPOINTS ===
+# Plain def: FastAPI draait deze in de threadpool. De blocker doet subprocess
+# calls, wacht op batch flushes en fsynct de block log onder een lock die de
+# expiry thread ook vasthoudt; dat mag de event loop (health, SSE, /ws) niet blokkeren.
 
 @app.get("/firewall/stats")
-async def get_firewall_stats():
+def get_firewall_stats():
     """Get firewall blocking statistics"""
     try:
-        from firewall_blocker import FirewallBlocker
-        blocker = FirewallBlocker(reload_config=False)
+        blocker = get_blocker()
         
         stats = blocker.get_stats()
         blocked_ips = blocker.get_blocked_ips()
@@ -451,35 +1139,23 @@ async def get_firewall_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/blocked-ips")
-async def get_blocked_ips():
+def get_blocked_ips():
     """Get list of all blocked IPs with details"""
     try:
-        from firewall_blocker import FirewallBlocker
-        blocker = FirewallBlocker(reload_config=False)
-        
-        # Get blocked IPs
-        blocked_ips = []
-        for ip in blocker.get_blocked_ips():
-            # Find in history
-            ip_history = [h for h in blocker.block_history if h['ip'] == ip]
-            
-            if ip_history:
-                latest = ip_history[-1]
-                blocked_ips.append({
-                    "ip": ip,
-                    "blocked_at": latest['timestamp'],
-                    "reason": latest['reason'],
-                    "method": latest['method'],
-                    "duration_hours": blocker.block_duration_hours
-                })
-            else:
-                blocked_ips.append({
-                    "ip": ip,
-                    "blocked_at": datetime.now().isoformat(),
-                    "reason": "Unknown",
-                    "method": "manual",
-                    "duration_hours": blocker.block_duration_hours
-                })
+        blocker = get_blocker()
+        
+        # Active blocks uit de store mirror (geen scan over de history)
+        blocked_ips = [
+            {
+                "ip": record['ip'],
+                "blocked_at": record['blocked_at'],
+                "expires_at": record['expires_at'],
+                "reason": record['reason'] or "Unknown",
+                "method": record['method'] or "manual",
+                "duration_hours": blocker.block_duration_hours
+            }
+            for record in blocker.get_block_records()
+        ]
         
         return {
             "status": "success",
@@ -492,12 +1168,60 @@ async def get_blocked_ips():
         logger.error(f"Error getting blocked IPs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/firewall/lookup/{ip}")
+def lookup_ip(ip: str):
+    """Whitelist en block status van een IP (longest-prefix-match op CIDRs)"""
+    blocker = get_blocker()
+    if not blocker.is_valid_ip(ip):
+        raise HTTPException(status_code=400, detail=f"Invalid IP address: {ip}")
+    
+    return {
+        "status": "success",
+        **blocker.lookup(ip),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def bulk_response(results: List[Dict]) -> Dict:
+    """Samenvatting + per-operatie resultaten voor bulk endpoints"""
+    succeeded = sum(1 for r in results if r['success'])
+    return {
+        "status": "success" if succeeded == len(results) else "partial" if succeeded else "failed",
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "timestamp": datetime.now().isoformat()
+    }
+
+# Bulk routes voor /block/{ip} en /unblock/{ip} zodat 'bulk' niet als IP matcht
+@app.post("/block/bulk")
+def bulk_block_ips(request: BulkBlockRequest):
+    """Block meerdere IPs in één firewall transactie"""
+    try:
+        blocker = get_blocker()
+        
+        results = blocker.block_ips(request.ips, request.reason)
+        return bulk_response(results)
+    except Exception as e:
+        logger.error(f"Error bulk blocking IPs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/unblock/bulk")
+def bulk_unblock_ips(request: BulkUnblockRequest):
+    """Unblock meerdere IPs in één firewall transactie"""
+    try:
+        blocker = get_blocker()
+        
+        results = blocker.unblock_ips(request.ips)
+        return bulk_response(results)
+    except Exception as e:
+        logger.error(f"Error bulk unblocking IPs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/unblock/{ip}")
-async def unblock_ip(ip: str):
+def unblock_ip(ip: str):
     """Manually unblock an IP address"""
     try:
-        from firewall_blocker import FirewallBlocker
-        blocker = FirewallBlocker(reload_config=False)
+        blocker = get_blocker()
         
         # Unblock
         success = blocker.unblock_ip(ip)
@@ -520,11 +1244,10 @@ async def unblock_ip(ip: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/block/{ip}")
-async def manual_block_ip(ip: str, reason: str = "Manual block"):
+def manual_block_ip(ip: str, reason: str = "Manual block"):
     """Manually block an IP address"""
     try:
-        from firewall_blocker import FirewallBlocker
-        blocker = FirewallBlocker(reload_config=False)
+        blocker = get_blocker()
         
         # Block
         success = blocker.block_ip(ip, reason)
@@ -548,29 +1271,18 @@ async def manual_block_ip(ip: str, reason: str = "Manual block"):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/logs/blocked")
-async def get_block_logs(limit: int = 100):
+def get_block_logs(limit: int = 100):
     """Get recent blocking history from logs"""
     try:
-        log_file = Path("logs/blocked_ips.json")
+        # Buffer van deze worker eerst wegschrijven, dan tail vanaf het einde
+        if blocker is not None:
+            blocker.block_log.sync()
         
-        if not log_file.exists():
-            return {
-                "status": "success",
-                "logs": [],
-                "total": 0
-            }
-        
-        # Read last N lines
-        logs = []
-        with open(log_file, 'r') as f:
-            for line in f:
-                try:
-                    logs.append(json.loads(line.strip()))
-                except:
-                    pass
-        
-        # Return most recent first
-        logs = logs[-limit:][::-1]
+        logs = tail_records(
+            config.get('firewall.log.path', 'logs/blocked_ips.json'),
+            limit,
+            backups=config.get('firewall.log.backups', 5)
+        )
         
         return {
             "status": "success",
@@ -651,5 +1363,6 @@ if __name__ == "__main__":
         port=8000,
         reload=False,  # Disable in productie
         workers=4,  # Multi-process
+        ws_per_message_deflate=True,  # Gecomprimeerde /ws frames (JSON batches)
         log_level="info"
     )
@@ -0,0 +1,387 @@
+"""
+Benchmark Firewall Blocking Backends
+Vergelijkt iptables chain (regel per IP) met ipset / nftables / netlink sets:
+insert latency en packet cost bij 10k en 100k geblokkeerde IPs.
+
+Vereist root (of sudo) op Linux. Alle regels staan in een eigen chain/tabel
+die alleen UDP verkeer op loopback naar de benchmark poort raakt.
+Met --fake draait de netlink backend tegen FakeIPSet (geen root nodig).
+Met --simulated gaan block/unblock storms door FirewallBlocker tegen een
+SimulatedKernel (chain vs set kostenmodel, geen root nodig).
+"""
+
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import ipaddress
+import numpy as np
+
+from firewall_backends import (IptablesChainBackend, IpsetBackend,
+                               NftablesSetBackend, NetlinkIpsetBackend,
+                               SimulatedBackend)
+from fake_netlink import FakeIPSet
+from firewall_blocker import FirewallBlocker
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+BENCH_CHAIN = 'AIFW-BENCH'
+BENCH_SET = 'aifw-bench'
+BENCH_TABLE = 'aifw_bench'
+BENCH_PORT = 47999
+
+
+def run(cmd, input=None):
+    """Run command zonder sudo (benchmark draait als root)"""
+    return subprocess.run(cmd, capture_output=True, text=True, input=input)
+
+
+def bench_ip(i: int) -> str:
+    """Deterministisch 10.0.0.0/8 adres (matcht nooit loopback)"""
+    return str(ipaddress.IPv4Address(0x0A000000 + i + 1))
+
+
+def hook_chain():
+    """Maak benchmark chain en stuur alleen loopback UDP naar de benchmark poort erdoor"""
+    run(['iptables', '-N', BENCH_CHAIN])
+    run(['iptables', '-I', 'INPUT', '1', '-i', 'lo', '-p', 'udp',
+         '--dport', str(BENCH_PORT), '-j', BENCH_CHAIN])
+
+
+def unhook_chain():
+    run(['iptables', '-D', 'INPUT', '-i', 'lo', '-p', 'udp',
+         '--dport', str(BENCH_PORT), '-j', BENCH_CHAIN])
+    run(['iptables', '-F', BENCH_CHAIN])
+    run(['iptables', '-X', BENCH_CHAIN])
+
+
+def populate(backend, n: int):
+    """Bulk load n entries (sneller dan n losse subprocess calls)"""
+    ips = [bench_ip(i) for i in range(n)]
+
+    if isinstance(backend, NetlinkIpsetBackend) and isinstance(backend.connection(), FakeIPSet):
+        for ip in ips:
+            backend.connection().add(BENCH_SET, ip, exclusive=False, etype='net')
+        return
+
+    if isinstance(backend, IptablesChainBackend):
+        lines = ['*filter'] + [f'-A {BENCH_CHAIN} -s {ip} -j DROP' for ip in ips] + ['COMMIT', '']
+        result = run(['iptables-restore', '--noflush'], input='\n'.join(lines))
+    elif isinstance(backend, IpsetBackend):
+        lines = [f'add {BENCH_SET} {ip} -exist' for ip in ips] + ['']
+        result = run(['ipset', 'restore'], input='\n'.join(lines))
+    else:
+        chunks = [ips[i:i + 5000] for i in range(0, len(ips), 5000)]
+        script = ''.join(
+            f"add element inet {BENCH_TABLE} blocked4 {{ {', '.join(chunk)} }}\n"
+            for chunk in chunks
+        )
+        result = run(['nft', '-f', '-'], input=script)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Populate failed for {backend.name}: {result.stderr[:200]}")
+
+
+def measure_insert(backend, offset: int, samples: int):
+    """Latency (ms) van losse block() + unblock() calls bovenop de geladen set"""
+    block_ms, unblock_ms = [], []
+
+    for i in range(samples):
+        ip = bench_ip(offset + i)
+
+        start = time.perf_counter()
+        backend.block(ip, 'benchmark')
+        block_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        backend.unblock(ip)
+        unblock_ms.append((time.perf_counter() - start) * 1000)
+
+    return block_ms, unblock_ms
+
+
+def measure_packet_rate(duration: float = 2.0) -> float:
+    """Ontvangen UDP packets/s over loopback door de benchmark chain"""
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', BENCH_PORT))
+    receiver.settimeout(0.2)
+
+    stop = threading.Event()
+    payload = b'x' * 64
+
+    def blast():
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        while not stop.is_set():
+            try:
+                sender.sendto(payload, ('127.0.0.1', BENCH_PORT))
+            except OSError:
+                pass
+        sender.close()
+
+    thread = threading.Thread(target=blast, daemon=True)
+    thread.start()
+
+    received = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        try:
+            receiver.recv(128)
+            received += 1
+        except socket.timeout:
+            continue
+
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    receiver.close()
+
+    return received / elapsed
+
+
+def make_backends():
+    """Backends in een geïsoleerde chain/set/tabel"""
+    return [
+        IptablesChainBackend(chain=BENCH_CHAIN, use_sudo=False),
+        IpsetBackend(set_name=BENCH_SET, chain=BENCH_CHAIN, use_sudo=False),
+        NftablesSetBackend(table=BENCH_TABLE, use_sudo=False),
+        NetlinkIpsetBackend(set_name=BENCH_SET, chain=BENCH_CHAIN, use_sudo=False),
+    ]
+
+
+def benchmark_backend(backend, sizes, samples):
+    """Benchmark één backend voor alle set sizes"""
+    results = {}
+
+    for n in sizes:
+        logger.info(f"[{backend.name}] loading {n:,} entries...")
+        hook_chain()
+        try:
+            backend.setup()
+            populate(backend, n)
+
+            block_ms, unblock_ms = measure_insert(backend, offset=n, samples=samples)
+            pps = measure_packet_rate()
+
+            results[n] = {
+                'block_p50_ms': float(np.percentile(block_ms, 50)),
+                'block_p99_ms': float(np.percentile(block_ms, 99)),
+                'unblock_p50_ms': float(np.percentile(unblock_ms, 50)),
+                'packets_per_sec': pps,
+            }
+        finally:
+            backend.teardown()
+            unhook_chain()
+
+    return results
+
+
+def benchmark_netlink_fake(sizes, samples):
+    """Netlink backend tegen FakeIPSet: alleen userspace overhead, geen root"""
+    results = {}
+
+    for n in sizes:
+        backend = NetlinkIpsetBackend(set_name=BENCH_SET, ipset=FakeIPSet(), manage_rule=False)
+        backend.setup()
+        populate(backend, n)
+
+        block_ms, unblock_ms = measure_insert(backend, offset=n, samples=samples)
+        results[n] = {
+            'block_p50_us': float(np.percentile(block_ms, 50)) * 1000,
+            'block_p99_us': float(np.percentile(block_ms, 99)) * 1000,
+            'unblock_p50_us': float(np.percentile(unblock_ms, 50)) * 1000,
+        }
+
+    print("\n" + "=" * 60)
+    print("NETLINK BACKEND (FakeIPSet, userspace overhead only)")
+    print("=" * 60)
+    print(f"{'Entries':>9} {'Block p50':>12} {'Block p99':>12} {'Unblock p50':>13}")
+    print("-" * 60)
+    for n, r in results.items():
+        print(f"{n:>9,} {r['block_p50_us']:>10.1f}us {r['block_p99_us']:>10.1f}us "
+              f"{r['unblock_p50_us']:>11.1f}us")
+    print("=" * 60)
+
+    return results
+
+
+def make_simulated_blocker(mode: str):
+    """FirewallBlocker met SimulatedBackend (state in de huidige directory)"""
+    blocker = FirewallBlocker(reload_config=False)
+    blocker.backend = SimulatedBackend(mode=mode)
+    blocker._backend_ready = True
+    blocker.auto_block_enabled = True
+    blocker.is_linux = lambda: True
+    # Sequentiële benchmark IPs zouden anders tot /24 prefixes samenvallen
+    blocker.aggregation.enabled = False
+    return blocker
+
+
+def storm(blocker, ips, batch: int, action: str):
+    """Block of unblock alle ips in calls van `batch` IPs; latency per call (ms)"""
+    latencies = []
+    for i in range(0, len(ips), batch):
+        chunk = ips[i:i + batch]
+        start = time.perf_counter()
+        if action == 'block':
+            if batch == 1:
+                blocker.block_ip(chunk[0], 'benchmark')
+            else:
+                blocker.block_ips(chunk, 'benchmark')
+        elif batch == 1:
+            blocker.unblock_ip(chunk[0])
+        else:
+            blocker.unblock_ips(chunk)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def benchmark_simulated(modes, sizes, batch):
+    """
+    Block/unblock storms door FirewallBlocker tegen SimulatedKernel
+
+    Per mode en grootte: ops/s en p99 latency per call voor beide storms,
+    geheugen van blocker + kernel state met alle IPs geblokkeerd (aparte run
+    onder tracemalloc, zodat de timings niet vertekend worden) en de
+    gemodelleerde kernel kosten per packet van een niet-geblokkeerd IP.
+    """
+    cwd = os.getcwd()
+    results = {}
+
+    for mode in modes:
+        for n in sizes:
+            ips = [bench_ip(i) for i in range(n)]
+
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)
+                try:
+                    blocker = make_simulated_blocker(mode)
+                    started = time.perf_counter()
+                    block_ms = storm(blocker, ips, batch, 'block')
+                    block_elapsed = time.perf_counter() - started
+
+                    kernel = blocker.backend.kernel
+                    assert len(kernel) == n, f"{mode}: {len(kernel)} of {n} blocked"
+                    packet_ns = kernel.packet_cost_ns('192.0.2.1')
+
+                    started = time.perf_counter()
+                    unblock_ms = storm(blocker, ips, batch, 'unblock')
+                    unblock_elapsed = time.perf_counter() - started
+                    stats = kernel.get_stats()
+                    blocker.close()
+                finally:
+                    os.chdir(cwd)
+
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)
+                try:
+                    tracemalloc.start()
+                    blocker = make_simulated_blocker(mode)
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    storm(blocker, ips, max(batch, 1000), 'block')
+                    memory = tracemalloc.get_traced_memory()[0] - baseline
+                    tracemalloc.stop()
+                    blocker.close()
+                finally:
+                    os.chdir(cwd)
+
+            results[(mode, n)] = {
+                'block_ops_per_sec': n / block_elapsed,
+                'block_p99_ms': float(np.percentile(block_ms, 99)),
+                'unblock_ops_per_sec': n / unblock_elapsed,
+                'unblock_p99_ms': float(np.percentile(unblock_ms, 99)),
+                'memory_mb': memory / 1024 / 1024,
+                'packet_ns': packet_ns,
+                'modeled_kernel_ms': stats['modeled_ns'] / 1e6,
+                'kernel_ops': stats['recorded_ops'],
+            }
+
+    print("\n" + "=" * 104)
+    print(f"SIMULATED KERNEL STORMS (FirewallBlocker, {batch} IP(s) per call)")
+    print("=" * 104)
+    print(f"{'Mode':<6} {'Entries':>8} {'Block/s':>10} {'Block p99':>11} {'Unblock/s':>10} "
+          f"{'Unbl. p99':>11} {'Memory':>9} {'Pkt cost':>10} {'Kernel time':>12} {'Ops':>8}")
+    print("-" * 104)
+    for (mode, n), r in results.items():
+        print(f"{mode:<6} {n:>8,} {r['block_ops_per_sec']:>10,.0f} {r['block_p99_ms']:>9.2f}ms "
+              f"{r['unblock_ops_per_sec']:>10,.0f} {r['unblock_p99_ms']:>9.2f}ms "
+              f"{r['memory_mb']:>7.1f}MB {r['packet_ns']:>8,.0f}ns "
+              f"{r['modeled_kernel_ms']:>10,.1f}ms {r['kernel_ops']:>8,}")
+    print("=" * 104)
+    print("Pkt cost / Kernel time: gemodelleerd (chain: regel evaluaties, set: hash probes)")
+
+    return results
+
+
+def print_results(baseline_pps, all_results):
+    """Print benchmark tabel"""
+    print("\n" + "=" * 78)
+    print("FIREWALL BACKEND BENCHMARK")
+    print("=" * 78)
+    print(f"Baseline (no rules): {baseline_pps:,.0f} packets/sec\n")
+    print(f"{'Backend':<10} {'Entries':>9} {'Block p50':>11} {'Block p99':>11} "
+          f"{'Unblock p50':>12} {'Packets/s':>12} {'vs base':>8}")
+    print("-" * 78)
+
+    for name, results in all_results.items():
+        for n, r in results.items():
+            print(f"{name:<10} {n:>9,} {r['block_p50_ms']:>9.2f}ms {r['block_p99_ms']:>9.2f}ms "
+                  f"{r['unblock_p50_ms']:>10.2f}ms {r['packets_per_sec']:>12,.0f} "
+                  f"{r['packets_per_sec'] / baseline_pps:>7.0%}")
+    print("=" * 78)
+
+
+def main():
+    """Run benchmarks"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark firewall blocking backends')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help='Number of blocked IPs to preload '
+                             '(default: 10k 100k, simulated: 1k 10k 100k)')
+    parser.add_argument('--samples', type=int, default=50,
+                        help='Single block/unblock operations to time per size')
+    parser.add_argument('--backends', nargs='+',
+                        default=['iptables', 'ipset', 'nftables', 'netlink'])
+    parser.add_argument('--fake', action='store_true',
+                        help='Benchmark the netlink backend against FakeIPSet (no root)')
+    parser.add_argument('--simulated', action='store_true',
+                        help='Block/unblock storms through FirewallBlocker against '
+                             'the simulated kernel (no root)')
+    parser.add_argument('--modes', nargs='+', default=['chain', 'set'],
+                        help='Simulated kernel modes')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='IPs per block/unblock call in simulated storms')
+    args = parser.parse_args()
+
+    if args.simulated:
+        benchmark_simulated(args.modes, args.sizes or [1000, 10000, 100000], max(args.batch, 1))
+        return
+
+    sizes = args.sizes or [10000, 100000]
+
+    if args.fake:
+        benchmark_netlink_fake(sizes, max(args.samples, 1000))
+        return
+
+    if os.geteuid() != 0:
+        print("This benchmark modifies the kernel ruleset - run as root.")
+        return
+
+    hook_chain()
+    baseline_pps = measure_packet_rate()
+    unhook_chain()
+
+    all_results = {}
+    for backend in make_backends():
+        if backend.name in args.backends:
+            all_results[backend.name] = benchmark_backend(backend, sizes, args.samples)
+
+    print_results(baseline_pps, all_results)
+
+
+if __name__ == "__main__":
+    main()
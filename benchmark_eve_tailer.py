@@ -0,0 +1,225 @@
+"""
+Benchmark EVE log tailing
+Synthetisch eve.json met 1M flow events: de oude readline() + sleep(0.1)
+loop tegenover EveTailer (inotify, grote reads, batches).
+
+Gemeten:
+- Catch-up: een bestaand bestand van 1M regels volledig inlezen (regels/s, MB/s)
+- Live: een writer die bursts schrijft; latency van write tot regel bij de
+  consumer (p50/p99), wakeups en CPU tijd
+- Rotatie: halverwege de live run rename + nieuw eve.json (logrotate);
+  aantal gemiste regels
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from eve_tailer import EveTailer
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+
+def flow_event(i: int, t: float = 0.0) -> str:
+    """Suricata-achtig flow event (~450 bytes)"""
+    return json.dumps({
+        'timestamp': '2026-10-19T12:00:00.000000+0000',
+        'flow_id': 1000000000 + i,
+        'event_type': 'flow',
+        'src_ip': f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}',
+        'src_port': 40000 + i % 20000,
+        'dest_ip': '192.168.1.100',
+        'dest_port': 443,
+        'proto': 'TCP',
+        'app_proto': 'tls',
+        'flow': {'pkts_toserver': i % 97, 'pkts_toclient': i % 89, 'bytes_toserver': i % 9973,
+                 'bytes_toclient': i % 7919, 'start': '2026-10-19T11:59:58.000000+0000',
+                 'end': '2026-10-19T12:00:00.000000+0000', 'age': 2, 'state': 'closed',
+                 'reason': 'timeout', 'alerted': False},
+        'tcp': {'tcp_flags': '1b', 'syn': True, 'fin': True, 'psh': True, 'ack': True, 'state': 'closed'},
+        't': t
+    })
+
+
+def write_file(path: str, lines: int):
+    with open(path, 'w') as f:
+        block = []
+        for i in range(lines):
+            block.append(flow_event(i))
+            if len(block) == 10000:
+                f.write('\n'.join(block) + '\n')
+                block = []
+        if block:
+            f.write('\n'.join(block) + '\n')
+
+
+class LegacyTail:
+    """De oude loop uit suricata_integration / suricata_ml_blocker"""
+
+    def __init__(self, path: str, from_start: bool = False):
+        self.f = open(path, 'r')
+        if not from_start:
+            self.f.seek(0, 2)
+        self.stopped = False
+        self.wakeups = 0
+
+    def lines(self):
+        while not self.stopped:
+            line = self.f.readline()
+            if not line:
+                self.wakeups += 1
+                time.sleep(0.1)
+                continue
+            yield line.strip()
+
+    def read_all(self):
+        while True:
+            line = self.f.readline()
+            if not line:
+                return
+            yield line.strip()
+
+
+# === Catch-up ===
+
+def bench_catchup(path: str, parse: bool) -> list:
+    size_mb = os.path.getsize(path) / 1e6
+    results = []
+
+    started = time.perf_counter()
+    count = 0
+    legacy = LegacyTail(path, from_start=True)
+    for line in legacy.read_all():
+        if parse:
+            json.loads(line)
+        count += 1
+    legacy.f.close()
+    results.append(('readline', count, time.perf_counter() - started, size_mb))
+
+    started = time.perf_counter()
+    count = 0
+    tailer = EveTailer(path, from_start=True)
+    for lines in tailer._drain():
+        if parse:
+            for line in lines:
+                json.loads(line)
+        count += len(lines)
+    tailer.close()
+    results.append(('eve_tailer', count, time.perf_counter() - started, size_mb))
+    return results
+
+
+# === Live ===
+
+def writer(path: str, total: int, burst: int, interval: float, rotate_at: int):
+    written = 0
+    while written < total:
+        if rotate_at and written == rotate_at:
+            # logrotate: rename, daarna heropent de writer een nieuw eve.json
+            os.rename(path, path + '.1')
+        now = time.time()
+        chunk = ''.join(flow_event(written + k, now) + '\n' for k in range(burst))
+        with open(path, 'a') as f:
+            f.write(chunk)
+        written += burst
+        time.sleep(interval)
+
+
+def bench_live(mode: str, tmp: str, total: int, burst: int, interval: float, rotate: bool) -> dict:
+    path = os.path.join(tmp, f'live-{mode}-{int(rotate)}.json')
+    open(path, 'w').close()
+    latencies = []
+
+    if mode == 'readline':
+        source = LegacyTail(path)
+        lines_iter = source.lines()
+        batches = ([line] for line in lines_iter)
+    else:
+        source = EveTailer(path, idle_timeout=0.5)
+        batches = source.batches()
+
+    def consume():
+        for batch in batches:
+            now = time.time()
+            for line in batch:
+                latencies.append(now - json.loads(line)['t'])
+
+    cpu = time.process_time()
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    writer(path, total, burst, interval, total // 2 // burst * burst if rotate else 0)
+    time.sleep(1.0)  # laatste bursts afleveren
+    if mode == 'readline':
+        source.stopped = True
+    else:
+        source.stop()
+    thread.join(timeout=2)
+    cpu = time.process_time() - cpu
+
+    wakeups = source.wakeups if mode == 'readline' else source.stats['wakeups']
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'mode': mode,
+        'rotate': rotate,
+        'received': len(latencies),
+        'missed': total - len(latencies),
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p99_ms': float(np.percentile(lat, 99)),
+        'wakeups': wakeups,
+        'cpu_s': cpu
+    }
+
+
+def print_results(lines: int, catchup, live):
+    print("\n" + "=" * 78)
+    print(f"EVE TAIL BENCHMARK ({lines:,} lines)")
+    print("=" * 78)
+    print(f"{'Catch-up':<22} {'Lines':>10} {'Seconds':>9} {'Lines/s':>12} {'MB/s':>9}")
+    print("-" * 78)
+    for name, count, elapsed, size_mb in catchup:
+        print(f"{name:<22} {count:>10,} {elapsed:>9.2f} {count / elapsed:>12,.0f} {size_mb / elapsed:>9.0f}")
+    print("-" * 78)
+    print(f"{'Live':<22} {'Received':>10} {'Missed':>7} {'p50':>9} {'p99':>9} {'Wakeups':>8} {'CPU':>7}")
+    print("-" * 78)
+    for r in live:
+        name = f"{r['mode']}{' +rotate' if r['rotate'] else ''}"
+        print(f"{name:<22} {r['received']:>10,} {r['missed']:>7,} {r['p50_ms']:>7.1f}ms "
+              f"{r['p99_ms']:>7.1f}ms {r['wakeups']:>8} {r['cpu_s']:>6.2f}s")
+    print("=" * 78)
+
+
+def main():
+    """Run benchmark"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark EVE log tailing')
+    parser.add_argument('--lines', type=int, default=1_000_000, help='Lines in the synthetic EVE file')
+    parser.add_argument('--parse', action='store_true', help='Include json.loads in catch-up')
+    parser.add_argument('--live-lines', type=int, default=20000, help='Lines written in the live test')
+    parser.add_argument('--burst', type=int, default=200, help='Lines per burst')
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between bursts')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'eve.json')
+        logger.info(f"Writing {args.lines:,} synthetic EVE lines...")
+        write_file(path, args.lines)
+        catchup = bench_catchup(path, args.parse)
+        os.remove(path)
+
+        live = []
+        for rotate in (False, True):
+            for mode in ('readline', 'eve_tailer'):
+                logger.info(f"Live: {mode}{' with rotation' if rotate else ''}")
+                live.append(bench_live(mode, tmp, args.live_lines, args.burst, args.interval, rotate))
+
+    print_results(args.lines, catchup, live)
+
+
+if __name__ == "__main__":
+    main()
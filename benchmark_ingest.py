@@ -0,0 +1,149 @@
+"""
+Load test /ingest vs /predict/raw
+Lokale load generator tegen een draaiende API server: dezelfde flows via één
+HTTP request per flow (N parallelle sensors met keep-alive sessies) en via
+de persistente /ingest WebSocket (batches met credits, pipelined).
+
+Gemeten: flows per seconde en latency per flow (van versturen tot verdict,
+p50/p99/p99.9). Bij /ingest telt voor elke flow de latency van zijn batch.
+
+Start eerst de API, bijv.:
+    uvicorn api_server:app --port 8000
+Vereist het websockets package voor /ingest.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from firewall_client import IngestClient
+from inference import create_example_flow
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+
+def make_flows(n: int):
+    """n varianten van de voorbeeld flow met sensor metadata"""
+    rng = random.Random(42)
+    flows = []
+    for i in range(n):
+        flow = create_example_flow()
+        flow['Flow Duration'] = rng.randint(1000, 5000000)
+        flow['Total Fwd Packets'] = rng.randint(1, 500)
+        flow['src_ip'] = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        flows.append(flow)
+    return flows
+
+
+def run_http(base_url: str, flows, sensors: int) -> dict:
+    """Eén POST /predict/raw per flow, sensors threads met elk een eigen Session"""
+    local = threading.local()
+    latencies = []
+
+    def send(flow):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        response = session.post(f"{base_url}/predict/raw", json=flow, timeout=30)
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sensors) as pool:
+        latencies.extend(pool.map(send, flows))
+    elapsed = time.perf_counter() - started
+
+    return summarize('http', sensors, len(flows), latencies, elapsed)
+
+
+async def run_ingest(url: str, flows, sensors: int, batch_size: int) -> dict:
+    """Elke sensor één /ingest verbinding; batches gaan zo snel als de credits toelaten"""
+    latencies = []
+    per_sensor = [flows[i::sensors] for i in range(sensors)]
+
+    async def sensor(own_flows):
+        async with IngestClient(url) as client:
+            size = min(batch_size, client.max_batch)
+            batches = [own_flows[i:i + size] for i in range(0, len(own_flows), size)]
+
+            # Eén loop per credit: elke batch gaat direct de lijn op (latency zonder credit wachttijd)
+            async def pipeline():
+                while batches:
+                    batch = batches.pop()
+                    started = time.perf_counter()
+                    verdicts = await client.score(batch)
+                    assert len(verdicts) == len(batch)
+                    latencies.extend([time.perf_counter() - started] * len(batch))
+
+            await asyncio.gather(*(pipeline() for _ in range(client.credits)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sensor(own_flows) for own_flows in per_sensor if own_flows))
+    elapsed = time.perf_counter() - started
+
+    return summarize(f'ingest/{batch_size}', sensors, len(flows), latencies, elapsed)
+
+
+def summarize(name: str, sensors: int, total: int, latencies, elapsed: float) -> dict:
+    latencies = np.array(latencies)
+    return {
+        'mode': name,
+        'connections': sensors,
+        'flows': total,
+        'flows_per_sec': total / elapsed if elapsed else 0.0,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'p999_ms': float(np.percentile(latencies, 99.9) * 1000),
+        'elapsed_s': elapsed
+    }
+
+
+def print_results(results):
+    print("\n" + "=" * 84)
+    print("SENSOR INGEST LOAD TEST (/predict/raw per flow vs /ingest WebSocket)")
+    print("=" * 84)
+    print(f"{'Mode':<14} {'Conns':>6} {'Flows':>9} {'Flows/s':>10} {'p50':>10} {'p99':>10} {'p99.9':>10}")
+    print("-" * 84)
+    for r in results:
+        print(f"{r['mode']:<14} {r['connections']:>6} {r['flows']:>9,} {r['flows_per_sec']:>10,.0f} "
+              f"{r['p50_ms']:>8.1f}ms {r['p99_ms']:>8.1f}ms {r['p999_ms']:>8.1f}ms")
+    print("=" * 84)
+
+
+def main():
+    """Run load test"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test /ingest vs per-request /predict/raw')
+    parser.add_argument('--url', default='http://localhost:8000', help='API base URL')
+    parser.add_argument('--flows', type=int, default=5000, help='Flows per mode')
+    parser.add_argument('--sensors', type=int, default=4,
+                        help='Parallel sensors (HTTP threads / ingest connections)')
+    parser.add_argument('--batch-sizes', default='1,50,500',
+                        help='Comma separated /ingest batch sizes')
+    parser.add_argument('--skip-http', action='store_true', help='Only run /ingest')
+    args = parser.parse_args()
+
+    flows = make_flows(args.flows)
+    ws_url = args.url.replace('http://', 'ws://').replace('https://', 'wss://').rstrip('/') + '/ingest'
+
+    results = []
+    if not args.skip_http:
+        logger.info(f"HTTP: {args.flows} flows via /predict/raw")
+        results.append(run_http(args.url.rstrip('/'), flows, args.sensors))
+    for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+        logger.info(f"Ingest: {args.flows} flows in batches of {batch_size}")
+        results.append(asyncio.run(run_ingest(ws_url, flows, args.sensors, batch_size)))
+
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark Wire Formats
+Vergelijkt JSON (NDJSON) met Arrow IPC en msgpack voor bulk scoring:
+client encode + server decode + score + server encode + client decode,
+in-process (zonder HTTP) voor batches van 10k flows.
+
+Zonder getrainde modellen (of met --no-score) wordt alleen de wire overhead
+gemeten.
+"""
+
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import wire_format
+from firewall_client import AIFirewallClient
+from inference import create_example_flow
+from json_stream import JsonRecordParser
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+
+def make_flows(n: int, seed: int = 42) -> pd.DataFrame:
+    """n CICIDS flows (voorbeeld flow met ruis) + metadata kolommen"""
+    rng = np.random.default_rng(seed)
+    example = create_example_flow()
+    df = pd.DataFrame({
+        name: (np.full(n, value) * rng.uniform(0.5, 1.5, n)).astype(type(value))
+        if isinstance(value, (int, float)) and not isinstance(value, bool) else [value] * n
+        for name, value in example.items()
+    })
+    df['src_ip'] = [f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}' for i in range(n)]
+    df['dst_ip'] = '192.168.1.100'
+    df['attack_type'] = 'BENIGN'
+    return df
+
+
+def fake_columns(n: int) -> dict:
+    """Verdict kolommen zonder model (--no-score)"""
+    scores = np.random.default_rng(0).random(n)
+    return {
+        'prediction': np.where(scores >= 0.5, 'malicious', 'benign'),
+        'ensemble_score': scores,
+        'is_alert': scores >= 0.7,
+        'confidence': np.abs(scores - 0.5) * 2,
+        'xgb_score': scores,
+        'if_score': np.zeros(n)
+    }
+
+
+def run_json(df: pd.DataFrame, firewall) -> dict:
+    """JSON pad: dict per flow aan beide kanten (zoals /predict/raw/batch met NDJSON)"""
+    timings = {}
+
+    start = time.perf_counter()
+    body = AIFirewallClient(wire_format='json').encode(df)
+    timings['client_encode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    flows = JsonRecordParser().feed(body, final=True)
+    metadata = [{key: flow.pop(key, None) for key in wire_format.METADATA_COLUMNS} for flow in flows]
+    timings['server_decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if firewall is not None:
+        results = firewall.predict_flows(flows)
+    else:
+        columns = fake_columns(len(flows))
+        results = [{name: values[i].item() for name, values in columns.items()} for i in range(len(flows))]
+    timings['score'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = ''.join(json.dumps({**result, **meta}) + '\n' for result, meta in zip(results, metadata))
+    timings['server_encode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verdicts = pd.DataFrame([json.loads(line) for line in response.splitlines()])
+    timings['client_decode'] = time.perf_counter() - start
+
+    assert len(verdicts) == len(df)
+    return {**timings, 'request_bytes': len(body), 'response_bytes': len(response)}
+
+
+def run_columnar(df: pd.DataFrame, firewall, fmt: str) -> dict:
+    """Columnar pad: kolommen direct naar het model, columnar antwoord"""
+    timings = {}
+    client = AIFirewallClient(wire_format='arrow' if fmt == wire_format.ARROW else 'msgpack')
+
+    start = time.perf_counter()
+    body = client.encode(df)
+    timings['client_encode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame = pd.concat(list(wire_format.iter_frames(body, fmt)), ignore_index=True)
+    features, metadata = wire_format.split_metadata(frame)
+    timings['server_decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = firewall.predict_columns(features) if firewall is not None else fake_columns(len(features))
+    timings['score'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in wire_format.METADATA_COLUMNS:
+        columns[name] = metadata[name].tolist()
+    if fmt == wire_format.ARROW:
+        encoder = wire_format.ArrowStreamEncoder()
+        response = encoder.write(columns) + encoder.close()
+    else:
+        response = wire_format.encode_columns(columns, fmt)
+    timings['server_encode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verdicts = client.decode(response, fmt)
+    timings['client_decode'] = time.perf_counter() - start
+
+    assert len(verdicts) == len(df)
+    return {**timings, 'request_bytes': len(body), 'response_bytes': len(response)}
+
+
+def benchmark(n: int, runs: int, firewall) -> dict:
+    """Mediaan over runs per format"""
+    df = make_flows(n)
+    formats = {
+        'json': lambda: run_json(df, firewall),
+        'arrow': lambda: run_columnar(df, firewall, wire_format.ARROW),
+        'msgpack': lambda: run_columnar(df, firewall, wire_format.MSGPACK),
+    }
+
+    results = {}
+    for name, run in formats.items():
+        try:
+            run()  # warmup
+        except RuntimeError as e:
+            logger.warning(f"Skipping {name}: {e}")
+            continue
+        samples = [run() for _ in range(runs)]
+        results[name] = {key: float(np.median([s[key] for s in samples])) for key in samples[0]}
+    return results
+
+
+def print_results(n: int, results: dict, scored: bool):
+    stages = ['client_encode', 'server_decode', 'score', 'server_encode', 'client_decode']
+    print("\n" + "=" * 96)
+    print(f"WIRE FORMAT BENCHMARK ({n:,} flows, {'model scoring' if scored else 'no model'})")
+    print("=" * 96)
+    print(f"{'Format':<8} " + ' '.join(f"{stage:>13}" for stage in stages) +
+          f" {'Total':>9} {'Request':>9} {'Response':>9}")
+    print("-" * 96)
+    for name, r in results.items():
+        total = sum(r[stage] for stage in stages)
+        print(f"{name:<8} " + ' '.join(f"{r[stage] * 1000:>11.1f}ms" for stage in stages) +
+              f" {total * 1000:>7.0f}ms {r['request_bytes'] / 1e6:>7.1f}MB {r['response_bytes'] / 1e6:>7.1f}MB")
+    print("=" * 96)
+
+
+def main():
+    """Run benchmark"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark JSON vs Arrow vs msgpack bulk scoring')
+    parser.add_argument('--flows', type=int, default=10000, help='Flows per batch')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per format (median)')
+    parser.add_argument('--no-score', action='store_true', help='Skip model scoring')
+    args = parser.parse_args()
+
+    firewall = None
+    if not args.no_score:
+        try:
+            from inference import AIFirewallInference
+            firewall = AIFirewallInference()
+        except Exception as e:
+            logger.warning(f"Models not available, measuring wire overhead only: {e}")
+
+    results = benchmark(args.flows, args.runs, firewall)
+    print_results(args.flows, results, firewall is not None)
+
+
+if __name__ == "__main__":
+    main()
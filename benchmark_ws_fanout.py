@@ -0,0 +1,197 @@
+"""
+Load test /ws fan-out
+Simuleert N websocket clients tegen een lokale Redis: de gedeelde
+RedisFanoutHub (één subscription, blokkerende listen) tegenover het oude
+patroon met een eigen pubsub en een poll loop (sleep 0.01) per client.
+
+Gemeten: Redis verbindingen, CPU tijd terwijl het channel stil is (wakeups),
+end-to-end latency per bericht en frames per client (burst coalescing).
+
+Vereist een Redis server (REDIS_URL, default redis://localhost:6379), bijv.:
+    docker run --rm -p 6379:6379 redis:7
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from redis_hub import RedisFanoutHub
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+CHANNEL = 'aifw-bench-events'
+
+
+class SimulatedSocket:
+    """Websocket client die alleen latency en frames bijhoudt"""
+
+    def __init__(self, send_delay: float = 0.0):
+        self.send_delay = send_delay
+        self.frames = 0
+        self.messages = 0
+        self.latencies = []
+        self.closed = asyncio.Event()
+
+    async def send_text(self, text: str):
+        now = time.time()
+        data = json.loads(text)
+        for message in data if isinstance(data, list) else [data]:
+            self.latencies.append(now - message['t'])
+        self.frames += 1
+        self.messages += len(data) if isinstance(data, list) else 1
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+
+    async def receive(self):
+        await self.closed.wait()
+        return {'type': 'websocket.disconnect'}
+
+    async def close(self, code: int = 1000):
+        self.closed.set()
+
+
+async def publish(redis_url: str, messages: int, rate: float):
+    """messages berichten met zend timestamp, rate per seconde (0 = zo snel mogelijk)"""
+    import redis.asyncio as redis
+    client = redis.from_url(redis_url, decode_responses=True)
+    interval = 1.0 / rate if rate else 0.0
+    start = time.perf_counter()
+    for i in range(messages):
+        await client.publish(CHANNEL, json.dumps({'type': 'alert', 'seq': i, 't': time.time()}))
+        if interval:
+            delay = start + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    await client.aclose()
+
+
+async def legacy_client(redis_url: str, socket: SimulatedSocket, stop: asyncio.Event):
+    """Oude /ws loop: eigen verbinding + get_message poll elke 10ms"""
+    import redis.asyncio as redis
+    r = redis.from_url(redis_url, decode_responses=True)
+    pubsub = r.pubsub()
+    await pubsub.subscribe(CHANNEL)
+    try:
+        while not stop.is_set():
+            message = await pubsub.get_message(ignore_subscribe_messages=True)
+            if message:
+                await socket.send_text(message['data'])
+            await asyncio.sleep(0.01)
+    finally:
+        await pubsub.unsubscribe(CHANNEL)
+        await r.aclose()
+
+
+def cpu_seconds() -> float:
+    return time.process_time()
+
+
+async def run_hub(redis_url: str, clients: int, messages: int, rate: float,
+                  idle: float, slow: float, batch_window: float) -> dict:
+    hub = RedisFanoutHub(redis_url=redis_url, channel=CHANNEL, batch_window=batch_window)
+    n_slow = int(clients * slow)
+    sockets = [SimulatedSocket(send_delay=0.5 if i < n_slow else 0.0) for i in range(clients)]
+    tasks = [asyncio.create_task(hub.serve(socket)) for socket in sockets]
+    await asyncio.sleep(0.5)  # subscription actief
+
+    idle_cpu = cpu_seconds()
+    await asyncio.sleep(idle)
+    idle_cpu = cpu_seconds() - idle_cpu
+
+    started = time.perf_counter()
+    await publish(redis_url, messages, rate)
+    await asyncio.sleep(1.0)  # laatste frames afleveren
+    elapsed = time.perf_counter() - started
+
+    for socket in sockets:
+        socket.closed.set()
+    await asyncio.gather(*tasks)
+    stats = hub.get_stats()
+    await hub.stop()
+
+    return summarize('hub', sockets[n_slow:], 1, idle_cpu / idle, elapsed, stats['evicted'])
+
+
+async def run_legacy(redis_url: str, clients: int, messages: int, rate: float, idle: float) -> dict:
+    stop = asyncio.Event()
+    sockets = [SimulatedSocket() for _ in range(clients)]
+    tasks = [asyncio.create_task(legacy_client(redis_url, socket, stop)) for socket in sockets]
+    await asyncio.sleep(2.0)  # alle subscriptions actief
+
+    idle_cpu = cpu_seconds()
+    await asyncio.sleep(idle)
+    idle_cpu = cpu_seconds() - idle_cpu
+
+    started = time.perf_counter()
+    await publish(redis_url, messages, rate)
+    await asyncio.sleep(1.0)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return summarize('legacy', sockets, clients, idle_cpu / idle, elapsed, 0)
+
+
+def summarize(name: str, sockets, connections: int, idle_cpu: float, elapsed: float,
+              evicted: int) -> dict:
+    latencies = np.concatenate([np.array(s.latencies) for s in sockets if s.latencies] or [np.zeros(0)])
+    return {
+        'mode': name,
+        'connections': connections,
+        'idle_cpu_pct': idle_cpu * 100,
+        'delivered': int(sum(s.messages for s in sockets)),
+        'frames_per_client': float(np.mean([s.frames for s in sockets])),
+        'p50_ms': float(np.percentile(latencies, 50) * 1000) if len(latencies) else 0.0,
+        'p99_ms': float(np.percentile(latencies, 99) * 1000) if len(latencies) else 0.0,
+        'evicted': evicted,
+        'elapsed_s': elapsed
+    }
+
+
+def print_results(clients: int, messages: int, results):
+    print("\n" + "=" * 92)
+    print(f"/ws FAN-OUT LOAD TEST ({clients:,} clients, {messages:,} messages)")
+    print("=" * 92)
+    print(f"{'Mode':<8} {'Redis conns':>11} {'Idle CPU':>9} {'Delivered':>11} "
+          f"{'Frames/client':>14} {'p50':>9} {'p99':>9} {'Evicted':>8}")
+    print("-" * 92)
+    for r in results:
+        print(f"{r['mode']:<8} {r['connections']:>11} {r['idle_cpu_pct']:>8.1f}% {r['delivered']:>11,} "
+              f"{r['frames_per_client']:>14.1f} {r['p50_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms {r['evicted']:>8}")
+    print("=" * 92)
+
+
+def main():
+    """Run load test"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test /ws Redis fan-out')
+    parser.add_argument('--clients', type=int, default=1000, help='Simulated websocket clients')
+    parser.add_argument('--messages', type=int, default=5000, help='Messages to publish')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Messages per second (0 = burst, as fast as possible)')
+    parser.add_argument('--idle', type=float, default=3.0,
+                        help='Seconds to measure CPU while the channel is quiet')
+    parser.add_argument('--slow', type=float, default=0.0,
+                        help='Fraction of clients with a slow (0.5s) send')
+    parser.add_argument('--batch-window', type=float, default=0.02,
+                        help='Hub batch window in seconds')
+    parser.add_argument('--legacy', action='store_true',
+                        help='Also run the old per-client pubsub + poll loop')
+    args = parser.parse_args()
+
+    redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379')
+    results = [asyncio.run(run_hub(redis_url, args.clients, args.messages, args.rate,
+                                   args.idle, args.slow, args.batch_window))]
+    if args.legacy:
+        results.append(asyncio.run(run_legacy(redis_url, args.clients, args.messages,
+                                              args.rate, args.idle)))
+    print_results(args.clients, args.messages, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Block Expiry Scheduler
+Min-heap van (expires_at, ip) met een achtergrond thread die alleen de blocks
+verwijdert die verlopen zijn, in batches.
+
+Alle processen (API workers, realtime engine, Suricata blocker) delen één
+state_db; alleen het proces met de OwnerLock draait de expiry. De anderen
+verversen alleen hun mirror en nemen het over als de owner stopt. De owner
+ververst zijn heap elke tick_interval uit de store (on_tick), anders zou hij
+blocks van andere processen nooit laten verlopen.
+"""
+
+import heapq
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from utils import Logger
+
+
+class OwnerLock:
+    """
+    Exclusive, non-blocking flock op een bestand naast de state db
+
+    De kernel geeft de lock vrij als het owner proces stopt of crasht. Zonder
+    flock (Windows) is elk proces owner.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Probeer owner te worden; True als dit proces de lock heeft"""
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # Alleen informatief: wie is de huidige owner
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+
+class ExpiryScheduler:
+    """
+    Plant het verlopen van blocks
+
+    - schedule()/cancel() zijn O(log n) / O(1); een verlengde of opgeheven block
+      laat een oude heap entry achter die bij het poppen overgeslagen wordt
+    - De thread slaapt tot de eerstvolgende expiry (of tot er een eerdere bijkomt)
+    - Alle entries die tegelijk verlopen gaan als één batch naar de callback
+    """
+
+    def __init__(self, on_expire: Callable[[List[str]], None],
+                 max_batch_size: int = 500, grace: float = 0.5,
+                 owner_lock: Optional[OwnerLock] = None, owner_retry: float = 5.0,
+                 on_owner: Optional[Callable[[], None]] = None,
+                 on_tick: Optional[Callable[[], None]] = None, tick_interval: float = 1.0):
+        """
+        Args:
+            on_expire: Callback met een lijst verlopen IPs
+            max_batch_size: Maximaal aantal IPs per callback
+            grace: Wacht zo lang na de eerste expiry om buren mee te nemen (seconden)
+            owner_lock: Alleen met deze lock verwerkt de thread expiries (None = altijd)
+            owner_retry: Seconden tussen pogingen om owner te worden
+            on_owner: Callback zodra dit proces owner wordt (heap herbouwen)
+            on_tick: Callback van de owner, max elke tick_interval seconden
+                     (heap bijwerken met blocks van andere processen)
+            tick_interval: Max slaaptijd van de owner als on_tick gezet is
+        """
+        self.logger = Logger(__name__).logger
+        self.on_expire = on_expire
+        self.max_batch_size = max_batch_size
+        self.grace = grace
+        self.owner_lock = owner_lock
+        self.owner_retry = owner_retry
+        self.on_owner = on_owner
+        self.on_tick = on_tick
+        self.tick_interval = tick_interval
+        self._next_tick = 0.0
+
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        self.stats = {'scheduled': 0, 'expired': 0, 'batches': 0, 'stale_skipped': 0}
+
+    def schedule(self, ip: str, expires_at: Optional[float]):
+        """Plan (of verplaats) expiry van een block; None = permanent"""
+        with self._cond:
+            if expires_at is None:
+                self._deadlines.pop(ip, None)
+                return
+
+            self._deadlines[ip] = expires_at
+            heapq.heappush(self._heap, (expires_at, ip))
+            self.stats['scheduled'] += 1
+
+            # Nieuwe vroegste deadline: maak de thread wakker
+            if self._heap[0] == (expires_at, ip):
+                self._cond.notify()
+
+    def cancel(self, ip: str):
+        """Vergeet expiry van een block (handmatig unblock)"""
+        with self._cond:
+            self._deadlines.pop(ip, None)
+
+    def rebuild(self, records: Iterable[Dict]):
+        """Bouw de heap opnieuw op uit persistente state (records met 'ip', 'expires_ts')"""
+        with self._cond:
+            self._deadlines = {r['ip']: r['expires_ts'] for r in records
+                               if r.get('expires_ts') is not None}
+            self._heap = [(deadline, ip) for ip, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Haal alle verlopen IPs van de heap (stale entries worden overgeslagen)"""
+        now = time.time() if now is None else now
+        due = []
+
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now and len(due) < self.max_batch_size:
+                deadline, ip = heapq.heappop(self._heap)
+                if self._deadlines.get(ip) != deadline:
+                    self.stats['stale_skipped'] += 1
+                    continue
+                del self._deadlines[ip]
+                due.append(ip)
+
+        return due
+
+    def next_deadline(self) -> Optional[float]:
+        """Eerstvolgende expiry (inclusief mogelijk stale entries)"""
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        """Start expiry thread (idempotent)"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='block-expiry', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop expiry thread"""
+        with self._cond:
+            self._running = False
+            thread = self._thread
+            self._thread = None
+            self._cond.notify()
+
+        if thread and thread.is_alive():
+            thread.join(timeout)
+        if self.owner_lock is not None:
+            self.owner_lock.release()
+
+    def is_owner(self) -> bool:
+        """True als dit proces de expiry verwerkt"""
+        return self.owner_lock is None or self.owner_lock.held
+
+    def _become_owner(self) -> bool:
+        if not self.owner_lock.acquire():
+            return False
+        self.logger.info(f"Expiry owner for {self.owner_lock.path} (pid {os.getpid()})")
+        if self.on_owner:
+            try:
+                self.on_owner()
+            except Exception as e:
+                self.logger.error(f"Expiry owner callback failed: {e}")
+        return True
+
+    def _run(self):
+        """Slaap tot de eerstvolgende deadline en verwerk verlopen blocks"""
+        while True:
+            # Geen owner: een ander proces verwerkt de expiries, later opnieuw proberen
+            if not self.is_owner() and not self._become_owner():
+                with self._cond:
+                    if not self._running:
+                        return
+                    self._cond.wait(self.owner_retry)
+                continue
+
+            # Buiten _cond: on_tick neemt de lock van de blocker, die _cond weer nodig heeft
+            if self.on_tick is not None and time.monotonic() >= self._next_tick:
+                self._next_tick = time.monotonic() + self.tick_interval
+                try:
+                    self.on_tick()
+                except Exception as e:
+                    self.logger.error(f"Expiry tick callback failed: {e}")
+
+            with self._cond:
+                if not self._running:
+                    return
+                timeout = self.tick_interval if self.on_tick is not None else None
+                if not self._heap:
+                    self._cond.wait(timeout)
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._cond.wait(delay if timeout is None else min(delay, timeout))
+                    continue
+
+            # Korte grace periode zodat gelijktijdige expiries één batch worden
+            if self.grace:
+                time.sleep(self.grace)
+
+            due = self.pop_due()
+            while due:
+                try:
+                    self.on_expire(due)
+                except Exception as e:
+                    self.logger.error(f"Expiry callback failed: {e}")
+                self.stats['expired'] += len(due)
+                self.stats['batches'] += 1
+                due = self.pop_due()
+
+    def get_stats(self) -> Dict:
+        """Get scheduler statistics"""
+        deadline = self.next_deadline()
+        return {
+            **self.stats,
+            'pending': len(self._deadlines),
+            'heap_size': len(self._heap),
+            'next_expiry_in': max(0.0, deadline - time.time()) if deadline else None,
+            'running': self._thread is not None,
+            'owner': self.is_owner()
+        }
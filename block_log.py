@@ -0,0 +1,200 @@
+"""
+Block Log
+Append-only JSON lines log voor block events: gebufferde writer met periodieke
+fsync en rotatie op grootte, plus tail reads vanaf het einde van het bestand.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils import Logger
+
+
+class BlockLogWriter:
+    """
+    Gebufferde writer voor logs/blocked_ips.json
+
+    - Regels worden in memory verzameld en in één os.write() toegevoegd
+      (O_APPEND): regels van meerdere processen raken nooit door elkaar
+    - Flush + fsync hooguit eens per fsync_interval; een timer zorgt dat de
+      laatste regels ook zonder nieuwe writes op disk komen
+    - Boven max_bytes wordt het bestand geroteerd naar .1, .2, ... (backups)
+    """
+
+    def __init__(self, path: str = 'logs/blocked_ips.json', fsync_interval: float = 1.0,
+                 max_bytes: int = 50 * 1024 * 1024, backups: int = 5):
+        """
+        Args:
+            path: Log bestand
+            fsync_interval: Maximaal aantal seconden dat regels in de buffer blijven
+            max_bytes: Roteer boven deze grootte (0 = nooit)
+            backups: Aantal geroteerde bestanden om te bewaren
+        """
+        self.logger = Logger(__name__).logger
+        self.path = Path(path).absolute()  # timer sync mag niet van de cwd afhangen
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._inode: Optional[int] = None
+        self._timer: Optional[threading.Timer] = None
+        self._last_sync = time.monotonic()
+
+        self.stats = {'records': 0, 'syncs': 0, 'rotations': 0}
+
+    @classmethod
+    def from_config(cls, config) -> 'BlockLogWriter':
+        """Writer met firewall.log config"""
+        return cls(
+            path=config.get('firewall.log.path', 'logs/blocked_ips.json'),
+            fsync_interval=config.get('firewall.log.fsync_interval', 1.0),
+            max_bytes=config.get('firewall.log.max_bytes', 50 * 1024 * 1024),
+            backups=config.get('firewall.log.backups', 5)
+        )
+
+    def _open(self):
+        """Open (of heropen na rotatie door een ander proces) het log bestand"""
+        if self._fd is not None:
+            try:
+                if os.stat(self.path).st_ino == self._inode:
+                    return
+            except FileNotFoundError:
+                pass
+            os.close(self._fd)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._inode = os.fstat(self._fd).st_ino
+
+    def write(self, record: Dict):
+        """Voeg record toe aan de buffer; sync als het interval verstreken is"""
+        with self._lock:
+            self._buffer.append(json.dumps(record) + '\n')
+            self.stats['records'] += 1
+
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        """Schrijf de buffer weg en fsync"""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._last_sync = time.monotonic()
+
+        if not self._buffer:
+            return
+
+        data = ''.join(self._buffer).encode('utf-8')
+        self._buffer.clear()
+
+        try:
+            self._open()
+            os.write(self._fd, data)
+            os.fsync(self._fd)
+            self.stats['syncs'] += 1
+
+            if self.max_bytes and os.fstat(self._fd).st_size >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            self.logger.error(f"Failed to write block log: {e}")
+
+    def _rotate(self):
+        """blocked_ips.json -> .1 -> .2 ... (oudste valt af)"""
+        os.close(self._fd)
+        self._fd = None
+
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+        self._open()
+        self.stats['rotations'] += 1
+
+    def close(self):
+        """Sync en sluit het bestand"""
+        with self._lock:
+            self._sync()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def tail_lines(path: Path, limit: int, chunk_size: int = 64 * 1024) -> List[bytes]:
+    """
+    Laatste `limit` regels van een bestand, gelezen vanaf het einde
+
+    Kosten hangen af van limit en regel lengte, niet van de bestandsgrootte.
+
+    Returns:
+        Regels, nieuwste eerst
+    """
+    lines: List[bytes] = []
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b''
+
+            while position > 0 and len(lines) < limit:
+                read_size = min(chunk_size, position)
+                position -= read_size
+                f.seek(position)
+                chunk = f.read(read_size) + remainder
+
+                parts = chunk.split(b'\n')
+                # Eerste stuk kan een halve regel zijn: bewaren voor de volgende chunk
+                remainder = parts.pop(0) if position > 0 else b''
+                if position == 0 and parts and parts[0] == b'':
+                    parts.pop(0)
+                lines.extend(reversed([p for p in parts if p.strip()]))
+    except FileNotFoundError:
+        return []
+
+    return lines[:limit]
+
+
+def tail_records(path: str, limit: int = 100, backups: int = 5) -> List[Dict]:
+    """
+    Laatste `limit` JSON records, nieuwste eerst; leest zo nodig door in
+    geroteerde bestanden (.1, .2, ...)
+    """
+    base = Path(path)
+    records: List[Dict] = []
+
+    for i in range(backups + 1):
+        file = base if i == 0 else base.with_name(f"{base.name}.{i}")
+        if not file.exists():
+            if i == 0:
+                continue
+            break
+
+        for line in tail_lines(file, limit - len(records)):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        if len(records) >= limit:
+            break
+
+    return records
@@ -0,0 +1,243 @@
+"""
+Persistent Block Store
+SQLite (WAL mode) opslag van block state, gedeeld door de realtime engine,
+de Suricata blocker en de API.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils import Logger
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ip TEXT NOT NULL,
+    reason TEXT,
+    method TEXT,
+    blocked_at REAL NOT NULL,
+    expires_at REAL,
+    active INTEGER NOT NULL DEFAULT 1,
+    unblocked_at REAL,
+    aggregate TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_blocks_ip ON blocks(ip);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_blocks_active_ip ON blocks(ip) WHERE active = 1;
+CREATE INDEX IF NOT EXISTS idx_blocks_active_expiry ON blocks(active, expires_at);
+"""
+
+
+class BlockStore:
+    """
+    Durable block state
+
+    - Eén rij per block; maximaal één actieve rij per IP (partial unique index)
+    - Indexes op ip, (active, expires_at) voor lookups en expiry scans
+    - WAL mode: meerdere processen lezen terwijl één proces schrijft
+    - data_version() laat andere processen goedkoop zien of er iets veranderd is
+    """
+
+    def __init__(self, db_path: str = "logs/block_state.db"):
+        """
+        Args:
+            db_path: Pad naar SQLite database
+        """
+        self.logger = Logger(__name__).logger
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+    
+    def _migrate(self):
+        """Voeg kolommen toe aan databases van een oudere versie"""
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(blocks)")}
+        if 'aggregate' not in columns:
+            self.conn.execute("ALTER TABLE blocks ADD COLUMN aggregate TEXT")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_blocks_aggregate ON blocks(aggregate) "
+            "WHERE aggregate IS NOT NULL"
+        )
+
+    @staticmethod
+    def to_record(row: sqlite3.Row) -> Dict:
+        """Converteer database rij naar block record"""
+        return {
+            'ip': row['ip'],
+            'reason': row['reason'],
+            'method': row['method'],
+            'blocked_at': datetime.fromtimestamp(row['blocked_at']).isoformat(),
+            'expires_at': (datetime.fromtimestamp(row['expires_at']).isoformat()
+                           if row['expires_at'] is not None else None),
+            'blocked_ts': row['blocked_at'],
+            'expires_ts': row['expires_at'],
+            'active': bool(row['active']),
+            'aggregate': row['aggregate']
+        }
+
+    def data_version(self) -> int:
+        """Verandert zodra een andere connectie de database heeft gewijzigd"""
+        with self._lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def add_blocks(self, blocks: Iterable[Dict]) -> List[Dict]:
+        """
+        Registreer (of vernieuw) actieve blocks in één transactie
+
+        Args:
+            blocks: Dicts met 'ip', 'reason', 'method' en optioneel 'duration' (seconden)
+                    of 'expires_at' (epoch)
+
+        Returns:
+            Opgeslagen records
+        """
+        now = time.time()
+        ips = []
+
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for block in blocks:
+                    expires_at = block.get('expires_at')
+                    if expires_at is None and block.get('duration'):
+                        expires_at = now + block['duration']
+
+                    updated = self.conn.execute(
+                        "UPDATE blocks SET reason = ?, method = ?, expires_at = ? "
+                        "WHERE ip = ? AND active = 1",
+                        (block.get('reason'), block.get('method'), expires_at, block['ip'])
+                    ).rowcount
+                    if not updated:
+                        self.conn.execute(
+                            "INSERT INTO blocks (ip, reason, method, blocked_at, expires_at) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (block['ip'], block.get('reason'), block.get('method'),
+                             block.get('blocked_at', now), expires_at)
+                        )
+                    ips.append(block['ip'])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return [record for record in (self.get_active(ip) for ip in ips) if record]
+
+    def add_block(self, ip: str, reason: str, method: str,
+                  duration: Optional[float] = None) -> Dict:
+        """Registreer één actieve block"""
+        return self.add_blocks([{'ip': ip, 'reason': reason, 'method': method,
+                                 'duration': duration}])[0]
+
+    def remove_blocks(self, ips: Iterable[str]) -> int:
+        """Markeer blocks als inactief; geeft aantal gewijzigde rijen terug"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed = sum(
+                    self.conn.execute(
+                        "UPDATE blocks SET active = 0, unblocked_at = ? WHERE ip = ? AND active = 1",
+                        (now, ip)
+                    ).rowcount
+                    for ip in ips
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def set_aggregate(self, ips: Iterable[str], prefix: Optional[str]) -> int:
+        """
+        Markeer actieve host blocks als onderdeel van een prefix block
+
+        Args:
+            ips: Member IPs
+            prefix: Aggregaat prefix, of None om de members weer los te maken
+
+        Returns:
+            Aantal gewijzigde rijen
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                changed = sum(
+                    self.conn.execute(
+                        "UPDATE blocks SET aggregate = ? WHERE ip = ? AND active = 1", (prefix, ip)
+                    ).rowcount
+                    for ip in ips
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return changed
+
+    def remove_block(self, ip: str) -> bool:
+        """Markeer één block als inactief"""
+        return self.remove_blocks([ip]) > 0
+
+    def get_active(self, ip: str) -> Optional[Dict]:
+        """Actieve block voor IP (index lookup)"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM blocks WHERE ip = ? AND active = 1", (ip,)
+            ).fetchone()
+        return self.to_record(row) if row else None
+
+    def active_blocks(self) -> List[Dict]:
+        """Alle actieve blocks"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM blocks WHERE active = 1 ORDER BY blocked_at"
+            ).fetchall()
+        return [self.to_record(row) for row in rows]
+
+    def expired_blocks(self, now: Optional[float] = None) -> List[Dict]:
+        """Actieve blocks waarvan expires_at verstreken is (index range scan)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM blocks WHERE active = 1 AND expires_at IS NOT NULL "
+                "AND expires_at <= ? ORDER BY expires_at",
+                (now or time.time(),)
+            ).fetchall()
+        return [self.to_record(row) for row in rows]
+
+    def history(self, ip: str, limit: int = 100) -> List[Dict]:
+        """Block geschiedenis van één IP, nieuwste eerst"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM blocks WHERE ip = ? ORDER BY blocked_at DESC LIMIT ?",
+                (ip, limit)
+            ).fetchall()
+        return [self.to_record(row) for row in rows]
+
+    def offense_count(self, ip: str, since: float = 0.0) -> int:
+        """Aantal blocks van dit IP sinds `since` (epoch), voor escalerende durations"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM blocks WHERE ip = ? AND blocked_at >= ?", (ip, since)
+            ).fetchone()[0]
+
+    def count_active(self) -> int:
+        """Aantal actieve blocks"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM blocks WHERE active = 1"
+            ).fetchone()[0]
+
+    def close(self):
+        """Sluit database connectie"""
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,213 @@
+"""
+Asynchronous Blocker Service
+Achtergrond worker tussen detectie en FirewallBlocker: detectie loops doen
+alleen een queue put, de worker dedupliceert per IP en blokkeert in batches.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from utils import Logger
+
+
+class BlockerService:
+    """
+    Worker thread voor block beslissingen
+
+    - submit() geeft direct een Future terug (resultaat: True als het IP geblokkeerd is)
+    - Openstaande verzoeken voor hetzelfde IP worden samengevoegd: één block,
+      alle futures/callbacks krijgen hetzelfde resultaat
+    - Batches gaan via FirewallBlocker.process_predictions (één kernel transactie)
+    - Is de queue vol, dan wordt het verzoek direct afgewezen i.p.v. te wachten
+    """
+
+    _STOP = object()
+
+    def __init__(self, blocker, batch_interval: float = 0.05,
+                 max_batch_size: int = 500, max_queue: int = 10000):
+        """
+        Args:
+            blocker: FirewallBlocker instance
+            batch_interval: Seconden wachten op meer verzoeken voor een batch
+            max_batch_size: Maximaal aantal IPs per batch
+            max_queue: Maximaal aantal openstaande IPs
+        """
+        self.logger = Logger(__name__).logger
+        self.blocker = blocker
+        self.batch_interval = batch_interval
+        self.max_batch_size = max_batch_size
+
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'dropped': 0,
+            'batches': 0,
+            'blocked': 0,
+            'last_batch_size': 0,
+            'last_batch_ms': 0.0
+        }
+
+    @classmethod
+    def from_config(cls, blocker, config) -> 'BlockerService':
+        """Service met firewall.worker config"""
+        return cls(
+            blocker,
+            batch_interval=config.get('firewall.worker.batch_interval', 0.05),
+            max_batch_size=config.get('firewall.worker.max_batch_size', 500),
+            max_queue=config.get('firewall.worker.max_queue', 10000)
+        )
+
+    def start(self):
+        """Start worker thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='blocker-service', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Verwerk openstaande verzoeken en stop de worker"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+
+        if thread and thread.is_alive():
+            self.queue.put(self._STOP)
+            thread.join(timeout)
+
+    def submit(self, flow_data: Dict, prediction: Dict, reason: Optional[str] = None,
+               callback: Optional[Callable[[str, bool], None]] = None) -> Future:
+        """
+        Zet block beslissing in de queue
+
+        Args:
+            flow_data: Flow metadata met src_ip
+            prediction: Model output (prediction, ensemble_score)
+            reason: Optionele block reden (default: score)
+            callback: Aangeroepen met (ip, blocked) vanuit de worker thread
+
+        Returns:
+            Future met True/False zodra de batch verwerkt is
+        """
+        ip = flow_data.get('src_ip', flow_data.get('source_ip'))
+        future: Future = Future()
+        if callback:
+            future.add_done_callback(lambda f: callback(ip, f.result()))
+
+        if not ip:
+            future.set_result(False)
+            return future
+
+        self.stats['submitted'] += 1
+        with self._lock:
+            entry = self._pending.get(ip)
+            if entry is not None:
+                # Zelfde IP staat al in de queue: alleen de future aanhaken
+                entry['futures'].append(future)
+                if prediction.get('ensemble_score', 0) > entry['prediction'].get('ensemble_score', 0):
+                    entry.update(flow_data=flow_data, prediction=prediction, reason=reason)
+                self.stats['deduplicated'] += 1
+                return future
+
+            try:
+                self.queue.put_nowait(ip)
+            except queue.Full:
+                self.stats['dropped'] += 1
+                future.set_result(False)
+                return future
+
+            self._pending[ip] = {
+                'flow_data': flow_data,
+                'prediction': prediction,
+                'reason': reason,
+                'futures': [future]
+            }
+
+        if self._thread is None:
+            self.start()
+        return future
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            item = self.queue.get()
+            if item is self._STOP:
+                return
+
+            ips = [item]
+            stopping = False
+            deadline = time.monotonic() + self.batch_interval
+
+            while len(ips) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                ips.append(item)
+
+            self.process(ips)
+
+            if stopping:
+                self._drain()
+                return
+
+    def _drain(self):
+        """Verwerk alles wat nog in de queue staat (bij stop)"""
+        ips = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                ips.append(item)
+
+        for i in range(0, len(ips), self.max_batch_size):
+            self.process(ips[i:i + self.max_batch_size])
+
+    def process(self, ips: List[str]):
+        """Verwerk één batch en resolve alle futures"""
+        started = time.perf_counter()
+
+        with self._lock:
+            entries = [self._pending.pop(ip) for ip in ips if ip in self._pending]
+
+        try:
+            results = self.blocker.process_predictions([
+                (entry['flow_data'], entry['prediction'], entry['reason']) for entry in entries
+            ])
+        except Exception as e:
+            self.logger.error(f"Blocker batch failed: {e}")
+            results = [False] * len(entries)
+
+        for entry, blocked in zip(entries, results):
+            for future in entry['futures']:
+                future.set_result(blocked)
+
+        self.stats['batches'] += 1
+        self.stats['blocked'] += sum(1 for blocked in results if blocked)
+        self.stats['last_batch_size'] = len(entries)
+        self.stats['last_batch_ms'] = (time.perf_counter() - started) * 1000
+
+    def get_stats(self) -> Dict:
+        """Get worker statistics"""
+        return {
+            **self.stats,
+            'pending': len(self._pending),
+            'batch_interval': self.batch_interval,
+            'max_batch_size': self.max_batch_size
+        }
@@ -0,0 +1,182 @@
+"""
+CIDR Lookup Table
+Longest-prefix-match over IPv4/IPv6 prefixes voor whitelist en block set.
+"""
+
+import socket
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+MAX_PREFIXLEN = {4: 32, 6: 128}
+
+
+def parse_prefix(value: str) -> Tuple[int, int, int]:
+    """
+    Parse IP of CIDR naar (versie, prefixlen, gepackte netwerk integer)
+
+    Host bits worden gemaskeerd, net als ip_network(strict=False).
+
+    Raises:
+        ValueError: Ongeldig adres of prefix lengte
+    """
+    address, _, length = value.strip().partition('/')
+    try:
+        if ':' in address:
+            version, packed = 6, socket.inet_pton(socket.AF_INET6, address)
+        else:
+            version, packed = 4, socket.inet_pton(socket.AF_INET, address)
+    except OSError:
+        raise ValueError(f"Invalid IP address: {value}")
+
+    bits = MAX_PREFIXLEN[version]
+    prefixlen = int(length) if length else bits
+    if not 0 <= prefixlen <= bits:
+        raise ValueError(f"Invalid prefix length: {value}")
+
+    return version, prefixlen, int.from_bytes(packed, 'big') >> (bits - prefixlen)
+
+
+def format_prefix(version: int, prefixlen: int, key: int) -> str:
+    """Inverse van parse_prefix; host prefixes zonder /32 of /128"""
+    bits = MAX_PREFIXLEN[version]
+    family = socket.AF_INET6 if version == 6 else socket.AF_INET
+    address = socket.inet_ntop(family, (key << (bits - prefixlen)).to_bytes(bits // 8, 'big'))
+    return address if prefixlen == bits else f"{address}/{prefixlen}"
+
+
+class CidrTable:
+    """
+    Prefix tabel met longest-prefix-match lookups
+
+    Per IP versie één dict per prefix lengte met het gemaskeerde netwerk als
+    key. Een lookup probeert alleen de prefix lengtes die in gebruik zijn (lang
+    naar kort): bij een whitelist met /32, /24 en /16 entries zijn dat drie
+    dict lookups, ongeacht het aantal entries. In pure Python is dat sneller
+    dan een bit-voor-bit trie walk over 32 of 128 niveaus.
+    """
+
+    def __init__(self, prefixes: Iterable = ()):
+        """
+        Args:
+            prefixes: IPs/CIDRs, of (cidr, value) tuples
+        """
+        self._tables: Dict[int, Dict[int, Dict[int, Any]]] = {4: {}, 6: {}}
+        self._lengths: Dict[int, List[int]] = {4: [], 6: []}
+        self.load(prefixes)
+
+    def _index(self, version: int):
+        """Prefix lengtes (lang naar kort) die entries bevatten"""
+        self._lengths[version] = sorted(
+            (length for length, table in self._tables[version].items() if table), reverse=True
+        )
+
+    def add(self, prefix: str, value: Any = True):
+        """Voeg IP of CIDR toe (bestaande entry krijgt nieuwe value)"""
+        version, prefixlen, key = parse_prefix(prefix)
+        table = self._tables[version].setdefault(prefixlen, {})
+        table[key] = value
+        if len(table) == 1:
+            self._index(version)
+
+    def load(self, prefixes: Iterable):
+        """Bulk load; lengte index wordt één keer opnieuw opgebouwd"""
+        for item in prefixes:
+            prefix, value = item if isinstance(item, tuple) else (item, True)
+            version, prefixlen, key = parse_prefix(prefix)
+            self._tables[version].setdefault(prefixlen, {})[key] = value
+        self._index(4)
+        self._index(6)
+
+    def remove(self, prefix: str) -> bool:
+        """Verwijder exacte prefix; True als hij bestond"""
+        version, prefixlen, key = parse_prefix(prefix)
+        table = self._tables[version].get(prefixlen)
+        if not table or key not in table:
+            return False
+        del table[key]
+        if not table:
+            self._index(version)
+        return True
+
+    def clear(self):
+        """Verwijder alle entries"""
+        self._tables = {4: {}, 6: {}}
+        self._lengths = {4: [], 6: []}
+
+    def lookup(self, ip: str) -> Optional[Tuple[str, Any]]:
+        """
+        Longest-prefix-match
+
+        Args:
+            ip: IP adres (of prefix: match alleen op even lange of kortere entries)
+
+        Returns:
+            (matchende prefix, value) of None
+        """
+        try:
+            version, prefixlen, key = parse_prefix(ip)
+        except ValueError:
+            return None
+
+        tables = self._tables[version]
+        for length in self._lengths[version]:
+            if length > prefixlen:
+                continue
+            shifted = key >> (prefixlen - length)
+            table = tables[length]
+            if shifted in table:
+                return format_prefix(version, length, shifted), table[shifted]
+        return None
+
+    def __contains__(self, ip: str) -> bool:
+        try:
+            version, prefixlen, key = parse_prefix(ip)
+        except ValueError:
+            return False
+
+        tables = self._tables[version]
+        for length in self._lengths[version]:
+            if length <= prefixlen and (key >> (prefixlen - length)) in tables[length]:
+                return True
+        return False
+
+    def overlaps(self, prefix: str) -> bool:
+        """True als een entry de prefix bevat of erbinnen valt"""
+        if prefix in self:
+            return True
+
+        version, prefixlen, key = parse_prefix(prefix)
+        for length in self._lengths[version]:
+            if length <= prefixlen:
+                break
+            shift = length - prefixlen
+            if any(member >> shift == key for member in self._tables[version][length]):
+                return True
+        return False
+
+    def covered(self, prefix: str) -> List[str]:
+        """Alle entries die binnen de prefix vallen (inclusief de prefix zelf)"""
+        version, prefixlen, key = parse_prefix(prefix)
+        found = []
+        for length in self._lengths[version]:
+            if length < prefixlen:
+                break
+            shift = length - prefixlen
+            found.extend(
+                format_prefix(version, length, member)
+                for member in self._tables[version][length] if member >> shift == key
+            )
+        return found
+
+    def __iter__(self) -> Iterator[str]:
+        for version, tables in self._tables.items():
+            for length, table in tables.items():
+                for key in table:
+                    yield format_prefix(version, length, key)
+
+    def __len__(self) -> int:
+        return sum(len(table) for tables in self._tables.values() for table in tables.values())
+
+    def prefix_lengths(self) -> Dict[int, List[int]]:
+        """Gebruikte prefix lengtes per IP versie"""
+        return {version: list(lengths) for version, lengths in self._lengths.items()}
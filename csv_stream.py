@@ -0,0 +1,175 @@
+"""
+CSV Stream Parser
+Incrementele verwerking van CSV uploads voor /predict/csv: de body (raw
+text/csv of een multipart/form-data file veld) wordt per stuk geparsed tot
+DataFrames van chunk_rows rijen, zonder de upload in memory of op disk te
+zetten.
+"""
+
+import codecs
+import io
+from typing import List, Optional
+
+import pandas as pd
+
+
+class CsvStreamError(ValueError):
+    """Ongeldige upload (multipart, CSV header of te lange regel)"""
+
+
+class CsvUploadTooLarge(CsvStreamError):
+    """Upload groter dan de server limiet"""
+
+
+def _multipart():
+    try:
+        import python_multipart as multipart
+        from python_multipart.multipart import parse_options_header
+    except ImportError:
+        try:
+            import multipart
+            from multipart.multipart import parse_options_header
+        except ImportError:
+            raise RuntimeError("Multipart uploads require python-multipart (pip install python-multipart)")
+    return multipart, parse_options_header
+
+
+class MultipartFileReader:
+    """
+    Push parser voor multipart/form-data: feed() body bytes, krijg de bytes
+    van het file veld terug (andere velden worden overgeslagen)
+    """
+
+    def __init__(self, content_type: str, field: str = 'file'):
+        """
+        Args:
+            content_type: Content-Type header van de request (met boundary)
+            field: Naam van het form veld met het bestand
+        """
+        multipart, self._parse_options_header = _multipart()
+        _, params = self._parse_options_header(content_type)
+        boundary = params.get(b'boundary')
+        if not boundary:
+            raise CsvStreamError("Multipart body without boundary")
+
+        self.field = field.encode('latin-1')
+        self.found = False
+        self._out: List[bytes] = []
+        self._header_field = b''
+        self._header_value = b''
+        self._disposition = b''
+        self._in_field = False
+
+        self._parser = multipart.MultipartParser(boundary, {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+        })
+
+    def _on_part_begin(self):
+        self._disposition = b''
+        self._in_field = False
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b'content-disposition':
+            self._disposition = self._header_value
+        self._header_field = b''
+        self._header_value = b''
+
+    def _on_headers_finished(self):
+        _, params = self._parse_options_header(self._disposition)
+        self._in_field = params.get(b'name') == self.field
+        self.found = self.found or self._in_field
+
+    def _on_part_data(self, data, start, end):
+        if self._in_field:
+            self._out.append(bytes(data[start:end]))
+
+    def feed(self, data: bytes) -> bytes:
+        """Volgende stuk van de body; geeft de nieuwe bytes van het file veld"""
+        try:
+            self._parser.write(data)
+        except Exception as e:
+            raise CsvStreamError(f"Invalid multipart body: {e}")
+        out = b''.join(self._out)
+        self._out.clear()
+        return out
+
+
+class CsvChunker:
+    """
+    Push parser: feed() CSV bytes, krijg DataFrames van chunk_rows rijen
+
+    Alleen de huidige chunk en één onvolledige regel staan in memory. Regels
+    worden op newlines gesplitst: velden met een newline binnen quotes
+    worden niet ondersteund (komt in flow exports niet voor).
+    """
+
+    def __init__(self, chunk_rows: int = 5000, max_line_bytes: int = 1024 * 1024):
+        """
+        Args:
+            chunk_rows: Rijen per DataFrame (= per model call)
+            max_line_bytes: Max lengte van één regel (header of rij)
+        """
+        self.chunk_rows = chunk_rows
+        self.max_line_bytes = max_line_bytes
+        self.header: Optional[str] = None
+        self.rows = 0
+        self._utf8 = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        self._partial = ''
+        self._lines: List[str] = []
+
+    def _frame(self) -> pd.DataFrame:
+        text = self.header + '\n' + '\n'.join(self._lines)
+        self._lines = []
+        try:
+            df = pd.read_csv(io.StringIO(text))
+        except (pd.errors.ParserError, ValueError) as e:
+            raise CsvStreamError(f"Invalid CSV after row {self.rows}: {e}")
+        # Zelfde normalisatie als predict_from_csv
+        df.columns = df.columns.str.strip()
+        self.rows += len(df)
+        return df
+
+    def feed(self, data: bytes, final: bool = False) -> List[pd.DataFrame]:
+        """
+        Args:
+            data: Volgende stuk CSV
+            final: True bij het laatste stuk (onvolledige laatste regel telt mee)
+
+        Returns:
+            Alle chunks die nu vol (of bij final: overgebleven) zijn
+        """
+        text = self._partial + self._utf8.decode(data, final)
+        lines = text.split('\n')
+        self._partial = '' if final else lines.pop()
+        if len(self._partial) > self.max_line_bytes:
+            raise CsvStreamError(f"CSV line exceeds {self.max_line_bytes} bytes")
+
+        frames = []
+        for line in lines:
+            line = line.rstrip('\r')
+            if not line.strip():
+                continue
+            if self.header is None:
+                self.header = line
+                continue
+            self._lines.append(line)
+            if len(self._lines) >= self.chunk_rows:
+                frames.append(self._frame())
+
+        if final:
+            if self.header is None:
+                raise CsvStreamError("Empty CSV upload")
+            if self._lines:
+                frames.append(self._frame())
+        return frames
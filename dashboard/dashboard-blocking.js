@@ -125,7 +125,10 @@ function connectWebSocket() {
     
     ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
-        handlePrediction(data);
+        // Burst: server stuurt meerdere berichten als array in één frame
+        for (const message of Array.isArray(data) ? data : [data]) {
+            handlePrediction(message);
+        }
     };
     
     ws.onerror = (error) => {
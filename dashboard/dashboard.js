@@ -1,13 +1,15 @@
 // AI-Firewall Dashboard JavaScript
-// WebSocket connection + Chart.js visualisaties
+// Server-Sent Events (polling fallback) + Chart.js visualisaties
 
 // Dynamic API URL based on current hostname
 const API_HOST = window.location.hostname;
 const API_PORT = '8000';
 const API_URL = `http://${API_HOST}:${API_PORT}`;
 const WS_URL = `ws://${API_HOST}:${API_PORT}/ws`;
+const STREAM_URL = `${API_URL}/predictions/stream`;
 
 let ws = null;
+let eventSource = null;
 let charts = {};
 let stats = {
     total: 0,
@@ -289,7 +291,10 @@ function connectWebSocket() {
         
         ws.onmessage = (event) => {
             const data = JSON.parse(event.data);
-            handlePrediction(data);
+            // Burst: server stuurt meerdere berichten als array in één frame
+            for (const message of Array.isArray(data) ? data : [data]) {
+                handlePrediction(message);
+            }
         };
         
         ws.onerror = (error) => {
@@ -321,6 +326,65 @@ function connectWebSocket() {
     }
 }
 
+// Server-Sent Events: server pusht elke prediction één keer naar alle tabs
+function connectEventStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    
+    // Hervat na de laatst verwerkte sequence number (ook na een polling periode)
+    eventSource = new EventSource(`${STREAM_URL}?since=${lastEventIndex}`);
+    
+    eventSource.onopen = () => {
+        console.log('✅ Prediction stream connected');
+        document.getElementById('statusIndicator').classList.add('online');
+        document.getElementById('statusIndicator').classList.remove('offline');
+        stopPolling();
+    };
+    
+    eventSource.addEventListener('prediction', (event) => {
+        const pred = JSON.parse(event.data);
+        // Al gezien (via polling of een eerdere verbinding)
+        if (pred.seq <= lastEventIndex) return;
+        lastEventIndex = pred.seq;
+        handlePrediction(pred);
+    });
+    
+    eventSource.addEventListener('stats', (event) => {
+        const delta = JSON.parse(event.data);
+        document.getElementById('statusIndicator').title =
+            `${delta.total_predictions} predictions on server`;
+    });
+    
+    eventSource.addEventListener('gap', (event) => {
+        const gap = JSON.parse(event.data);
+        console.warn(`Prediction stream: missed ${gap.missed} predictions`);
+    });
+    
+    eventSource.addEventListener('evicted', () => {
+        console.warn('Prediction stream: too slow, server closed the stream');
+    });
+    
+    eventSource.onerror = () => {
+        // Stream weg: pollen tot een nieuwe verbinding lukt
+        console.log('❌ Prediction stream disconnected, falling back to polling');
+        eventSource.close();
+        eventSource = null;
+        if (!pollingInterval) {
+            startPolling();
+        }
+        setTimeout(connectEventStream, 10000);
+    };
+}
+
+function disconnectEventStream() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+}
+
 // Handle prediction from WebSocket
 function handlePrediction(data) {
     stats.total++;
@@ -389,7 +453,7 @@ function simulateDemoData() {
     }, 1000); // Elke seconde een flow
 }
 
-// Polling fallback for real-time events (when WebSocket fails)
+// Polling fallback for real-time events (when the event stream fails)
 let pollingInterval = null;
 let lastEventIndex = 0;
 
@@ -405,6 +469,11 @@ async function startPolling() {
             if (response.data && response.data.predictions) {
                 const newPredictions = response.data.predictions;
                 
+                // Poller liep achter op de ring buffer: events tussendoor zijn weg
+                if (response.data.fell_behind) {
+                    console.warn(`Polling: missed ${response.data.missed} predictions`);
+                }
+                
                 // Process each new prediction (pass ALL fields!)
                 for (const pred of newPredictions) {
                     handlePrediction({
@@ -419,7 +488,7 @@ async function startPolling() {
                     });
                 }
                 
-                // Update index for next poll
+                // Sequence number van de laatste prediction voor de volgende poll
                 lastEventIndex = response.data.next_index;
             }
         } catch (error) {
@@ -438,11 +507,15 @@ function stopPolling() {
 // Control functions
 function startMonitoring() {
     console.log('▶️ Starting monitoring...');
-    connectWebSocket();
+    if (!eventSource) {
+        connectEventStream();
+    }
 }
 
 function stopMonitoring() {
     console.log('⏸️ Stopping monitoring...');
+    disconnectEventStream();
+    stopPolling();
     if (ws) {
         ws.close();
     }
@@ -508,8 +581,8 @@ async function init() {
         console.log('✅ API is healthy');
         // Load existing predictions first
         await loadExistingData();
-        // Then start polling for new data
-        startPolling();
+        // Then stream new data (polling als fallback)
+        connectEventStream();
     } else {
         console.log('⚠️ API not available - using demo mode');
         simulateDemoData();
@@ -542,7 +615,7 @@ async function loadExistingData() {
                 });
             }
             
-            // Set index to current total to avoid reprocessing
+            // Laatste sequence number: volgende poll geeft alleen nieuwere predictions
             lastEventIndex = response.data.next_index;
             console.log(`Loaded ${predictions.length} predictions, next index: ${lastEventIndex}`);
         }
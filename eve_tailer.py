@@ -0,0 +1,301 @@
+"""
+EVE Log Tailer
+Gedeelde tailer voor Suricata's eve.json: wacht op inotify events
+(IN_MODIFY/IN_MOVE_SELF) in plaats van een sleep loop, leest in grote
+blokken en geeft complete regels per batch terug. Een onvolledige laatste
+regel blijft in een carry-over buffer tot de rest geschreven is.
+
+Logrotate wordt opgevangen: bij rename/delete wordt het oude bestand eerst
+leeggelezen en daarna het nieuwe eve.json vanaf het begin geopend; bij
+truncation (copytruncate) begint het lezen opnieuw vanaf offset 0.
+
+Buiten Linux (of als inotify niet beschikbaar is) valt de tailer terug op
+pollen met poll_interval.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+FILE_MASK = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+DIR_MASK = IN_CREATE | IN_MOVED_TO
+
+
+class Inotify:
+    """Minimale inotify wrapper via libc (geen extra dependency)"""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._poll = select.poll()
+        self._poll.register(self.fd, select.POLLIN)
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def rm_watch(self, wd: int):
+        # Mag falen: een verwijderd bestand heeft geen watch meer
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def wait(self, timeout: float) -> List[tuple]:
+        """
+        Wacht max timeout seconden op events
+
+        Returns:
+            List van (wd, mask, naam); leeg bij timeout
+        """
+        if not self._poll.poll(timeout * 1000):
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += length
+                events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class EveTailer:
+    """
+    Rotation-safe tail -f voor EVE JSON (of elk ander regel-gebaseerd log)
+
+    Gebruik:
+        tailer = EveTailer('/var/log/suricata/eve.json')
+        for lines in tailer.batches():
+            for line in lines:
+                event = json.loads(line)
+
+    Regels zijn bytes zonder newline (json.loads accepteert bytes).
+    """
+
+    def __init__(self, path, from_start: bool = False, chunk_size: int = 256 << 10,
+                 max_line_bytes: int = 16 << 20, poll_interval: float = 0.1,
+                 idle_timeout: float = 1.0, use_inotify: bool = True):
+        """
+        Args:
+            path: Pad naar eve.json
+            from_start: True = bestaande inhoud ook lezen, False = vanaf het einde
+                        (na een rotatie altijd vanaf het begin)
+            chunk_size: Bytes per read (één batch per read)
+            max_line_bytes: Langere regels worden weggegooid (kapotte writer)
+            poll_interval: Wachttijd tussen checks zonder inotify
+            idle_timeout: Max wachttijd op inotify; daarna toch rotatie checken
+            use_inotify: False = altijd pollen
+        """
+        self.path = Path(path)
+        self.from_start = from_start
+        self.chunk_size = chunk_size
+        self.max_line_bytes = max_line_bytes
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+
+        self.inotify: Optional[Inotify] = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify not available ({e}); polling every {poll_interval}s")
+
+        self._fd: Optional[int] = None
+        self._inode = None
+        self._position = 0
+        self._carry = b''
+        self._file_wd: Optional[int] = None
+        self._dir_wd: Optional[int] = None
+        self._stopped = False
+
+        self.stats = {'lines': 0, 'bytes': 0, 'reads': 0, 'wakeups': 0,
+                      'rotations': 0, 'truncations': 0, 'dropped_bytes': 0}
+
+        # Alleen een bestand dat er nu al is wordt vanaf het einde gelezen;
+        # een later aangemaakt eve.json vanaf het begin
+        self._watch_dir()
+        self._open(at_end=not from_start)
+
+    # === Bestand ===
+
+    def _open(self, at_end: bool) -> bool:
+        """Open path (als het bestaat) en zet de watch op het nieuwe bestand"""
+        try:
+            fd = os.open(self.path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+        except FileNotFoundError:
+            return False
+
+        st = os.fstat(fd)
+        self._fd = fd
+        self._inode = (st.st_dev, st.st_ino)
+        self._position = os.lseek(fd, 0, os.SEEK_END) if at_end else 0
+        self._carry = b''
+
+        if self.inotify is not None:
+            if self._file_wd is not None:
+                self.inotify.rm_watch(self._file_wd)
+            try:
+                self._file_wd = self.inotify.add_watch(str(self.path), FILE_MASK)
+            except OSError:
+                # Al weer geroteerd; de directory watch ziet het volgende bestand
+                self._file_wd = None
+        logger.info(f"Tailing {self.path} from offset {self._position}")
+        return True
+
+    def _close_file(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._carry:
+            # Laatste regel van het oude bestand is nooit afgemaakt
+            self.stats['dropped_bytes'] += len(self._carry)
+            self._carry = b''
+
+    def _watch_dir(self):
+        if self.inotify is not None and self._dir_wd is None:
+            try:
+                self._dir_wd = self.inotify.add_watch(str(self.path.parent), DIR_MASK)
+            except OSError as e:
+                logger.warning(f"Cannot watch {self.path.parent}: {e}")
+
+    def _rotated(self) -> bool:
+        """Staat er een ander bestand op path dan het geopende?"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False  # Verplaatst, nieuw bestand nog niet aangemaakt
+        return (st.st_dev, st.st_ino) != self._inode
+
+    # === Lezen ===
+
+    def _split(self, data: bytes) -> List[bytes]:
+        if self._carry:
+            data = self._carry + data
+        lines = data.split(b'\n')
+        # Laatste element: onvolledige regel (of b'' als data op een newline eindigt)
+        self._carry = lines.pop()
+        if b'' in lines:
+            lines = [line for line in lines if line]
+
+        if len(self._carry) > self.max_line_bytes:
+            logger.warning(f"Dropping line over {self.max_line_bytes} bytes in {self.path}")
+            self.stats['dropped_bytes'] += len(self._carry)
+            self._carry = b''
+        return lines
+
+    def _read_chunks(self) -> Iterator[List[bytes]]:
+        """Lees vanaf de huidige positie tot EOF, één batch per chunk"""
+        if self._position > os.fstat(self._fd).st_size:
+            logger.info(f"{self.path} truncated; reading from start")
+            self.stats['truncations'] += 1
+            self._position = 0
+            self._carry = b''
+
+        while True:
+            data = os.pread(self._fd, self.chunk_size, self._position)
+            if not data:
+                return
+            self._position += len(data)
+            self.stats['reads'] += 1
+            self.stats['bytes'] += len(data)
+            lines = self._split(data)
+            if lines:
+                self.stats['lines'] += len(lines)
+                yield lines
+            if len(data) < self.chunk_size:
+                return
+
+    def _drain(self) -> Iterator[List[bytes]]:
+        """Alles wat nu beschikbaar is, inclusief de rest van een geroteerd bestand"""
+        if self._fd is None and not self._open(at_end=False):
+            return
+        yield from self._read_chunks()
+
+        if self._rotated():
+            # Oude bestand is leeg gelezen (writer schrijft al naar het nieuwe)
+            self.stats['rotations'] += 1
+            logger.info(f"{self.path} rotated; reopening")
+            self._close_file()
+            if self._open(at_end=False):
+                yield from self._read_chunks()
+
+    def _wait(self, timeout: float):
+        self.stats['wakeups'] += 1
+        if self.inotify is None or (self._fd is None and self._dir_wd is None):
+            time.sleep(min(timeout, self.poll_interval))
+        else:
+            self.inotify.wait(timeout)
+
+    def poll(self, timeout: float = 0.0) -> List[bytes]:
+        """
+        Complete regels die nu beschikbaar zijn; wacht max timeout seconden als er niets is
+
+        Returns:
+            List van regels (kan leeg zijn)
+        """
+        lines = [line for batch in self._drain() for line in batch]
+        if lines or timeout <= 0:
+            return lines
+        self._wait(timeout)
+        return [line for batch in self._drain() for line in batch]
+
+    def batches(self) -> Iterator[List[bytes]]:
+        """Blokkerende generator van batches regels tot stop()"""
+        while not self._stopped:
+            got = False
+            for lines in self._drain():
+                got = True
+                yield lines
+            if not got:
+                self._wait(self.idle_timeout)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for lines in self.batches():
+            yield from lines
+
+    def stop(self):
+        """Laat batches() stoppen (binnen idle_timeout)"""
+        self._stopped = True
+
+    def close(self):
+        self.stop()
+        self._close_file()
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def get_stats(self) -> dict:
+        return {**self.stats, 'path': str(self.path), 'offset': self._position,
+                'inotify': self.inotify is not None}
@@ -0,0 +1,133 @@
+"""
+Fake Netlink Kernel voor de netlink ipset backend
+In-memory test double met dezelfde interface als pyroute2.ipset.IPSet, zodat
+NetlinkIpsetBackend zonder root getest en gebenchmarkt kan worden.
+"""
+
+import errno
+import ipaddress
+import socket
+import time
+from typing import Dict, List
+
+
+class FakeNetlinkError(Exception):
+    """Zelfde vorm als pyroute2 NetlinkError: .code met errno"""
+
+    def __init__(self, code: int, msg: str = ''):
+        super().__init__(code, msg or errno.errorcode.get(code, str(code)))
+        self.code = code
+
+
+class FakeIPSet:
+    """
+    Stand-in voor pyroute2.ipset.IPSet
+
+    Modelleert wat de backend gebruikt: create/add/delete/test/list/destroy,
+    per-element timeouts, maxelem en de kernel errno's (EEXIST, ENOENT,
+    IPSET_ERR_HASH_FULL als ENOSPC). Elke call wordt geregistreerd.
+    """
+
+    def __init__(self, op_latency: float = 0.0):
+        """
+        Args:
+            op_latency: Gesimuleerde kernel latency per operatie (seconden)
+        """
+        self.op_latency = op_latency
+        self.sets: Dict[str, Dict] = {}
+        self.calls: List[tuple] = []
+        self.closed = False
+
+    def _op(self, name: str, *args):
+        if self.closed:
+            raise OSError(errno.EBADF, "netlink socket closed")
+        self.calls.append((name,) + args)
+        if self.op_latency:
+            time.sleep(self.op_latency)
+
+    def _get_set(self, name: str) -> Dict:
+        if name not in self.sets:
+            raise FakeNetlinkError(errno.ENOENT, f"set {name} does not exist")
+        return self.sets[name]
+
+    @staticmethod
+    def _key(entry: str) -> str:
+        return str(ipaddress.ip_network(entry, strict=False))
+
+    def _expired(self, members: Dict, key: str, now: float) -> bool:
+        expires = members.get(key)
+        if expires is not None and expires <= now:
+            del members[key]
+            return True
+        return False
+
+    def create(self, name, stype='hash:ip', family=socket.AF_INET, exclusive=True,
+               timeout=None, maxelem=None, **kwargs):
+        self._op('create', name, stype)
+        if name in self.sets:
+            if exclusive:
+                raise FakeNetlinkError(errno.EEXIST, f"set {name} exists")
+            return
+        self.sets[name] = {
+            'type': stype,
+            'family': family,
+            'timeout': timeout,
+            'maxelem': maxelem or 65536,
+            'members': {}
+        }
+
+    def add(self, name, entry, family=socket.AF_INET, exclusive=True,
+            timeout=None, etype='ip', **kwargs):
+        self._op('add', name, entry, timeout)
+        ipset = self._get_set(name)
+        members = ipset['members']
+        key = self._key(entry)
+        now = time.monotonic()
+
+        if key in members and not self._expired(members, key, now):
+            if exclusive:
+                raise FakeNetlinkError(errno.EEXIST, f"{entry} already in {name}")
+        elif len(members) >= ipset['maxelem']:
+            raise FakeNetlinkError(errno.ENOSPC, f"set {name} is full")
+
+        if timeout is None:
+            timeout = ipset['timeout']
+        members[key] = now + timeout if timeout else None
+
+    def delete(self, name, entry, family=socket.AF_INET, exclusive=True, etype='ip'):
+        self._op('delete', name, entry)
+        members = self._get_set(name)['members']
+        key = self._key(entry)
+
+        if key not in members or self._expired(members, key, time.monotonic()):
+            if exclusive:
+                raise FakeNetlinkError(errno.ENOENT, f"{entry} not in {name}")
+            return
+        del members[key]
+
+    def test(self, name, entry, family=socket.AF_INET, etype='ip') -> bool:
+        self._op('test', name, entry)
+        members = self._get_set(name)['members']
+        key = self._key(entry)
+        return key in members and not self._expired(members, key, time.monotonic())
+
+    def list(self, name=None) -> List[str]:
+        self._op('list', name)
+        now = time.monotonic()
+        names = [name] if name else list(self.sets)
+        result = []
+        for set_name in names:
+            members = self._get_set(set_name)['members']
+            result.extend(key for key in list(members) if not self._expired(members, key, now))
+        return result
+
+    def destroy(self, name=None):
+        self._op('destroy', name)
+        if name is None:
+            self.sets.clear()
+        else:
+            self._get_set(name)
+            del self.sets[name]
+
+    def close(self):
+        self.closed = True
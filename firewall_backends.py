@@ -0,0 +1,673 @@
+"""
+Firewall Backends voor FirewallBlocker
+Chain-based iptables (één regel per IP), set-based ipset / nftables (één hash set
+achter één enkele DROP regel) en een netlink ipset backend zonder subprocesses.
+"""
+
+import ipaddress
+import json
+import shlex
+import socket
+import subprocess
+from typing import Dict, List, Optional
+
+from simulated_kernel import SimulatedKernel
+from utils import Logger
+
+
+class FirewallBackend:
+    """
+    Basis interface voor firewall backends
+
+    Een backend weet alleen hoe een IP in de kernel geblokkeerd en gedeblokkeerd
+    wordt; whitelist, logging en bookkeeping blijven in FirewallBlocker.
+    """
+
+    name = 'base'
+    supports_timeout = False
+
+    def __init__(self, use_sudo: bool = True):
+        self.logger = Logger(__name__).logger
+        self.use_sudo = use_sudo
+
+    def _cmd(self, *args: str) -> List[str]:
+        """Bouw command met optionele sudo prefix"""
+        return (['sudo'] if self.use_sudo else []) + list(args)
+
+    def _run(self, cmd: List[str], input: Optional[str] = None) -> subprocess.CompletedProcess:
+        """Voer command uit en geef resultaat terug"""
+        return subprocess.run(cmd, capture_output=True, text=True, input=input)
+
+    @staticmethod
+    def ip_version(ip: str) -> int:
+        """IP versie (4 of 6) van een adres of prefix"""
+        return ipaddress.ip_network(ip, strict=False).version
+
+    def setup(self) -> bool:
+        """Maak benodigde chains/sets aan (idempotent)"""
+        return True
+
+    def block(self, ip: str, reason: str = "Malicious traffic",
+              timeout: Optional[int] = None) -> bool:
+        """
+        Block IP in de kernel
+
+        Args:
+            ip: IP adres of prefix
+            reason: Reden (als comment waar mogelijk)
+            timeout: Seconden tot de kernel de block zelf verwijdert (None = permanent)
+
+        Returns:
+            True if successful
+        """
+        raise NotImplementedError
+
+    def unblock(self, ip: str) -> bool:
+        """Verwijder block voor IP; True if successful"""
+        raise NotImplementedError
+
+    def teardown(self) -> bool:
+        """Verwijder alle door deze backend aangemaakte state"""
+        return True
+
+    def list_blocked(self) -> Optional[List[str]]:
+        """
+        IPs/prefixes die nu in de kernel geblokkeerd zijn
+
+        Returns:
+            List van IPs (zonder /32 of /128), of None als de backend de kernel
+            state niet kan uitlezen
+        """
+        return None
+
+    @staticmethod
+    def normalize(entry: str) -> str:
+        """Strip host prefix lengte: '1.2.3.4/32' -> '1.2.3.4'"""
+        network = ipaddress.ip_network(entry, strict=False)
+        if network.prefixlen == network.max_prefixlen:
+            return str(network.network_address)
+        return str(network)
+
+    def close(self):
+        """Geef persistente resources (sockets) vrij"""
+        pass
+
+    def apply_batch(self, ops: List[Dict]) -> List[bool]:
+        """
+        Pas een batch block/unblock operaties toe
+
+        Backends met transactie support overschrijven _apply_transaction; faalt
+        de transactie, dan vallen we terug op losse operaties zodat elke
+        operatie een eigen resultaat krijgt.
+
+        Args:
+            ops: List van {'action': 'block'|'unblock', 'ip', 'reason', 'timeout'}
+
+        Returns:
+            Resultaat per operatie (zelfde volgorde)
+        """
+        if not ops:
+            return []
+
+        if self._apply_transaction(ops):
+            return [True] * len(ops)
+
+        return [self._apply_single(op) for op in ops]
+
+    def _apply_transaction(self, ops: List[Dict]) -> bool:
+        """Atomaire batch; False = niet ondersteund of mislukt"""
+        return False
+
+    def _apply_single(self, op: Dict) -> bool:
+        if op['action'] == 'block':
+            return self.block(op['ip'], op.get('reason', 'Malicious traffic'), op.get('timeout'))
+        return self.unblock(op['ip'])
+
+
+class IptablesChainBackend(FirewallBackend):
+    """
+    Originele aanpak: één `iptables -A <chain> -s ip -j DROP` regel per IP
+    Elke packet loopt de chain lineair af - O(n) per packet.
+    """
+
+    name = 'iptables'
+
+    def __init__(self, chain: str = 'INPUT', use_sudo: bool = True):
+        super().__init__(use_sudo)
+        self.chain = chain
+
+    def _tool(self, ip: str) -> str:
+        return 'ip6tables' if self.ip_version(ip) == 6 else 'iptables'
+
+    def block(self, ip: str, reason: str = "Malicious traffic",
+              timeout: Optional[int] = None) -> bool:
+        cmd = self._cmd(
+            self._tool(ip),
+            '-A', self.chain,
+            '-s', ip,
+            '-j', 'DROP',
+            '-m', 'comment',
+            '--comment', f'AI-Firewall: {reason}'
+        )
+
+        result = self._run(cmd)
+        if result.returncode != 0:
+            self.logger.error(f"Failed to block {ip}: {result.stderr}")
+            return False
+        return True
+
+    def unblock(self, ip: str) -> bool:
+        # Comment maakt deel uit van de rule spec; zonder comment matcht -D niet
+        # altijd, dus zoek de regel op via -S en verwijder op exacte spec.
+        result = self._run(self._cmd(self._tool(ip), '-S', self.chain))
+        if result.returncode != 0:
+            return False
+
+        removed = False
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) < 4 or parts[0] != '-A' or '-s' not in parts:
+                continue
+            source = parts[parts.index('-s') + 1]
+            if source not in (ip, f'{ip}/32', f'{ip}/128') or 'DROP' not in parts:
+                continue
+
+            spec = self._parse_rule_spec(line)
+            spec[0] = '-D'
+            if self._run(self._cmd(self._tool(ip), *spec)).returncode == 0:
+                removed = True
+        return removed
+
+    @staticmethod
+    def _parse_rule_spec(line: str) -> List[str]:
+        """Parse `iptables -S` regel (quoted comments) naar argumenten"""
+        return shlex.split(line)
+
+    def _existing_rules(self, tool: str) -> Dict[str, List[str]]:
+        """Map van source IP naar bestaande DROP rule specs in onze chain"""
+        rules: Dict[str, List[str]] = {}
+        result = self._run(self._cmd(tool, '-S', self.chain))
+        if result.returncode != 0:
+            return rules
+
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) < 4 or parts[0] != '-A' or '-s' not in parts or 'DROP' not in parts:
+                continue
+            source = parts[parts.index('-s') + 1]
+            ip = source.rsplit('/', 1)[0] if source.endswith(('/32', '/128')) else source
+            rules.setdefault(ip, []).append(line[len('-A '):])
+        return rules
+
+    def list_blocked(self) -> Optional[List[str]]:
+        # Alleen onze eigen regels (herkenbaar aan de AI-Firewall comment)
+        blocked = []
+        for tool in ('iptables', 'ip6tables'):
+            result = self._run(self._cmd(tool, '-S', self.chain))
+            if result.returncode != 0:
+                if tool == 'iptables':
+                    return None
+                continue
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if '-s' not in parts or 'DROP' not in parts or 'AI-Firewall:' not in line:
+                    continue
+                blocked.append(self.normalize(parts[parts.index('-s') + 1]))
+        return blocked
+
+    def apply_batch(self, ops: List[Dict]) -> List[bool]:
+        # iptables en ip6tables hebben elk een eigen transactie
+        results = [False] * len(ops)
+        for version in (4, 6):
+            indices = [i for i, op in enumerate(ops) if self.ip_version(op['ip']) == version]
+            family_results = super().apply_batch([ops[i] for i in indices])
+            for i, ok in zip(indices, family_results):
+                results[i] = ok
+        return results
+
+    def _apply_transaction(self, ops: List[Dict]) -> bool:
+        # Eén iptables-restore --noflush: één commit i.p.v. N subprocesses
+        tool = self._tool(ops[0]['ip'])
+
+        existing = {}
+        if any(op['action'] == 'unblock' for op in ops):
+            existing = self._existing_rules(tool)
+
+        lines = ['*filter']
+        for op in ops:
+            if op['action'] == 'block':
+                reason = op.get('reason', 'Malicious traffic').replace('"', "'")
+                lines.append(f'-A {self.chain} -s {op["ip"]} -m comment '
+                             f'--comment "AI-Firewall: {reason}" -j DROP')
+            else:
+                specs = existing.pop(op['ip'], None)
+                if not specs:
+                    return False  # Onbekende regel: laat per-op fallback het resultaat bepalen
+                lines.extend(f"-D {spec}" for spec in specs)
+        lines += ['COMMIT', '']
+
+        result = self._run(self._cmd(f'{tool}-restore', '--noflush'), input='\n'.join(lines))
+        if result.returncode != 0:
+            self.logger.error(f"{tool}-restore batch failed: {result.stderr}")
+            return False
+        return True
+
+
+class IpsetBackend(FirewallBackend):
+    """
+    Set-based backend: één ipset `hash:net` per IP familie achter één DROP regel
+    Lookup en insert zijn O(1); expiry gaat via per-element timeouts in de kernel.
+    """
+
+    name = 'ipset'
+    supports_timeout = True
+
+    def __init__(self, set_name: str = 'ai-firewall', chain: str = 'INPUT',
+                 use_sudo: bool = True, maxelem: int = 1048576):
+        super().__init__(use_sudo)
+        self.set_name = set_name
+        self.chain = chain
+        self.maxelem = maxelem
+
+    def set_for(self, ip: str) -> str:
+        """Set naam voor de IP familie"""
+        return f'{self.set_name}6' if self.ip_version(ip) == 6 else self.set_name
+
+    def setup(self) -> bool:
+        ok = True
+        for family, set_name, tool in (('inet', self.set_name, 'iptables'),
+                                       ('inet6', f'{self.set_name}6', 'ip6tables')):
+            # timeout 0 = standaard permanent, maar per element overschrijfbaar
+            create = self._cmd(
+                'ipset', 'create', set_name, 'hash:net',
+                'family', family, 'timeout', '0',
+                'maxelem', str(self.maxelem), '-exist'
+            )
+            result = self._run(create)
+            if result.returncode != 0:
+                self.logger.error(f"Failed to create ipset {set_name}: {result.stderr}")
+                ok = False
+                continue
+
+            if not self._ensure_rule(tool, set_name):
+                ok = False
+        return ok
+
+    def _ensure_rule(self, tool: str, set_name: str) -> bool:
+        """Eén DROP regel die naar de set verwijst (eenmalig bij setup)"""
+        rule = ['-m', 'set', '--match-set', set_name, 'src', '-j', 'DROP']
+        if self._run(self._cmd(tool, '-C', self.chain, *rule)).returncode == 0:
+            return True
+
+        result = self._run(self._cmd(tool, '-I', self.chain, '1', *rule))
+        if result.returncode != 0:
+            self.logger.error(f"Failed to add set rule for {set_name}: {result.stderr}")
+            return False
+        return True
+
+    def block(self, ip: str, reason: str = "Malicious traffic",
+              timeout: Optional[int] = None) -> bool:
+        cmd = self._cmd('ipset', 'add', self.set_for(ip), ip, '-exist')
+        if timeout:
+            cmd[-1:-1] = ['timeout', str(int(timeout))]
+
+        result = self._run(cmd)
+        if result.returncode != 0:
+            self.logger.error(f"Failed to block {ip}: {result.stderr}")
+            return False
+        return True
+
+    def unblock(self, ip: str) -> bool:
+        result = self._run(self._cmd('ipset', 'del', self.set_for(ip), ip))
+        return result.returncode == 0
+
+    def list_blocked(self) -> Optional[List[str]]:
+        blocked = []
+        for set_name in (self.set_name, f'{self.set_name}6'):
+            result = self._run(self._cmd('ipset', 'list', set_name))
+            if result.returncode != 0:
+                return None
+            members = result.stdout.split('Members:', 1)[-1] if 'Members:' in result.stdout else ''
+            for line in members.splitlines():
+                if line.strip():
+                    blocked.append(self.normalize(line.split()[0]))
+        return blocked
+
+    def _apply_transaction(self, ops: List[Dict]) -> bool:
+        # `ipset restore` past alle regels in één netlink sessie toe
+        lines = []
+        for op in ops:
+            if op['action'] == 'block':
+                timeout = f" timeout {int(op['timeout'])}" if op.get('timeout') else ''
+                lines.append(f"add {self.set_for(op['ip'])} {op['ip']}{timeout} -exist")
+            else:
+                lines.append(f"del {self.set_for(op['ip'])} {op['ip']}")
+        lines.append('')
+
+        result = self._run(self._cmd('ipset', 'restore'), input='\n'.join(lines))
+        if result.returncode != 0:
+            self.logger.error(f"ipset restore batch failed: {result.stderr}")
+            return False
+        return True
+
+    def teardown(self) -> bool:
+        ok = True
+        for set_name, tool in ((self.set_name, 'iptables'), (f'{self.set_name}6', 'ip6tables')):
+            rule = ['-m', 'set', '--match-set', set_name, 'src', '-j', 'DROP']
+            self._run(self._cmd(tool, '-D', self.chain, *rule))
+            if self._run(self._cmd('ipset', 'destroy', set_name)).returncode != 0:
+                ok = False
+        return ok
+
+
+class NftablesSetBackend(FirewallBackend):
+    """
+    Set-based backend op nftables: named sets met per-element timeouts
+    Eén tabel met twee sets (IPv4/IPv6) en één input chain met twee regels.
+    """
+
+    name = 'nftables'
+    supports_timeout = True
+
+    def __init__(self, table: str = 'ai_firewall', hook: str = 'input',
+                 priority: int = -10, use_sudo: bool = True):
+        super().__init__(use_sudo)
+        self.table = table
+        self.hook = hook
+        self.priority = priority
+
+    def set_for(self, ip: str) -> str:
+        """Set naam voor de IP familie"""
+        return 'blocked6' if self.ip_version(ip) == 6 else 'blocked4'
+
+    def ruleset(self) -> str:
+        """nft script voor tabel, sets en chain"""
+        return (
+            f"table inet {self.table} {{\n"
+            f"  set blocked4 {{ type ipv4_addr; flags interval, timeout; }}\n"
+            f"  set blocked6 {{ type ipv6_addr; flags interval, timeout; }}\n"
+            f"  chain {self.hook} {{\n"
+            f"    type filter hook {self.hook} priority {self.priority}; policy accept;\n"
+            f"    ip saddr @blocked4 drop\n"
+            f"    ip6 saddr @blocked6 drop\n"
+            f"  }}\n"
+            f"}}\n"
+        )
+
+    def setup(self) -> bool:
+        # Alleen aanmaken als de tabel nog niet bestaat (sets behouden bij restart)
+        if self._run(self._cmd('nft', 'list', 'table', 'inet', self.table)).returncode == 0:
+            return True
+
+        result = self._run(self._cmd('nft', '-f', '-'), input=self.ruleset())
+        if result.returncode != 0:
+            self.logger.error(f"Failed to create nftables table {self.table}: {result.stderr}")
+            return False
+        return True
+
+    def element(self, ip: str, timeout: Optional[int] = None) -> str:
+        """Set element notatie, optioneel met timeout"""
+        return f"{ip} timeout {int(timeout)}s" if timeout else ip
+
+    def block(self, ip: str, reason: str = "Malicious traffic",
+              timeout: Optional[int] = None) -> bool:
+        cmd = self._cmd(
+            'nft', 'add', 'element', 'inet', self.table, self.set_for(ip),
+            f'{{ {self.element(ip, timeout)} }}'
+        )
+
+        result = self._run(cmd)
+        if result.returncode != 0:
+            self.logger.error(f"Failed to block {ip}: {result.stderr}")
+            return False
+        return True
+
+    def unblock(self, ip: str) -> bool:
+        cmd = self._cmd(
+            'nft', 'delete', 'element', 'inet', self.table, self.set_for(ip),
+            f'{{ {ip} }}'
+        )
+        return self._run(cmd).returncode == 0
+
+    def list_blocked(self) -> Optional[List[str]]:
+        blocked = []
+        for set_name in ('blocked4', 'blocked6'):
+            result = self._run(self._cmd('nft', '-j', 'list', 'set', 'inet', self.table, set_name))
+            if result.returncode != 0:
+                return None
+            try:
+                items = json.loads(result.stdout).get('nftables', [])
+            except ValueError:
+                return None
+            for item in items:
+                for elem in item.get('set', {}).get('elem', []):
+                    # Element met timeout: {"elem": {"val": ..., "timeout": ...}}
+                    if isinstance(elem, dict) and 'elem' in elem:
+                        elem = elem['elem'].get('val')
+                    if isinstance(elem, dict) and 'prefix' in elem:
+                        elem = f"{elem['prefix']['addr']}/{elem['prefix']['len']}"
+                    if isinstance(elem, str):
+                        blocked.append(self.normalize(elem))
+        return blocked
+
+    def _apply_transaction(self, ops: List[Dict]) -> bool:
+        # `nft -f` is één atomaire transactie: alles of niets
+        lines = []
+        for op in ops:
+            verb = 'add' if op['action'] == 'block' else 'delete'
+            element = self.element(op['ip'], op.get('timeout')) if verb == 'add' else op['ip']
+            lines.append(f"{verb} element inet {self.table} {self.set_for(op['ip'])} {{ {element} }}")
+        lines.append('')
+
+        result = self._run(self._cmd('nft', '-f', '-'), input='\n'.join(lines))
+        if result.returncode != 0:
+            self.logger.error(f"nft batch failed: {result.stderr}")
+            return False
+        return True
+
+    def teardown(self) -> bool:
+        result = self._run(self._cmd('nft', 'delete', 'table', 'inet', self.table))
+        return result.returncode == 0
+
+
+class NetlinkIpsetBackend(IpsetBackend):
+    """
+    Ipset backend die direct via netlink met de kernel praat (pyroute2)
+
+    Geen sudo, fork/exec of ruleset dump per operatie: één persistente netlink
+    socket voor alle set operaties. Vereist CAP_NET_ADMIN voor het proces; alleen
+    de eenmalige DROP regel bij setup gaat nog via iptables.
+    """
+
+    name = 'netlink'
+
+    def __init__(self, set_name: str = 'ai-firewall', chain: str = 'INPUT',
+                 use_sudo: bool = True, maxelem: int = 1048576, ipset=None,
+                 manage_rule: bool = True):
+        super().__init__(set_name, chain, use_sudo, maxelem)
+        # ipset: pyroute2.ipset.IPSet compatible object (FakeIPSet in tests)
+        self._ipset = ipset
+        self.manage_rule = manage_rule
+
+    def connection(self):
+        """Persistente netlink socket (lazy)"""
+        if self._ipset is None:
+            try:
+                from pyroute2.ipset import IPSet
+            except ImportError:
+                raise RuntimeError(
+                    "Netlink backend requires pyroute2 (pip install pyroute2)"
+                )
+            self._ipset = IPSet()
+        return self._ipset
+
+    def reconnect(self):
+        """Sluit de socket; volgende operatie opent een nieuwe"""
+        self.close()
+        self._ipset = None
+
+    def close(self):
+        """Sluit de netlink socket"""
+        if self._ipset is not None:
+            try:
+                self._ipset.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def family_for(ip: str) -> int:
+        return socket.AF_INET6 if FirewallBackend.ip_version(ip) == 6 else socket.AF_INET
+
+    @staticmethod
+    def entry_for(ip: str) -> str:
+        """hash:net entry (altijd met prefix lengte)"""
+        return str(ipaddress.ip_network(ip, strict=False))
+
+    def setup(self) -> bool:
+        ok = True
+        for family, set_name, tool in ((socket.AF_INET, self.set_name, 'iptables'),
+                                       (socket.AF_INET6, f'{self.set_name}6', 'ip6tables')):
+            try:
+                self.connection().create(
+                    set_name, stype='hash:net', family=family,
+                    exclusive=False, timeout=0, maxelem=self.maxelem
+                )
+            except Exception as e:
+                self.logger.error(f"Failed to create ipset {set_name} via netlink: {e}")
+                ok = False
+                continue
+
+            if self.manage_rule and not self._ensure_rule(tool, set_name):
+                ok = False
+        return ok
+
+    def _call(self, method: str, *args, **kwargs):
+        """Netlink call met één reconnect bij een kapotte socket"""
+        try:
+            return getattr(self.connection(), method)(*args, **kwargs)
+        except (OSError, EOFError):
+            # Socket probleem (kernel errors zijn NetlinkError, geen OSError)
+            self.reconnect()
+            return getattr(self.connection(), method)(*args, **kwargs)
+
+    def block(self, ip: str, reason: str = "Malicious traffic",
+              timeout: Optional[int] = None) -> bool:
+        try:
+            self._call(
+                'add', self.set_for(ip), self.entry_for(ip),
+                family=self.family_for(ip), exclusive=False, etype='net',
+                timeout=int(timeout) if timeout else None
+            )
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to block {ip} via netlink: {e}")
+            return False
+
+    def unblock(self, ip: str) -> bool:
+        try:
+            self._call(
+                'delete', self.set_for(ip), self.entry_for(ip),
+                family=self.family_for(ip), exclusive=True, etype='net'
+            )
+            return True
+        except Exception:
+            return False
+
+    def list_blocked(self) -> Optional[List[str]]:
+        # FakeIPSet geeft entries terug; echte pyroute2 messages via `ipset list`
+        try:
+            blocked = []
+            for set_name in (self.set_name, f'{self.set_name}6'):
+                entries = self._call('list', set_name)
+                if entries and not isinstance(entries[0], str):
+                    return super().list_blocked()
+                blocked.extend(self.normalize(entry) for entry in entries)
+            return blocked
+        except Exception:
+            return super().list_blocked()
+
+    def apply_batch(self, ops: List[Dict]) -> List[bool]:
+        # Losse netlink operaties zijn al goedkoop; geen transactie nodig
+        return [self._apply_single(op) for op in ops]
+
+    def teardown(self) -> bool:
+        ok = True
+        for set_name, tool in ((self.set_name, 'iptables'), (f'{self.set_name}6', 'ip6tables')):
+            if self.manage_rule:
+                rule = ['-m', 'set', '--match-set', set_name, 'src', '-j', 'DROP']
+                self._run(self._cmd(tool, '-D', self.chain, *rule))
+            try:
+                self.connection().destroy(set_name)
+            except Exception:
+                ok = False
+        self.reconnect()
+        return ok
+
+
+class SimulatedBackend(FirewallBackend):
+    """
+    In-process backend tegen een SimulatedKernel (geen root, geen subprocesses)
+
+    Voor benchmarks en tests van het volledige blocking pad. mode='chain'
+    modelleert de iptables backend (regel per IP, geen timeouts), mode='set'
+    de ipset/nftables backends (hash set met kernel timeouts).
+    """
+
+    name = 'simulated'
+
+    def __init__(self, mode: str = 'set', kernel=None, **kernel_options):
+        """
+        Args:
+            mode: 'chain' of 'set'
+            kernel: Bestaande SimulatedKernel (bijv. gedeeld met een test)
+            **kernel_options: Opties voor een nieuwe SimulatedKernel
+                              (rule_cost_ns, probe_cost_ns, op_latency, record)
+        """
+        super().__init__(use_sudo=False)
+        if kernel is None:
+            kernel = SimulatedKernel(mode=mode, **kernel_options)
+        self.kernel = kernel
+        self.supports_timeout = kernel.mode == 'set'
+
+    def block(self, ip: str, reason: str = "Malicious traffic",
+              timeout: Optional[int] = None) -> bool:
+        return self.kernel.add(ip, reason, int(timeout) if timeout else None)
+
+    def unblock(self, ip: str) -> bool:
+        return self.kernel.delete(ip)
+
+    def list_blocked(self) -> Optional[List[str]]:
+        return self.kernel.list()
+
+    def _apply_transaction(self, ops: List[Dict]) -> bool:
+        return self.kernel.transaction(ops)
+
+    def teardown(self) -> bool:
+        self.kernel.flush()
+        return True
+
+
+BACKENDS = {
+    IptablesChainBackend.name: IptablesChainBackend,
+    IpsetBackend.name: IpsetBackend,
+    NftablesSetBackend.name: NftablesSetBackend,
+    NetlinkIpsetBackend.name: NetlinkIpsetBackend,
+    SimulatedBackend.name: SimulatedBackend,
+}
+
+
+def create_backend(name: str, **kwargs) -> FirewallBackend:
+    """
+    Maak backend op naam
+
+    Args:
+        name: Backend naam uit config (firewall.backend)
+              'iptables', 'ipset', 'nftables', 'netlink' of 'simulated'
+        **kwargs: Backend-specifieke opties
+
+    Returns:
+        FirewallBackend instance
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown firewall backend: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
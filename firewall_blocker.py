@@ -5,10 +5,32 @@ Blokkeert malicious traffic automatisch via iptables/nftables
 
 import subprocess
 import json
-from datetime import datetime, timedelta
+import time
+import threading
+import functools
+from collections import deque
+import ipaddress
+from datetime import datetime
 from pathlib import Path
-from typing import Set, Dict, List
+from typing import Set, Dict, List, Optional
 from utils import Logger, Config
+from firewall_backends import FirewallBackend, create_backend
+from rule_batcher import RuleBatcher
+from block_store import BlockStore
+from block_expiry import ExpiryScheduler, OwnerLock
+from cidr_table import CidrTable
+from block_log import BlockLogWriter
+from subnet_aggregation import AggregationPolicy
+import metrics
+from metrics import timed
+
+def synchronized(method):
+    """Serialiseer state wijzigingen (worker, expiry thread en API delen één blocker)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class FirewallBlocker:
     """
@@ -26,26 +48,79 @@ class FirewallBlocker:
             importlib.reload(utils)
         
         self.config = Config()
+        self._lock = threading.RLock()
         
         # Blocked IPs tracking
         self.blocked_ips: Set[str] = set()
-        self.block_history: List[Dict] = []
+        # Recente block events (bounded ring) + gebufferde log writer
+        self.block_history: deque = deque(maxlen=self.config.get('firewall.history_size', 1000))
+        self.block_log = BlockLogWriter.from_config(self.config)
+        
+        # Persistente block state (gedeeld met andere processen) + in-memory mirror
+        state_db = self.config.get('firewall.state_db', 'logs/block_state.db')
+        self.store = BlockStore(state_db)
+        self.blocks: Dict[str, Dict] = {}
+        self.block_table = CidrTable()
+        self.members_by_parent: Dict[str, Set[str]] = {}
+        self._store_version: Optional[int] = None
+        self._last_refresh = 0.0
         
         # Thresholds
         self.block_threshold = self.config.get('firewall.block_threshold', 0.7)
         self.auto_block_enabled = self.config.get('firewall.auto_block', False)
         self.block_duration_hours = self.config.get('firewall.block_duration', 24)
         
-        # Whitelist (never block these)
-        self.whitelist = set(self.config.get('firewall.whitelist', [
+        # Escalatie: herhaalde offenders krijgen langere blocks
+        self.escalation_enabled = self.config.get('firewall.escalation.enabled', True)
+        self.escalation_factor = self.config.get('firewall.escalation.factor', 2.0)
+        self.escalation_window_hours = self.config.get('firewall.escalation.window_hours', 720)
+        self.max_block_duration_hours = self.config.get('firewall.escalation.max_duration', 168)
+        
+        # Whitelist (never block these): IPs of CIDR prefixes
+        self.whitelist = CidrTable(self.config.get('firewall.whitelist', [
             '127.0.0.1',
             '192.168.1.1',  # Router
             '8.8.8.8',      # Google DNS
         ]))
         
+        # Hot paths verversen de mirror hooguit eens per refresh_interval seconden
+        self.refresh_interval = self.config.get('firewall.refresh_interval', 1.0)
+        
+        # Kernel backend: 'iptables' (regel per IP), 'ipset' of 'nftables' (hash set)
+        self.backend_name = self.config.get('firewall.backend', 'iptables')
+        self.kernel_expiry = self.config.get('firewall.kernel_expiry', True)
+        self.backend: Optional[FirewallBackend] = None
+        self._backend_ready = False
+        
+        # Batching: operaties coalescen tot periodieke transacties
+        self.batching_enabled = self.config.get('firewall.batching.enabled', False)
+        self.flush_interval = self.config.get('firewall.batching.flush_interval', 0.05)
+        self.max_batch_size = self.config.get('firewall.batching.max_batch_size', 500)
+        self.batcher: Optional[RuleBatcher] = None
+        # Losse block/unblock operaties die buiten de lock op hun batch wachten
+        self._in_flight: Dict[str, tuple] = {}
+        
+        # Subnet aggregatie: dichte clusters host blocks worden één prefix regel
+        self.aggregation = AggregationPolicy.from_config(self.config)
+        
+        # Expiry: min-heap op expires_at, gevuld vanuit de store; alleen het proces
+        # met de owner lock naast state_db verwijdert verlopen blocks, en ververst
+        # elke refresh_interval zodat ook blocks van andere processen verlopen
+        self.expiry = ExpiryScheduler(
+            self.expire_blocks,
+            max_batch_size=self.max_batch_size,
+            owner_lock=OwnerLock(f"{state_db}.expiry.lock"),
+            owner_retry=self.config.get('firewall.expiry_owner_retry', 5.0),
+            on_owner=lambda: self.refresh(force=True),
+            on_tick=self.refresh,
+            tick_interval=self.refresh_interval
+        )
+        self.refresh()
+        
         self.logger.info("FirewallBlocker initialized")
         self.logger.info(f"Auto-block: {self.auto_block_enabled}")
         self.logger.info(f"Threshold: {self.block_threshold}")
+        self.logger.info(f"Backend: {self.backend_name}")
         
     def is_linux(self) -> bool:
         """Check if running on Linux"""
@@ -57,9 +132,507 @@ class FirewallBlocker:
         import platform
         return platform.system() == 'Windows'
     
+    def get_backend(self) -> FirewallBackend:
+        """Get Linux kernel backend (lazy setup van chains/sets)"""
+        if self.backend is None:
+            self.backend = create_backend(
+                self.backend_name,
+                **self.config.get('firewall.backend_options', {})
+            )
+        
+        if not self._backend_ready:
+            self._backend_ready = self.backend.setup()
+        
+        return self.backend
+    
+    def kernel_handles_expiry(self) -> bool:
+        """True als de backend blocks zelf laat verlopen (ipset/nftables timeouts)"""
+        return bool(self.kernel_expiry and self.get_backend().supports_timeout)
+    
+    def kernel_timeout(self, duration: Optional[float] = None) -> Optional[int]:
+        """
+        Kernel timeout in seconden als de backend expiry zelf afhandelt
+        
+        Args:
+            duration: Block duration in seconden (default: block_duration)
+        """
+        if duration is None and self.block_duration_hours:
+            duration = self.block_duration_hours * 3600
+        if duration and self.kernel_handles_expiry():
+            return max(1, int(duration))
+        return None
+    
+    def block_duration(self, ip: str) -> Optional[float]:
+        """
+        Block duration in seconden voor dit IP
+        
+        Elke eerdere block binnen het escalatie window vermenigvuldigt de
+        duration met escalation_factor, tot max_block_duration_hours.
+        
+        Returns:
+            Seconden, of None voor een permanente block
+        """
+        if not self.block_duration_hours:
+            return None
+        
+        duration = self.block_duration_hours * 3600
+        if self.escalation_enabled:
+            since = time.time() - self.escalation_window_hours * 3600
+            offenses = self.store.offense_count(ip, since)
+            duration *= self.escalation_factor ** offenses
+            duration = min(duration, max(self.max_block_duration_hours * 3600,
+                                         self.block_duration_hours * 3600))
+        return duration
+    
+    def get_batcher(self) -> RuleBatcher:
+        """Get (en start) de rule batcher"""
+        if self.batcher is None:
+            self.batcher = RuleBatcher(
+                self.get_backend(),
+                flush_interval=self.flush_interval,
+                max_batch_size=self.max_batch_size
+            )
+            self.batcher.start()
+        return self.batcher
+    
+    def apply_kernel_ops(self, ops: List[Dict]) -> List[bool]:
+        """
+        Pas kernel operaties toe via batcher of als directe transacties
+        
+        Args:
+            ops: List van {'action': 'block'|'unblock', 'ip', 'reason', 'timeout'}
+            
+        Returns:
+            Resultaat per operatie
+        """
+        # Wachtende losse operaties op deze IPs zijn nu niet meer de laatste
+        for op in ops:
+            self._in_flight.pop(op['ip'], None)
+        
+        if self.batching_enabled:
+            futures = self.get_batcher().submit_many(ops)
+            return [future.result() for future in futures]
+        
+        backend = self.get_backend()
+        results = []
+        for i in range(0, len(ops), self.max_batch_size):
+            results.extend(backend.apply_batch(ops[i:i + self.max_batch_size]))
+        return results
+    
+    def _submit_single(self, action: str, ip: str, reason: str = "Malicious traffic",
+                       timeout: Optional[int] = None) -> tuple:
+        """
+        Zet een losse operatie in de batcher (aanroepen onder de lock)
+        
+        Loopt dezelfde operatie voor dit IP al, dan wacht de caller op die
+        future i.p.v. een tweede operatie in te dienen.
+        
+        Returns:
+            (entry, owner): entry = (action, future), owner False bij meeliften
+        """
+        entry = self._in_flight.get(ip)
+        if entry is not None and entry[0] == action:
+            return entry, False
+        entry = (action, self.get_batcher().submit(action, ip, reason, timeout))
+        self._in_flight[ip] = entry
+        return entry, True
+    
+    def _finish_single(self, ip: str, entry: tuple) -> bool:
+        """
+        Ruim een afgeronde losse operatie op (aanroepen onder de lock)
+        
+        Returns:
+            False als een latere operatie op dit IP de state bepaalt
+        """
+        if self._in_flight.get(ip) is not entry:
+            return False
+        del self._in_flight[ip]
+        return True
+    
+    def close(self):
+        """Flush openstaande operaties en stop achtergrond threads"""
+        self.expiry.stop()
+        if self.batcher:
+            self.batcher.stop()
+            self.batcher = None
+        if self.backend:
+            self.backend.close()
+        self.block_log.close()
+        self.store.close()
+    
+    @synchronized
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Herlaad de mirror als een ander proces de store heeft gewijzigd
+        
+        PRAGMA data_version verandert alleen bij commits van andere connecties,
+        dus deze check kost één pragma zolang niemand anders schrijft.
+        
+        Returns:
+            True als de mirror herladen is
+        """
+        version = self.store.data_version()
+        if not force and version == self._store_version:
+            return False
+        
+        self.blocks = {record['ip']: record for record in self.store.active_blocks()}
+        self.blocked_ips = set(self.blocks)
+        self.block_table = CidrTable(self.blocks)
+        self.members_by_parent = {}
+        for ip in self.blocks:
+            parent = self.aggregation.parent(ip)
+            if parent:
+                self.members_by_parent.setdefault(parent, set()).add(ip)
+        self.expiry.rebuild(self.blocks.values())
+        self._store_version = version
+        return True
+    
+    def maybe_refresh(self) -> bool:
+        """refresh() hooguit eens per refresh_interval (voor per-packet hot paths)"""
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_interval:
+            return False
+        self._last_refresh = now
+        return self.refresh()
+    
+    def _mirror_add(self, record: Dict):
+        self.blocks[record['ip']] = record
+        self.blocked_ips.add(record['ip'])
+        self.block_table.add(record['ip'])
+        parent = self.aggregation.parent(record['ip'])
+        if parent:
+            self.members_by_parent.setdefault(parent, set()).add(record['ip'])
+    
+    def _mirror_remove(self, ip: str):
+        self.blocks.pop(ip, None)
+        self.blocked_ips.discard(ip)
+        self.block_table.remove(ip)
+        parent = self.aggregation.parent(ip)
+        if parent in self.members_by_parent:
+            self.members_by_parent[parent].discard(ip)
+            if not self.members_by_parent[parent]:
+                del self.members_by_parent[parent]
+    
+    def is_blocked(self, ip: str, refresh: bool = True) -> bool:
+        """
+        Check of IP (of prefix) onder een actieve block valt (longest-prefix-match)
+        
+        Args:
+            ip: IP adres of prefix
+            refresh: Eerst de mirror verversen als een ander proces geschreven heeft
+        """
+        if refresh:
+            self.refresh()
+        return ip in self.block_table
+    
+    def is_whitelisted(self, ip: str) -> bool:
+        """Check of IP of prefix whitelisted adresruimte raakt"""
+        return self.whitelist.overlaps(ip) if '/' in ip else ip in self.whitelist
+    
+    def lookup(self, ip: str) -> Dict:
+        """Whitelist en block match voor een IP (longest-prefix-match)"""
+        self.refresh()
+        whitelist_match = self.whitelist.lookup(ip)
+        block_match = self.block_table.lookup(ip)
+        return {
+            'ip': ip,
+            'whitelisted': whitelist_match is not None,
+            'whitelist_match': whitelist_match[0] if whitelist_match else None,
+            'blocked': block_match is not None,
+            'block_match': block_match[0] if block_match else None,
+            'block': self.blocks.get(block_match[0]) if block_match else None
+        }
+    
+    @synchronized
+    def record_blocks(self, ips: List[str], reason: str, method: str,
+                      durations: Optional[Dict[str, Optional[float]]] = None):
+        """
+        Persisteer nieuwe blocks, werk de mirror bij en plan expiry
+        
+        Args:
+            ips: Geblokkeerde IPs
+            reason: Reason for blocking
+            method: Backend naam
+            durations: Duration per IP in seconden (default: block_duration(ip))
+        """
+        if durations is None:
+            durations = {ip: self.block_duration(ip) for ip in ips}
+        
+        records = self.store.add_blocks(
+            {'ip': ip, 'reason': reason, 'method': method, 'duration': durations.get(ip)}
+            for ip in ips
+        )
+        for record in records:
+            self._mirror_add(record)
+            self.expiry.schedule(record['ip'], record['expires_ts'])
+            self.log_block(record['ip'], reason, method)
+    
+    @synchronized
+    def record_unblocks(self, ips: List[str]):
+        """Markeer blocks als verwijderd in store en mirror"""
+        self.store.remove_blocks(ips)
+        for ip in ips:
+            self._mirror_remove(ip)
+            self.expiry.cancel(ip)
+    
+    def start_expiry(self):
+        """
+        Bouw de expiry heap op uit de store en start de expiry thread
+        
+        Eén proces per state_db wordt owner (flock); de andere threads wachten
+        tot de owner stopt en verversen tot dan alleen hun mirror.
+        """
+        self.refresh(force=True)
+        self.expiry.start()
+    
+    @synchronized
+    def expire_blocks(self, ips: List[str]) -> List[str]:
+        """
+        Verwijder verlopen blocks in één batch (callback van de expiry scheduler)
+        
+        Blocks die intussen door een ander proces verlengd of opgeheven zijn
+        worden overgeslagen en zo nodig opnieuw ingepland.
+        
+        Returns:
+            Daadwerkelijk verwijderde IPs
+        """
+        now = time.time()
+        due = []
+        self.refresh()
+        for ip in ips:
+            record = self.store.get_active(ip)
+            if record is None:
+                continue
+            if record['expires_ts'] is None or record['expires_ts'] > now:
+                self.expiry.schedule(ip, record['expires_ts'])
+                continue
+            due.append(ip)
+        
+        if not due:
+            return []
+        
+        # Members van een aggregaat hebben geen eigen kernel regel
+        affected = {self.blocks[ip]['aggregate'] for ip in due
+                    if ip in self.blocks and self.blocks[ip].get('aggregate')}
+        kernel_due = [ip for ip in due
+                      if not (ip in self.blocks and self.blocks[ip].get('aggregate'))]
+        
+        # ipset/nftables hebben de entries zelf al laten verlopen
+        if self.is_linux() and not self.kernel_handles_expiry():
+            if kernel_due:
+                self.apply_kernel_ops([{'action': 'unblock', 'ip': ip} for ip in kernel_due])
+        elif self.is_windows():
+            for ip in due:
+                self.unblock_ip_windows(ip)
+        
+        self.record_unblocks(due)
+        self.logger.info(f"Expired {len(due)} blocks")
+        
+        # Aggregaten zonder genoeg members worden weer losse regels
+        for prefix in affected:
+            if self.aggregation.should_split(len(self.members_of(prefix))):
+                self.split_aggregate(prefix)
+        return due
+    
+    def aggregate_covering(self, ip: str) -> Optional[str]:
+        """Aggregaat prefix waar ip onder valt zonder zelf member te zijn (of None)"""
+        if ip in self.blocks:
+            return None
+        prefix = self.aggregation.parent(ip)
+        if prefix in self.blocks and self.members_of(prefix):
+            return prefix
+        return None
+    
+    def _join_aggregate(self, ip: str, prefix: str, reason: str) -> Dict:
+        """
+        Registreer een nieuwe offender binnen een aggregaat als member
+        
+        De prefix regel dekt het IP al; het member record geeft het een eigen
+        expiry en offense count, zodat het bij het opsplitsen een eigen regel
+        terugkrijgt. De prefix blijft minstens zo lang als zijn langste member.
+        
+        Returns:
+            Member record
+        """
+        aggregate = self.blocks[prefix]
+        method = aggregate['method'] or self.backend_name
+        record = self.store.add_blocks([{'ip': ip, 'reason': reason, 'method': method,
+                                         'duration': self.block_duration(ip)}])[0]
+        self.store.set_aggregate([ip], prefix)
+        record['aggregate'] = prefix
+        self._mirror_add(record)
+        self.expiry.schedule(ip, record['expires_ts'])
+        self.log_block(ip, reason, method, aggregate=prefix)
+        
+        expires_at = record['expires_ts']
+        if aggregate['expires_ts'] is not None and (expires_at is None or expires_at > aggregate['expires_ts']):
+            if self.is_linux() and self.kernel_handles_expiry():
+                # Kernel timeout van de prefix verlengen (permanent: geen timeout)
+                timeout = self.kernel_timeout(expires_at - time.time()) if expires_at else None
+                self.apply_kernel_ops([{'action': 'block', 'ip': prefix,
+                                        'reason': aggregate['reason'], 'timeout': timeout}])
+            extended = self.store.add_blocks([{'ip': prefix, 'reason': aggregate['reason'],
+                                               'method': aggregate['method'],
+                                               'expires_at': expires_at}])[0]
+            self._mirror_add(extended)
+            self.expiry.schedule(prefix, expires_at)
+        return record
+    
+    def members_of(self, prefix: str) -> List[str]:
+        """Host blocks die in aggregaat `prefix` zijn opgegaan"""
+        return [
+            ip for ip in self.members_by_parent.get(prefix, ())
+            if self.blocks[ip].get('aggregate') == prefix
+        ]
+    
+    def aggregate_blocks(self, ips: List[str]) -> List[str]:
+        """
+        Vervang dichte clusters host blocks door één prefix block
+        
+        Alleen prefixes rond de gegeven (nieuw geblokkeerde) IPs worden bekeken.
+        Een prefix die whitelisted adresruimte raakt wordt nooit geaggregeerd.
+        
+        Returns:
+            Aangemaakte aggregaat prefixes
+        """
+        if not self.aggregation.enabled or not self.is_linux():
+            return []
+        
+        created = []
+        parents = dict.fromkeys(filter(None, (self.aggregation.parent(ip) for ip in ips)))
+        for prefix in parents:
+            if prefix in self.blocks or self.is_whitelisted(prefix):
+                continue
+            
+            members = [ip for ip in self.members_by_parent.get(prefix, ())
+                       if not self.blocks[ip].get('aggregate')]
+            if self.aggregation.should_aggregate(len(members)) and self._aggregate(prefix, members):
+                created.append(prefix)
+        return created
+    
+    def _aggregate(self, prefix: str, members: List[str]) -> bool:
+        """Eén transactie: prefix erin, member regels eruit"""
+        expiries = [self.blocks[ip]['expires_ts'] for ip in members]
+        expires_at = None if None in expiries else max(expiries)
+        timeout = self.kernel_timeout(expires_at - time.time()) if expires_at else None
+        reason = f"Aggregated {len(members)} blocks"
+        
+        ops = [{'action': 'block', 'ip': prefix, 'reason': reason, 'timeout': timeout}]
+        ops += [{'action': 'unblock', 'ip': ip} for ip in members]
+        if not self.apply_kernel_ops(ops)[0]:
+            self.logger.error(f"Failed to aggregate {len(members)} blocks into {prefix}")
+            return False
+        
+        method = self.backend.name
+        record = self.store.add_blocks([{'ip': prefix, 'reason': reason, 'method': method,
+                                         'expires_at': expires_at}])[0]
+        self.store.set_aggregate(members, prefix)
+        for ip in members:
+            self.blocks[ip]['aggregate'] = prefix
+        self._mirror_add(record)
+        self.expiry.schedule(prefix, expires_at)
+        
+        self.log_block(prefix, reason, method, action='aggregate',
+                       members=len(members), rules_saved=len(members) - 1)
+        self.logger.info(f"✅ AGGREGATED {len(members)} blocks into {prefix} "
+                         f"({len(members) - 1} fewer kernel rules)")
+        return True
+    
+    def split_aggregate(self, prefix: str) -> bool:
+        """Vervang aggregaat door losse regels voor de resterende members"""
+        members = self.members_of(prefix)
+        now = time.time()
+        
+        ops = [{'action': 'unblock', 'ip': prefix}]
+        for ip in members:
+            record = self.blocks[ip]
+            ops.append({
+                'action': 'block', 'ip': ip,
+                'reason': record['reason'] or 'Malicious traffic',
+                'timeout': self.kernel_timeout(record['expires_ts'] - now) if record['expires_ts'] else None
+            })
+        
+        results = self.apply_kernel_ops(ops)
+        failed = [ip for ip, ok in zip(members, results[1:]) if not ok]
+        if failed:
+            self.logger.error(f"Failed to restore {len(failed)} blocks while splitting {prefix}")
+        
+        self.store.set_aggregate(members, None)
+        for ip in members:
+            self.blocks[ip]['aggregate'] = None
+        self.record_unblocks([prefix])
+        
+        self.log_block(prefix, f"Split into {len(members)} blocks", self.backend.name,
+                       action='split', members=len(members), rules_saved=0)
+        self.logger.info(f"Split aggregate {prefix} into {len(members)} blocks")
+        return not failed
+    
+    @synchronized
+    def reconcile(self) -> Dict:
+        """
+        Breng kernel ruleset en persistente state in lijn (bij startup)
+        
+        - Verlopen blocks: uit kernel en store
+        - Actief in store maar niet in kernel (reboot, flush): opnieuw toepassen
+        - In kernel maar niet in store (state verloren): adopteren
+        
+        Returns:
+            Dict met aantallen per actie, of {'supported': False}
+        """
+        self.refresh(force=True)
+        summary = {'supported': False, 'expired': 0, 'restored': 0, 'adopted': 0}
+        if not self.is_linux():
+            return summary
+        
+        try:
+            kernel = self.get_backend().list_blocked()
+        except Exception as e:
+            self.logger.error(f"Could not read kernel ruleset: {e}")
+            kernel = None
+        if kernel is None:
+            return summary
+        
+        summary['supported'] = True
+        kernel_ips = set(kernel)
+        now = time.time()
+        
+        expired = [r['ip'] for r in self.store.expired_blocks(now)]
+        if expired:
+            self.apply_kernel_ops([{'action': 'unblock', 'ip': ip}
+                                   for ip in expired if ip in kernel_ips])
+            self.record_unblocks(expired)
+            kernel_ips.difference_update(expired)
+            summary['expired'] = len(expired)
+        
+        missing = [r for r in self.blocks.values()
+                   if r['ip'] not in kernel_ips and not r.get('aggregate')]
+        if missing:
+            ops = []
+            for record in missing:
+                timeout = None
+                if record['expires_ts']:
+                    timeout = self.kernel_timeout(record['expires_ts'] - now)
+                ops.append({'action': 'block', 'ip': record['ip'],
+                            'reason': record['reason'] or 'Restored', 'timeout': timeout})
+            summary['restored'] = sum(self.apply_kernel_ops(ops))
+        
+        adopted = [ip for ip in kernel_ips if ip not in self.blocks]
+        if adopted:
+            records = self.store.add_blocks(
+                {'ip': ip, 'reason': 'Adopted from kernel', 'method': self.backend.name}
+                for ip in adopted
+            )
+            for record in records:
+                self._mirror_add(record)
+            summary['adopted'] = len(records)
+        
+        self.logger.info(f"Reconciled block state: {summary['expired']} expired, "
+                         f"{summary['restored']} restored, {summary['adopted']} adopted")
+        return summary
+    
     def block_ip_linux(self, ip: str, reason: str = "Malicious traffic") -> bool:
         """
-        Block IP using iptables (Linux)
+        Block IP using the configured kernel backend (Linux)
         
         Args:
             ip: IP address to block
@@ -69,41 +642,60 @@ class FirewallBlocker:
             True if successful
         """
         try:
-            # Check if already blocked
-            if ip in self.blocked_ips:
-                self.logger.info(f"IP {ip} already blocked")
-                return True
-            
-            # Check whitelist
-            if ip in self.whitelist:
-                self.logger.warning(f"IP {ip} is whitelisted - NOT blocking")
-                return False
-            
-            # Block with iptables
-            cmd = [
-                'sudo', 'iptables',
-                '-A', 'INPUT',
-                '-s', ip,
-                '-j', 'DROP',
-                '-m', 'comment',
-                '--comment', f'AI-Firewall: {reason}'
-            ]
+            with self._lock:
+                self.refresh()
+                
+                # Binnen een aggregaat: member record, geen eigen kernel regel
+                prefix = self.aggregate_covering(ip)
+                if prefix:
+                    self._join_aggregate(ip, prefix, reason)
+                    self.logger.info(f"✅ BLOCKED IP: {ip} ({reason}, covered by {prefix})")
+                    return True
+                
+                # Check if already blocked
+                if self.is_blocked(ip, refresh=False):
+                    self.logger.info(f"IP {ip} already blocked")
+                    return True
+                
+                # Check whitelist
+                if self.is_whitelisted(ip):
+                    self.logger.warning(f"IP {ip} is whitelisted - NOT blocking")
+                    return False
+                
+                # Block via kernel backend (iptables chain of ipset/nftables set)
+                backend = self.get_backend()
+                duration = self.block_duration(ip)
+                timeout = self.kernel_timeout(duration)
+                
+                if not self.batching_enabled:
+                    ok = backend.block(ip, reason, timeout=timeout)
+                    if ok:
+                        self._record_block(ip, reason, backend.name, duration)
+                    return ok
+                
+                entry, owner = self._submit_single('block', ip, reason, timeout)
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            # Wachten op de flush buiten de lock: gelijktijdige blocks delen de batch
+            ok = entry[1].result()
+            if not owner:
+                return ok
             
-            if result.returncode == 0:
-                self.blocked_ips.add(ip)
-                self.log_block(ip, reason, 'iptables')
-                self.logger.info(f"✅ BLOCKED IP: {ip} ({reason})")
-                return True
-            else:
-                self.logger.error(f"Failed to block {ip}: {result.stderr}")
-                return False
+            with self._lock:
+                ok = self._finish_single(ip, entry) and ok
+                if ok:
+                    self._record_block(ip, reason, backend.name, duration)
+            return ok
                 
         except Exception as e:
             self.logger.error(f"Error blocking IP {ip}: {e}")
             return False
     
+    def _record_block(self, ip: str, reason: str, method: str, duration: Optional[float]):
+        """Persisteer een toegepaste losse block en kijk of de prefix aggregeert"""
+        self.record_blocks([ip], reason, method, {ip: duration})
+        self.logger.info(f"✅ BLOCKED IP: {ip} ({reason})")
+        self.aggregate_blocks([ip])
+    
     def block_ip_windows(self, ip: str, reason: str = "Malicious traffic") -> bool:
         """
         Block IP using Windows Firewall
@@ -116,13 +708,21 @@ class FirewallBlocker:
             True if successful
         """
         try:
+            self.refresh()
+            
+            prefix = self.aggregate_covering(ip)
+            if prefix:
+                self._join_aggregate(ip, prefix, reason)
+                self.logger.info(f"✅ BLOCKED IP: {ip} ({reason}, covered by {prefix})")
+                return True
+            
             # Check if already blocked
-            if ip in self.blocked_ips:
+            if self.is_blocked(ip, refresh=False):
                 self.logger.info(f"IP {ip} already blocked")
                 return True
             
             # Check whitelist
-            if ip in self.whitelist:
+            if self.is_whitelisted(ip):
                 self.logger.warning(f"IP {ip} is whitelisted - NOT blocking")
                 return False
             
@@ -142,8 +742,7 @@ class FirewallBlocker:
             result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
             
             if result.returncode == 0:
-                self.blocked_ips.add(ip)
-                self.log_block(ip, reason, 'windows_firewall')
+                self.record_blocks([ip], reason, 'windows_firewall')
                 self.logger.info(f"✅ BLOCKED IP: {ip} ({reason})")
                 return True
             else:
@@ -158,6 +757,9 @@ class FirewallBlocker:
         """
         Block IP address (platform independent)
         
+        Met batching wacht de caller zonder de lock op de flush, zodat losse
+        blocks uit meerdere threads in één transactie terechtkomen.
+        
         Args:
             ip: IP address to block
             reason: Reason for blocking
@@ -169,37 +771,59 @@ class FirewallBlocker:
             self.logger.warning(f"Auto-block DISABLED - Would block {ip} ({reason})")
             return False
         
-        if self.is_linux():
-            return self.block_ip_linux(ip, reason)
-        elif self.is_windows():
-            return self.block_ip_windows(ip, reason)
-        else:
-            self.logger.error("Unsupported platform for firewall blocking")
-            return False
+        with timed('block'):
+            if self.is_linux():
+                ok = self.block_ip_linux(ip, reason)
+            elif self.is_windows():
+                with self._lock:
+                    ok = self.block_ip_windows(ip, reason)
+            else:
+                self.logger.error("Unsupported platform for firewall blocking")
+                ok = False
+        metrics.inc('blocks_total', 'ok' if ok else 'failed')
+        return ok
     
     def unblock_ip_linux(self, ip: str) -> bool:
         """Unblock IP on Linux"""
         try:
-            cmd = [
-                'sudo', 'iptables',
-                '-D', 'INPUT',
-                '-s', ip,
-                '-j', 'DROP'
-            ]
+            with self._lock:
+                self.refresh()
+                
+                # Member van een aggregaat: prefix opsplitsen zonder dit IP
+                prefix = self.blocks.get(ip, {}).get('aggregate')
+                if prefix:
+                    self.record_unblocks([ip])
+                    self.split_aggregate(prefix)
+                    self.logger.info(f"✅ UNBLOCKED IP: {ip}")
+                    return True
+                
+                if not self.batching_enabled:
+                    ok = self.get_backend().unblock(ip)
+                    if ok:
+                        self._record_unblock(ip)
+                    return ok
+                
+                entry, owner = self._submit_single('unblock', ip)
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            ok = entry[1].result()
+            if not owner:
+                return ok
             
-            if result.returncode == 0:
-                self.blocked_ips.discard(ip)
-                self.logger.info(f"✅ UNBLOCKED IP: {ip}")
-                return True
-            else:
-                return False
+            with self._lock:
+                ok = self._finish_single(ip, entry) and ok
+                if ok:
+                    self._record_unblock(ip)
+            return ok
                 
         except Exception as e:
             self.logger.error(f"Error unblocking IP {ip}: {e}")
             return False
     
+    def _record_unblock(self, ip: str):
+        # Aggregaat handmatig opgeheven: members gaan mee
+        self.record_unblocks([ip] + self.members_of(ip))
+        self.logger.info(f"✅ UNBLOCKED IP: {ip}")
+    
     def unblock_ip_windows(self, ip: str) -> bool:
         """Unblock IP on Windows"""
         try:
@@ -213,7 +837,7 @@ class FirewallBlocker:
             result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
             
             if result.returncode == 0:
-                self.blocked_ips.discard(ip)
+                self.record_unblocks([ip])
                 self.logger.info(f"✅ UNBLOCKED IP: {ip}")
                 return True
             else:
@@ -228,63 +852,235 @@ class FirewallBlocker:
         if self.is_linux():
             return self.unblock_ip_linux(ip)
         elif self.is_windows():
-            return self.unblock_ip_windows(ip)
+            with self._lock:
+                return self.unblock_ip_windows(ip)
         else:
             return False
     
-    def process_prediction(self, flow_data: Dict, prediction_result: Dict) -> bool:
+    @staticmethod
+    def is_valid_ip(ip: str) -> bool:
+        """Check of string een geldig IP adres of prefix is"""
+        try:
+            ipaddress.ip_network(ip, strict=False)
+            return True
+        except ValueError:
+            return False
+    
+    @synchronized
+    def block_ips(self, ips: List[str], reason: str = "Malicious traffic",
+                  reasons: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        Block meerdere IPs in één transactie
+        
+        Args:
+            ips: IP adressen om te blokkeren
+            reason: Reason for blocking
+            reasons: Optionele reason per IP (overschrijft reason)
+            
+        Returns:
+            Resultaat per IP: {'ip', 'action', 'success', 'status'}
+        """
+        results = {}
+        pending = []
+        reasons = reasons or {}
+        self.refresh()
+        
+        for ip in dict.fromkeys(ips):
+            if not self.auto_block_enabled:
+                results[ip] = (False, 'disabled')
+            elif not self.is_valid_ip(ip):
+                results[ip] = (False, 'invalid')
+            elif self.aggregate_covering(ip):
+                self._join_aggregate(ip, self.aggregate_covering(ip), reasons.get(ip, reason))
+                results[ip] = (True, 'blocked')
+            elif self.is_blocked(ip, refresh=False) or self._in_flight.get(ip, (None,))[0] == 'block':
+                results[ip] = (True, 'already_blocked')
+            elif self.is_whitelisted(ip):
+                results[ip] = (False, 'whitelisted')
+            else:
+                pending.append(ip)
+        
+        if pending and self.is_linux():
+            durations = {ip: self.block_duration(ip) for ip in pending}
+            ops = [{'action': 'block', 'ip': ip, 'reason': reasons.get(ip, reason),
+                    'timeout': self.kernel_timeout(durations[ip])}
+                   for ip in pending]
+            
+            for ip, ok in zip(pending, self.apply_kernel_ops(ops)):
+                results[ip] = (ok, 'blocked' if ok else 'failed')
+            
+            blocked_by_reason: Dict[str, List[str]] = {}
+            for ip in pending:
+                if results[ip][0]:
+                    blocked_by_reason.setdefault(reasons.get(ip, reason), []).append(ip)
+            for ip_reason, blocked_ips in blocked_by_reason.items():
+                self.record_blocks(blocked_ips, ip_reason, self.backend.name, durations)
+            self.aggregate_blocks([ip for ip in pending if results[ip][0]])
+            
+            blocked = sum(1 for ip in pending if results[ip][0])
+            self.logger.info(f"✅ BULK BLOCKED {blocked}/{len(pending)} IPs")
+        else:
+            for ip in pending:
+                ok = self.block_ip(ip, reasons.get(ip, reason))
+                results[ip] = (ok, 'blocked' if ok else 'failed')
+        
+        return [
+            {'ip': ip, 'action': 'block', 'success': ok, 'status': status}
+            for ip, (ok, status) in results.items()
+        ]
+    
+    @synchronized
+    def unblock_ips(self, ips: List[str]) -> List[Dict]:
+        """
+        Unblock meerdere IPs in één transactie
+        
+        Args:
+            ips: IP adressen om te deblokkeren
+            
+        Returns:
+            Resultaat per IP: {'ip', 'action', 'success', 'status'}
+        """
+        results = {}
+        pending = []
+        self.refresh()
+        
+        for ip in dict.fromkeys(ips):
+            if not self.is_valid_ip(ip):
+                results[ip] = (False, 'invalid')
+            elif self.blocks.get(ip, {}).get('aggregate') or self.members_of(ip):
+                # Aggregaten en hun members: opsplitsen i.p.v. een losse kernel regel
+                ok = self.unblock_ip(ip)
+                results[ip] = (ok, 'unblocked' if ok else 'failed')
+            else:
+                pending.append(ip)
+        
+        if pending and self.is_linux():
+            ops = [{'action': 'unblock', 'ip': ip} for ip in pending]
+            
+            for ip, ok in zip(pending, self.apply_kernel_ops(ops)):
+                results[ip] = (ok, 'unblocked' if ok else 'failed')
+            self.record_unblocks([ip for ip in pending if results[ip][0]])
+        else:
+            for ip in pending:
+                ok = self.unblock_ip(ip)
+                results[ip] = (ok, 'unblocked' if ok else 'failed')
+        
+        return [
+            {'ip': ip, 'action': 'unblock', 'success': ok, 'status': status}
+            for ip, (ok, status) in results.items()
+        ]
+    
+    def block_candidate(self, flow_data: Dict, prediction_result: Dict) -> Optional[str]:
+        """
+        Source IP dat op basis van deze prediction geblokkeerd moet worden
+        
+        Returns:
+            IP, of None (benign, onder threshold, whitelisted of al geblokkeerd)
+        """
+        prediction = prediction_result.get('prediction', 'BENIGN')
+        ensemble_score = prediction_result.get('ensemble_score', 0)
+        
+        if prediction != 'MALICIOUS' or ensemble_score < self.block_threshold:
+            return None
+        
+        src_ip = flow_data.get('src_ip', flow_data.get('source_ip'))
+        if not src_ip:
+            return None
+        
+        # Prefix lookups: geen subprocess/log voor whitelisted of al geblokkeerde bronnen
+        # (een nieuw IP binnen een aggregaat krijgt nog wel een member record)
+        self.maybe_refresh()
+        if src_ip in self.whitelist:
+            return None
+        if self.is_blocked(src_ip, refresh=False) and not self.aggregate_covering(src_ip):
+            return None
+        return src_ip
+    
+    def process_prediction(self, flow_data: Dict, prediction_result: Dict,
+                           reason: Optional[str] = None) -> bool:
         """
         Process AI prediction en block indien nodig
         
         Args:
             flow_data: Flow metadata (src_ip, dst_ip, etc.)
             prediction_result: AI model output
+            reason: Block reason (default: ensemble score)
             
         Returns:
             True if IP was blocked
         """
-        # Extract prediction
-        prediction = prediction_result.get('prediction', 'BENIGN')
-        confidence = prediction_result.get('confidence', 0)
-        ensemble_score = prediction_result.get('ensemble_score', 0)
+        src_ip = self.block_candidate(flow_data, prediction_result)
+        if not src_ip:
+            return False
+        
+        reason = reason or f"Malicious score: {prediction_result.get('ensemble_score', 0):.3f}"
+        blocked = self.block_ip(src_ip, reason)
         
-        # Check if malicious
-        if prediction == 'MALICIOUS' and ensemble_score >= self.block_threshold:
-            # Get source IP
-            src_ip = flow_data.get('src_ip', flow_data.get('source_ip'))
+        if blocked:
+            # Send alert
+            self.send_alert(src_ip, flow_data, prediction_result)
+        
+        return blocked
+    
+    @synchronized
+    def process_predictions(self, items: List[tuple]) -> List[bool]:
+        """
+        Batch variant van process_prediction (gebruikt door BlockerService)
+        
+        Args:
+            items: List van (flow_data, prediction_result, reason) tuples
             
-            if src_ip:
-                reason = f"Malicious score: {ensemble_score:.3f}"
-                blocked = self.block_ip(src_ip, reason)
-                
-                if blocked:
-                    # Send alert
-                    self.send_alert(src_ip, flow_data, prediction_result)
-                
-                return blocked
+        Returns:
+            Per item True als het source IP in deze batch geblokkeerd is
+        """
+        candidates: Dict[str, tuple] = {}
+        sources = []
+        for flow_data, prediction_result, reason in items:
+            src_ip = self.block_candidate(flow_data, prediction_result)
+            sources.append(src_ip)
+            if src_ip and src_ip not in candidates:
+                score = prediction_result.get('ensemble_score', 0)
+                candidates[src_ip] = (flow_data, prediction_result,
+                                      reason or f"Malicious score: {score:.3f}")
         
-        return False
+        if not candidates:
+            return [False] * len(items)
+        
+        if not self.auto_block_enabled:
+            self.logger.warning(f"Auto-block DISABLED - Would block {len(candidates)} IPs")
+            return [False] * len(items)
+        
+        results = self.block_ips(
+            list(candidates),
+            reasons={ip: candidate[2] for ip, candidate in candidates.items()}
+        )
+        blocked = {r['ip'] for r in results if r['status'] == 'blocked'}
+        
+        for ip in blocked:
+            flow_data, prediction_result, _ = candidates[ip]
+            self.send_alert(ip, flow_data, prediction_result)
+        
+        return [src_ip in blocked for src_ip in sources]
     
-    def log_block(self, ip: str, reason: str, method: str):
-        """Log blocked IP"""
+    def log_block(self, ip: str, reason: str, method: str, **details):
+        """
+        Log blocked IP
+        
+        Args:
+            details: Extra velden, bijv. action='aggregate', members, rules_saved
+        """
         block_record = {
             'timestamp': datetime.now().isoformat(),
             'ip': ip,
             'reason': reason,
-            'method': method
+            'method': method,
+            **details
         }
         
         self.block_history.append(block_record)
         
-        # Save to file
-        log_file = Path('logs/blocked_ips.json')
-        log_file.parent.mkdir(exist_ok=True)
-        
-        try:
-            with open(log_file, 'a') as f:
-                f.write(json.dumps(block_record) + '\n')
-        except Exception as e:
-            self.logger.error(f"Failed to log block: {e}")
+        # Gebufferd naar logs/blocked_ips.json (periodieke fsync + rotatie)
+        self.block_log.write(block_record)
     
     def send_alert(self, ip: str, flow_data: Dict, prediction: Dict):
         """
@@ -312,30 +1108,41 @@ class FirewallBlocker:
         # self.send_email(alert)
         # self.send_slack(alert)
     
-    def cleanup_expired_blocks(self):
-        """Remove blocks ouder dan block_duration"""
-        cutoff_time = datetime.now() - timedelta(hours=self.block_duration_hours)
-        
-        for record in self.block_history:
-            block_time = datetime.fromisoformat(record['timestamp'])
-            
-            if block_time < cutoff_time:
-                ip = record['ip']
-                if ip in self.blocked_ips:
-                    self.unblock_ip(ip)
-                    self.logger.info(f"Expired block removed: {ip}")
+    def cleanup_expired_blocks(self) -> List[str]:
+        """Remove blocks waarvan de expiry verstreken is (zonder de expiry thread)"""
+        return self.expire_blocks([record['ip'] for record in self.store.expired_blocks()])
     
     def get_blocked_ips(self) -> List[str]:
         """Get list of currently blocked IPs"""
+        self.refresh()
         return list(self.blocked_ips)
     
+    def get_block_records(self) -> List[Dict]:
+        """Actieve blocks met reason, method, blocked_at en expires_at"""
+        self.refresh()
+        return list(self.blocks.values())
+    
+    @synchronized
     def get_stats(self) -> Dict:
         """Get blocking statistics"""
+        self.refresh()
+        aggregates = [ip for ip in self.blocks if self.members_of(ip)]
+        aggregated = sum(1 for r in self.blocks.values() if r.get('aggregate'))
         return {
             'total_blocked': len(self.blocked_ips),
+            'kernel_rules': len(self.blocks) - aggregated,
+            'aggregation': {
+                **self.aggregation.get_config(),
+                'aggregates': len(aggregates),
+                'aggregated_members': aggregated,
+                'rules_saved': aggregated - len(aggregates)
+            },
             'auto_block_enabled': self.auto_block_enabled,
             'block_threshold': self.block_threshold,
             'whitelist_size': len(self.whitelist),
+            'backend': self.backend_name,
+            'batching': self.batcher.get_stats() if self.batcher else None,
+            'expiry': self.expiry.get_stats(),
             'total_blocks_history': len(self.block_history)
         }
 
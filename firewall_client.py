@@ -0,0 +1,462 @@
+"""
+AI-Firewall API Client
+Python client voor de scoring endpoints; bulk flows gaan columnar (Arrow IPC
+of msgpack) naar /predict/raw/batch, met JSON als fallback. Async varianten
+voor sensors: AsyncAIFirewallClient (connection pool, micro-batching,
+retries) en IngestClient (persistente /ingest WebSocket).
+"""
+
+import asyncio
+import collections
+import email.utils
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import requests
+
+import wire_format
+
+FORMATS = {
+    'arrow': wire_format.ARROW,
+    'msgpack': wire_format.MSGPACK,
+    'json': wire_format.NDJSON,
+}
+
+# Statuscodes waarop een request later opnieuw mag (admission control, proxy/restart)
+RETRY_STATUS = (429, 502, 503, 504)
+
+
+def encode_flows(flows: Union[pd.DataFrame, List[Dict]], fmt: str) -> bytes:
+    """Flows als /predict/raw/batch body in wire format fmt ('arrow', 'msgpack' of 'json')"""
+    if fmt == 'json':
+        if isinstance(flows, pd.DataFrame):
+            flows = flows.to_dict(orient='records')
+        return ''.join(json.dumps(flow) + '\n' for flow in flows).encode('utf-8')
+
+    df = flows if isinstance(flows, pd.DataFrame) else pd.DataFrame(flows)
+    return wire_format.encode_frame(df, FORMATS[fmt])
+
+
+def decode_verdicts(body: bytes, content_type: str) -> pd.DataFrame:
+    """/predict/raw/batch response naar een DataFrame met één verdict per flow"""
+    fmt = wire_format.media_type(content_type)
+    if fmt in wire_format.BINARY_FORMATS:
+        verdicts = wire_format.decode_response(body, fmt)
+        error = verdicts.attrs.get(wire_format.SUMMARY_KEY, {}).get('error')
+        if error:
+            raise RuntimeError(f"Batch scoring failed: {error}")
+        return verdicts
+
+    verdicts = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if 'summary' in record:
+            if record['summary'].get('error'):
+                raise RuntimeError(f"Batch scoring failed: {record['summary']['error']}")
+            continue
+        verdicts.append(record)
+    return pd.DataFrame(verdicts)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (seconden of HTTP datum) naar seconden"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AIFirewallClient:
+    """
+    Client voor de AI-Firewall API
+
+    Bulk scoring onderhandelt het wire format via Content-Type/Accept: met
+    'arrow' of 'msgpack' worden kolommen direct verstuurd en komt het antwoord
+    columnar terug als DataFrame.
+    """
+
+    def __init__(self, base_url: str = 'http://localhost:8000', wire_format: str = 'arrow',
+                 timeout: float = 30.0, session: Optional[requests.Session] = None,
+                 sensor_token: Optional[str] = None):
+        """
+        Args:
+            base_url: API URL
+            wire_format: 'arrow', 'msgpack' of 'json'
+            timeout: Request timeout in seconden
+            session: Bestaande requests.Session (connection pooling)
+            sensor_token: X-Sensor-Token voor de ruimere sensor limieten van
+                admission control (default: $AI_FIREWALL_SENSOR_TOKEN)
+        """
+        if wire_format not in FORMATS:
+            raise ValueError(f"Unknown wire format: {wire_format} (choose from {', '.join(FORMATS)})")
+
+        self.base_url = base_url.rstrip('/')
+        self.wire_format = wire_format
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+        sensor_token = sensor_token or os.getenv('AI_FIREWALL_SENSOR_TOKEN')
+        if sensor_token:
+            self.session.headers['X-Sensor-Token'] = sensor_token
+
+    def predict(self, flow: Dict) -> Dict:
+        """Eén raw flow via /predict/raw"""
+        response = self.session.post(f"{self.base_url}/predict/raw", json=flow, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def encode(self, flows: Union[pd.DataFrame, List[Dict]]) -> bytes:
+        """Request body in het geconfigureerde wire format"""
+        return encode_flows(flows, self.wire_format)
+
+    def decode(self, body: bytes, content_type: str) -> pd.DataFrame:
+        """Response body naar een DataFrame met één verdict per flow"""
+        return decode_verdicts(body, content_type)
+
+    def predict_batch(self, flows: Union[pd.DataFrame, List[Dict]],
+                      chunk_size: Optional[int] = None) -> pd.DataFrame:
+        """
+        Scoor een batch raw flows via /predict/raw/batch
+
+        Args:
+            flows: DataFrame of list van flow dicts (features + src_ip/dst_ip/attack_type)
+            chunk_size: Flows per model call op de server (default: server config)
+
+        Returns:
+            DataFrame met verdicts (prediction, ensemble_score, ...), zelfde volgorde
+        """
+        content_type = FORMATS[self.wire_format]
+        response = self.session.post(
+            f"{self.base_url}/predict/raw/batch",
+            data=self.encode(flows),
+            params={'chunk_size': chunk_size} if chunk_size else None,
+            headers={'Content-Type': content_type, 'Accept': content_type},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return self.decode(response.content, response.headers.get('content-type', ''))
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncAIFirewallClient:
+    """
+    Async client met connection pool en automatische micro-batching
+
+    predict() geeft per flow een verdict, maar flows die binnen max_delay
+    (of tot max_batch) samen binnenkomen gaan als één request naar
+    /predict/raw/batch over keep-alive verbindingen. Bij 429/502/503/504 en
+    netwerkfouten volgt een retry: na Retry-After als de server die stuurt,
+    anders exponentiële backoff met jitter. get_stats() geeft de latency
+    zoals de client die ziet. Vereist het httpx package.
+
+        async with AsyncAIFirewallClient('http://localhost:8000') as client:
+            verdict = await client.predict(flow)
+    """
+
+    def __init__(self, base_url: str = 'http://localhost:8000', wire_format: str = 'json',
+                 timeout: float = 30.0, max_connections: int = 10, max_batch: int = 500,
+                 max_delay: float = 0.005, max_retries: int = 5, backoff: float = 0.1,
+                 max_backoff: float = 10.0, sensor_token: Optional[str] = None,
+                 client=None):
+        """
+        Args:
+            base_url: API URL
+            wire_format: 'json' (NDJSON, flows mogen verschillende features hebben),
+                         'arrow' of 'msgpack'
+            timeout: Request timeout in seconden
+            max_connections: Grootte van de connection pool (= max gelijktijdige batches)
+            max_batch: Max flows per micro-batch
+            max_delay: Seconden dat een flow wacht op meer flows voor dezelfde batch
+            max_retries: Retries per request (daarna faalt predict())
+            backoff: Start backoff in seconden (verdubbelt per poging, met jitter)
+            max_backoff: Max backoff in seconden
+            sensor_token: X-Sensor-Token (default: $AI_FIREWALL_SENSOR_TOKEN)
+            client: Bestaande httpx.AsyncClient (bijv. voor tests)
+        """
+        if wire_format not in FORMATS:
+            raise ValueError(f"Unknown wire format: {wire_format} (choose from {', '.join(FORMATS)})")
+
+        self.base_url = base_url.rstrip('/')
+        self.wire_format = wire_format
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        headers = {}
+        sensor_token = sensor_token or os.getenv('AI_FIREWALL_SENSOR_TOKEN')
+        if sensor_token:
+            headers['X-Sensor-Token'] = sensor_token
+
+        if client is None:
+            import httpx
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=timeout,
+                headers=headers,
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections)
+            )
+        else:
+            client.headers.update(headers)
+        self.client = client
+        self._slots = asyncio.Semaphore(max_connections)
+
+        # (flow, future, t_submit) die nog op een batch wachten
+        self._pending: List = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches = set()
+
+        self.latencies = collections.deque(maxlen=10000)
+        self.stats = {'requests': 0, 'batches': 0, 'flows': 0, 'retries': 0,
+                      'rate_limited': 0, 'errors': 0}
+
+    # === Requests met retry ===
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: clients die tegelijk falen komen niet tegelijk terug
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def request(self, method: str, path: str, **kwargs):
+        """
+        HTTP request met retries op RETRY_STATUS en netwerkfouten
+
+        Returns:
+            httpx.Response (status < 400)
+        """
+        import httpx
+
+        attempt = 0
+        while True:
+            self.stats['requests'] += 1
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code == 429:
+                    self.stats['rate_limited'] += 1
+                if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                retry_after = retry_after_seconds(response.headers.get('retry-after'))
+                # Retry-After is een minimum; jitter erbovenop spreidt de retries
+                delay = (retry_after + self._backoff(0)) if retry_after is not None else self._backoff(attempt)
+
+            self.stats['retries'] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def health(self) -> Dict:
+        response = await self.request('GET', '/health')
+        return response.json()
+
+    async def predict_batch(self, flows: Union[pd.DataFrame, List[Dict]],
+                            chunk_size: Optional[int] = None) -> pd.DataFrame:
+        """
+        Scoor een batch raw flows via /predict/raw/batch (zonder micro-batching)
+
+        Returns:
+            DataFrame met verdicts, zelfde volgorde als flows
+        """
+        content_type = FORMATS[self.wire_format]
+        async with self._slots:
+            response = await self.request(
+                'POST', '/predict/raw/batch',
+                content=encode_flows(flows, self.wire_format),
+                params={'chunk_size': chunk_size} if chunk_size else None,
+                headers={'Content-Type': content_type, 'Accept': content_type}
+            )
+        return decode_verdicts(response.content, response.headers.get('content-type', ''))
+
+    # === Micro-batching ===
+
+    async def predict(self, flow: Dict) -> Dict:
+        """
+        Verdict voor één raw flow (features + src_ip/dst_ip/attack_type)
+
+        De flow gaat samen met andere gelijktijdige predict() calls in één batch.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((flow, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self):
+        """Verstuur de wachtende flows nu als batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        items, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._send_batch(items))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _send_batch(self, items: List):
+        try:
+            verdicts = await self.predict_batch([flow for flow, _, _ in items])
+            if len(verdicts) != len(items):
+                raise RuntimeError(f"Expected {len(items)} verdicts, got {len(verdicts)}")
+        except Exception as e:
+            self.stats['errors'] += 1
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        self.stats['batches'] += 1
+        self.stats['flows'] += len(items)
+        for (_, future, submitted), verdict in zip(items, verdicts.to_dict(orient='records')):
+            self.latencies.append(now - submitted)
+            if not future.done():
+                future.set_result(verdict)
+
+    def get_stats(self) -> Dict:
+        """Client-side statistieken: latency per flow (submit → verdict), batches en retries"""
+        latencies = np.array(self.latencies) * 1000
+        stats = {
+            **self.stats,
+            'avg_batch_size': round(self.stats['flows'] / self.stats['batches'], 1) if self.stats['batches'] else 0.0,
+            'pending': len(self._pending),
+        }
+        if len(latencies):
+            stats.update({
+                'latency_p50_ms': round(float(np.percentile(latencies, 50)), 2),
+                'latency_p95_ms': round(float(np.percentile(latencies, 95)), 2),
+                'latency_p99_ms': round(float(np.percentile(latencies, 99)), 2),
+                'latency_max_ms': round(float(latencies.max()), 2),
+            })
+        return stats
+
+    async def close(self):
+        """Verstuur wat nog wacht, wacht op open batches en sluit de pool"""
+        self.flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class IngestClient:
+    """
+    Async client voor /ingest: één persistente WebSocket per sensor
+
+    score() wacht op een credit, stuurt de batch met een eigen seq en geeft
+    de verdicts terug zodra de server ze stuurt; meerdere score() calls
+    kunnen tegelijk openstaan (pipelining), antwoorden mogen in andere
+    volgorde binnenkomen. Vereist het websockets package.
+
+        async with IngestClient('ws://localhost:8000/ingest') as client:
+            verdicts = await client.score(flows)
+    """
+
+    def __init__(self, url: str = 'ws://localhost:8000/ingest', sensor_token: Optional[str] = None):
+        """
+        Args:
+            url: WebSocket URL van /ingest
+            sensor_token: X-Sensor-Token (default: $AI_FIREWALL_SENSOR_TOKEN)
+        """
+        self.url = url
+        self.sensor_token = sensor_token or os.getenv('AI_FIREWALL_SENSOR_TOKEN')
+        self.max_batch = 0
+        self.credits = 0
+        self._socket = None
+        self._reader = None
+        self._credits = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._seq = 0
+
+    async def connect(self):
+        import websockets
+
+        headers = {'X-Sensor-Token': self.sensor_token} if self.sensor_token else {}
+        try:
+            from websockets.asyncio.client import connect  # websockets >= 13
+            self._socket = await connect(self.url, additional_headers=headers, max_size=None)
+        except ImportError:
+            self._socket = await websockets.connect(self.url, extra_headers=headers, max_size=None)
+
+        hello = json.loads(await self._socket.recv())
+        self.max_batch = hello['max_batch']
+        self.credits = hello['credits']
+        self._credits = asyncio.Semaphore(self.credits)
+        self._reader = asyncio.create_task(self._read())
+        return self
+
+    async def _read(self):
+        error = ConnectionError("Ingest connection closed")
+        try:
+            async for data in self._socket:
+                frame = json.loads(data)
+                future = self._pending.pop(frame['seq'], None)
+                for _ in range(frame.get('credits', 0)):
+                    self._credits.release()
+                if future is None or future.done():
+                    continue
+                if frame['type'] == 'verdicts':
+                    future.set_result(frame['verdicts'])
+                else:
+                    future.set_exception(RuntimeError(f"Ingest batch failed: {frame.get('detail')}"))
+        except Exception as e:
+            error = ConnectionError(f"Ingest connection closed: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            # Wachtende score() calls wakker maken (die geven de credit door)
+            self._credits.release()
+
+    async def score(self, flows: List[Dict]) -> List[Dict]:
+        """Scoor één batch (max max_batch flows); verdicts in dezelfde volgorde"""
+        await self._credits.acquire()
+        if self._reader.done():
+            self._credits.release()
+            raise ConnectionError("Ingest connection closed")
+        self._seq += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._seq] = future
+        await self._socket.send(json.dumps({'type': 'batch', 'seq': self._seq, 'flows': flows}))
+        return await future
+
+    async def close(self):
+        if self._socket is not None:
+            await self._socket.close()
+        if self._reader is not None:
+            await self._reader
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
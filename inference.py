@@ -5,14 +5,17 @@ Realtime classificatie van netwerkflows met ensemble scoring.
 
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
+from datetime import datetime
 import json
 import warnings
 warnings.filterwarnings('ignore')
 
 from utils import Config, Logger, load_model, PredictionLogger
 from feature_extraction import FeatureExtractor
+import metrics
+from metrics import timed
 
 
 class AIFirewallInference:
@@ -88,8 +91,23 @@ class AIFirewallInference:
         self.if_model, if_metadata = load_model(str(if_model_path))
         self.logger.info("  ✓ Isolation Forest model geladen")
         
+        # Versie voor /metrics: zelfde timestamp formaat als de model bestanden van train_model
+        self.model_version = datetime.fromtimestamp(xgb_model_path.stat().st_mtime).strftime('%Y%m%d_%H%M%S')
+        
         self.logger.info("Alle modellen succesvol geladen!")
     
+    def set_threads(self, n_threads: int):
+        """
+        Aantal threads per model call (XGBoost nthread).
+        
+        Args:
+            n_threads: Threads per predict; bij meerdere gelijktijdige calls
+                       (API inference pool) klein houden om CPU's niet te overboeken
+        """
+        if hasattr(self.xgb_model, 'set_params'):
+            self.xgb_model.set_params(n_jobs=n_threads)
+        self.logger.info(f"Model threads per call: {n_threads}")
+    
     def preprocess_flow(self, flow_data: Dict[str, Any]) -> pd.DataFrame:
         """
         Preprocesst single flow voor inference.
@@ -110,48 +128,63 @@ class AIFirewallInference:
     
     def predict_single_flow(self, 
                           flow_data: Dict[str, Any],
-                          return_details: bool = True) -> Dict[str, Any]:
+                          return_details: bool = True,
+                          use_isolation_forest: bool = True) -> Dict[str, Any]:
         """
         Classificeert een enkele netwerkflow.
         
         Args:
             flow_data: Dictionary met flow features
             return_details: Of gedetailleerde scores teruggegeven moeten worden
+            use_isolation_forest: False = alleen XGBoost (degraded mode bij overbelasting)
             
         Returns:
             Dictionary met classificatie en scores
         """
         # Preprocess flow
-        df = self.preprocess_flow(flow_data)
+        with timed('transform'):
+            df = self.preprocess_flow(flow_data)
         
         # XGBoost prediction
-        xgb_proba = self.xgb_model.predict_proba(df)[0, 1]
-        
-        # Isolation Forest prediction
-        if_score = self.if_model.score_samples(df)[0]
-        # Normaliseer (simpele normalisatie, in productie zou je min/max van training set gebruiken)
-        # Voor nu: score < -0.5 is verdacht
-        if_score_norm = 1.0 if if_score < -0.5 else 0.0
-        if if_score >= -0.5 and if_score < 0:
-            if_score_norm = (-if_score) / 0.5  # Scale [-0.5, 0] naar [0, 1]
-        
-        # Ensemble score
-        ensemble_score = (self.xgb_weight * xgb_proba) + (self.if_weight * if_score_norm)
+        with timed('xgboost'):
+            xgb_proba = self.xgb_model.predict_proba(df)[0, 1]
+        
+        if use_isolation_forest:
+            # Isolation Forest prediction
+            with timed('isolation_forest'):
+                if_score = self.if_model.score_samples(df)[0]
+            # Normaliseer (simpele normalisatie, in productie zou je min/max van training set gebruiken)
+            # Voor nu: score < -0.5 is verdacht
+            if_score_norm = 1.0 if if_score < -0.5 else 0.0
+            if if_score >= -0.5 and if_score < 0:
+                if_score_norm = (-if_score) / 0.5  # Scale [-0.5, 0] naar [0, 1]
+            
+            # Ensemble score
+            ensemble_score = (self.xgb_weight * xgb_proba) + (self.if_weight * if_score_norm)
+        else:
+            # Zonder IF telt alleen XGBoost (gewichten hernormaliseerd)
+            if_score = None
+            if_score_norm = 0.0
+            ensemble_score = xgb_proba
         
         # Classificatie
         prediction = 'malicious' if ensemble_score >= self.threshold else 'benign'
         is_alert = ensemble_score >= self.alert_threshold
+        metrics.inc('predictions_total', prediction)
+        if is_alert:
+            metrics.inc('alerts_total')
         
         # Log prediction
         if self.pred_logger:
-            self.pred_logger.log_prediction(
-                flow_data=flow_data,
-                prediction=prediction,
-                score=ensemble_score,
-                xgb_score=xgb_proba,
-                if_score=if_score_norm,
-                is_alert=is_alert
-            )
+            with timed('prediction_log'):
+                self.pred_logger.log_prediction(
+                    flow_data=flow_data,
+                    prediction=prediction,
+                    score=ensemble_score,
+                    xgb_score=xgb_proba,
+                    if_score=if_score_norm,
+                    is_alert=is_alert
+                )
         
         # Resultaat
         result = {
@@ -167,7 +200,7 @@ class AIFirewallInference:
             result['details'] = {
                 'xgboost_score': float(xgb_proba),
                 'isolation_forest_score': float(if_score_norm),
-                'raw_if_score': float(if_score),
+                'raw_if_score': float(if_score) if if_score is not None else None,
                 'threshold': self.threshold,
                 'alert_threshold': self.alert_threshold
             }
@@ -196,6 +229,141 @@ class AIFirewallInference:
         
         return results
     
+    @staticmethod
+    def normalize_if_scores(scores: np.ndarray) -> np.ndarray:
+        """
+        Normaliseert Isolation Forest scores naar [0, 1] (vectorized).
+        
+        Zelfde schaal als predict_single_flow: < -0.5 = 1, [-0.5, 0] lineair, >= 0 = 0.
+        """
+        return np.clip(-np.asarray(scores, dtype=float) / 0.5, 0.0, 1.0)
+    
+    def score_frame(self, 
+                   df: pd.DataFrame,
+                   use_isolation_forest: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Ensemble scores voor alle rijen van een DataFrame in één model call.
+        
+        Args:
+            df: Ruwe flow features (één rij per flow)
+            use_isolation_forest: False = alleen XGBoost (degraded mode)
+            
+        Returns:
+            Dictionary met arrays xgb_score, if_score en ensemble_score
+        """
+        with timed('transform'):
+            df_transformed = self.feature_extractor.transform(df)
+        with timed('xgboost'):
+            xgb_proba = self.xgb_model.predict_proba(df_transformed)[:, 1]
+        
+        with timed('ensemble'):
+            if use_isolation_forest:
+                with timed('isolation_forest'):
+                    if_raw = self.if_model.score_samples(df_transformed)
+                if_scores_norm = self.normalize_if_scores(if_raw)
+                ensemble_scores = (self.xgb_weight * xgb_proba) + (self.if_weight * if_scores_norm)
+            else:
+                if_scores_norm = np.zeros_like(xgb_proba)
+                ensemble_scores = xgb_proba
+        
+        malicious = int(np.count_nonzero(ensemble_scores >= self.threshold))
+        metrics.inc('predictions_total', 'malicious', malicious)
+        metrics.inc('predictions_total', 'benign', len(ensemble_scores) - malicious)
+        metrics.inc('alerts_total', amount=int(np.count_nonzero(ensemble_scores >= self.alert_threshold)))
+        
+        return {
+            'xgb_score': xgb_proba,
+            'if_score': if_scores_norm,
+            'ensemble_score': ensemble_scores
+        }
+    
+    def predict_flows(self, 
+                     flows: List[Dict[str, Any]],
+                     use_isolation_forest: bool = True) -> List[Dict[str, Any]]:
+        """
+        Classificeert een chunk flows met één vectorized model call.
+        
+        Zelfde velden als predict_single_flow (zonder details). Predictions
+        worden niet naar de prediction log geschreven, net als bij
+        predict_from_csv.
+        
+        Args:
+            flows: List van flow dictionaries
+            use_isolation_forest: False = alleen XGBoost (degraded mode)
+            
+        Returns:
+            List van prediction dictionaries (zelfde volgorde als flows)
+        """
+        if not flows:
+            return []
+        
+        scores = self.score_frame(pd.DataFrame(flows), use_isolation_forest)
+        ensemble_scores = scores['ensemble_score']
+        
+        return [
+            {
+                'prediction': 'malicious' if ensemble_scores[i] >= self.threshold else 'benign',
+                'ensemble_score': float(ensemble_scores[i]),
+                'is_alert': bool(ensemble_scores[i] >= self.alert_threshold),
+                'confidence': float(abs(ensemble_scores[i] - 0.5) * 2),
+                'xgb_score': float(scores['xgb_score'][i]),
+                'if_score': float(scores['if_score'][i])
+            }
+            for i in range(len(flows))
+        ]
+    
+    def predict_columns(self, 
+                       df: pd.DataFrame,
+                       use_isolation_forest: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Columnar variant van predict_flows: verdicts als arrays, geen dict per flow.
+        
+        Args:
+            df: Ruwe flow features (één rij per flow, zonder metadata kolommen)
+            use_isolation_forest: False = alleen XGBoost (degraded mode)
+            
+        Returns:
+            Dictionary met arrays prediction, ensemble_score, is_alert,
+            confidence, xgb_score en if_score
+        """
+        scores = self.score_frame(df, use_isolation_forest)
+        ensemble_scores = scores['ensemble_score']
+        
+        return {
+            'prediction': np.where(ensemble_scores >= self.threshold, 'malicious', 'benign'),
+            'ensemble_score': ensemble_scores.astype(float),
+            'is_alert': ensemble_scores >= self.alert_threshold,
+            'confidence': np.abs(ensemble_scores - 0.5) * 2,
+            'xgb_score': scores['xgb_score'].astype(float),
+            'if_score': scores['if_score'].astype(float)
+        }
+    
+    def annotate_frame(self, 
+                      df: pd.DataFrame,
+                      use_isolation_forest: bool = True) -> pd.DataFrame:
+        """
+        Voegt score en prediction kolommen toe aan een DataFrame met flows.
+        
+        Args:
+            df: Ruwe flow features (kolomnamen al gestript)
+            use_isolation_forest: False = alleen XGBoost (degraded mode)
+            
+        Returns:
+            Kopie van df met XGBoost_Score, IF_Score, Ensemble_Score,
+            Prediction (0/1) en Prediction_Label
+        """
+        annotated = df.copy()
+        scores = self.score_frame(df, use_isolation_forest)
+        predictions = (scores['ensemble_score'] >= self.threshold).astype(int)
+        
+        annotated['XGBoost_Score'] = scores['xgb_score']
+        annotated['IF_Score'] = scores['if_score']
+        annotated['Ensemble_Score'] = scores['ensemble_score']
+        annotated['Prediction'] = predictions
+        annotated['Prediction_Label'] = np.where(predictions == 1, 'malicious', 'benign')
+        
+        return annotated
+    
     def predict_from_csv(self, 
                         csv_path: str,
                         output_path: Optional[str] = None) -> pd.DataFrame:
@@ -215,37 +383,12 @@ class AIFirewallInference:
         df = pd.read_csv(csv_path)
         # Normaliseer kolomnamen (verwijder leading/trailing spaties)
         df.columns = df.columns.str.strip()
-        original_df = df.copy()
         
         self.logger.info(f"  → {len(df)} flows geladen")
         
-        # Preprocess (zonder labels)
-        df_transformed = self.feature_extractor.transform(df)
-        
-        # Predictions
-        xgb_proba = self.xgb_model.predict_proba(df_transformed)[:, 1]
-        if_scores = self.if_model.score_samples(df_transformed)
-        
-        # Normaliseer IF scores (simpel)
-        if_scores_norm = np.zeros_like(if_scores)
-        for i, score in enumerate(if_scores):
-            if score < -0.5:
-                if_scores_norm[i] = 1.0
-            elif score >= -0.5 and score < 0:
-                if_scores_norm[i] = (-score) / 0.5
-            else:
-                if_scores_norm[i] = 0.0
-        
-        # Ensemble
-        ensemble_scores = (self.xgb_weight * xgb_proba) + (self.if_weight * if_scores_norm)
-        predictions = (ensemble_scores >= self.threshold).astype(int)
-        
-        # Voeg toe aan originele DataFrame
-        original_df['XGBoost_Score'] = xgb_proba
-        original_df['IF_Score'] = if_scores_norm
-        original_df['Ensemble_Score'] = ensemble_scores
-        original_df['Prediction'] = predictions
-        original_df['Prediction_Label'] = original_df['Prediction'].map({0: 'benign', 1: 'malicious'})
+        # Preprocess (zonder labels) + vectorized ensemble scores
+        original_df = self.annotate_frame(df)
+        predictions = original_df['Prediction'].to_numpy()
         
         # Save als gevraagd
         if output_path:
@@ -263,6 +406,44 @@ class AIFirewallInference:
         return original_df
 
 
+def load_models(models_dir: Optional[str] = None,
+                config: Optional[Config] = None) -> AIFirewallInference:
+    """
+    Laadt de inference engine (gebruikt door realtime_firewall).
+    
+    Args:
+        models_dir: Directory met getrainde modellen
+        config: Config object (optioneel)
+        
+    Returns:
+        Geladen AIFirewallInference
+    """
+    return AIFirewallInference(models_dir=models_dir, config=config)
+
+
+def predict_flow(flow_data: Dict[str, Any],
+                 models: AIFirewallInference,
+                 use_isolation_forest: bool = True) -> Dict[str, Any]:
+    """
+    Classificeert een flow met een geladen inference engine.
+    
+    Args:
+        flow_data: Dictionary met flow features
+        models: Inference engine van load_models()
+        use_isolation_forest: False = alleen XGBoost scoren
+        
+    Returns:
+        Prediction dictionary met 'prediction' als 'BENIGN' / 'MALICIOUS'
+    """
+    result = models.predict_single_flow(
+        flow_data,
+        return_details=False,
+        use_isolation_forest=use_isolation_forest
+    )
+    result['prediction'] = result['prediction'].upper()
+    return result
+
+
 def create_example_flow() -> Dict[str, Any]:
     """
     Creëert een voorbeeld netwerkflow voor testing met ALLE vereiste CICIDS2017 features.
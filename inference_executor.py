@@ -0,0 +1,221 @@
+"""
+Inference Executor
+Draait CPU-bound model calls buiten de asyncio event loop: een thread pool
+van vaste grootte (XGBoost nthread daarop afgestemd), concurrency limits per
+endpoint en een optionele process pool voor lange jobs. Meet daarnaast de event
+loop lag, zodat zichtbaar is of de loop nog ergens geblokkeerd wordt.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import metrics
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+
+def _call(started: Callable, fn: Callable, args: tuple):
+    started()
+    return fn(*args)
+
+
+class LoopLagMonitor:
+    """
+    Event loop lag: hoe veel later een sleep(interval) wakker wordt dan
+    gepland. Een geblokkeerde loop (sync model call, grote json.dumps) is
+    direct zichtbaar als lag.
+    """
+
+    def __init__(self, interval: float = 0.5, smoothing: float = 0.2):
+        """
+        Args:
+            interval: Seconden tussen metingen
+            smoothing: EWMA factor voor lag_ewma
+        """
+        self.interval = interval
+        self.smoothing = smoothing
+        self.lag = 0.0
+        self.lag_ewma = 0.0
+        self.lag_max = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start de meting (aanroepen op de event loop)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def record(self, lag: float):
+        self.lag = lag
+        self.lag_ewma = lag if self.samples == 0 else \
+            self.smoothing * lag + (1 - self.smoothing) * self.lag_ewma
+        self.lag_max = max(self.lag_max, lag)
+        self.samples += 1
+
+    async def _run(self):
+        while True:
+            scheduled = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.monotonic() - scheduled))
+
+    def get_stats(self) -> Dict:
+        return {
+            'lag_ms': round(self.lag * 1000, 2),
+            'lag_ewma_ms': round(self.lag_ewma * 1000, 2),
+            'lag_max_ms': round(self.lag_max * 1000, 2),
+            'samples': self.samples
+        }
+
+
+class InferenceExecutor:
+    """
+    Dedicated executor voor model inference
+
+    - Eén ThreadPoolExecutor met workers threads; XGBoost krijgt
+      model_threads threads per call zodat workers * model_threads de CPU's
+      niet overboekt (XGBoost/numpy geven de GIL vrij tijdens predict)
+    - Per endpoint een limiet op gelijktijdige calls; wachtende requests
+      blokkeren de event loop niet
+    - run_process() voor lange jobs in een aparte process pool
+    """
+
+    def __init__(self, workers: int = 0, model_threads: int = 0,
+                 limits: Optional[Dict[str, int]] = None, process_workers: int = 1):
+        """
+        Args:
+            workers: Threads in de pool (0 = cpu_count / 2, minimaal 1)
+            model_threads: XGBoost nthread per call (0 = cpu_count / workers)
+            limits: Max gelijktijdige calls per endpoint naam (ontbreekt = workers)
+            process_workers: Processen voor run_process
+        """
+        cpus = os.cpu_count() or 1
+        self.workers = workers or max(1, cpus // 2)
+        self.model_threads = model_threads or max(1, cpus // self.workers)
+        self.limits = dict(limits or {})
+        self.process_workers = process_workers
+
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.endpoint_stats: Dict[str, Dict] = {}
+        # Starttijd per wachtende call (voor queue_delay)
+        self._waiting_since: Dict[object, float] = {}
+
+    def _endpoint(self, name: str):
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(self.limits.get(name, self.workers))
+            self.endpoint_stats[name] = {
+                'limit': self.limits.get(name, self.workers),
+                'active': 0, 'waiting': 0, 'completed': 0, 'errors': 0,
+                'busy_seconds': 0.0, 'wait_seconds': 0.0
+            }
+        return self._semaphores[name], self.endpoint_stats[name]
+
+    async def _submit(self, endpoint: str, submit: Callable):
+        semaphore, stats = self._endpoint(endpoint)
+        queued = time.perf_counter()
+        token = object()
+        stats['waiting'] += 1
+        self._waiting_since[token] = queued
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            self._waiting_since.pop(token, None)
+            raise
+        finally:
+            stats['waiting'] -= 1
+
+        acquired = time.perf_counter()
+        stats['wait_seconds'] += acquired - queued
+        stats['active'] += 1
+
+        def started():
+            # Einde van de wachttijd: semaphore én de queue van de pool
+            if self._waiting_since.pop(token, None) is not None:
+                metrics.observe('queue', time.perf_counter() - queued)
+
+        try:
+            return await submit(started)
+        except Exception:
+            stats['errors'] += 1
+            raise
+        finally:
+            self._waiting_since.pop(token, None)
+            stats['active'] -= 1
+            stats['completed'] += 1
+            stats['busy_seconds'] += time.perf_counter() - acquired
+            semaphore.release()
+
+    def queue_delay(self) -> float:
+        """Seconden dat de oudste wachtende call al wacht (0 = geen wachtrij)"""
+        if not self._waiting_since:
+            return 0.0
+        return time.perf_counter() - min(self._waiting_since.values())
+
+    async def run(self, endpoint: str, fn: Callable, *args):
+        """
+        Voer fn(*args) uit in de inference thread pool
+
+        Args:
+            endpoint: Naam voor de concurrency limit en statistieken
+            fn: CPU-bound functie (model call)
+
+        Returns:
+            Resultaat van fn
+        """
+        loop = asyncio.get_running_loop()
+        return await self._submit(
+            endpoint, lambda started: loop.run_in_executor(self._pool, _call, started, fn, args)
+        )
+
+    async def run_process(self, endpoint: str, fn: Callable, *args):
+        """
+        Voer fn(*args) uit in de process pool (fn en args moeten picklable zijn)
+
+        Processen starten via spawn: forken vanuit een proces met draaiende
+        threads (uvicorn, inference pool) is niet veilig.
+        """
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        loop = asyncio.get_running_loop()
+
+        def submit(started):
+            started()
+            return loop.run_in_executor(self._process_pool, fn, *args)
+
+        return await self._submit(endpoint, submit)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    def get_stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'model_threads': self.model_threads,
+            'queue_delay_seconds': round(self.queue_delay(), 3),
+            'endpoints': {
+                name: {**stats, 'busy_seconds': round(stats['busy_seconds'], 3),
+                       'wait_seconds': round(stats['wait_seconds'], 3)}
+                for name, stats in self.endpoint_stats.items()
+            }
+        }
@@ -0,0 +1,137 @@
+"""
+Ingest Channel
+Persistente WebSocket (/ingest) voor sensors: één verbinding waarover flow
+batches met een sequence id binnenkomen en verdicts asynchroon (zodra klaar,
+dus mogelijk in andere volgorde) terugkomen. Credit-based flow control
+begrenst het aantal batches dat een sensor tegelijk open mag hebben.
+
+Protocol (JSON text of binary frames):
+    server → {"type": "hello", "credits": C, "max_batch": B}
+    client → {"type": "batch", "seq": S, "flows": [...]}          (kost 1 credit)
+    server → {"type": "verdicts", "seq": S, "verdicts": [...], "credits": 1}
+    server → {"type": "error", "seq": S, "detail": "...", "credits": 1}
+
+Een batch zonder credit, een dubbele seq of een onleesbaar frame sluit de
+verbinding met 1008 (policy violation).
+"""
+
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import metrics
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+# RFC 6455: policy violation
+CLOSE_POLICY_VIOLATION = 1008
+
+
+class ProtocolError(Exception):
+    """Client houdt zich niet aan het ingest protocol"""
+
+
+class IngestSession:
+    """
+    Eén sensor verbinding op /ingest
+
+    Elke batch wordt in een eigen task gescoord; het aantal open batches is
+    begrensd door de credits, het aantal gelijktijdige model calls door de
+    InferenceExecutor limit van het endpoint. Antwoorden gaan via één send
+    lock zodat frames niet door elkaar lopen.
+    """
+
+    def __init__(self, websocket, score: Callable[[List[Dict]], Awaitable[List[Dict]]],
+                 credits: int = 8, max_batch: int = 1000):
+        """
+        Args:
+            websocket: Starlette WebSocket (al geaccepteerd)
+            score: Async functie flows → verdicts (zelfde volgorde)
+            credits: Max batches tegelijk in behandeling
+            max_batch: Max flows per batch
+        """
+        self.websocket = websocket
+        self.score = score
+        self.credits = credits
+        self.max_batch = max_batch
+
+        self.available = credits
+        self.pending: Dict[int, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+        self.stats = {'batches': 0, 'flows': 0, 'errors': 0}
+
+    async def serve(self):
+        """Verwerk frames tot de client de verbinding sluit"""
+        await self._send({'type': 'hello', 'credits': self.credits, 'max_batch': self.max_batch})
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                try:
+                    self._handle(message.get('text') or message.get('bytes'))
+                except ProtocolError as e:
+                    logger.warning(f"Ingest protocol violation: {e}")
+                    await self.websocket.close(code=CLOSE_POLICY_VIOLATION, reason=str(e)[:120])
+                    break
+        finally:
+            for task in self.pending.values():
+                task.cancel()
+            if self.pending:
+                await asyncio.gather(*self.pending.values(), return_exceptions=True)
+
+    def _handle(self, data):
+        try:
+            frame = json.loads(data)
+        except (TypeError, ValueError):
+            raise ProtocolError("Frame is not valid JSON")
+        if not isinstance(frame, dict) or frame.get('type') != 'batch':
+            raise ProtocolError("Expected a batch frame")
+
+        seq = frame.get('seq')
+        flows = frame.get('flows')
+        if not isinstance(seq, int) or not isinstance(flows, list):
+            raise ProtocolError("Batch needs an integer seq and a list of flows")
+        if seq in self.pending:
+            raise ProtocolError(f"Duplicate seq {seq}")
+        if self.available <= 0:
+            raise ProtocolError("Batch sent without credit")
+
+        self.available -= 1
+        self.pending[seq] = asyncio.get_running_loop().create_task(self._process(seq, flows))
+
+    async def _process(self, seq: int, flows: List):
+        started = time.perf_counter()
+        try:
+            if len(flows) > self.max_batch:
+                raise ValueError(f"Batch of {len(flows)} flows exceeds max_batch {self.max_batch}")
+            if not all(isinstance(flow, dict) for flow in flows):
+                raise ValueError("Flows must be JSON objects")
+            verdicts = await self.score(flows)
+            reply = {'type': 'verdicts', 'seq': seq, 'verdicts': verdicts}
+            self.stats['batches'] += 1
+            self.stats['flows'] += len(flows)
+            metrics.inc('ingest_flows_total', amount=len(flows))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ingest batch {seq} failed: {e}")
+            reply = {'type': 'error', 'seq': seq, 'detail': str(e)}
+            self.stats['errors'] += 1
+
+        metrics.observe('ingest_batch', time.perf_counter() - started)
+        del self.pending[seq]
+        self.available += 1
+        reply['credits'] = 1
+        try:
+            await self._send(reply)
+        except Exception:
+            # Verbinding al weg; serve() ruimt op
+            pass
+
+    async def _send(self, frame: Dict):
+        text = json.dumps(frame)
+        async with self._send_lock:
+            await self.websocket.send_text(text)
@@ -0,0 +1,550 @@
+"""
+Classification Jobs
+Offline classificatie van grote CSV flow exports buiten de HTTP request: een
+job draait in een process pool, schrijft voortgang naar SQLite en het
+resultaat naar disk, zodat status (en het resultaat) een API restart
+overleven.
+
+Elke job heeft een lease van zijn API process (pid + starttijd, verloopt na
+lease_seconds): de eigenaar verlengt hem met een heartbeat en het job process
+bij elke voortgangsupdate. Alleen een job met een verlopen lease wordt door
+een ander process overgenomen; een hergebruikt PID (bijv. pid 1 in een
+container) of een worker op een andere host maakt een job dus niet wees.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from utils import Logger, pid_alive, process_start_id
+
+logger = Logger(__name__).logger
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    result_path TEXT NOT NULL,
+    uploaded INTEGER NOT NULL DEFAULT 0,
+    owner_pid INTEGER,
+    owner_start TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    bytes_total INTEGER NOT NULL DEFAULT 0,
+    bytes_done INTEGER NOT NULL DEFAULT 0,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    malicious_count INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+"""
+
+
+class JobStore:
+    """
+    Job state in SQLite (WAL): de API workers en de job processen lezen en
+    schrijven dezelfde database
+    """
+
+    def __init__(self, db_path: str = "logs/jobs.db"):
+        """
+        Args:
+            db_path: Pad naar SQLite database
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Voeg kolommen toe aan databases van een oudere versie"""
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for name, kind in (('owner_start', 'TEXT'), ('lease_expires', 'REAL')):
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    def create(self, job: Dict):
+        columns = ', '.join(job)
+        with self._lock:
+            self.conn.execute(
+                f"INSERT INTO jobs ({columns}) VALUES ({', '.join('?' * len(job))})",
+                tuple(job.values())
+            )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def unfinished(self) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def update(self, job_id: str, where_status: Optional[tuple] = None, **fields) -> bool:
+        """
+        Update velden van een job
+
+        Args:
+            where_status: Alleen updaten als de job één van deze statussen heeft
+
+        Returns:
+            True als de rij gewijzigd is
+        """
+        sql = f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?"
+        params = list(fields.values()) + [job_id]
+        if where_status:
+            sql += f" AND status IN ({', '.join('?' * len(where_status))})"
+            params += list(where_status)
+        with self._lock:
+            return self.conn.execute(sql, params).rowcount == 1
+
+    def claim(self, job_id: str, old_owner: Optional[int], old_lease: Optional[float],
+              owner: int, owner_start: Optional[str], lease_expires: float) -> bool:
+        """
+        Neem een job over van een (gestopt) API process; atomair
+
+        Faalt als de oude eigenaar de lease intussen verlengd heeft.
+        """
+        with self._lock:
+            return self.conn.execute(
+                "UPDATE jobs SET owner_pid = ?, owner_start = ?, lease_expires = ?, status = ?, "
+                "bytes_done = 0, rows_done = 0, malicious_count = 0, started_at = NULL "
+                "WHERE id = ? AND owner_pid IS ? AND lease_expires IS ?",
+                (owner, owner_start, lease_expires, QUEUED, job_id, old_owner, old_lease)
+            ).rowcount == 1
+
+    def renew(self, owner: int, owner_start: Optional[str], lease_expires: Optional[float]) -> int:
+        """
+        Zet de lease van alle onafgemaakte jobs van een eigenaar
+
+        Args:
+            lease_expires: Nieuwe verloopdatum (0 = direct vrijgeven)
+
+        Returns:
+            Aantal jobs
+        """
+        with self._lock:
+            return self.conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE owner_pid = ? AND owner_start IS ? "
+                "AND status IN (?, ?)",
+                (lease_expires, owner, owner_start, QUEUED, RUNNING)
+            ).rowcount
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def close(self):
+        self.conn.close()
+
+
+def job_status(job: Dict, now: Optional[float] = None) -> Dict:
+    """Job record met voortgang, rows/s en ETA voor GET /jobs/{id}"""
+    now = now or time.time()
+    progress = job['bytes_done'] / job['bytes_total'] if job['bytes_total'] else 0.0
+    if job['status'] == COMPLETED:
+        progress = 1.0
+
+    rows_per_second = 0.0
+    eta_seconds = None
+    if job['started_at']:
+        elapsed = (job['finished_at'] or now) - job['started_at']
+        if elapsed > 0:
+            rows_per_second = job['rows_done'] / elapsed
+            if job['status'] == RUNNING and 0 < progress < 1:
+                eta_seconds = round(elapsed * (1 - progress) / progress, 1)
+
+    def iso(ts):
+        return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'source': job['source'],
+        'created_at': iso(job['created_at']),
+        'started_at': iso(job['started_at']),
+        'finished_at': iso(job['finished_at']),
+        'progress': round(progress, 4),
+        'rows_done': job['rows_done'],
+        'malicious_count': job['malicious_count'],
+        'bytes_done': job['bytes_done'],
+        'bytes_total': job['bytes_total'],
+        'rows_per_second': round(rows_per_second, 1),
+        'eta_seconds': eta_seconds,
+        'cancel_requested': bool(job['cancel_requested']),
+        'error': job['error']
+    }
+
+
+# === Job process ===
+
+_worker_firewall = None
+
+
+def run_job(db_path: str, job_id: str, chunk_rows: int = 50000, model_threads: int = 1,
+            lease_seconds: float = 60.0) -> str:
+    """
+    Voer één job uit (in een process van de pool)
+
+    Leest de CSV in chunks, annoteert elke chunk en schrijft die achter het
+    .part resultaat; voortgang en cancel checks gaan via de JobStore, elke
+    voortgangsupdate verlengt de lease. Modellen worden één keer per process
+    geladen.
+
+    Returns:
+        Eindstatus
+    """
+    global _worker_firewall
+    import pandas as pd
+
+    store = JobStore(db_path)
+    job = store.get(job_id)
+    if job is None or not store.update(job_id, where_status=(QUEUED,),
+                                       status=RUNNING, started_at=time.time(),
+                                       lease_expires=time.time() + lease_seconds):
+        store.close()
+        return job['status'] if job else FAILED
+
+    part_path = job['result_path'] + '.part'
+    status = COMPLETED
+    try:
+        if _worker_firewall is None:
+            from inference import AIFirewallInference
+            _worker_firewall = AIFirewallInference()
+            _worker_firewall.set_threads(model_threads)
+
+        rows = malicious = 0
+        with open(job['input_path'], 'rb') as source, open(part_path, 'w', newline='') as out:
+            for i, df in enumerate(pd.read_csv(source, chunksize=chunk_rows)):
+                if store.cancel_requested(job_id):
+                    status = CANCELLED
+                    break
+                df.columns = df.columns.str.strip()
+                annotated = _worker_firewall.annotate_frame(df)
+                annotated.to_csv(out, index=False, header=(i == 0))
+                out.flush()
+
+                rows += len(annotated)
+                malicious += int(annotated['Prediction'].sum())
+                store.update(job_id, rows_done=rows, malicious_count=malicious,
+                             bytes_done=source.tell(), lease_expires=time.time() + lease_seconds)
+
+        if status == COMPLETED:
+            os.replace(part_path, job['result_path'])
+            store.update(job_id, status=COMPLETED, finished_at=time.time(),
+                         bytes_done=job['bytes_total'])
+        else:
+            store.update(job_id, status=CANCELLED, finished_at=time.time())
+    except Exception as e:
+        status = FAILED
+        store.update(job_id, status=FAILED, finished_at=time.time(), error=str(e))
+    finally:
+        if status != COMPLETED and os.path.exists(part_path):
+            os.remove(part_path)
+        if job['uploaded'] and os.path.exists(job['input_path']):
+            os.remove(job['input_path'])
+        store.close()
+
+    return status
+
+
+class JobManager:
+    """
+    Plant classificatie jobs in op een process pool
+
+    - max_concurrent processen; extra jobs wachten (status queued)
+    - Cancel via een vlag in de database: een wachtende job wordt direct
+      geannuleerd, een lopende job stopt bij de volgende chunk
+    - recover() bij startup en daarna elke lease_seconds: jobs waarvan de
+      lease verlopen is worden overgenomen en opnieuw gestart
+    - shutdown() stopt lopende job processen en geeft de leases vrij
+    """
+
+    def __init__(self, store: JobStore, jobs_dir: str = "output/jobs", max_concurrent: int = 2,
+                 chunk_rows: int = 50000, model_threads: int = 1,
+                 allowed_dirs: Optional[List[str]] = None, lease_seconds: float = 60.0):
+        """
+        Args:
+            store: JobStore
+            jobs_dir: Directory voor uploads en resultaten
+            max_concurrent: Max gelijktijdige jobs (processen)
+            chunk_rows: Rijen per model call
+            model_threads: XGBoost threads per job process
+            allowed_dirs: Server-side paden die als input mogen (leeg = geen)
+            lease_seconds: Zonder heartbeat of voortgang mag een ander process
+                           de job na zoveel seconden overnemen
+        """
+        self.store = store
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.max_concurrent = max_concurrent
+        self.chunk_rows = chunk_rows
+        self.model_threads = model_threads
+        self.allowed_dirs = [Path(d).resolve() for d in (allowed_dirs or [])]
+        self.lease_seconds = lease_seconds
+        self.pid = os.getpid()
+        self.start_id = process_start_id(self.pid)
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        self._stop = threading.Event()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True,
+                                                  name='job-lease-heartbeat')
+        self._heartbeat_thread.start()
+
+    @classmethod
+    def from_config(cls, config, model_threads: int = 1) -> 'JobManager':
+        return cls(
+            JobStore(config.get('api.jobs.state_db', 'logs/jobs.db')),
+            jobs_dir=config.get('api.jobs.dir', 'output/jobs'),
+            max_concurrent=config.get('api.jobs.max_concurrent', 2),
+            chunk_rows=config.get('api.jobs.chunk_rows', 50000),
+            model_threads=model_threads,
+            allowed_dirs=config.get('api.jobs.allowed_dirs', []),
+            lease_seconds=config.get('api.jobs.lease_seconds', 60.0)
+        )
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: niet forken vanuit een process met draaiende threads
+            self._pool = ProcessPoolExecutor(max_workers=self.max_concurrent,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    # === Input ===
+
+    def new_upload_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.input.csv"
+
+    def resolve_path(self, path: str) -> Path:
+        """
+        Valideer een server-side input pad
+
+        Raises:
+            PermissionError: Pad buiten api.jobs.allowed_dirs
+            FileNotFoundError: Bestand bestaat niet
+            ValueError: Geen CSV (pcap moet eerst naar flows, bijv. CICFlowMeter)
+        """
+        resolved = Path(path).resolve()
+        if not any(resolved.is_relative_to(allowed) for allowed in self.allowed_dirs):
+            raise PermissionError(f"Path not in allowed job directories: {path}")
+        if not resolved.is_file():
+            raise FileNotFoundError(f"Input file not found: {path}")
+        check_input_name(resolved.name)
+        return resolved
+
+    # === Jobs ===
+
+    def create(self, input_path: Path, source: str, uploaded: bool, job_id: Optional[str] = None) -> Dict:
+        """Registreer en start een job"""
+        job_id = job_id or uuid.uuid4().hex
+        self.store.create({
+            'id': job_id,
+            'status': QUEUED,
+            'source': source,
+            'input_path': str(input_path),
+            'result_path': str(self.jobs_dir / f"{job_id}.result.csv"),
+            'uploaded': int(uploaded),
+            'owner_pid': self.pid,
+            'owner_start': self.start_id,
+            'lease_expires': time.time() + self.lease_seconds,
+            'created_at': time.time(),
+            'bytes_total': input_path.stat().st_size
+        })
+        self._submit(job_id)
+        return self.status(job_id)
+
+    def _submit(self, job_id: str):
+        future = self._executor().submit(
+            run_job, self.store.db_path, job_id, self.chunk_rows, self.model_threads,
+            self.lease_seconds
+        )
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+
+    def _on_done(self, job_id: str, future: Future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        if future.cancelled() or self._closing:
+            # Bij shutdown: job blijft staan voor het volgende process
+            return
+        error = future.exception()
+        if error is not None:
+            # Process gecrasht (BrokenProcessPool) voordat de job zelf iets kon schrijven
+            logger.error(f"Job {job_id} crashed: {error}")
+            self.store.update(job_id, where_status=(QUEUED, RUNNING),
+                              status=FAILED, finished_at=time.time(), error=str(error))
+        else:
+            logger.info(f"Job {job_id} {future.result()}")
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        return job_status(job) if job else None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.store.get(job_id)
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        return [job_status(job) for job in self.store.list(limit)]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Annuleer een job
+
+        Returns:
+            Nieuwe status, of None als de job niet bestaat
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] in FINISHED:
+            return job_status(job)
+
+        self.store.update(job_id, cancel_requested=1)
+        with self._lock:
+            future = self._futures.get(job_id)
+        # Nog niet gestart: direct annuleren (anders stopt run_job bij de volgende chunk)
+        if (future.cancel() if future is not None else job['status'] == QUEUED):
+            if self.store.update(job_id, where_status=(QUEUED,),
+                                 status=CANCELLED, finished_at=time.time()):
+                if job['uploaded'] and os.path.exists(job['input_path']):
+                    os.remove(job['input_path'])
+        return self.status(job_id)
+
+    def _heartbeat(self):
+        """
+        Verleng de leases van eigen jobs (ook wachtende, die geen voortgang
+        schrijven) en neem elke lease_seconds verlopen jobs over: een worker
+        die crasht terwijl deze al draait wordt anders nooit opgeruimd
+        """
+        ticks = 0
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.store.renew(self.pid, self.start_id, time.time() + self.lease_seconds)
+            except sqlite3.Error as e:
+                logger.warning(f"Job lease heartbeat failed: {e}")
+            ticks += 1
+            if ticks % 3 == 0 and not self._closing:
+                try:
+                    self.recover()
+                except Exception as e:
+                    logger.error(f"Job recovery failed: {e}")
+
+    def _orphaned(self, job: Dict, now: float) -> bool:
+        """Mag deze job overgenomen worden?"""
+        owner, start = job['owner_pid'], job['owner_start']
+        if owner == self.pid and start == self.start_id:
+            return False
+        if (job['lease_expires'] or 0) > now:
+            return False
+        # Lease verlopen: een owner die op deze host nog draait (zelfde pid en
+        # starttijd) heeft alleen heartbeats gemist. Jobs van een oudere versie
+        # hebben geen starttijd; daar blijft alleen het pid over
+        if owner and (process_start_id(owner) == start if start else pid_alive(owner)):
+            return False
+        return True
+
+    def recover(self) -> int:
+        """
+        Hervat jobs waarvan de lease verlopen is (bijv. na een restart)
+
+        Returns:
+            Aantal overgenomen jobs
+        """
+        recovered = 0
+        now = time.time()
+        for job in self.store.unfinished():
+            if not self._orphaned(job, now):
+                continue
+            if job['cancel_requested']:
+                self.store.update(job['id'], status=CANCELLED, finished_at=time.time())
+                continue
+            if self.store.claim(job['id'], job['owner_pid'], job['lease_expires'],
+                                self.pid, self.start_id, time.time() + self.lease_seconds):
+                part_path = job['result_path'] + '.part'
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                self._submit(job['id'])
+                recovered += 1
+        if recovered:
+            logger.info(f"Recovered {recovered} unfinished jobs")
+        return recovered
+
+    def shutdown(self, timeout: float = 5.0):
+        """
+        Stop de pool en de lopende job processen; hun jobs worden bij de
+        volgende start hervat
+
+        Args:
+            timeout: Seconden per process na SIGTERM, daarna SIGKILL
+        """
+        self._closing = True
+        self._stop.set()
+        if self._pool is not None:
+            # ProcessPoolExecutor kan lopende taken niet annuleren: na
+            # shutdown(wait=False) zouden de children doorschrijven terwijl een
+            # ander process de job al overneemt. Dus zelf stoppen en wachten
+            processes = list((self._pool._processes or {}).values())
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join(timeout)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+        self._heartbeat_thread.join()
+        # Leases vrijgeven: het volgende process hoeft niet op de timeout te wachten
+        self.store.renew(self.pid, self.start_id, 0)
+        self.store.close()
+
+
+def check_input_name(name: str):
+    """Alleen CSV flow exports; pcap heeft eerst flow extractie nodig"""
+    if name.lower().endswith(('.pcap', '.pcapng', '.cap')):
+        raise ValueError("pcap input is not supported: export flows to CSV first (e.g. CICFlowMeter)")
+
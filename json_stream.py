@@ -0,0 +1,92 @@
+"""
+JSON Stream Parser
+Incrementele parser voor request bodies met flow records: een JSON array of
+NDJSON (één object per regel), zonder de hele body in memory te laden.
+"""
+
+import codecs
+import json
+import re
+from typing import AsyncIterator, Dict, Iterable, Iterator, List
+
+from metrics import timed
+
+# Tussen records: whitespace, komma's en de haken van een JSON array
+_SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+class JsonStreamError(ValueError):
+    """Ongeldige of te grote record in de stream"""
+
+
+class JsonRecordParser:
+    """
+    Push parser: feed() bytes, krijg complete records terug
+
+    Buffer is begrensd tot max_record_bytes onverwerkte data; daarboven is de
+    huidige record te groot (of de stream geen geldige JSON).
+    """
+
+    def __init__(self, max_record_bytes: int = 1024 * 1024):
+        self.max_record_bytes = max_record_bytes
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self.records = 0
+
+    def feed(self, data: bytes, final: bool = False) -> List[Dict]:
+        """
+        Args:
+            data: Volgende stuk van de body
+            final: True bij het laatste stuk (restdata is dan een fout)
+
+        Returns:
+            Alle records die nu compleet zijn
+        """
+        buffer = self._buffer + self._utf8.decode(data, final)
+        records = []
+        pos = 0
+
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            try:
+                record, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if final:
+                    raise JsonStreamError(f"Invalid JSON after record {self.records}: {e.msg}")
+                if len(buffer) - pos > self.max_record_bytes:
+                    raise JsonStreamError(
+                        f"Record {self.records} exceeds {self.max_record_bytes} bytes"
+                    )
+                break
+
+            if not isinstance(record, dict):
+                raise JsonStreamError(f"Record {self.records} is not a JSON object")
+            self.records += 1
+            records.append(record)
+
+        self._buffer = buffer[pos:]
+        return records
+
+
+def iter_records(chunks: Iterable[bytes], max_record_bytes: int = 1024 * 1024) -> Iterator[Dict]:
+    """Records uit een (sync) iterable van bytes chunks"""
+    parser = JsonRecordParser(max_record_bytes)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.feed(b'', final=True)
+
+
+async def aiter_records(chunks: AsyncIterator[bytes],
+                        max_record_bytes: int = 1024 * 1024) -> AsyncIterator[Dict]:
+    """Records uit een async stream (bijv. Starlette request.stream())"""
+    parser = JsonRecordParser(max_record_bytes)
+    async for chunk in chunks:
+        with timed('parse'):
+            records = parser.feed(chunk)
+        for record in records:
+            yield record
+    for record in parser.feed(b'', final=True):
+        yield record
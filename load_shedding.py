@@ -0,0 +1,206 @@
+"""
+Adaptive Load Shedding voor de realtime pipeline
+Meet capture-to-verdict lag en inference utilisatie en schakelt bij overbelasting
+over op deterministische flow sampling.
+"""
+
+import time
+import zlib
+from typing import Dict, Optional
+
+from utils import Config
+
+
+class OverloadController:
+    """
+    Overload controller voor RealtimeAIFirewall
+
+    - Meet capture-to-verdict lag (EWMA) en inference utilisatie per window
+    - Onder druk: Isolation Forest overslaan en hash-based flow sampling
+      (een hele flow zit er altijd in of altijd uit)
+    - Flows van eerder verdachte sources worden altijd geanalyseerd
+    - Herstelt automatisch zodra de load daalt
+    """
+
+    STATE_NORMAL = 'normal'
+    STATE_DEGRADED = 'degraded'
+
+    def __init__(self, config: Optional[Config] = None):
+        self.config = config or Config()
+
+        # High/low watermarks (hysteresis voorkomt flapping)
+        self.max_lag = self.config.get('realtime.overload.max_lag_seconds', 0.5)
+        self.recover_lag = self.config.get('realtime.overload.recover_lag_seconds', 0.1)
+        self.max_utilization = self.config.get('realtime.overload.max_utilization', 0.85)
+        self.recover_utilization = self.config.get('realtime.overload.recover_utilization', 0.5)
+        self.min_sample_rate = self.config.get('realtime.overload.min_sample_rate', 0.05)
+        self.evaluate_interval = self.config.get('realtime.overload.evaluate_interval', 1.0)
+        self.recover_intervals = self.config.get('realtime.overload.recover_intervals', 3)
+        self.suspicious_ttl = self.config.get('realtime.overload.suspicious_ttl', 600)
+        self.suspicious_score = self.config.get('realtime.overload.suspicious_score', 0.4)
+        self.lag_smoothing = 0.2
+
+        # Controller state
+        self.state = self.STATE_NORMAL
+        self.sample_rate = 1.0
+        self.lag_ewma = 0.0
+        self.utilization = 0.0
+        self._healthy_intervals = 0
+
+        # Utilisatie window
+        self._window_start = time.monotonic()
+        self._busy_time = 0.0
+        self._window_verdicts = 0
+
+        # src_ip -> expiry (monotonic)
+        self.suspicious_sources: Dict[str, float] = {}
+
+        self.stats = {
+            'sampled_out_packets': 0,
+            'priority_flows': 0,
+            'degradations': 0,
+            'recoveries': 0
+        }
+
+    @property
+    def degraded(self) -> bool:
+        """True als de pipeline in degraded mode draait"""
+        return self.state == self.STATE_DEGRADED
+
+    @property
+    def use_isolation_forest(self) -> bool:
+        """Isolation Forest wordt overgeslagen zolang we degraded zijn"""
+        return not self.degraded
+
+    @staticmethod
+    def flow_hash(flow_key: str) -> float:
+        """Deterministische hash van een flow key in [0, 1)"""
+        return zlib.crc32(flow_key.encode()) / 4294967296.0
+
+    def is_suspicious(self, src_ip: str, now: Optional[float] = None) -> bool:
+        """Check of source recent verdacht was"""
+        expires = self.suspicious_sources.get(src_ip)
+        if expires is None:
+            return False
+
+        if (now or time.monotonic()) >= expires:
+            del self.suspicious_sources[src_ip]
+            return False
+        return True
+
+    def mark_suspicious(self, src_ip: str):
+        """Geef source voorrang tijdens overbelasting"""
+        if src_ip:
+            self.suspicious_sources[src_ip] = time.monotonic() + self.suspicious_ttl
+
+    def observe_prediction(self, src_ip: Optional[str], prediction: Dict):
+        """Markeer source als verdacht bij malicious of medium-risk score"""
+        if (prediction.get('prediction') == 'MALICIOUS' or
+                prediction.get('ensemble_score', 0) >= self.suspicious_score):
+            self.mark_suspicious(src_ip)
+
+    def should_analyze(self, flow_key: str, src_ip: Optional[str] = None) -> bool:
+        """
+        Beslis of een flow geanalyseerd wordt
+
+        Args:
+            flow_key: Flow key (src:port->dst:port:proto)
+            src_ip: Source IP van de flow
+
+        Returns:
+            True als de flow gevolgd en gescoord moet worden
+        """
+        if self.sample_rate >= 1.0:
+            return True
+
+        if src_ip and self.is_suspicious(src_ip):
+            self.stats['priority_flows'] += 1
+            return True
+
+        if self.flow_hash(flow_key) < self.sample_rate:
+            return True
+
+        self.stats['sampled_out_packets'] += 1
+        return False
+
+    def record_verdict(self, capture_time: float, inference_seconds: float):
+        """
+        Registreer een verdict
+
+        Args:
+            capture_time: Capture timestamp van het packet (epoch seconds)
+            inference_seconds: Tijd besteed aan inference voor dit verdict
+        """
+        lag = max(0.0, time.time() - capture_time)
+        self.lag_ewma += self.lag_smoothing * (lag - self.lag_ewma)
+        self._busy_time += inference_seconds
+        self._window_verdicts += 1
+        self.maybe_evaluate()
+
+    def maybe_evaluate(self):
+        """Evalueer de load zodra het window verstreken is"""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.evaluate_interval:
+            return
+
+        self.utilization = min(1.0, self._busy_time / elapsed)
+        if self._window_verdicts == 0:
+            # Geen verdicts in dit window: er staat niets meer in de wachtrij
+            self.lag_ewma *= (1 - self.lag_smoothing)
+
+        self._window_start = now
+        self._busy_time = 0.0
+        self._window_verdicts = 0
+        self.prune_suspicious(now)
+        self.evaluate()
+
+    def prune_suspicious(self, now: float):
+        """Verwijder verlopen suspicious sources"""
+        expired = [ip for ip, expires in self.suspicious_sources.items() if expires <= now]
+        for ip in expired:
+            del self.suspicious_sources[ip]
+
+    def evaluate(self):
+        """Pas state en sample rate aan op basis van lag en utilisatie"""
+        overloaded = (self.lag_ewma > self.max_lag or
+                      self.utilization > self.max_utilization)
+        healthy = (self.lag_ewma < self.recover_lag and
+                   self.utilization < self.recover_utilization)
+
+        if overloaded:
+            self._healthy_intervals = 0
+            if not self.degraded:
+                # Eerste stap: IF overslaan, nog alle flows scoren
+                self.state = self.STATE_DEGRADED
+                self.stats['degradations'] += 1
+            else:
+                self.sample_rate = max(self.min_sample_rate, self.sample_rate / 2)
+            return
+
+        if not healthy or not self.degraded:
+            self._healthy_intervals = 0
+            return
+
+        self._healthy_intervals += 1
+        if self._healthy_intervals < self.recover_intervals:
+            return
+
+        self._healthy_intervals = 0
+        if self.sample_rate < 1.0:
+            self.sample_rate = min(1.0, self.sample_rate * 2)
+        else:
+            self.state = self.STATE_NORMAL
+            self.stats['recoveries'] += 1
+
+    def get_stats(self) -> Dict:
+        """Get overload statistics"""
+        return {
+            'state': self.state,
+            'sample_rate': self.sample_rate,
+            'isolation_forest_enabled': self.use_isolation_forest,
+            'lag_seconds': self.lag_ewma,
+            'inference_utilization': self.utilization,
+            'suspicious_sources': len(self.suspicious_sources),
+            **self.stats
+        }
@@ -0,0 +1,486 @@
+"""
+Metrics
+Counters, gauges en HDR-style latency histogrammen voor /metrics
+(Prometheus text format).
+
+Elk process schrijft naar een eigen bestand (metrics.dir/<namespace>-<pid>-
+<identity>.metrics, numpy memmap) en elke thread naar een eigen rij daarin:
+geen locks op het hot path. Een scrape telt de bestanden van alle levende
+processen op, zodat /metrics op elke uvicorn worker hetzelfde totaal geeft
+(ook job en blocker processen op dezelfde host tellen mee, ook vanuit een
+andere container die de directory deelt).
+
+Een bestand hoort bij een proces, niet bij een PID: de naam bevat de PID
+namespace en de starttijd (utils.process_identity), zodat een hergebruikt
+PID of een gelijk PID in een andere container nooit andermans bestand
+opent. Het eigenaar proces houdt een gedeelde flock op zijn bestand; voor
+bestanden uit een andere namespace is die lock de levenscheck.
+
+Counters en histogrammen van een gestopt process gaan niet verloren: voor
+het bestand verwijderd wordt, worden ze opgeteld bij archive.metrics (zoals
+de multiprocess mode van prometheus_client), anders zou een herstarte
+worker de totalen laten dalen. Gauges van een gestopt process vervallen.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from utils import Config, Logger, pid_alive, pid_namespace, process_identity
+
+logger = Logger(__name__).logger
+
+PREFIX = 'ai_firewall'
+
+# Pipeline stages met een latency histogram (per call; batches = één observatie)
+STAGES = ('parse', 'queue', 'transform', 'xgboost', 'isolation_forest', 'ensemble',
+          'prediction_log', 'block', 'redis_publish', 'ingest_batch')
+
+QUEUES = ('inference_waiting', 'inference_active', 'sse_clients', 'ws_clients', 'jobs_active',
+          'in_flight_sensor', 'in_flight_default', 'ingest_sessions')
+
+# Admission control (admission.py): prioriteitsklassen en redenen voor een reject
+ADMISSION_CLASSES = ('sensor', 'default')
+REJECT_REASONS = ('in_flight', 'queue_delay')
+
+# Log-linear buckets: SUB_BUCKETS per verdubbeling, 2^MIN_EXP s (15µs) t/m 2^MAX_EXP s (32s);
+# relatieve fout per bucket max 1/SUB_BUCKETS
+SUB_BUCKETS = 4
+MIN_EXP = -15
+MAX_EXP = 6
+BOUNDS = [2.0 ** (e - 1) * (1 + (k + 1) / SUB_BUCKETS)
+          for e in range(MIN_EXP, MAX_EXP) for k in range(SUB_BUCKETS)]
+
+# Thread rijen per process; rij 0 is voor gauges
+SLOTS = 64
+
+# Histogram cellen: len(BOUNDS) buckets, overflow, som
+_SUM = len(BOUNDS) + 1
+
+# Opgetelde counters/histogrammen van gestopte processen (één rij)
+ARCHIVE = 'archive.metrics'
+
+
+def _token(text: str, length: int) -> str:
+    """Korte, bestandsnaam-veilige hash"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:length]
+
+
+def bucket_index(seconds: float) -> int:
+    """Bucket voor een latency (len(BOUNDS) = overflow)"""
+    if seconds <= 0:
+        return 0
+    m, e = math.frexp(seconds)  # seconds = m * 2^e, 0.5 <= m < 1
+    if e < MIN_EXP:
+        return 0
+    if e >= MAX_EXP:
+        return len(BOUNDS)
+    return (e - MIN_EXP) * SUB_BUCKETS + int((m - 0.5) * 2 * SUB_BUCKETS)
+
+
+class MetricsRegistry:
+    """
+    Vast schema van cellen; elke metric/label combinatie heeft een offset
+
+    Counters en histogrammen tellen op in de rij van de huidige thread,
+    gauges staan in rij 0 en worden door het process zelf gezet.
+    """
+
+    def __init__(self, metrics_dir: Optional[str] = None):
+        """
+        Args:
+            metrics_dir: Directory voor per-process bestanden (None = alleen in memory)
+        """
+        self.metrics_dir = Path(metrics_dir) if metrics_dir else None
+        self.counters: Dict[str, Tuple[str, str, Dict[Tuple, int]]] = {}
+        self.histograms: Dict[str, Tuple[str, str, Dict[Tuple, int]]] = {}
+        self.gauges: Dict[str, Tuple[str, str, Dict[Tuple, int]]] = {}
+        self.cells = 0
+        self._gauge_callbacks: List[Callable[[], None]] = []
+
+        self._path: Optional[Path] = None
+        self._lock_fd: Optional[int] = None
+        self._namespace = _token(pid_namespace(), 8)
+        self._data: Optional[np.ndarray] = None
+        self._local = threading.local()
+        self._next_slot = 1
+        self._slot_lock = threading.Lock()
+        self._overflow_lock = threading.Lock()
+
+        self._define()
+        self._stage_base = {key[0][1]: offset for key, offset in self.histograms['stage_seconds'][2].items()}
+        self._counter_offset = {(name, _label_values(key)): offset
+                                for name, (_, _, offsets) in self.counters.items()
+                                for key, offset in offsets.items()}
+        self._gauge_cells = np.array([offset for _, _, offsets in self.gauges.values()
+                                      for offset in offsets.values()], dtype=np.intp)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _add(self, kind: Dict, name: str, help_text: str, label, values, width: int):
+        """label: naam, tuple van namen (values zijn dan tuples) of None"""
+        offsets = {}
+        for value in values:
+            if label is None:
+                key = ()
+            elif isinstance(label, tuple):
+                key = tuple(zip(label, value))
+            else:
+                key = ((label, value),)
+            offsets[key] = self.cells
+            self.cells += width
+        kind[name] = (help_text, label, offsets)
+
+    def _define(self):
+        self._add(self.histograms, 'stage_seconds', 'Latency per pipeline stage',
+                  'stage', STAGES, _SUM + 1)
+        self._add(self.counters, 'predictions_total', 'Verdicts per type',
+                  'verdict', ('benign', 'malicious'), 1)
+        self._add(self.counters, 'alerts_total', 'Predictions boven de alert threshold', None, [None], 1)
+        self._add(self.counters, 'blocks_total', 'Block pogingen per resultaat',
+                  'result', ('ok', 'failed'), 1)
+        self._add(self.counters, 'redis_publish_total', 'Redis publishes per resultaat',
+                  'result', ('ok', 'failed'), 1)
+        self._add(self.counters, 'admission_rejects_total', 'Geweigerde requests (429/503) per klasse en reden',
+                  ('class', 'reason'), [(c, r) for c in ADMISSION_CLASSES for r in REJECT_REASONS], 1)
+        self._add(self.counters, 'ingest_flows_total', 'Flows gescoord via /ingest', None, [None], 1)
+        self._add(self.gauges, 'queue_depth', 'Wachtrijen en verbindingen per worker (opgeteld)',
+                  'queue', QUEUES, 1)
+
+    # === Opslag ===
+
+    def _storage(self) -> np.ndarray:
+        if self._data is None:
+            with self._slot_lock:
+                if self._data is None:
+                    self._data = self._open(os.getpid())
+        return self._data
+
+    def _after_fork(self):
+        # Child schrijft naar een eigen bestand; de flock van de parent laten
+        # we bij de parent (de geërfde fd sluiten geeft hem niet vrij)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self._path = None
+        self._data = None
+        self._local = threading.local()
+        self._next_slot = 1
+        self._slot_lock = threading.Lock()
+
+    def _file_name(self, pid: int) -> str:
+        identity = process_identity(pid)
+        # Zonder identiteit (geen /proc en geen psutil) beslist alleen de flock
+        return f"{self._namespace}-{pid}-{_token(identity, 12) if identity else '0'}.metrics"
+
+    def _open(self, pid: int) -> np.ndarray:
+        shape = (SLOTS, self.cells)
+        if self.metrics_dir is None:
+            return np.zeros(shape)
+        try:
+            self.metrics_dir.mkdir(parents=True, exist_ok=True)
+            self._path = self.metrics_dir / self._file_name(pid)
+            # Eerst de flock, dan pas de inhoud: een ander proces ziet het
+            # bestand nooit zonder eigenaar
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, SLOTS * self.cells * 8)
+            self._lock_fd = fd
+            with self._archive_lock():
+                self._archive_dead()
+            return np.memmap(self._path, dtype=np.float64, mode='r+', shape=shape)
+        except OSError as e:
+            logger.warning(f"Metrics dir not writable ({e}); metrics stay in-process")
+            self.metrics_dir = None
+            return np.zeros(shape)
+
+    def _owner_alive(self, path: Path) -> bool:
+        """Leeft het proces dat dit bestand schrijft?"""
+        parts = path.stem.split('-')
+        if path.stem.isdigit():
+            # Bestand van een oudere versie (<pid>.metrics)
+            return pid_alive(int(path.stem))
+        if len(parts) == 3 and parts[0] == self._namespace and parts[1].isdigit() and parts[2] != '0':
+            # Zelfde namespace: het PID moet nog hetzelfde proces zijn
+            identity = process_identity(int(parts[1]))
+            return identity is not None and _token(identity, 12) == parts[2]
+        if fcntl is None:
+            return True  # Andere host/namespace zonder flock: niet te beoordelen
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return True  # Net opgeruimd door een ander proces
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True  # Eigenaar houdt zijn gedeelde lock nog vast
+        finally:
+            os.close(fd)
+        return False
+
+    @contextmanager
+    def _archive_lock(self):
+        """Exclusief over processen: archiveren en optellen zien dezelfde bestanden"""
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.metrics_dir / '.archive.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read_archive(self) -> np.ndarray:
+        path = self.metrics_dir / ARCHIVE
+        try:
+            data = np.fromfile(path, dtype=np.float64)
+        except OSError:
+            return np.zeros(self.cells)
+        if data.size != self.cells:
+            logger.warning(f"Ignoring {path}: schema changed ({data.size} cells, expected {self.cells})")
+            return np.zeros(self.cells)
+        return data
+
+    def _archive_dead(self) -> np.ndarray:
+        """
+        Tel counters/histogrammen van gestopte processen op bij het archief
+        en verwijder hun bestanden (aanroepen onder _archive_lock)
+
+        Returns:
+            Het bijgewerkte archief
+        """
+        archive = self._read_archive()
+        dead = []
+        for path in self.metrics_dir.glob('*.metrics'):
+            if path.name == ARCHIVE or path == self._path or self._owner_alive(path):
+                continue
+            try:
+                data = np.fromfile(path, dtype=np.float64)
+            except OSError:
+                continue
+            if data.size == SLOTS * self.cells:
+                cells = data.reshape(SLOTS, self.cells).sum(axis=0)
+                cells[self._gauge_cells] = 0  # Gauges gelden alleen voor levende processen
+                archive += cells
+            dead.append(path)
+        if not dead:
+            return archive
+
+        # Eerst het archief atomair vervangen, dan pas de bestanden weg:
+        # een crash ertussen telt een process hooguit dubbel, nooit niet
+        tmp = self.metrics_dir / f".{ARCHIVE}.{os.getpid()}"
+        archive.tofile(tmp)
+        os.replace(tmp, self.metrics_dir / ARCHIVE)
+        for path in dead:
+            path.unlink(missing_ok=True)
+        return archive
+
+    def _slot(self) -> Tuple[memoryview, Optional[threading.Lock]]:
+        """(rij van deze thread, lock als de rij gedeeld is)"""
+        try:
+            return self._local.slot
+        except AttributeError:
+            pass
+        data = self._storage()
+        with self._slot_lock:
+            slot = self._next_slot
+            self._next_slot += 1
+        # memoryview: element += is een stuk goedkoper dan via numpy scalars.
+        # Meer threads dan rijen: de laatste rij gedeeld, onder lock
+        row = memoryview(data.view(np.ndarray)[min(slot, SLOTS - 1)])
+        self._local.slot = (row, self._overflow_lock if slot >= SLOTS - 1 else None)
+        return self._local.slot
+
+    # === Hot path ===
+
+    def observe(self, stage: str, seconds: float):
+        """Latency van één stage"""
+        base = self._stage_base[stage]
+        row, lock = self._slot()
+        if lock is None:
+            row[base + bucket_index(seconds)] += 1
+            row[base + _SUM] += seconds
+        else:
+            with lock:
+                row[base + bucket_index(seconds)] += 1
+                row[base + _SUM] += seconds
+
+    def inc(self, name: str, value: Optional[str] = None, amount: float = 1):
+        """Counter ophogen (value = label waarde)"""
+        offset = self._counter_offset[name, value]
+        row, lock = self._slot()
+        if lock is None:
+            row[offset] += amount
+        else:
+            with lock:
+                row[offset] += amount
+
+    def set_gauge(self, name: str, value: str, amount: float):
+        _, label, offsets = self.gauges[name]
+        self._storage()[0, offsets[((label, value),)]] = amount
+
+    def gauge_callback(self, fn: Callable[[], None]):
+        """fn zet gauges van dit process (aangeroepen door update_gauges)"""
+        self._gauge_callbacks.append(fn)
+
+    def update_gauges(self):
+        for fn in self._gauge_callbacks:
+            try:
+                fn()
+            except Exception as e:
+                logger.debug(f"Gauge callback failed: {e}")
+
+    # === Scrape ===
+
+    def totals(self) -> Tuple[np.ndarray, int]:
+        """
+        Som over alle threads en levende processen, plus het archief van
+        gestopte processen
+
+        Returns:
+            (cellen, aantal levende processen)
+        """
+        own = self._storage()
+        if self.metrics_dir is None:
+            return own.sum(axis=0), 1
+
+        processes = 0
+        with self._archive_lock():
+            total = self._archive_dead().copy()
+            for path in self.metrics_dir.glob('*.metrics'):
+                if path.name == ARCHIVE:
+                    continue
+                if path == self._path:
+                    total += own.sum(axis=0)
+                else:
+                    try:
+                        data = np.fromfile(path, dtype=np.float64)
+                    except OSError:
+                        continue
+                    if data.size != SLOTS * self.cells:
+                        continue  # ander schema (oudere versie) of nog niet geschreven
+                    total += data.reshape(SLOTS, self.cells).sum(axis=0)
+                processes += 1
+        return total, processes
+
+    def counter_value(self, name: str, value: Optional[str] = None) -> float:
+        return float(self.totals()[0][self._counter_offset[name, value]])
+
+    def render(self, extra: Optional[List[str]] = None) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        self.update_gauges()
+        cells, processes = self.totals()
+        lines = []
+
+        for name, (help_text, label, offsets) in self.counters.items():
+            lines += [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} counter"]
+            for key, offset in offsets.items():
+                lines.append(f"{PREFIX}_{name}{_labels(*key)} {_number(cells[offset])}")
+
+        for name, (help_text, label, offsets) in self.gauges.items():
+            lines += [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} gauge"]
+            for key, offset in offsets.items():
+                lines.append(f"{PREFIX}_{name}{_labels(*key)} {_number(cells[offset])}")
+
+        for name, (help_text, label, offsets) in self.histograms.items():
+            lines += [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} histogram"]
+            for key, offset in offsets.items():
+                counts = cells[offset:offset + len(BOUNDS) + 1]
+                cumulative = np.cumsum(counts)
+                for bound, count in zip(BOUNDS, cumulative):
+                    lines.append(f"{PREFIX}_{name}_bucket{_labels(*key, ('le', repr(bound)))} {_number(count)}")
+                lines.append(f"{PREFIX}_{name}_bucket{_labels(*key, ('le', '+Inf'))} {_number(cumulative[-1])}")
+                lines.append(f"{PREFIX}_{name}_sum{_labels(*key)} {float(cells[offset + _SUM])!r}")
+                lines.append(f"{PREFIX}_{name}_count{_labels(*key)} {_number(cumulative[-1])}")
+
+        lines += [f"# HELP {PREFIX}_processes Processen die naar de metrics dir schrijven",
+                  f"# TYPE {PREFIX}_processes gauge", f"{PREFIX}_processes {processes}"]
+        lines += extra or []
+        return '\n'.join(lines) + '\n'
+
+
+def _label_values(key: Tuple):
+    """Label waarde(n) zoals inc() ze krijgt: None, één waarde of een tuple"""
+    if not key:
+        return None
+    if len(key) == 1:
+        return key[0][1]
+    return tuple(value for _, value in key)
+
+
+def _labels(*pairs) -> str:
+    pairs = [pair for pair in pairs if pair]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{escape(str(v))}"' for k, v in pairs) + '}'
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_registry: Optional[MetricsRegistry] = None
+
+
+def registry() -> MetricsRegistry:
+    """Process-wide registry (metrics.dir uit config)"""
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry(Config().get('metrics.dir'))
+    return _registry
+
+
+def observe(stage: str, seconds: float):
+    registry().observe(stage, seconds)
+
+
+def inc(name: str, value: Optional[str] = None, amount: float = 1):
+    registry().inc(name, value, amount)
+
+
+async def run_gauge_updates(interval: float = 2.0):
+    """Zet periodiek de gauges van dit process (asyncio task per worker)"""
+    import asyncio
+    while True:
+        registry().update_gauges()
+        await asyncio.sleep(interval)
+
+
+class timed:
+    """
+    Context manager: `with timed('xgboost'):` observeert de duur van het blok
+
+    Een nieuw object per gebruik, dus veilig vanuit meerdere threads.
+    """
+
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.started)
+        return False
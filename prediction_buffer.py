@@ -0,0 +1,118 @@
+"""
+Prediction Ring Buffer
+Vaste capaciteit store voor recente predictions (dashboard polling), met
+oplopende sequence numbers zodat pollers niets missen of dubbel krijgen.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+
+class PredictionRing:
+    """
+    Ring buffer met monotone sequence numbers
+
+    - append() is O(1): overschrijft het oudste slot, geen list slicing
+    - Sequence numbers beginnen bij 1 en zijn aaneengesloten, dus de positie
+      van seq N in de ring is direct te berekenen (N % capacity)
+    - since(N) geeft alles na N; ligt N al buiten de ring, dan meldt het
+      resultaat expliciet hoeveel entries gemist zijn
+    """
+
+    def __init__(self, capacity: int = 100):
+        """
+        Args:
+            capacity: Aantal entries dat bewaard blijft
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+
+        self.capacity = capacity
+        self._slots: List[Optional[Dict]] = [None] * capacity
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number van de nieuwste entry (0 = leeg)"""
+        return self._last_seq
+
+    @property
+    def oldest_seq(self) -> int:
+        """Sequence number van de oudste entry in de ring (0 = leeg)"""
+        if self._last_seq == 0:
+            return 0
+        return max(1, self._last_seq - self.capacity + 1)
+
+    def __len__(self) -> int:
+        return min(self._last_seq, self.capacity)
+
+    def append(self, entry: Dict) -> int:
+        """
+        Voeg entry toe; entry krijgt een 'seq' veld
+
+        Returns:
+            Sequence number
+        """
+        with self._lock:
+            self._last_seq += 1
+            entry['seq'] = self._last_seq
+            self._slots[self._last_seq % self.capacity] = entry
+            return self._last_seq
+
+    def extend(self, entries: List[Dict]) -> int:
+        """Voeg meerdere entries toe onder één lock; geeft de laatste seq terug"""
+        with self._lock:
+            for entry in entries:
+                self._last_seq += 1
+                entry['seq'] = self._last_seq
+                self._slots[self._last_seq % self.capacity] = entry
+            return self._last_seq
+
+    def _range(self, first: int, last: int) -> List[Dict]:
+        return [self._slots[seq % self.capacity] for seq in range(first, last + 1)]
+
+    def since(self, seq: int, limit: Optional[int] = None) -> Dict:
+        """
+        Entries met een sequence number groter dan seq
+
+        Args:
+            seq: Laatst geziene sequence number (0 = vanaf het begin)
+            limit: Maximaal aantal entries (oudste eerst)
+
+        Returns:
+            {'entries', 'last_seq', 'oldest_seq', 'fell_behind', 'missed'}
+        """
+        with self._lock:
+            last = self._last_seq
+            oldest = self.oldest_seq
+
+            # Client voor de server (bijv. na een API restart): opnieuw beginnen
+            if seq > last:
+                seq = 0
+
+            first = seq + 1
+            missed = 0
+            if last and first < oldest:
+                missed = oldest - first
+                first = oldest
+
+            if limit is not None:
+                last = min(last, first + limit - 1)
+            entries = self._range(first, last) if last >= first else []
+
+        return {
+            'entries': entries,
+            # Volgende poll: since=last_seq
+            'last_seq': last,
+            'oldest_seq': oldest,
+            'fell_behind': missed > 0,
+            'missed': missed
+        }
+
+    def latest(self, n: int) -> List[Dict]:
+        """Laatste n entries, oudste eerst"""
+        with self._lock:
+            last = self._last_seq
+            first = max(self.oldest_seq, last - n + 1, 1)
+            return self._range(first, last) if last else []
@@ -0,0 +1,263 @@
+"""
+Prediction Stream (Server-Sent Events)
+In-process broadcaster: elke nieuwe prediction en stats delta wordt één keer
+geserialiseerd en naar alle dashboard subscribers gepusht, in plaats van dat
+elke tab /predictions/recent pollt.
+"""
+
+import asyncio
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from prediction_buffer import PredictionRing
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+
+def _json_default(value):
+    # numpy scalars uit de vectorized scoring paden
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> bytes:
+    """Eén SSE frame (id/event/data regels + lege regel)"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=_json_default)}")
+    return ("\n".join(lines) + "\n\n").encode('utf-8')
+
+
+# Comment frame: houdt proxies/load balancers open zonder event
+KEEPALIVE = b": keepalive\n\n"
+
+
+class Subscriber:
+    """Eén verbonden client met een begrensde queue van SSE frames"""
+
+    def __init__(self, queue_size: int, last_seq: int):
+        # Ruimte voor het afsluitende evicted frame + einde-stream marker
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(2, queue_size))
+        # Hoogste seq die al (via replay of queue) bij deze client is
+        self.last_seq = last_seq
+        self.evicted = False
+
+
+class PredictionBroadcaster:
+    """
+    Fan-out van predictions naar SSE subscribers
+
+    - publish() zet entries in de PredictionRing (seq nummers) en pusht ze
+      één keer geserialiseerd naar alle subscribers
+    - Elke subscriber heeft een begrensde queue; een client die niet bijhoudt
+      wordt afgesloten (evicted) in plaats van de server memory op te blazen
+    - subscribe(since) speelt gemiste predictions uit de ring opnieuw af, zodat
+      een reconnect (Last-Event-ID) hervat waar de client gebleven was
+    - Met een gedeelde ring (shared=True, zie shared_state.py) pusht publish()
+      niet zelf: follow() leest nieuwe entries van alle workers uit de ring,
+      zodat elke worker dezelfde stream geeft
+
+    Fan-out gebeurt altijd op de event loop; publish() mag ook vanuit een
+    worker thread aangeroepen worden.
+    """
+
+    def __init__(self, ring: PredictionRing, queue_size: int = 1000,
+                 counters=None, shared: bool = False):
+        """
+        Args:
+            ring: Ring buffer met recente predictions (bron voor replay)
+            queue_size: Max frames in de queue per subscriber
+            counters: SharedCounters voor totalen in de stats events (optioneel)
+            shared: Ring wordt ook door andere workers gevuld (fan-out via follow)
+        """
+        self.ring = ring
+        self.counters = counters
+        self.shared = shared
+        self.queue_size = queue_size
+        self.subscribers: List[Subscriber] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self.stats = {'published': 0, 'evicted': 0, 'subscribers': 0}
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Koppel aan de event loop van de server (bij startup)"""
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+
+    def publish(self, entries: List[Dict], total: Optional[int] = None,
+                malicious: Optional[int] = None) -> int:
+        """
+        Publiceer nieuwe predictions
+
+        Args:
+            entries: Prediction dicts (krijgen een 'seq' veld)
+            total: Aantal gescoorde flows als dat meer is dan len(entries)
+                   (columnar batches zetten alleen de laatste N in de ring)
+            malicious: Aantal malicious onder die total flows
+
+        Returns:
+            Sequence number van de laatste entry
+        """
+        last_seq = self.ring.extend(entries)
+        if total is None:
+            total = len(entries)
+        if malicious is None:
+            malicious = sum(1 for entry in entries if entry.get('prediction') == 'MALICIOUS')
+        if self.counters is not None:
+            self.counters.add(predictions=total, malicious=malicious)
+        self.stats['published'] += len(entries)
+        if self.shared:
+            return last_seq
+
+        frames = [(entry['seq'], format_event('prediction', entry, entry['seq'])) for entry in entries]
+        frames.append((None, self._stats_frame(last_seq, total, malicious)))
+
+        if self._loop is None or not self.subscribers:
+            return last_seq
+        if threading.get_ident() == self._loop_thread:
+            self._fan_out(frames)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, frames)
+        return last_seq
+
+    def _stats_frame(self, last_seq: int, total: int, malicious: int) -> bytes:
+        totals = self.counters.totals()['predictions'] if self.counters is not None else last_seq
+        return format_event('stats', {
+            'last_seq': last_seq,
+            'total_predictions': totals,
+            'delta': {'predictions': total, 'malicious': malicious, 'benign': total - malicious}
+        })
+
+    async def follow(self, interval: float = 0.05):
+        """
+        Fan-out vanuit een gedeelde ring (asyncio task per worker)
+
+        Pollt de ring (een geheugen read) en pusht nieuwe entries van alle
+        workers; de stats delta komt uit de gedeelde counters.
+        """
+        followed = self.ring.last_seq
+        previous = self.counters.totals() if self.counters is not None else None
+        while True:
+            await asyncio.sleep(interval)
+            if self.ring.last_seq == followed:
+                continue
+            result = self.ring.since(followed, limit=self.queue_size)
+            followed = result['last_seq']
+            if not self.subscribers:
+                previous = self.counters.totals() if self.counters is not None else None
+                continue
+
+            frames: List[Tuple[Optional[int], bytes]] = []
+            if result['fell_behind']:
+                frames.append((None, format_event('gap', {
+                    'missed': result['missed'],
+                    'oldest_seq': result['oldest_seq']
+                })))
+            frames += [(entry['seq'], format_event('prediction', entry, entry['seq']))
+                       for entry in result['entries']]
+            if previous is not None:
+                totals = self.counters.totals()
+                total = totals['predictions'] - previous['predictions']
+                malicious = totals['malicious'] - previous['malicious']
+                previous = totals
+            else:
+                total = len(result['entries'])
+                malicious = sum(1 for entry in result['entries'] if entry.get('prediction') == 'MALICIOUS')
+            frames.append((None, self._stats_frame(followed, total, malicious)))
+            self._fan_out(frames)
+
+    def _fan_out(self, frames: List[Tuple[Optional[int], bytes]]):
+        for subscriber in list(self.subscribers):
+            for seq, frame in frames:
+                # Al via replay afgeleverd
+                if seq is not None and seq <= subscriber.last_seq:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(frame)
+                except asyncio.QueueFull:
+                    self._evict(subscriber)
+                    break
+                if seq is not None:
+                    subscriber.last_seq = seq
+
+    def _evict(self, subscriber: Subscriber):
+        """Slow consumer: queue leeg, één evicted frame, daarna None (einde stream)"""
+        self.unsubscribe(subscriber)
+        subscriber.evicted = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(format_event('evicted', {
+            'last_seq': subscriber.last_seq,
+            'reason': f'queue exceeded {self.queue_size} events'
+        }))
+        subscriber.queue.put_nowait(None)
+        self.stats['evicted'] += 1
+        logger.warning(f"Evicted slow prediction stream subscriber at seq {subscriber.last_seq}")
+
+    def subscribe(self, since: Optional[int] = None) -> Tuple[Subscriber, List[bytes]]:
+        """
+        Registreer een subscriber (aanroepen op de event loop)
+
+        Args:
+            since: Laatst geziene seq (Last-Event-ID); None = alleen nieuwe events
+
+        Returns:
+            (subscriber, replay frames die eerst verstuurd moeten worden)
+        """
+        replay = []
+        if since is None:
+            last_seq = self.ring.last_seq
+        else:
+            result = self.ring.since(since)
+            if result['fell_behind']:
+                replay.append(format_event('gap', {
+                    'missed': result['missed'],
+                    'oldest_seq': result['oldest_seq']
+                }))
+            replay.extend(format_event('prediction', entry, entry['seq']) for entry in result['entries'])
+            last_seq = result['last_seq']
+
+        subscriber = Subscriber(self.queue_size, last_seq)
+        self.subscribers.append(subscriber)
+        self.stats['subscribers'] = len(self.subscribers)
+        return subscriber, replay
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+        self.stats['subscribers'] = len(self.subscribers)
+
+    async def stream(self, since: Optional[int] = None, heartbeat: float = 15.0,
+                     retry_ms: int = 3000):
+        """
+        Async generator met SSE frames voor één client
+
+        Args:
+            since: Laatst geziene seq (resume), None = alleen nieuwe events
+            heartbeat: Seconden tussen keepalive comments zonder events
+            retry_ms: Reconnect delay hint voor EventSource
+        """
+        subscriber, replay = self.subscribe(since)
+        try:
+            yield f"retry: {retry_ms}\n\n".encode('utf-8')
+            for frame in replay:
+                yield frame
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'last_seq': self.ring.last_seq}
@@ -11,6 +11,8 @@ from scapy.all import sniff, IP, TCP, UDP
 from typing import Dict, Optional
 from inference import load_models, predict_flow
 from firewall_blocker import FirewallBlocker
+from blocker_service import BlockerService
+from load_shedding import OverloadController
 from utils import Logger, Config
 
 class RealtimeAIFirewall:
@@ -32,6 +34,11 @@ class RealtimeAIFirewall:
         
         # Initialize firewall blocker
         self.blocker = FirewallBlocker()
+        self.blocker.reconcile()
+        self.blocker.start_expiry()
+        
+        # Block beslissingen via achtergrond worker (capture loop doet alleen een queue put)
+        self.blocker_service = BlockerService.from_config(self.blocker, self.config)
         
         # Network interface
         self.interface = interface
@@ -40,13 +47,17 @@ class RealtimeAIFirewall:
         self.flows = {}
         self.flow_timeout = 60  # seconds
         
+        # Load shedding bij overbelasting
+        self.overload = OverloadController(self.config)
+        
         # Statistics
         self.stats = {
             'total_packets': 0,
             'total_flows': 0,
             'benign_flows': 0,
             'malicious_flows': 0,
-            'blocked_ips': 0
+            'blocked_ips': 0,
+            'prefiltered_packets': 0
         }
         
         self.logger.info("RealtimeAIFirewall initialized")
@@ -288,11 +299,27 @@ class RealtimeAIFirewall:
         try:
             self.stats['total_packets'] += 1
             
+            # Re-evalueer load ook als er geen verdicts meer binnenkomen
+            self.overload.maybe_evaluate()
+            
             # Get flow key
             flow_key = self.packet_to_flow_key(packet)
             if not flow_key:
                 return
             
+            # Pre-filter: bron valt al onder een actieve block (prefix match)
+            src_ip = packet[IP].src
+            self.blocker.maybe_refresh()
+            if self.blocker.is_blocked(src_ip, refresh=False):
+                self.stats['prefiltered_packets'] += 1
+                self.flows.pop(flow_key, None)
+                return
+            
+            # Load shedding: hele flow in of uit de sample
+            if not self.overload.should_analyze(flow_key, src_ip):
+                self.flows.pop(flow_key, None)
+                return
+            
             # Update flow
             flow_data = self.update_flow(flow_key, packet)
             
@@ -302,8 +329,14 @@ class RealtimeAIFirewall:
                 features = self.packet_to_features(packet, flow_data)
                 
                 if features:
-                    # AI prediction
-                    prediction = predict_flow(features, self.models)
+                    # AI prediction (zonder IF in degraded mode)
+                    started = time.perf_counter()
+                    prediction = predict_flow(
+                        features, self.models,
+                        use_isolation_forest=self.overload.use_isolation_forest
+                    )
+                    self.overload.record_verdict(float(packet.time), time.perf_counter() - started)
+                    self.overload.observe_prediction(src_ip, prediction)
                     
                     # Update stats
                     self.stats['total_flows'] += 1
@@ -315,12 +348,9 @@ class RealtimeAIFirewall:
                         self.logger.warning(f"🚨 MALICIOUS FLOW: {flow_key}")
                         self.logger.warning(f"   Score: {prediction['ensemble_score']:.3f}")
                         
-                        # AUTOMATIC BLOCKING
-                        blocked = self.blocker.process_prediction(features, prediction)
-                        
-                        if blocked:
-                            self.stats['blocked_ips'] += 1
-                            self.logger.warning(f"   ✅ IP BLOCKED: {features['src_ip']}")
+                        # AUTOMATIC BLOCKING (async, resultaat via callback)
+                        self.blocker_service.submit(features, prediction,
+                                                    callback=self.on_block_result)
                     else:
                         self.stats['benign_flows'] += 1
                     
@@ -330,6 +360,12 @@ class RealtimeAIFirewall:
         except Exception as e:
             self.logger.error(f"Error analyzing packet: {e}")
     
+    def on_block_result(self, ip: str, blocked: bool):
+        """Callback van de blocker worker"""
+        if blocked:
+            self.stats['blocked_ips'] += 1
+            self.logger.warning(f"   ✅ IP BLOCKED: {ip}")
+    
     def cleanup_flows(self):
         """Remove expired flows"""
         current_time = time.time()
@@ -342,6 +378,15 @@ class RealtimeAIFirewall:
         for flow_key in expired:
             del self.flows[flow_key]
     
+    def get_stats(self) -> Dict:
+        """Get pipeline statistics inclusief degradation state"""
+        return {
+            **self.stats,
+            'active_flows': len(self.flows),
+            'overload': self.overload.get_stats(),
+            'blocker_worker': self.blocker_service.get_stats()
+        }
+    
     def print_stats(self):
         """Print statistics"""
         print("\n" + "="*60)
@@ -352,9 +397,21 @@ class RealtimeAIFirewall:
         print(f"Benign Flows:      {self.stats['benign_flows']:,}")
         print(f"Malicious Flows:   {self.stats['malicious_flows']:,}")
         print(f"Blocked IPs:       {self.stats['blocked_ips']:,}")
+        print(f"Pre-filtered:      {self.stats['prefiltered_packets']:,}")
         print(f"Active Flows:      {len(self.flows):,}")
         print("="*60)
         
+        # Load shedding stats
+        overload_stats = self.overload.get_stats()
+        print(f"\nLoad Shedding:")
+        print(f"  State:           {overload_stats['state']}")
+        print(f"  Sample rate:     {overload_stats['sample_rate']:.2f}")
+        print(f"  IF scoring:      {overload_stats['isolation_forest_enabled']}")
+        print(f"  Verdict lag:     {overload_stats['lag_seconds']*1000:.1f} ms")
+        print(f"  Utilization:     {overload_stats['inference_utilization']:.0%}")
+        print(f"  Sampled out:     {overload_stats['sampled_out_packets']:,}")
+        print("="*60)
+        
         # Blocker stats
         blocker_stats = self.blocker.get_stats()
         print(f"\nFirewall Blocker:")
@@ -389,6 +446,7 @@ class RealtimeAIFirewall:
             
         except KeyboardInterrupt:
             self.logger.info("\n\nStopping AI Firewall...")
+            self.blocker_service.stop()
             self.print_stats()
             
         except Exception as e:
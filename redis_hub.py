@@ -0,0 +1,259 @@
+"""
+Redis Fan-out Hub
+Eén Redis subscriber per worker process voor het /ws endpoint: berichten op
+het firewall_events channel worden naar alle verbonden websockets verdeeld
+via begrensde queues per client, in plaats van één pubsub (en een poll loop)
+per verbinding.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from utils import Logger
+
+logger = Logger(__name__).logger
+
+# Close code voor een client die de queue niet bijhoudt (RFC 6455: try again later)
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+async def _aclose(resource):
+    # redis-py >= 5.0.1: aclose(), daarvoor close()
+    close = getattr(resource, 'aclose', None) or resource.close
+    await close()
+
+
+class HubClient:
+    """Eén websocket met een begrensde queue van berichten"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size + 1)
+        self.queue_size = queue_size
+        self.evicted = False
+        # Gezet bij eviction: ook een sender die vastzit in send_text stopt
+        self.eviction = asyncio.Event()
+        self.frames_sent = 0
+        self.messages_sent = 0
+
+
+class RedisFanoutHub:
+    """
+    Gedeelde Redis pubsub subscription met fan-out naar websockets
+
+    - Eén subscriber task per process die blokkerend op pubsub.listen()
+      wacht: geen wakeups zonder berichten
+    - Elke client heeft een begrensde queue; een trage client wordt gesloten
+      (1013) en reconnect zelf, de rest merkt er niets van
+    - Berichten die zich ophopen (burst) gaan samen in één frame: een JSON
+      array van de losse berichten (max batch_max per frame)
+
+    Berichten op het channel moeten JSON zijn; enkele berichten worden
+    ongewijzigd doorgestuurd.
+    """
+
+    def __init__(self, redis_url: str = 'redis://localhost:6379', channel: str = 'firewall_events',
+                 queue_size: int = 1000, batch_max: int = 100, batch_window: float = 0.02,
+                 reconnect_delay: float = 1.0, client=None):
+        """
+        Args:
+            redis_url: Redis URL (alleen gebruikt als client None is)
+            channel: Pubsub channel
+            queue_size: Max berichten in de queue per websocket
+            batch_max: Max berichten per websocket frame
+            batch_window: Seconden wachten op meer berichten na het eerste
+                          (0 = alleen samenvoegen wat al klaar staat)
+            reconnect_delay: Start backoff na een Redis fout (verdubbelt tot 30s)
+            client: Bestaande redis.asyncio client (bijv. voor tests)
+        """
+        self.redis_url = redis_url
+        self.channel = channel
+        self.queue_size = queue_size
+        self.batch_max = batch_max
+        self.batch_window = batch_window
+        self.reconnect_delay = reconnect_delay
+        self.client = client
+        self.clients: List[HubClient] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'received': 0, 'frames': 0, 'evicted': 0, 'reconnects': 0}
+
+    # === Subscriber ===
+
+    def start(self):
+        """Start de subscriber task (idempotent, aanroepen op de event loop)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop de subscriber en sluit alle clients"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for client in list(self.clients):
+            self._close(client)
+        if self.client is not None:
+            await _aclose(self.client)
+
+    def _connect(self):
+        if self.client is None:
+            import redis.asyncio as redis
+            self.client = redis.from_url(self.redis_url, decode_responses=True)
+        return self.client
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._connect().pubsub()
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Subscribed to Redis channel '{self.channel}'")
+                delay = self.reconnect_delay
+
+                async for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    self.publish(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['reconnects'] += 1
+                logger.warning(f"Redis subscriber error: {e}; retrying in {delay:.0f}s")
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.unsubscribe(self.channel)
+                        await _aclose(pubsub)
+                    except Exception:
+                        pass
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    # === Fan-out ===
+
+    def publish(self, data: str):
+        """Verdeel één bericht over alle clients (op de event loop)"""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        self.stats['received'] += 1
+        for client in list(self.clients):
+            if client.queue.qsize() >= client.queue_size:
+                self._evict(client)
+                continue
+            client.queue.put_nowait(data)
+
+    def _close(self, client: HubClient):
+        if client in self.clients:
+            self.clients.remove(client)
+        # Extra slot in de queue: de None marker past altijd
+        while client.queue.full():
+            client.queue.get_nowait()
+        client.queue.put_nowait(None)
+
+    def _evict(self, client: HubClient):
+        client.evicted = True
+        # Achterstand is waardeloos: client reconnect en krijgt nieuwe berichten
+        while not client.queue.empty():
+            client.queue.get_nowait()
+        self._close(client)
+        client.eviction.set()
+        self.stats['evicted'] += 1
+        logger.warning(f"Evicted slow websocket client ({self.queue_size} queued messages)")
+
+    def register(self) -> HubClient:
+        client = HubClient(self.queue_size)
+        self.clients.append(client)
+        self.start()
+        return client
+
+    def unregister(self, client: HubClient):
+        if client in self.clients:
+            self.clients.remove(client)
+
+    async def next_frame(self, client: HubClient) -> Optional[str]:
+        """
+        Wacht op het volgende frame voor client
+
+        Returns:
+            Eén bericht, een JSON array van berichten (burst) of None als de
+            client gesloten/evicted is
+        """
+        message = await client.queue.get()
+        if message is None:
+            return None
+
+        if self.batch_window and client.queue.empty():
+            await asyncio.sleep(self.batch_window)
+
+        batch = [message]
+        while len(batch) < self.batch_max and not client.queue.empty():
+            message = client.queue.get_nowait()
+            if message is None:
+                # Marker terugzetten: eerst deze batch nog versturen
+                client.queue.put_nowait(None)
+                break
+            batch.append(message)
+
+        client.messages_sent += len(batch)
+        client.frames_sent += 1
+        self.stats['frames'] += 1
+        if len(batch) == 1:
+            return batch[0]
+        return '[' + ','.join(batch) + ']'
+
+    async def serve(self, websocket):
+        """
+        Stuur hub berichten naar een geaccepteerde websocket tot disconnect
+
+        Een reader task detecteert het sluiten door de client, ook als er
+        geen berichten binnenkomen; bij eviction wordt een lopende send
+        afgebroken.
+        """
+        client = self.register()
+
+        async def sender():
+            while True:
+                frame = await self.next_frame(client)
+                if frame is None:
+                    return
+                await websocket.send_text(frame)
+
+        async def receiver():
+            while True:
+                message = await websocket.receive()
+                if message.get('type') == 'websocket.disconnect':
+                    return
+
+        tasks = [
+            asyncio.ensure_future(sender()),
+            asyncio.ensure_future(receiver()),
+            asyncio.ensure_future(client.eviction.wait())
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.unregister(client)
+
+        for task in done:
+            # Send/receive op een gesloten verbinding: normale disconnect
+            if not task.cancelled() and task.exception():
+                logger.debug(f"WebSocket closed: {task.exception()}")
+
+        if client.evicted:
+            try:
+                await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'clients': len(self.clients),
+            'subscribed': self._task is not None and not self._task.done()
+        }
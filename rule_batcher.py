@@ -0,0 +1,192 @@
+"""
+Batched Firewall Rule Application
+Verzamelt block/unblock operaties in een queue en past ze periodiek toe als
+één transactie (iptables-restore --noflush, ipset restore of nft -f).
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from firewall_backends import FirewallBackend
+from utils import Logger
+
+
+class RuleBatcher:
+    """
+    Coalescing queue voor firewall operaties
+
+    - submit() geeft direct een Future terug (resultaat = bool per operatie)
+    - Achtergrond thread flusht na flush_interval of bij max_batch_size
+    - Meerdere operaties op hetzelfde IP binnen één batch: de laatste wint;
+      de eerdere (superseded) operaties zijn nooit toegepast en krijgen False
+    """
+
+    _STOP = object()
+
+    def __init__(self, backend: FirewallBackend,
+                 flush_interval: float = 0.05,
+                 max_batch_size: int = 500):
+        self.logger = Logger(__name__).logger
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+
+        self.queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'batches': 0,
+            'operations': 0,
+            'applied': 0,
+            'coalesced': 0,
+            'failed': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0
+        }
+
+    def start(self):
+        """Start flush thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='rule-batcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush resterende operaties en stop de thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+
+        if thread and thread.is_alive():
+            self.queue.put(self._STOP)
+            thread.join(timeout)
+
+    def submit(self, action: str, ip: str, reason: str = "Malicious traffic",
+               timeout: Optional[int] = None) -> Future:
+        """
+        Zet operatie in de queue
+
+        Args:
+            action: 'block' of 'unblock'
+            ip: IP adres of prefix
+            reason: Reden voor block
+            timeout: Kernel timeout in seconden (set backends)
+
+        Returns:
+            Future met True/False zodra de batch is toegepast (False ook als
+            een latere operatie op hetzelfde IP in dezelfde batch deze vervangt)
+        """
+        if action not in ('block', 'unblock'):
+            raise ValueError(f"Unknown firewall action: {action}")
+
+        future: Future = Future()
+        self.queue.put({
+            'action': action,
+            'ip': ip,
+            'reason': reason,
+            'timeout': timeout,
+            'future': future
+        })
+
+        if self._thread is None:
+            self.start()
+        return future
+
+    def submit_many(self, ops: List[Dict]) -> List[Future]:
+        """Submit meerdere operaties ({'action', 'ip', 'reason', 'timeout'})"""
+        return [
+            self.submit(op['action'], op['ip'], op.get('reason', 'Malicious traffic'),
+                        op.get('timeout'))
+            for op in ops
+        ]
+
+    def _run(self):
+        """Flush loop"""
+        while True:
+            item = self.queue.get()
+            if item is self._STOP:
+                return
+
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+
+            # Verzamel tot interval verstreken of batch vol is
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self.flush(batch)
+
+            if stopping:
+                self._drain()
+                return
+
+    def _drain(self):
+        """Verwerk alles wat nog in de queue staat (bij stop)"""
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                batch.append(item)
+
+        for i in range(0, len(batch), self.max_batch_size):
+            self.flush(batch[i:i + self.max_batch_size])
+
+    def flush(self, batch: List[Dict]):
+        """Coalesce en pas een batch toe; resolve alle futures"""
+        started = time.perf_counter()
+
+        # Laatste operatie per IP wint
+        latest: Dict[str, int] = {}
+        for i, item in enumerate(batch):
+            latest[item['ip']] = i
+        ops = [batch[i] for i in sorted(latest.values())]
+
+        try:
+            results = self.backend.apply_batch(ops)
+        except Exception as e:
+            self.logger.error(f"Batch apply failed: {e}")
+            results = [False] * len(ops)
+
+        # Alleen de toegepaste operatie krijgt het backend resultaat
+        applied = set(latest.values())
+        for op, ok in zip(ops, results):
+            op['future'].set_result(ok)
+        for i, item in enumerate(batch):
+            if i not in applied:
+                item['future'].set_result(False)
+
+        self.stats['batches'] += 1
+        self.stats['operations'] += len(batch)
+        self.stats['applied'] += len(ops)
+        self.stats['coalesced'] += len(batch) - len(ops)
+        self.stats['failed'] += sum(1 for ok in results if not ok)
+        self.stats['last_batch_size'] = len(ops)
+        self.stats['last_flush_ms'] = (time.perf_counter() - started) * 1000
+
+    def get_stats(self) -> Dict:
+        """Get batching statistics"""
+        return {
+            **self.stats,
+            'pending': self.queue.qsize(),
+            'flush_interval': self.flush_interval,
+            'max_batch_size': self.max_batch_size
+        }
@@ -0,0 +1,430 @@
+"""
+Shared State
+Gedeelde state voor uvicorn workers op dezelfde host, via mmap bestanden:
+
+- SharedPredictionRing: recente predictions met één doorlopende sequence
+  (zelfde interface als PredictionRing), zodat elke worker dezelfde
+  /predictions/recent en /predictions/stream ziet
+- SharedCounters: cumulatieve en rolling (per seconde) counters, één
+  regio per worker
+
+Lezen is een geheugen read (geen round trip naar een ander proces). Data
+schrijven gebeurt zonder locks; alleen het reserveren van sequence numbers
+(één keer per batch) en het claimen van een counter regio (bij startup)
+gebruiken een korte flock.
+
+Zonder fcntl (Windows) valt open_shared_state terug op per-worker state.
+Een counter regio hoort bij een proces (utils.process_identity), niet bij
+een PID: een hergebruikt PID neemt geen regio over van een levende worker en
+houdt een regio van een gestopte worker niet vast.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from prediction_buffer import PredictionRing
+from utils import Logger, pid_alive, process_identity
+
+logger = Logger(__name__).logger
+
+_RING_MAGIC = 0x41494652494e4731  # 'AIFRING1'
+_COUNTER_MAGIC = 0x414946434e545232  # 'AIFCNTR2'
+
+# Ring header: magic, capacity, slot_bytes, next_seq
+_RING_HEADER = struct.Struct('<QQQQ')
+# Slot header: seq (0 = wordt geschreven), payload lengte
+_SLOT_HEADER = struct.Struct('<qI')
+
+COUNTER_FIELDS = ('predictions', 'malicious')
+
+# Per counter regio vóór de totalen: pid en identiteit van de eigenaar
+_OWNER_CELLS = 2
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+@contextmanager
+def _flock(fd: int):
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _identity_cell(identity: Optional[str]) -> float:
+    """process_identity als float64 cel (52 bits, exact representeerbaar; 0 = onbekend)"""
+    if identity is None:
+        return 0.0
+    return float(int(hashlib.sha1(identity.encode('utf-8')).hexdigest()[:13], 16) or 1)
+
+
+def _owner_alive(pid: int, identity: float) -> bool:
+    """Is pid nog het proces dat de regio claimde?"""
+    if not identity:
+        return pid_alive(pid)  # Geen identiteit beschikbaar bij het claimen
+    return _identity_cell(process_identity(pid)) == identity
+
+
+def _open_mapping(path: Path, size: int, header: bytes) -> Tuple[int, mmap.mmap]:
+    """
+    Open (of initialiseer) een mmap bestand
+
+    header bevat magic en geometrie; wijkt die af (of is het bestand nieuw),
+    dan wordt het bestand leeg opnieuw opgezet.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    with _flock(fd):
+        if os.fstat(fd).st_size != size or os.pread(fd, len(header), 0) != header:
+            if os.fstat(fd).st_size:
+                logger.info(f"Re-initializing shared state file {path}")
+            os.ftruncate(fd, size)
+            os.pwrite(fd, bytes(size), 0)
+            os.pwrite(fd, header, 0)
+    return fd, mmap.mmap(fd, size)
+
+
+class SharedPredictionRing:
+    """
+    Ring buffer in een mmap bestand, gedeeld door alle workers
+
+    - Sequence numbers zijn globaal en aaneengesloten (zoals PredictionRing)
+    - extend() reserveert N sequence numbers onder een flock en schrijft de
+      slots daarna zonder lock: slot seq op 0, payload, dan de echte seq
+    - Lezers valideren de seq voor en na het lezen van de payload (seqlock);
+      een slot dat net overschreven wordt telt als gemist
+    - last_seq is de hoogste seq waarvoor alles ervoor geschreven is; een slot
+      dat langer dan stall_timeout onvolledig blijft (gecrashte writer) wordt
+      overgeslagen
+    """
+
+    def __init__(self, path: str, capacity: int = 100, slot_bytes: int = 1024,
+                 stall_timeout: float = 1.0):
+        """
+        Args:
+            path: Bestand (bijv. logs/shared/predictions.ring)
+            capacity: Aantal entries dat bewaard blijft
+            slot_bytes: Max grootte van één entry als JSON (inclusief slot header)
+            stall_timeout: Seconden voordat een onvolledig slot overgeslagen wordt
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        self.slot_bytes = slot_bytes
+        self.stall_timeout = stall_timeout
+        self.path = Path(path)
+
+        header = struct.pack('<QQQ', _RING_MAGIC, capacity, slot_bytes)
+        size = _RING_HEADER.size + capacity * slot_bytes
+        self._fd, self._map = _open_mapping(self.path, size, header)
+        if self._next_seq() == 0:
+            struct.pack_into('<Q', self._map, 24, 1)
+
+        self._lock = threading.Lock()
+        # flock sluit alleen andere processen uit, niet threads met dezelfde fd
+        self._reserve_lock = threading.Lock()
+        self._committed = self._next_seq() - 1
+        self._stalled: Optional[Tuple[int, float]] = None
+
+    # === Slots ===
+
+    def _next_seq(self) -> int:
+        return struct.unpack_from('<Q', self._map, 24)[0]
+
+    def _offset(self, seq: int) -> int:
+        return _RING_HEADER.size + (seq % self.capacity) * self.slot_bytes
+
+    def _encode(self, entry: Dict) -> bytes:
+        payload = _dumps(entry)
+        limit = self.slot_bytes - _SLOT_HEADER.size
+        if len(payload) <= limit:
+            return payload
+
+        # Entry verkleinen tot hij past; nooit de JSON zelf afknippen (dan is
+        # het slot onleesbaar en ziet geen lezer de truncated vlag).
+        # Eerst geneste velden (flow details), dan de langste strings inkorten,
+        # als laatste hele velden.
+        entry = {k: v for k, v in entry.items() if not isinstance(v, (dict, list))}
+        entry['truncated'] = True
+        while True:
+            payload = _dumps(entry)
+            excess = len(payload) - limit
+            if excess <= 0:
+                return payload
+            strings = [k for k, v in entry.items() if isinstance(v, str) and v]
+            if strings:
+                # Elk teken is minstens één byte: excess tekens eraf is genoeg of bijna
+                key = max(strings, key=lambda k: len(entry[k]))
+                entry[key] = entry[key][:max(0, len(entry[key]) - excess)]
+                continue
+            fields = [k for k in entry if k != 'truncated']
+            if not fields:
+                raise ValueError(f"slot_bytes {self.slot_bytes} too small for a prediction entry")
+            del entry[max(fields, key=lambda k: len(_dumps(entry[k])))]
+
+    def _write(self, seq: int, payload: bytes):
+        offset = self._offset(seq)
+        _SLOT_HEADER.pack_into(self._map, offset, 0, len(payload))
+        self._map[offset + _SLOT_HEADER.size:offset + _SLOT_HEADER.size + len(payload)] = payload
+        _SLOT_HEADER.pack_into(self._map, offset, seq, len(payload))
+
+    def _read(self, seq: int) -> Optional[Dict]:
+        offset = self._offset(seq)
+        found, length = _SLOT_HEADER.unpack_from(self._map, offset)
+        if found != seq:
+            return None
+        payload = self._map[offset + _SLOT_HEADER.size:offset + _SLOT_HEADER.size + length]
+        if _SLOT_HEADER.unpack_from(self._map, offset)[0] != seq:
+            return None  # Overschreven tijdens het lezen
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def _is_committed(self, seq: int) -> bool:
+        return _SLOT_HEADER.unpack_from(self._map, self._offset(seq))[0] == seq
+
+    def _advance(self) -> int:
+        """Schuif de committed watermark op (amortized O(nieuwe entries))"""
+        reserved = self._next_seq() - 1
+        if self._committed > reserved:
+            # Bestand opnieuw geïnitialiseerd
+            self._committed = reserved
+        seq = max(self._committed, reserved - self.capacity)
+        while seq < reserved:
+            if self._is_committed(seq + 1):
+                seq += 1
+                continue
+            now = time.monotonic()
+            if self._stalled is None or self._stalled[0] != seq + 1:
+                self._stalled = (seq + 1, now)
+                break
+            if now - self._stalled[1] < self.stall_timeout:
+                break
+            logger.warning(f"Skipping stalled prediction slot {seq + 1}")
+            seq += 1
+        self._committed = seq
+        return seq
+
+    # === PredictionRing interface ===
+
+    @property
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._advance()
+
+    @property
+    def oldest_seq(self) -> int:
+        last = self.last_seq
+        return max(1, last - self.capacity + 1) if last else 0
+
+    def __len__(self) -> int:
+        return min(self.last_seq, self.capacity)
+
+    def append(self, entry: Dict) -> int:
+        return self.extend([entry])
+
+    def extend(self, entries: List[Dict]) -> int:
+        """Voeg entries toe (krijgen een 'seq' veld); geeft de laatste seq terug"""
+        if not entries:
+            return self.last_seq
+        with self._reserve_lock, _flock(self._fd):
+            first = self._next_seq()
+            struct.pack_into('<Q', self._map, 24, first + len(entries))
+        for seq, entry in enumerate(entries, first):
+            entry['seq'] = seq
+            self._write(seq, self._encode(entry))
+        return first + len(entries) - 1
+
+    def _range(self, first: int, last: int) -> Tuple[List[Dict], int]:
+        entries = []
+        lost = 0
+        for seq in range(first, last + 1):
+            entry = self._read(seq)
+            if entry is None:
+                lost += 1
+            else:
+                entries.append(entry)
+        return entries, lost
+
+    def since(self, seq: int, limit: Optional[int] = None) -> Dict:
+        """Zelfde resultaat als PredictionRing.since"""
+        with self._lock:
+            last = self._advance()
+        oldest = max(1, last - self.capacity + 1) if last else 0
+
+        if seq > last:
+            seq = 0
+
+        first = seq + 1
+        missed = 0
+        if last and first < oldest:
+            missed = oldest - first
+            first = oldest
+
+        if limit is not None:
+            last = min(last, first + limit - 1)
+        entries, lost = self._range(first, last) if last >= first else ([], 0)
+        missed += lost
+
+        return {
+            'entries': entries,
+            'last_seq': last,
+            'oldest_seq': oldest,
+            'fell_behind': missed > 0,
+            'missed': missed
+        }
+
+    def latest(self, n: int) -> List[Dict]:
+        last = self.last_seq
+        if not last:
+            return []
+        first = max(1, last - min(n, self.capacity) + 1)
+        return self._range(first, last)[0]
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class SharedCounters:
+    """
+    Counters per worker regio (één writer per regio, dus geen locks)
+
+    Per regio: cumulatieve totalen en een ring van per-seconde buckets voor
+    rolling windows. Lezers tellen alle regio's op; regio's van gestopte
+    workers blijven meetellen en worden door een nieuwe worker voortgezet.
+    """
+
+    def __init__(self, path: Optional[str] = None, regions: int = 32, window: int = 300):
+        """
+        Args:
+            path: Bestand (None = alleen in dit process)
+            regions: Max gelijktijdige workers
+            window: Seconden historie voor rolling counters
+        """
+        self.window = window
+        self.fields = len(COUNTER_FIELDS)
+        # Per regio: pid, identiteit, totalen, bucket seconden, buckets
+        self.region_cells = _OWNER_CELLS + self.fields + window + window * self.fields
+        header = struct.pack('<QQQQ', _COUNTER_MAGIC, regions, self.fields, window)
+        cells = regions * self.region_cells
+
+        if path:
+            self._fd, self._map = _open_mapping(Path(path), len(header) + cells * 8, header)
+            data = np.ndarray((regions, self.region_cells), dtype=np.float64,
+                              buffer=self._map, offset=len(header))
+        else:
+            self._fd, self._map = None, None
+            data = np.zeros((regions, self.region_cells))
+        self._data = data
+        self._lock = threading.Lock()
+        self._region = self._claim()
+
+    def _claim(self) -> np.ndarray:
+        pid = os.getpid()
+        identity = _identity_cell(process_identity(pid))
+        lock = _flock(self._fd) if self._fd is not None else threading.Lock()
+        with lock:
+            for region in self._data:
+                owner = int(region[0])
+                if (owner == 0 or (owner == pid and region[1] == identity)
+                        or not _owner_alive(owner, region[1])):
+                    region[0] = pid
+                    region[1] = identity
+                    return region
+        raise RuntimeError(f"No free shared counter region ({len(self._data)} workers)")
+
+    def add(self, **values: int):
+        """Tel op bij de counters van deze worker (bijv. predictions=10, malicious=2)"""
+        second = int(time.time())
+        index = second % self.window
+        region = self._region
+        f = self.fields
+        o = _OWNER_CELLS
+        bucket = o + f + self.window + index * f
+        with self._lock:
+            if region[o + f + index] != second:
+                region[bucket:bucket + f] = 0
+                region[o + f + index] = second
+            for i, name in enumerate(COUNTER_FIELDS):
+                if name in values:
+                    region[o + i] += values[name]
+                    region[bucket + i] += values[name]
+
+    def totals(self) -> Dict[str, int]:
+        sums = self._data[:, _OWNER_CELLS:_OWNER_CELLS + self.fields].sum(axis=0)
+        return {name: int(sums[i]) for i, name in enumerate(COUNTER_FIELDS)}
+
+    def rolling(self, seconds: int = 60) -> Dict[str, int]:
+        """Som over de laatste seconds seconden (max window)"""
+        f = self.fields
+        now = int(time.time())
+        o = _OWNER_CELLS
+        stamps = self._data[:, o + f:o + f + self.window]
+        buckets = self._data[:, o + f + self.window:].reshape(len(self._data), self.window, f)
+        recent = (stamps > now - min(seconds, self.window)) & (stamps <= now)
+        sums = (buckets * recent[:, :, None]).sum(axis=(0, 1))
+        return {name: int(sums[i]) for i, name in enumerate(COUNTER_FIELDS)}
+
+    def workers(self) -> int:
+        return sum(1 for owner, identity in self._data[:, :_OWNER_CELLS]
+                   if owner and _owner_alive(int(owner), identity))
+
+    def close(self):
+        if self._map is not None:
+            del self._region, self._data
+            self._map.close()
+            os.close(self._fd)
+
+
+def open_shared_state(config) -> Tuple[object, SharedCounters]:
+    """
+    Ring en counters volgens api.shared_state
+
+    Returns:
+        (ring, counters): mmap backend = gedeeld tussen workers,
+        memory (of geen fcntl) = per worker (PredictionRing)
+    """
+    capacity = config.get('api.recent_predictions', 100)
+    window = config.get('api.shared_state.window_seconds', 300)
+    backend = config.get('api.shared_state.backend', 'mmap')
+    if backend == 'mmap' and fcntl is None:
+        # flock en pread/pwrite ontbreken (Windows)
+        logger.warning("Shared state needs fcntl; falling back to per-worker state")
+    elif backend == 'mmap':
+        shared_dir = Path(config.get('api.shared_state.dir', 'logs/shared'))
+        try:
+            ring = SharedPredictionRing(
+                str(shared_dir / 'predictions.ring'), capacity,
+                slot_bytes=config.get('api.shared_state.slot_bytes', 1024)
+            )
+            counters = SharedCounters(str(shared_dir / 'counters.bin'), window=window)
+            return ring, counters
+        except OSError as e:
+            logger.warning(f"Shared state unavailable ({e}); falling back to per-worker state")
+    return PredictionRing(capacity), SharedCounters(window=window)
@@ -0,0 +1,280 @@
+"""
+Simulated Kernel Table voor de simulated firewall backend
+In-process model van een iptables chain of een ipset/nftables hash set, zodat
+het blocking pad zonder root gebenchmarkt en getest kan worden.
+"""
+
+import bisect
+import time
+from typing import Callable, Dict, List, Optional
+
+from cidr_table import CidrTable, format_prefix, parse_prefix
+
+
+class SimulatedKernel:
+    """
+    Kernel block tabel met kostenmodel
+
+    Elke operatie telt 'evaluations' (regels of hash probes die de kernel zou
+    aflopen) en een gemodelleerde kernel tijd in ns:
+
+    - chain: een packet loopt de regels lineair af tot de eerste match (bij een
+      miss: de hele chain); elke -A/-D herschrijft de volledige ruleset.
+    - set: één hash probe per gebruikte prefix lengte (hash:net), insert en
+      delete zijn één probe; per-element timeouts worden ondersteund.
+
+    Alle operaties worden geregistreerd in `ops` (uit te zetten met record=False).
+    """
+
+    MODES = ('chain', 'set')
+
+    def __init__(self, mode: str = 'set', rule_cost_ns: float = 25.0,
+                 probe_cost_ns: float = 80.0, op_latency: float = 0.0,
+                 record: bool = True, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            mode: 'chain' (regel per IP) of 'set' (hash set achter één regel)
+            rule_cost_ns: Gemodelleerde kosten per chain regel evaluatie
+            probe_cost_ns: Gemodelleerde kosten per hash probe
+            op_latency: Echte vertraging per update operatie (seconden), zoals een syscall
+            record: Operaties registreren in self.ops
+            clock: Tijdbron voor timeouts
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown kernel mode: {mode} (choose from {', '.join(self.MODES)})")
+
+        self.mode = mode
+        self.rule_cost_ns = rule_cost_ns
+        self.probe_cost_ns = probe_cost_ns
+        self.op_latency = op_latency
+        self.record = record
+        self.clock = clock
+
+        # prefix -> {'seq', 'reason', 'expires'}; seq bepaalt de positie in de chain
+        self.entries: Dict[str, Dict] = {}
+        self.table = CidrTable()
+        self._order: Dict[int, List[int]] = {4: [], 6: []}
+        self._seq = 0
+
+        self.ops: List[Dict] = []
+        self.stats = {
+            'block': 0,
+            'unblock': 0,
+            'match': 0,
+            'transactions': 0,
+            'failed': 0,
+            'evaluations': 0,
+            'modeled_ns': 0.0
+        }
+
+    @staticmethod
+    def _key(ip: str) -> str:
+        return format_prefix(*parse_prefix(ip))
+
+    def _rules(self, version: int) -> int:
+        return len(self._order[version])
+
+    def _update_cost(self, version: int) -> int:
+        """Evaluations voor een insert/delete"""
+        return max(1, self._rules(version)) if self.mode == 'chain' else 1
+
+    def _account(self, action: str, ip: str, ok: bool, evaluations: int):
+        cost = self.rule_cost_ns if self.mode == 'chain' else self.probe_cost_ns
+        self.stats['evaluations'] += evaluations
+        self.stats['modeled_ns'] += evaluations * cost
+        if not ok:
+            self.stats['failed'] += 1
+        if self.record:
+            self.ops.append({
+                'ts': self.clock(),
+                'action': action,
+                'ip': ip,
+                'ok': ok,
+                'evaluations': evaluations,
+                'modeled_ns': evaluations * cost
+            })
+
+    def _live(self, prefix: str, entry: Dict) -> bool:
+        """False (en verwijderd) als de timeout verlopen is"""
+        if entry['expires'] is not None and entry['expires'] <= self.clock():
+            self._remove(prefix, entry)
+            return False
+        return True
+
+    def _remove(self, prefix: str, entry: Dict):
+        order = self._order[entry['version']]
+        index = bisect.bisect_left(order, entry['seq'])
+        if index < len(order) and order[index] == entry['seq']:
+            del order[index]
+        del self.entries[prefix]
+        self.table.remove(prefix)
+
+    def _find(self, ip: str):
+        """Exacte (prefix, entry) voor ip/prefix, of None"""
+        prefix = self._key(ip)
+        entry = self.entries.get(prefix)
+        if entry is None or not self._live(prefix, entry):
+            return None
+        return prefix, entry
+
+    def _insert(self, ip: str, reason: str, timeout: Optional[int]):
+        existing = self._find(ip)
+        expires = self.clock() + timeout if timeout else None
+
+        if existing is not None:
+            # -exist semantiek: alleen reason/timeout bijwerken
+            existing[1].update(reason=reason, expires=expires)
+            return
+
+        version, prefixlen, key = parse_prefix(ip)
+        prefix = format_prefix(version, prefixlen, key)
+        self._seq += 1
+        entry = {'seq': self._seq, 'version': version, 'reason': reason, 'expires': expires}
+        self.entries[prefix] = entry
+        self.table.add(prefix, entry)
+        self._order[version].append(self._seq)
+
+    def add(self, ip: str, reason: str = '', timeout: Optional[int] = None) -> bool:
+        """Block ip/prefix; timeout alleen in set mode"""
+        if self.op_latency:
+            time.sleep(self.op_latency)
+        try:
+            version = parse_prefix(ip)[0]
+        except ValueError:
+            self._account('block', ip, False, 0)
+            return False
+        if timeout and self.mode == 'chain':
+            # Chains kennen geen per-regel timeouts
+            self._account('block', ip, False, 0)
+            return False
+
+        evaluations = self._update_cost(version)
+        self._insert(ip, reason, timeout)
+        self.stats['block'] += 1
+        self._account('block', ip, True, evaluations)
+        return True
+
+    def delete(self, ip: str) -> bool:
+        """Unblock exacte ip/prefix; False als hij niet bestaat"""
+        if self.op_latency:
+            time.sleep(self.op_latency)
+        try:
+            version = parse_prefix(ip)[0]
+        except ValueError:
+            self._account('unblock', ip, False, 0)
+            return False
+
+        evaluations = self._update_cost(version)
+        existing = self._find(ip)
+        if existing is None:
+            self._account('unblock', ip, False, evaluations)
+            return False
+
+        self._remove(*existing)
+        self.stats['unblock'] += 1
+        self._account('unblock', ip, True, evaluations)
+        return True
+
+    def transaction(self, ops: List[Dict]) -> bool:
+        """
+        Atomaire batch (iptables-restore / nft -f): alles of niets
+
+        In chain mode wordt de ruleset één keer herschreven, in set mode kost
+        elke operatie één probe. Een unblock van een ontbrekende entry laat de
+        hele transactie falen.
+        """
+        if self.op_latency:
+            time.sleep(self.op_latency)
+
+        pending = set()
+        for op in ops:
+            try:
+                parse_prefix(op['ip'])
+            except ValueError:
+                return self._fail_transaction(ops)
+            if op['action'] == 'unblock' and self._find(op['ip']) is None and op['ip'] not in pending:
+                return self._fail_transaction(ops)
+            if op['action'] == 'block':
+                if op.get('timeout') and self.mode == 'chain':
+                    return self._fail_transaction(ops)
+                pending.add(op['ip'])
+            else:
+                pending.discard(op['ip'])
+
+        if self.mode == 'chain':
+            evaluations = max(1, self._rules(4) + self._rules(6))
+        else:
+            evaluations = len(ops)
+
+        for op in ops:
+            if op['action'] == 'block':
+                self._insert(op['ip'], op.get('reason', ''), op.get('timeout'))
+                self.stats['block'] += 1
+            else:
+                found = self._find(op['ip'])
+                if found is not None:
+                    self._remove(*found)
+                self.stats['unblock'] += 1
+
+        self.stats['transactions'] += 1
+        self._account('transaction', f'{len(ops)} ops', True, evaluations)
+        return True
+
+    def _fail_transaction(self, ops: List[Dict]) -> bool:
+        self._account('transaction', f'{len(ops)} ops', False, 0)
+        return False
+
+    def _classify(self, ip: str):
+        """(match, evaluations) voor een packet van ip"""
+        version = parse_prefix(ip)[0]
+        found = self.table.lookup(ip)
+        while found is not None and not self._live(*found):
+            found = self.table.lookup(ip)
+
+        if self.mode == 'chain':
+            # Eerste matchende regel; bij een miss wordt de hele chain afgelopen
+            order = self._order[version]
+            evaluations = bisect.bisect_left(order, found[1]['seq']) + 1 if found else len(order)
+        else:
+            evaluations = len(self.table.prefix_lengths()[version])
+        return found is not None, max(1, evaluations)
+
+    def match(self, ip: str) -> bool:
+        """
+        Classificeer een packet van ip (zoals de kernel doet)
+
+        Returns:
+            True als het packet gedropt wordt
+        """
+        dropped, evaluations = self._classify(ip)
+        self.stats['match'] += 1
+        self._account('match', ip, dropped, evaluations)
+        return dropped
+
+    def packet_cost_ns(self, ip: str) -> float:
+        """Gemodelleerde kernel tijd om één packet van ip te classificeren (niet geregistreerd)"""
+        cost = self.rule_cost_ns if self.mode == 'chain' else self.probe_cost_ns
+        return self._classify(ip)[1] * cost
+
+    def list(self) -> List[str]:
+        """Actieve entries in chain/insert volgorde"""
+        live = [(entry['seq'], prefix) for prefix, entry in list(self.entries.items())
+                if self._live(prefix, entry)]
+        return [prefix for _, prefix in sorted(live)]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def flush(self):
+        """Verwijder alle entries (teardown)"""
+        self.entries.clear()
+        self.table.clear()
+        self._order = {4: [], 6: []}
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'mode': self.mode,
+            'entries': len(self.entries),
+            'recorded_ops': len(self.ops)
+        }
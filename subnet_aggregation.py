@@ -0,0 +1,74 @@
+"""
+Subnet Aggregation Policy
+Bepaalt wanneer losse host blocks binnen een prefix vervangen worden door één
+prefix block, en wanneer die weer opgesplitst wordt.
+"""
+
+from typing import Dict, Optional
+
+from cidr_table import MAX_PREFIXLEN, format_prefix, parse_prefix
+
+
+class AggregationPolicy:
+    """
+    Density policy voor prefix aggregatie
+
+    Zodra min_members host blocks in dezelfde /ipv4_prefix (of /ipv6_prefix)
+    vallen, worden ze één kernel regel. Daalt het aantal actieve members onder
+    split_below, dan worden de resterende members weer losse regels.
+    """
+
+    def __init__(self, enabled: bool = False, ipv4_prefix: int = 24,
+                 ipv6_prefix: int = 64, min_members: int = 16,
+                 split_below: Optional[int] = None):
+        """
+        Args:
+            enabled: Aggregatie aan/uit
+            ipv4_prefix: Prefix lengte voor IPv4 aggregaten
+            ipv6_prefix: Prefix lengte voor IPv6 aggregaten
+            min_members: Aantal host blocks binnen de prefix om te aggregeren
+            split_below: Opsplitsen onder dit aantal members (default min_members / 2)
+        """
+        self.enabled = enabled
+        self.prefixlen = {4: ipv4_prefix, 6: ipv6_prefix}
+        self.min_members = max(2, min_members)
+        self.split_below = split_below if split_below is not None else max(1, self.min_members // 2)
+
+    @classmethod
+    def from_config(cls, config) -> 'AggregationPolicy':
+        """Policy uit firewall.aggregation config"""
+        return cls(
+            enabled=config.get('firewall.aggregation.enabled', False),
+            ipv4_prefix=config.get('firewall.aggregation.ipv4_prefix', 24),
+            ipv6_prefix=config.get('firewall.aggregation.ipv6_prefix', 64),
+            min_members=config.get('firewall.aggregation.min_members', 16),
+            split_below=config.get('firewall.aggregation.split_below', None)
+        )
+
+    def parent(self, ip: str) -> Optional[str]:
+        """Aggregatie prefix voor een host adres (None voor prefixes of ongeldige input)"""
+        try:
+            version, prefixlen, key = parse_prefix(ip)
+        except ValueError:
+            return None
+
+        bits = MAX_PREFIXLEN[version]
+        target = self.prefixlen[version]
+        if prefixlen != bits or target >= bits:
+            return None
+        return format_prefix(version, target, key >> (bits - target))
+
+    def should_aggregate(self, members: int) -> bool:
+        return self.enabled and members >= self.min_members
+
+    def should_split(self, members: int) -> bool:
+        return members < self.split_below
+
+    def get_config(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'ipv4_prefix': self.prefixlen[4],
+            'ipv6_prefix': self.prefixlen[6],
+            'min_members': self.min_members,
+            'split_below': self.split_below
+        }
@@ -7,12 +7,13 @@ import json
 import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 import asyncio
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 from inference import AIFirewallInference
+from eve_tailer import EveTailer
 from utils import Logger, PredictionLogger
 
 class SuricataEveParser:
@@ -126,7 +127,7 @@ class SuricataIntegration:
             'errors': 0
         }
         
-    def process_eve_line(self, line: str):
+    def process_eve_line(self, line: Union[str, bytes]):
         """
         Process single EVE JSON line
         
@@ -184,32 +185,30 @@ class SuricataIntegration:
     def tail_eve_log(self):
         """
         Tail EVE log file (zoals tail -f)
+        
+        Wacht via inotify op nieuwe regels en overleeft logrotate (zie eve_tailer.py)
         """
         self.logger.info(f"📡 Monitoring Suricata EVE log: {self.eve_log_path}")
         
+        tailer = EveTailer(self.eve_log_path)
+        last_stats = time.time()
         try:
-            with open(self.eve_log_path, 'r') as f:
-                # Ga naar einde van file
-                f.seek(0, 2)
+            for lines in tailer.batches():
+                for line in lines:
+                    self.process_eve_line(line)
                 
-                while True:
-                    line = f.readline()
-                    
-                    if line:
-                        self.process_eve_line(line.strip())
-                    else:
-                        # Wacht op nieuwe data
-                        time.sleep(0.1)
-                        
-                        # Print stats elke 10 seconden
-                        if self.stats['total_flows'] % 100 == 0 and self.stats['total_flows'] > 0:
-                            self.print_stats()
+                # Print stats elke 10 seconden
+                if time.time() - last_stats >= 10 and self.stats['total_flows'] > 0:
+                    self.print_stats()
+                    last_stats = time.time()
                             
         except KeyboardInterrupt:
             self.logger.info("\n⏹️  Stopping Suricata integration...")
             self.print_stats()
         except Exception as e:
             self.logger.error(f"Error tailing EVE log: {e}")
+        finally:
+            tailer.close()
     
     def print_stats(self):
         """Print statistieken"""
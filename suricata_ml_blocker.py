@@ -14,8 +14,12 @@ import redis
 
 from utils import Logger, Config
 from firewall_blocker import FirewallBlocker
+from blocker_service import BlockerService
 from suricata_integration import SuricataEveParser
+from eve_tailer import EveTailer
 from inference import AIFirewallInference
+import metrics
+from metrics import timed
 
 class SuricataMLBlocker:
     """
@@ -30,6 +34,9 @@ class SuricataMLBlocker:
         
         # Initialize components
         self.blocker = FirewallBlocker()
+        self.blocker.reconcile()
+        self.blocker.start_expiry()
+        self.blocker_service = BlockerService.from_config(self.blocker, self.config)
         self.suricata_parser = SuricataEveParser()
         self.ml_engine = AIFirewallInference()
         
@@ -233,7 +240,7 @@ class SuricataMLBlocker:
             self.logger.error(f"Error processing alert: {e}")
     
     def block_ip(self, ip: str, reason: str, threat_score: float):
-        """Block IP address"""
+        """Block IP address (async via de blocker worker)"""
         flow_data = {'src_ip': ip}
         result = {
             'prediction': 'MALICIOUS',
@@ -242,53 +249,45 @@ class SuricataMLBlocker:
             'isolation_forest_score': -1
         }
         
-        blocked = self.blocker.process_prediction(flow_data, result, reason=reason)
+        def on_result(ip: str, blocked: bool):
+            if blocked:
+                self.stats['blocked'] += 1
+                self.logger.warning(f"[BLOCKED] {ip} - {reason}")
+            else:
+                self.logger.info(f"[NOT BLOCKED] {ip} (whitelisted, already blocked or auto-block off)")
         
-        if blocked:
-            self.stats['blocked'] += 1
-            self.logger.warning(f"[BLOCKED] {ip} - {reason}")
-        else:
-            self.logger.error(f"[FAILED] Could not block {ip}")
+        self.blocker_service.submit(flow_data, result, reason=reason, callback=on_result)
     
     def tail_eve_log(self):
-        """Tail Suricata EVE JSON log"""
+        """Tail Suricata EVE JSON log (inotify, rotation-safe; zie eve_tailer.py)"""
         self.logger.info(f"Monitoring Suricata EVE log: {self.eve_log}")
         
         if not self.eve_log.exists():
-            self.logger.error(f"EVE log not found: {self.eve_log}")
+            self.logger.warning(f"EVE log not found: {self.eve_log}")
             self.logger.info("Waiting for Suricata to start...")
-            time.sleep(10)
         
-        # Open log file
-        with open(self.eve_log, 'r') as f:
-            # Go to end
-            f.seek(0, 2)
-            
-            while True:
-                line = f.readline()
-                
-                if not line:
-                    time.sleep(0.1)  # Wait for new data
-                    continue
-                
-                try:
-                    event = json.loads(line)
-                    event_type = event.get('event_type')
-                    
-                    # Process events
-                    if event_type == 'alert':
-                        self.process_alert(event)
-                    elif event_type == 'flow':
-                        self.process_flow(event)
-                    elif event_type == 'stats':
-                        self.process_stats(event)
-                    
-                except json.JSONDecodeError:
-                    continue
-                except KeyboardInterrupt:
-                    break
-                except Exception as e:
-                    self.logger.error(f"Error reading EVE log: {e}")
+        tailer = EveTailer(self.eve_log)
+        try:
+            for lines in tailer.batches():
+                for line in lines:
+                    try:
+                        event = json.loads(line)
+                        event_type = event.get('event_type')
+                        
+                        # Process events
+                        if event_type == 'alert':
+                            self.process_alert(event)
+                        elif event_type == 'flow':
+                            self.process_flow(event)
+                        elif event_type == 'stats':
+                            self.process_stats(event)
+                        
+                    except json.JSONDecodeError:
+                        continue
+                    except Exception as e:
+                        self.logger.error(f"Error processing EVE event: {e}")
+        finally:
+            tailer.close()
     
     def process_flow(self, event: Dict):
         """Process flow event (for stats)"""
@@ -315,8 +314,11 @@ class SuricataMLBlocker:
                 'blocked': self.stats['blocked'],
                 'timestamp': datetime.now().isoformat()
             }
-            self.redis.publish('firewall_events', json.dumps(stats_data))
+            with timed('redis_publish'):
+                self.redis.publish('firewall_events', json.dumps(stats_data))
+            metrics.inc('redis_publish_total', 'ok')
         except Exception as e:
+            metrics.inc('redis_publish_total', 'failed')
             self.logger.error(f"Failed to publish stats: {e}")
 
     def publish_alert(self, alert_data: Dict):
@@ -327,8 +329,11 @@ class SuricataMLBlocker:
         try:
             alert_data['type'] = 'alert'
             alert_data['timestamp'] = datetime.now().isoformat()
-            self.redis.publish('firewall_events', json.dumps(alert_data))
+            with timed('redis_publish'):
+                self.redis.publish('firewall_events', json.dumps(alert_data))
+            metrics.inc('redis_publish_total', 'ok')
         except Exception as e:
+            metrics.inc('redis_publish_total', 'failed')
             self.logger.error(f"Failed to publish alert: {e}")
     
     def print_stats(self):
@@ -360,6 +365,7 @@ class SuricataMLBlocker:
             self.tail_eve_log()
         except KeyboardInterrupt:
             self.logger.info("\nShutting down...")
+            self.blocker_service.stop()
             self.print_stats()
         except Exception as e:
             self.logger.error(f"Fatal error: {e}")
@@ -0,0 +1,124 @@
+"""
+Test Admission Control
+Controleert de limieten per klasse (429/503 + Retry-After), sensor
+herkenning via netwerk en token, en dat streaming responses als in
+behandeling blijven tellen
+"""
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+import metrics
+from admission import AdmissionController, AdmissionMiddleware
+
+# Rejects naar een in-process registry, niet naar logs/metrics
+metrics._registry = metrics.MetricsRegistry()
+
+
+def make_controller(delay=0.0, **kwargs):
+    state = {'delay': delay}
+    controller = AdmissionController(
+        queue_delay=lambda: state['delay'],
+        limits={'default': {'max_in_flight': 2, 'max_queue_delay': 0.5},
+                'sensor': {'max_in_flight': 4, 'max_queue_delay': 2.0}},
+        **kwargs
+    )
+    return controller, state
+
+
+def test_in_flight_limit_per_class():
+    controller, _ = make_controller()
+
+    assert controller.admit('default') is None
+    assert controller.admit('default') is None
+    assert controller.admit('default') == (429, 1, 'in_flight')
+    # Sensors hebben een eigen budget
+    assert controller.admit('sensor') is None
+
+    controller.release('default')
+    assert controller.admit('default') is None
+
+    stats = controller.get_stats()['classes']
+    assert stats['default']['in_flight'] == 2 and stats['default']['rejected_in_flight'] == 1
+    assert metrics.registry().counter_value('admission_rejects_total', ('default', 'in_flight')) >= 1
+
+
+def test_queue_delay_rejects_default_before_sensor():
+    controller, state = make_controller()
+    state['delay'] = 1.2
+
+    # Retry-After volgt de huidige queue delay (naar boven afgerond)
+    assert controller.admit('default') == (503, 2, 'queue_delay')
+    assert controller.admit('sensor') is None
+
+    state['delay'] = 3.0
+    assert controller.admit('sensor') == (503, 3, 'queue_delay')
+    assert controller.in_flight == {'sensor': 1, 'default': 0}
+
+
+def test_classify_network_and_token():
+    controller, _ = make_controller(sensor_networks=['10.0.0.0/24'], sensor_token='geheim')
+
+    assert controller.classify('10.0.0.7', None) == 'sensor'
+    assert controller.classify('192.168.1.5', None) == 'default'
+    assert controller.classify('192.168.1.5', b'geheim') == 'sensor'
+    assert controller.classify('192.168.1.5', b'fout') == 'default'
+
+
+def test_middleware_responses_and_streaming():
+    controller, state = make_controller(sensor_token='geheim')
+    app = FastAPI()
+
+    @app.post("/predict")
+    async def predict():
+        return {"ok": True}
+
+    @app.post("/predict/stream")
+    async def stream():
+        async def body():
+            yield b"a"
+            # Response nog niet klaar: telt als in behandeling
+            yield str(controller.in_flight['default']).encode()
+        return StreamingResponse(body())
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    app.add_middleware(AdmissionMiddleware, controller=controller, paths=['/predict', '/predict/'])
+    client = TestClient(app)
+
+    assert client.post("/predict").status_code == 200
+    assert client.post("/predict/stream").content == b"a1"
+    assert controller.in_flight['default'] == 0
+
+    state['delay'] = 5.0
+    response = client.post("/predict")
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '5'
+    assert response.json()['reason'] == 'queue_delay'
+
+    # Niet-beschermde paden en sensors met token blijven bereikbaar
+    assert client.get("/health").status_code == 200
+    state['delay'] = 1.0
+    assert client.post("/predict", headers={'X-Sensor-Token': 'geheim'}).status_code == 200
+
+    controller.in_flight['default'] = 2
+    response = client.post("/predict")
+    assert response.status_code == 429 and response.headers['retry-after'] == '1'
+
+
+if __name__ == "__main__":
+    tests = [
+        test_in_flight_limit_per_class,
+        test_queue_delay_rejects_default_before_sensor,
+        test_classify_network_and_token,
+        test_middleware_responses_and_streaming,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Admission control tests geslaagd!")
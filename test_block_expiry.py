@@ -0,0 +1,166 @@
+"""
+Test Block Expiry
+Controleert heap scheduling, batching, rebuild, één expiry owner per
+state_db en escalerende durations
+"""
+
+import multiprocessing
+import threading
+import time
+
+from block_expiry import ExpiryScheduler, OwnerLock
+from block_store import BlockStore
+from test_block_store import make_blocker
+
+
+def test_pop_due_only_returns_expired():
+    scheduler = ExpiryScheduler(lambda ips: None)
+    now = time.time()
+    scheduler.schedule('203.0.113.1', now - 5)
+    scheduler.schedule('203.0.113.2', now + 60)
+    scheduler.schedule('203.0.113.3', now - 1)
+
+    assert scheduler.pop_due(now) == ['203.0.113.1', '203.0.113.3']
+    assert scheduler.get_stats()['pending'] == 1
+
+
+def test_rescheduled_and_cancelled_entries_are_skipped():
+    scheduler = ExpiryScheduler(lambda ips: None)
+    now = time.time()
+    scheduler.schedule('203.0.113.1', now - 5)
+    scheduler.schedule('203.0.113.1', now + 60)  # verlengd
+    scheduler.schedule('203.0.113.2', now - 5)
+    scheduler.cancel('203.0.113.2')              # handmatig unblock
+
+    assert scheduler.pop_due(now) == []
+    assert scheduler.stats['stale_skipped'] == 2
+
+
+def test_thread_expires_in_one_batch():
+    batches = []
+    done = threading.Event()
+
+    def on_expire(ips):
+        batches.append(ips)
+        done.set()
+
+    scheduler = ExpiryScheduler(on_expire, grace=0.05)
+    scheduler.start()
+    deadline = time.time() + 0.1
+    for i in range(20):
+        scheduler.schedule(f'203.0.113.{i}', deadline)
+
+    assert done.wait(2)
+    scheduler.stop()
+    assert len(batches) == 1 and len(batches[0]) == 20
+
+
+def test_single_expiry_owner(tmp_path):
+    lock_path = str(tmp_path / 'blocks.db.expiry.lock')
+    expired = {'a': [], 'b': []}
+    owners = []
+
+    def make(name):
+        return ExpiryScheduler(expired[name].extend, grace=0, owner_retry=0.05,
+                               owner_lock=OwnerLock(lock_path),
+                               on_owner=lambda: owners.append(name))
+
+    first, second = make('a'), make('b')
+    first.start()
+    time.sleep(0.1)
+    second.start()
+    deadline = time.time() + 0.1
+    for scheduler in (first, second):
+        scheduler.schedule('203.0.113.1', deadline)
+
+    time.sleep(0.3)
+    # Alleen de owner verwijdert de block, de ander doet niets
+    assert expired == {'a': ['203.0.113.1'], 'b': []}
+    assert first.get_stats()['owner'] and not second.get_stats()['owner']
+
+    # Owner stopt: de ander neemt het over
+    first.stop()
+    second.schedule('203.0.113.2', time.time())
+    time.sleep(0.3)
+    assert owners == ['a', 'b']
+    # (De blocker herbouwt de heap in on_owner en checkt elke IP in de store)
+    assert '203.0.113.2' in expired['b']
+    second.stop()
+
+
+def _block_from_other_process(db_path, ip, duration):
+    BlockStore(db_path).add_blocks([{'ip': ip, 'reason': 'other worker', 'method': 'fake',
+                                     'duration': duration}])
+
+
+def test_owner_expires_blocks_of_other_processes(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / 'blocks.db')
+    blocker = make_blocker(db_path)
+    blocker.expiry.grace = 0
+    blocker.expiry.tick_interval = 0.1
+    blocker.start_expiry()
+    time.sleep(0.1)
+    assert blocker.expiry.get_stats()['owner']
+
+    # Een ander proces (API worker, Suricata blocker) schrijft een block met
+    # korte duration; de owner is idle met een lege heap
+    other = multiprocessing.get_context('fork').Process(
+        target=_block_from_other_process, args=(db_path, '203.0.113.50', 0.3))
+    other.start()
+    other.join(10)
+    assert other.exitcode == 0
+
+    deadline = time.time() + 5
+    while blocker.store.get_active('203.0.113.50') is not None and time.time() < deadline:
+        time.sleep(0.05)
+    blocker.expiry.stop()
+    assert blocker.store.get_active('203.0.113.50') is None
+    assert blocker.expiry.stats['expired'] == 1
+
+
+def test_rebuild_from_store(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / 'blocks.db')
+    BlockStore(db_path).add_blocks([
+        {'ip': '203.0.113.1', 'reason': 'old', 'method': 'fake', 'expires_at': time.time() - 1},
+        {'ip': '203.0.113.2', 'reason': 'new', 'method': 'fake', 'duration': 3600},
+    ])
+
+    blocker = make_blocker(db_path, kernel=['203.0.113.1', '203.0.113.2'])
+    assert blocker.expiry.get_stats()['pending'] == 2
+
+    expired = blocker.expire_blocks(blocker.expiry.pop_due())
+    assert expired == ['203.0.113.1']
+    assert blocker.backend.kernel == {'203.0.113.2'}
+    assert blocker.get_blocked_ips() == ['203.0.113.2']
+
+
+def test_repeat_offender_duration_escalates(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    blocker.block_duration_hours = 1
+    blocker.max_block_duration_hours = 3
+
+    durations = []
+    for _ in range(4):
+        assert blocker.block_ip('203.0.113.9', 'scan')
+        record = blocker.get_block_records()[0]
+        durations.append(round(record['expires_ts'] - record['blocked_ts']))
+        assert blocker.unblock_ip('203.0.113.9')
+
+    assert durations == [3600, 7200, 10800, 10800]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_pop_due_only_returns_expired,
+        test_rescheduled_and_cancelled_entries_are_skipped,
+        test_thread_expires_in_one_batch,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Block expiry tests geslaagd!")
@@ -0,0 +1,95 @@
+"""
+Test Block Log
+Controleert gebufferd schrijven, rotatie, tail reads en de begrensde history
+"""
+
+import json
+
+from block_log import BlockLogWriter, tail_lines, tail_records
+from test_block_store import make_blocker
+
+
+def test_writer_buffers_until_sync(tmp_path):
+    path = tmp_path / 'blocked.json'
+    writer = BlockLogWriter(str(path), fsync_interval=60)
+
+    for i in range(10):
+        writer.write({'ip': f'203.0.113.{i}'})
+    assert not path.exists() or path.read_text() == ''
+
+    writer.sync()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 10 and writer.stats['syncs'] == 1
+    writer.close()
+
+
+def test_writer_rotates_on_size(tmp_path):
+    path = tmp_path / 'blocked.json'
+    writer = BlockLogWriter(str(path), fsync_interval=0, max_bytes=1024, backups=2)
+
+    for i in range(200):
+        writer.write({'ip': f'203.0.113.{i % 250}', 'reason': 'x' * 20})
+    writer.close()
+
+    assert writer.stats['rotations'] >= 2
+    assert (tmp_path / 'blocked.json.1').exists()
+    assert (tmp_path / 'blocked.json.2').exists()
+    assert not (tmp_path / 'blocked.json.3').exists()
+
+
+def test_tail_lines_reads_from_end(tmp_path):
+    path = tmp_path / 'blocked.json'
+    path.write_text(''.join(json.dumps({'n': i}) + '\n' for i in range(5000)))
+
+    # Kleine chunks: regels lopen over chunk grenzen heen
+    lines = tail_lines(path, 3, chunk_size=7)
+    assert [json.loads(line)['n'] for line in lines] == [4999, 4998, 4997]
+
+    lines = tail_lines(path, 10000, chunk_size=100)
+    assert len(lines) == 5000 and json.loads(lines[-1])['n'] == 0
+
+
+def test_tail_records_continues_into_rotated_file(tmp_path):
+    path = tmp_path / 'blocked.json'
+    (tmp_path / 'blocked.json.1').write_text(
+        ''.join(json.dumps({'n': i}) + '\n' for i in range(5))
+    )
+    path.write_text(json.dumps({'n': 5}) + '\n' + 'not json\n' + json.dumps({'n': 6}) + '\n')
+
+    records = tail_records(str(path), limit=4)
+    assert [r['n'] for r in records] == [6, 5, 4, 3]
+
+
+def test_block_history_is_bounded(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    blocker.block_history = type(blocker.block_history)(maxlen=5)
+
+    for i in range(20):
+        blocker.log_block(f'203.0.113.{i}', 'scan', 'fake')
+
+    assert len(blocker.block_history) == 5
+    assert blocker.block_history[-1]['ip'] == '203.0.113.19'
+
+    blocker.close()
+    records = tail_records('logs/blocked_ips.json', limit=100)
+    assert len(records) == 20 and records[0]['ip'] == '203.0.113.19'
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    tests = [
+        test_writer_buffers_until_sync,
+        test_writer_rotates_on_size,
+        test_tail_lines_reads_from_end,
+        test_tail_records_continues_into_rotated_file,
+    ]
+
+    for test in tests:
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Block log tests geslaagd!")
@@ -0,0 +1,127 @@
+"""
+Test Block Store
+Controleert persistente block state, gedeelde zichtbaarheid tussen processen
+en reconcile met de kernel ruleset
+"""
+
+import os
+import tempfile
+import time
+
+from block_store import BlockStore
+from firewall_backends import FirewallBackend
+from firewall_blocker import FirewallBlocker
+
+
+class KernelBackend(FirewallBackend):
+    """Backend met een in-memory 'kernel' set"""
+
+    name = 'fake'
+
+    def __init__(self, kernel=()):
+        super().__init__(use_sudo=False)
+        self.kernel = set(kernel)
+
+    def block(self, ip, reason="Malicious traffic", timeout=None):
+        self.kernel.add(ip)
+        return True
+
+    def unblock(self, ip):
+        if ip not in self.kernel:
+            return False
+        self.kernel.discard(ip)
+        return True
+
+    def list_blocked(self):
+        return sorted(self.kernel)
+
+
+def make_store():
+    return BlockStore(os.path.join(tempfile.mkdtemp(), 'blocks.db'))
+
+
+def make_blocker(db_path, kernel=()):
+    blocker = FirewallBlocker(reload_config=False)
+    blocker.store = BlockStore(db_path)
+    blocker.refresh(force=True)
+    blocker.backend = KernelBackend(kernel)
+    blocker._backend_ready = True
+    blocker.auto_block_enabled = True
+    blocker.is_linux = lambda: True
+    return blocker
+
+
+def test_one_active_block_per_ip():
+    store = make_store()
+    store.add_block('203.0.113.1', 'scan', 'ipset', duration=60)
+    store.add_block('203.0.113.1', 'ddos', 'ipset', duration=120)
+
+    assert store.count_active() == 1
+    assert store.get_active('203.0.113.1')['reason'] == 'ddos'
+
+    assert store.remove_block('203.0.113.1')
+    assert store.get_active('203.0.113.1') is None
+    assert len(store.history('203.0.113.1')) == 1
+
+
+def test_expired_blocks_uses_expiry():
+    store = make_store()
+    store.add_blocks([
+        {'ip': '203.0.113.1', 'reason': 'a', 'method': 'ipset', 'expires_at': time.time() - 1},
+        {'ip': '203.0.113.2', 'reason': 'b', 'method': 'ipset', 'duration': 3600},
+        {'ip': '203.0.113.3', 'reason': 'c', 'method': 'ipset'},
+    ])
+
+    assert [r['ip'] for r in store.expired_blocks()] == ['203.0.113.1']
+
+
+def test_second_process_sees_changes():
+    path = os.path.join(tempfile.mkdtemp(), 'blocks.db')
+    writer, reader = BlockStore(path), BlockStore(path)
+
+    version = reader.data_version()
+    writer.add_block('203.0.113.9', 'scan', 'ipset')
+
+    assert reader.data_version() != version
+    assert reader.get_active('203.0.113.9')['method'] == 'ipset'
+
+
+def test_blocker_mirror_refreshes(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / 'blocks.db')
+    engine, api = make_blocker(db_path), make_blocker(db_path)
+
+    assert engine.block_ip('203.0.113.7', 'test')
+    assert api.get_blocked_ips() == ['203.0.113.7']
+    assert api.get_block_records()[0]['reason'] == 'test'
+
+
+def test_reconcile_restores_adopts_and_expires(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / 'blocks.db')
+
+    store = BlockStore(db_path)
+    store.add_block('203.0.113.1', 'lost on reboot', 'ipset', duration=3600)
+    store.add_blocks([{'ip': '203.0.113.2', 'reason': 'old', 'method': 'ipset',
+                       'expires_at': time.time() - 1}])
+
+    blocker = make_blocker(db_path, kernel=['203.0.113.2', '198.51.100.5'])
+    summary = blocker.reconcile()
+
+    assert summary == {'supported': True, 'expired': 1, 'restored': 1, 'adopted': 1}
+    assert blocker.backend.kernel == {'203.0.113.1', '198.51.100.5'}
+    assert sorted(blocker.get_blocked_ips()) == ['198.51.100.5', '203.0.113.1']
+
+
+if __name__ == "__main__":
+    tests = [
+        test_one_active_block_per_ip,
+        test_expired_blocks_uses_expiry,
+        test_second_process_sees_changes,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Block store tests geslaagd!")
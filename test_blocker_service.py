@@ -0,0 +1,102 @@
+"""
+Test Blocker Service
+Controleert async submit, deduplicatie per IP, batching en callbacks
+"""
+
+import threading
+import time
+
+from blocker_service import BlockerService
+from test_block_store import make_blocker
+
+
+class RecordingBlocker:
+    """Registreert batches i.p.v. echt te blokkeren"""
+
+    def __init__(self, delay=None):
+        self.batches = []
+        self.delay = delay
+
+    def process_predictions(self, items):
+        if self.delay:
+            self.delay.wait(2)
+        self.batches.append([flow['src_ip'] for flow, _, _ in items])
+        return [True] * len(items)
+
+
+MALICIOUS = {'prediction': 'MALICIOUS', 'ensemble_score': 0.9}
+
+
+def test_submit_returns_immediately_and_batches():
+    blocker = RecordingBlocker()
+    service = BlockerService(blocker, batch_interval=0.2)
+
+    futures = [service.submit({'src_ip': f'203.0.113.{i}'}, MALICIOUS) for i in range(20)]
+    assert all(f.result(timeout=2) for f in futures)
+    assert len(blocker.batches) == 1 and len(blocker.batches[0]) == 20
+    service.stop()
+
+
+def test_pending_requests_are_deduplicated():
+    gate = threading.Event()
+    blocker = RecordingBlocker(delay=gate)
+    service = BlockerService(blocker, batch_interval=0.01)
+
+    # Worker hangt in process_predictions tot de gate open gaat
+    futures = [service.submit({'src_ip': '203.0.113.2'}, MALICIOUS) for _ in range(5)]
+    gate.set()
+
+    assert all(f.result(timeout=2) for f in futures)
+    assert blocker.batches == [['203.0.113.2']]
+    assert service.get_stats()['deduplicated'] == 4
+    service.stop()
+
+
+def test_full_queue_rejects_without_blocking():
+    gate = threading.Event()
+    service = BlockerService(RecordingBlocker(delay=gate), batch_interval=0.01, max_queue=1)
+
+    service.submit({'src_ip': '203.0.113.1'}, MALICIOUS)
+    time.sleep(0.1)  # Worker hangt nu in de eerste batch
+    futures = [service.submit({'src_ip': f'198.51.100.{i}'}, MALICIOUS) for i in range(5)]
+
+    assert service.stats['dropped'] == 4
+    assert [f.done() for f in futures] == [False, True, True, True, True]
+    gate.set()
+    service.stop()
+
+
+def test_callback_with_real_blocker(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    service = BlockerService(blocker, batch_interval=0.01)
+
+    outcomes = []
+    done = threading.Event()
+
+    def on_result(ip, blocked):
+        outcomes.append((ip, blocked))
+        done.set()
+
+    service.submit({'src_ip': '203.0.113.50'}, MALICIOUS, reason='Suricata: scan',
+                   callback=on_result)
+    assert done.wait(2)
+    service.stop()
+
+    assert outcomes == [('203.0.113.50', True)]
+    assert blocker.get_block_records()[0]['reason'] == 'Suricata: scan'
+    assert blocker.backend.kernel == {'203.0.113.50'}
+
+
+if __name__ == "__main__":
+    tests = [
+        test_submit_returns_immediately_and_batches,
+        test_pending_requests_are_deduplicated,
+        test_full_queue_rejects_without_blocking,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Blocker service tests geslaagd!")
@@ -0,0 +1,72 @@
+"""
+Test CIDR Table
+Controleert longest-prefix-match, IPv6, overlap checks en whitelist gebruik
+"""
+
+from cidr_table import CidrTable, parse_prefix
+from test_block_store import make_blocker
+
+
+def test_longest_prefix_wins():
+    table = CidrTable([('10.0.0.0/8', 'corp'), ('10.20.0.0/16', 'mgmt'), ('10.20.5.7', 'host')])
+
+    assert table.lookup('10.20.5.7') == ('10.20.5.7', 'host')
+    assert table.lookup('10.20.9.1') == ('10.20.0.0/16', 'mgmt')
+    assert table.lookup('10.99.0.1') == ('10.0.0.0/8', 'corp')
+    assert table.lookup('11.0.0.1') is None
+
+
+def test_ipv6_and_invalid_input():
+    table = CidrTable(['2001:db8::/32', '192.168.1.1'])
+
+    assert '2001:db8:1::5' in table
+    assert '2001:db9::1' not in table
+    assert '192.168.1.1' in table
+    assert 'not-an-ip' not in table
+    assert parse_prefix('10.1.2.3/8') == (4, 8, 10)
+
+
+def test_overlaps_and_covered():
+    table = CidrTable(['10.20.0.0/16', '192.168.1.5'])
+
+    assert table.overlaps('10.0.0.0/8')        # whitelist ligt binnen de prefix
+    assert table.overlaps('10.20.3.0/24')      # prefix ligt binnen de whitelist
+    assert not table.overlaps('172.16.0.0/12')
+    assert table.covered('192.168.1.0/24') == ['192.168.1.5']
+
+
+def test_remove_updates_lengths():
+    table = CidrTable(['10.0.0.0/8', '10.1.1.1'])
+    assert table.remove('10.1.1.1')
+    assert not table.remove('10.1.1.1')
+    assert table.prefix_lengths()[4] == [8]
+    assert len(table) == 1
+
+
+def test_blocker_honours_cidr_whitelist(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    blocker.whitelist = CidrTable(['10.20.0.0/16'])
+
+    assert not blocker.block_ip('10.20.3.4', 'scan')
+    assert blocker.block_ip('198.51.100.0/24', 'scan')
+    assert blocker.is_blocked('198.51.100.77')
+
+    result = blocker.lookup('198.51.100.77')
+    assert result['block_match'] == '198.51.100.0/24'
+    assert not result['whitelisted']
+
+
+if __name__ == "__main__":
+    tests = [
+        test_longest_prefix_wins,
+        test_ipv6_and_invalid_input,
+        test_overlaps_and_covered,
+        test_remove_updates_lengths,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ CIDR table tests geslaagd!")
@@ -4,11 +4,12 @@ Test with custom crafted attacks - NO CSV data!
 Creates simulated network flows that should trigger detection
 """
 
-import requests
-import time
+import asyncio
 import random
 import json
 
+from firewall_client import AsyncAIFirewallClient
+
 API_URL = "http://localhost:8000"
 
 # Attack patterns - manually crafted to test detection
@@ -505,7 +506,7 @@ def generate_random_ip():
     return f"{random.randint(1,254)}.{random.randint(0,255)}.{random.randint(0,255)}.{random.randint(1,254)}"
 
 
-def send_flow(flow_data, attack_type, src_ip, dst_ip, is_attack=True):
+async def send_flow(client, flow_data, attack_type, src_ip, dst_ip, is_attack=True):
     """Send a flow to the API"""
     try:
         # Add IP info to the flow
@@ -513,42 +514,37 @@ def send_flow(flow_data, attack_type, src_ip, dst_ip, is_attack=True):
         flow_data["dst_ip"] = dst_ip
         flow_data["attack_type"] = attack_type if is_attack else "BENIGN"
         
-        # Use /predict/raw endpoint for full flow data
-        response = requests.post(
-            f"{API_URL}/predict/raw",
-            json=flow_data,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            return result
-        else:
-            print(f"  ❌ Error: {response.status_code}")
-            return None
+        # Full flow data; the client batches, pools connections and retries (429)
+        return await client.predict(flow_data)
             
     except Exception as e:
         print(f"  ❌ Exception: {e}")
         return None
 
 
-def main():
+async def main():
     print("=" * 60)
     print("AI-FIREWALL CUSTOM ATTACK TEST")
     print("=" * 60)
     
-    # Check API health
-    try:
-        response = requests.get(f"{API_URL}/health", timeout=5)
-        if response.status_code == 200:
+    async with AsyncAIFirewallClient(API_URL, timeout=10) as client:
+        # Check API health
+        try:
+            await client.health()
             print("✅ API is online")
-        else:
-            print("❌ API not healthy")
+        except Exception:
+            print("❌ Cannot connect to API")
             return
-    except:
-        print("❌ Cannot connect to API")
-        return
-    
+        
+        await run_tests(client)
+        
+        stats = client.get_stats()
+        print(f"\nClient: {stats['flows']} flows in {stats['batches']} batches, "
+              f"{stats['retries']} retries, p50 {stats.get('latency_p50_ms', 0):.1f}ms, "
+              f"p99 {stats.get('latency_p99_ms', 0):.1f}ms")
+
+
+async def run_tests(client):
     print("\n📡 Watch the dashboard at http://localhost:80")
     print("-" * 60)
     
@@ -571,11 +567,11 @@ def main():
                 if isinstance(variation[key], (int, float)) and key != " Destination Port":
                     variation[key] *= random.uniform(0.8, 1.2)
             
-            result = send_flow(variation, attack_name, src_ip, dst_ip, is_attack=True)
+            result = await send_flow(client, variation, attack_name, src_ip, dst_ip, is_attack=True)
             total_attacks += 1
             
             if result:
-                pred = result.get("prediction", "UNKNOWN")
+                pred = result.get("prediction", "UNKNOWN").upper()
                 score = result.get("ensemble_score", 0)
                 
                 if pred == "MALICIOUS":
@@ -584,7 +580,7 @@ def main():
                 else:
                     print(f"  ❌ {attack_name} [{i+1}/3] → MISSED (score: {score:.3f})")
             
-            time.sleep(0.3)
+            await asyncio.sleep(0.3)
     
     # Send benign traffic
     print("\n🟢 SENDING BENIGN TRAFFIC:")
@@ -598,11 +594,11 @@ def main():
                 if isinstance(variation[key], (int, float)) and key != " Destination Port":
                     variation[key] *= random.uniform(0.8, 1.2)
             
-            result = send_flow(variation, benign_name, src_ip, dst_ip, is_attack=False)
+            result = await send_flow(client, variation, benign_name, src_ip, dst_ip, is_attack=False)
             total_benign += 1
             
             if result:
-                pred = result.get("prediction", "UNKNOWN")
+                pred = result.get("prediction", "UNKNOWN").upper()
                 score = result.get("ensemble_score", 0)
                 
                 if pred == "BENIGN":
@@ -611,7 +607,7 @@ def main():
                 else:
                     print(f"  ⚠️ {benign_name} [{i+1}/3] → False Positive (score: {score:.3f})")
             
-            time.sleep(0.3)
+            await asyncio.sleep(0.3)
     
     # Summary
     print("\n" + "=" * 60)
@@ -623,4 +619,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""
+Test Firewall Backends
+Controleert de gegenereerde iptables / ipset / nftables commands zonder root
+"""
+
+import subprocess
+from firewall_backends import (IptablesChainBackend, IpsetBackend,
+                               NftablesSetBackend, create_backend)
+
+
+class RecordingMixin:
+    """Vervangt subprocess door een recorder"""
+
+    def __init__(self, *args, stdout='', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+        self.stdout = stdout
+
+    def _run(self, cmd, input=None):
+        self.commands.append((cmd, input))
+        return subprocess.CompletedProcess(cmd, 0, stdout=self.stdout, stderr='')
+
+
+class RecordingIptables(RecordingMixin, IptablesChainBackend):
+    pass
+
+
+class RecordingIpset(RecordingMixin, IpsetBackend):
+    pass
+
+
+class RecordingNftables(RecordingMixin, NftablesSetBackend):
+    pass
+
+
+def test_iptables_appends_rule_per_ip():
+    backend = RecordingIptables(use_sudo=False)
+    assert backend.block('203.0.113.45', 'test')
+
+    cmd, _ = backend.commands[0]
+    assert cmd[:5] == ['iptables', '-A', 'INPUT', '-s', '203.0.113.45']
+
+
+def test_iptables_unblock_matches_commented_rule():
+    listing = '-A INPUT -s 203.0.113.45/32 -m comment --comment "AI-Firewall: x y" -j DROP\n'
+    backend = RecordingIptables(use_sudo=False, stdout=listing)
+    assert backend.unblock('203.0.113.45')
+
+    cmd, _ = backend.commands[-1]
+    assert cmd[:2] == ['iptables', '-D']
+    assert 'AI-Firewall: x y' in cmd
+
+
+def test_ipset_uses_single_set_with_timeout():
+    backend = RecordingIpset(use_sudo=False)
+    backend.setup()
+    backend.commands.clear()
+
+    backend.block('203.0.113.45', timeout=3600)
+    backend.block('2001:db8::1')
+
+    assert backend.commands[0][0] == ['ipset', 'add', 'ai-firewall', '203.0.113.45',
+                                      'timeout', '3600', '-exist']
+    assert backend.commands[1][0][2] == 'ai-firewall6'
+
+
+def test_nftables_element_timeout():
+    backend = RecordingNftables(use_sudo=True)
+    backend.block('203.0.113.45', timeout=60)
+
+    cmd, _ = backend.commands[0]
+    assert cmd[0] == 'sudo'
+    assert cmd[-1] == '{ 203.0.113.45 timeout 60s }'
+
+
+def test_iptables_batch_is_single_restore():
+    backend = RecordingIptables(use_sudo=False)
+    ops = [{'action': 'block', 'ip': f'203.0.113.{i}', 'reason': 'scan'} for i in range(3)]
+
+    assert backend.apply_batch(ops) == [True, True, True]
+    assert len(backend.commands) == 1
+
+    cmd, script = backend.commands[0]
+    assert cmd == ['iptables-restore', '--noflush']
+    assert script.count('-A INPUT') == 3
+    assert '--comment "AI-Firewall: scan"' in script
+
+
+def test_nftables_batch_is_one_transaction():
+    backend = RecordingNftables(use_sudo=False)
+    ops = [
+        {'action': 'block', 'ip': '203.0.113.1', 'timeout': 60},
+        {'action': 'unblock', 'ip': '2001:db8::1'},
+    ]
+
+    assert backend.apply_batch(ops) == [True, True]
+    cmd, script = backend.commands[0]
+    assert cmd == ['nft', '-f', '-']
+    assert 'add element inet ai_firewall blocked4 { 203.0.113.1 timeout 60s }' in script
+    assert 'delete element inet ai_firewall blocked6 { 2001:db8::1 }' in script
+
+
+def test_ipset_lists_members_for_reconcile():
+    listing = ('Name: ai-firewall\nType: hash:net\nMembers:\n'
+               '203.0.113.45 timeout 3500\n198.51.100.0/24\n')
+    backend = RecordingIpset(use_sudo=False, stdout=listing)
+
+    blocked = backend.list_blocked()
+    assert blocked[:2] == ['203.0.113.45', '198.51.100.0/24']
+    assert backend.commands[0][0] == ['ipset', 'list', 'ai-firewall']
+
+
+def test_create_backend_by_name():
+    assert isinstance(create_backend('ipset'), IpsetBackend)
+    try:
+        create_backend('pf')
+        assert False, "Unknown backend should raise"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    tests = [
+        test_iptables_appends_rule_per_ip,
+        test_iptables_unblock_matches_commented_rule,
+        test_ipset_uses_single_set_with_timeout,
+        test_nftables_element_timeout,
+        test_iptables_batch_is_single_restore,
+        test_nftables_batch_is_one_transaction,
+        test_ipset_lists_members_for_reconcile,
+        test_create_backend_by_name,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Firewall backend tests geslaagd!")
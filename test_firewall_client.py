@@ -0,0 +1,128 @@
+"""
+Test Async Firewall Client
+Micro-batching van predict() calls, retries op 429 (Retry-After) en
+netwerkfouten en de client-side latency stats (met een mock transport
+i.p.v. een API server)
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from firewall_client import AsyncAIFirewallClient, retry_after_seconds
+
+
+def batch_handler(requests_seen, fail_first=0, status=429, retry_after='0'):
+    """Mock /predict/raw/batch: eerste fail_first requests falen met status"""
+    def handler(request: httpx.Request):
+        requests_seen.append(request)
+        if len(requests_seen) <= fail_first:
+            if status is None:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(status, headers={'Retry-After': retry_after})
+
+        flows = [json.loads(line) for line in request.content.splitlines()]
+        lines = [json.dumps({'prediction': 'malicious' if f['x'] > 5 else 'benign',
+                             'ensemble_score': f['x'] / 10, 'src_ip': f.get('src_ip')})
+                 for f in flows]
+        lines.append(json.dumps({'summary': {'total_flows': len(flows)}}))
+        return httpx.Response(200, content='\n'.join(lines).encode(),
+                              headers={'content-type': 'application/x-ndjson'})
+    return handler
+
+
+def make_client(handler, **kwargs):
+    transport = httpx.MockTransport(handler)
+    return AsyncAIFirewallClient(
+        client=httpx.AsyncClient(transport=transport, base_url='http://api'),
+        sensor_token='geheim',
+        **kwargs
+    )
+
+
+def test_concurrent_predicts_share_one_batch():
+    seen = []
+
+    async def run():
+        async with make_client(batch_handler(seen), max_delay=0.01) as client:
+            flows = [{'x': i, 'src_ip': f'10.0.0.{i}'} for i in range(10)]
+            verdicts = await asyncio.gather(*(client.predict(f) for f in flows))
+            return verdicts, client.get_stats()
+
+    verdicts, stats = asyncio.run(run())
+
+    assert len(seen) == 1
+    assert seen[0].url.path == '/predict/raw/batch'
+    assert seen[0].headers['x-sensor-token'] == 'geheim'
+    # Elke caller krijgt zijn eigen verdict terug
+    assert [v['src_ip'] for v in verdicts] == [f'10.0.0.{i}' for i in range(10)]
+    assert verdicts[9]['prediction'] == 'malicious' and verdicts[0]['prediction'] == 'benign'
+    assert stats['batches'] == 1 and stats['flows'] == 10 and stats['avg_batch_size'] == 10
+    assert stats['latency_p99_ms'] >= stats['latency_p50_ms'] > 0
+
+
+def test_max_batch_splits_requests():
+    seen = []
+
+    async def run():
+        async with make_client(batch_handler(seen), max_batch=4, max_delay=0.01) as client:
+            await asyncio.gather(*(client.predict({'x': i}) for i in range(10)))
+
+    asyncio.run(run())
+    assert [len(r.content.splitlines()) for r in seen] == [4, 4, 2]
+
+
+def test_retry_after_on_429():
+    seen = []
+
+    async def run():
+        async with make_client(batch_handler(seen, fail_first=2), backoff=0.001) as client:
+            verdict = await client.predict({'x': 7})
+            return verdict, client.get_stats()
+
+    verdict, stats = asyncio.run(run())
+    assert verdict['prediction'] == 'malicious'
+    assert len(seen) == 3
+    assert stats['retries'] == 2 and stats['rate_limited'] == 2
+
+
+def test_network_errors_retry_then_fail():
+    seen = []
+
+    async def run():
+        async with make_client(batch_handler(seen, fail_first=10, status=None),
+                               max_retries=2, backoff=0.001) as client:
+            try:
+                await client.predict({'x': 1})
+                assert False, "predict should fail after max_retries"
+            except httpx.ConnectError:
+                pass
+            return client.get_stats()
+
+    stats = asyncio.run(run())
+    assert len(seen) == 3
+    assert stats['errors'] == 1 and stats['retries'] == 2
+
+
+def test_retry_after_parsing():
+    assert retry_after_seconds('3') == 3.0
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds('geen datum') is None
+    assert retry_after_seconds('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_concurrent_predicts_share_one_batch,
+        test_max_batch_splits_requests,
+        test_retry_after_on_429,
+        test_network_errors_retry_then_fail,
+        test_retry_after_parsing,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Async firewall client tests geslaagd!")
@@ -0,0 +1,117 @@
+"""
+Test Inference Executor
+Controleert dat model calls de event loop niet blokkeren, de concurrency
+limits per endpoint en de event loop lag meting
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from inference_executor import InferenceExecutor, LoopLagMonitor
+
+
+def test_run_keeps_event_loop_free():
+    async def run():
+        executor = InferenceExecutor(workers=2, model_threads=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        thread = await executor.run('predict', lambda: (time.sleep(0.3), threading.get_ident())[1])
+        task.cancel()
+        executor.shutdown()
+
+        assert thread != threading.get_ident()
+        # Loop bleef tikken terwijl het "model" 300ms rekende
+        assert ticks >= 10
+
+    asyncio.run(run())
+
+
+def test_endpoint_concurrency_limit():
+    async def run():
+        executor = InferenceExecutor(workers=4, model_threads=1, limits={'predict_csv': 1})
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def job():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+
+        await asyncio.gather(*(executor.run('predict_csv', job) for _ in range(4)))
+        stats = executor.get_stats()['endpoints']['predict_csv']
+        executor.shutdown()
+
+        assert peak == 1
+        assert stats['completed'] == 4 and stats['active'] == 0 and stats['waiting'] == 0
+        assert stats['wait_seconds'] > 0
+
+    asyncio.run(run())
+
+
+def test_errors_propagate():
+    async def run():
+        executor = InferenceExecutor(workers=1, model_threads=1)
+        try:
+            await executor.run('predict', lambda: 1 / 0)
+            assert False, "expected ZeroDivisionError"
+        except ZeroDivisionError:
+            pass
+        stats = executor.get_stats()['endpoints']['predict']
+        executor.shutdown()
+        assert stats['errors'] == 1 and stats['active'] == 0
+
+    asyncio.run(run())
+
+
+def test_loop_lag_detects_blocking_call():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.02)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        time.sleep(0.25)  # sync model call op de loop
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+        return monitor.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats['lag_max_ms'] >= 150 and stats['samples'] > 3
+
+
+def test_run_process_uses_separate_process():
+    async def run():
+        executor = InferenceExecutor(workers=1, model_threads=1, process_workers=1)
+        pid = await executor.run_process('jobs', os.getpid)
+        executor.shutdown()
+        return pid
+
+    assert asyncio.run(run()) != os.getpid()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_run_keeps_event_loop_free,
+        test_endpoint_concurrency_limit,
+        test_errors_propagate,
+        test_loop_lag_detects_blocking_call,
+        test_run_process_uses_separate_process,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Inference executor tests geslaagd!")
@@ -0,0 +1,104 @@
+"""
+Test Ingest Channel
+Controleert het /ingest protocol: verdicts per seq (ook in andere volgorde),
+credit-based flow control en foutafhandeling per batch
+"""
+
+import asyncio
+
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import metrics
+from ingest_channel import CLOSE_POLICY_VIOLATION, IngestSession
+
+metrics._registry = metrics.MetricsRegistry()
+
+
+async def fake_score(flows):
+    # Eerste flow bepaalt hoe lang het "model" rekent
+    await asyncio.sleep(flows[0].get('delay', 0) if flows else 0)
+    return [{'prediction': 'malicious' if f.get('x', 0) > 5 else 'benign'} for f in flows]
+
+
+def make_client(credits=2, max_batch=3):
+    app = FastAPI()
+
+    @app.websocket("/ingest")
+    async def ingest(websocket: WebSocket):
+        await websocket.accept()
+        await IngestSession(websocket, fake_score, credits=credits, max_batch=max_batch).serve()
+
+    return TestClient(app)
+
+
+def test_verdicts_out_of_order():
+    with make_client().websocket_connect("/ingest") as ws:
+        assert ws.receive_json() == {'type': 'hello', 'credits': 2, 'max_batch': 3}
+
+        ws.send_json({'type': 'batch', 'seq': 1, 'flows': [{'x': 9, 'delay': 0.3}]})
+        ws.send_json({'type': 'batch', 'seq': 2, 'flows': [{'x': 1}, {'x': 7}]})
+
+        first, second = ws.receive_json(), ws.receive_json()
+        assert first['seq'] == 2 and first['credits'] == 1
+        assert [v['prediction'] for v in first['verdicts']] == ['benign', 'malicious']
+        assert second['seq'] == 1 and second['verdicts'] == [{'prediction': 'malicious'}]
+
+        # Credits terug: volgende batch mag
+        ws.send_json({'type': 'batch', 'seq': 3, 'flows': []})
+        assert ws.receive_json() == {'type': 'verdicts', 'seq': 3, 'verdicts': [], 'credits': 1}
+
+    assert metrics.registry().counter_value('ingest_flows_total') >= 3
+
+
+def test_batch_errors_return_credit():
+    with make_client(credits=1).websocket_connect("/ingest") as ws:
+        ws.receive_json()
+        ws.send_json({'type': 'batch', 'seq': 1, 'flows': [{'x': 1}] * 4})
+        reply = ws.receive_json()
+        assert reply['type'] == 'error' and reply['seq'] == 1 and reply['credits'] == 1
+        assert 'max_batch' in reply['detail']
+
+        ws.send_json({'type': 'batch', 'seq': 2, 'flows': [{'x': 1}]})
+        assert ws.receive_json()['type'] == 'verdicts'
+
+
+def test_batch_without_credit_closes():
+    with make_client(credits=1).websocket_connect("/ingest") as ws:
+        ws.receive_json()
+        ws.send_json({'type': 'batch', 'seq': 1, 'flows': [{'x': 1, 'delay': 0.5}]})
+        ws.send_json({'type': 'batch', 'seq': 2, 'flows': [{'x': 1}]})
+
+        try:
+            ws.receive_json()
+            assert False, "Connection should be closed"
+        except WebSocketDisconnect as e:
+            assert e.code == CLOSE_POLICY_VIOLATION
+
+
+def test_invalid_frame_closes():
+    with make_client().websocket_connect("/ingest") as ws:
+        ws.receive_json()
+        ws.send_text('{"type": "batch", "seq": "een"}')
+
+        try:
+            ws.receive_json()
+            assert False, "Connection should be closed"
+        except WebSocketDisconnect as e:
+            assert e.code == CLOSE_POLICY_VIOLATION
+
+
+if __name__ == "__main__":
+    tests = [
+        test_verdicts_out_of_order,
+        test_batch_errors_return_credit,
+        test_batch_without_credit_closes,
+        test_invalid_frame_closes,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Ingest channel tests geslaagd!")
@@ -0,0 +1,219 @@
+"""
+Test Classification Jobs
+Controleert job state in SQLite, voortgang/ETA, cancel en het hervatten van
+jobs na een restart
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import job_manager
+from job_manager import JobManager, JobStore, job_status, run_job
+
+
+class FakeFirewall:
+    def annotate_frame(self, df):
+        df = df.copy()
+        df['Prediction'] = (df['Flow Duration'] > 50).astype(int)
+        df['Prediction_Label'] = np.where(df['Prediction'] == 1, 'malicious', 'benign')
+        return df
+
+
+def make_manager(tmp, **kwargs):
+    return JobManager(JobStore(os.path.join(tmp, 'jobs.db')), jobs_dir=os.path.join(tmp, 'jobs'),
+                      allowed_dirs=[tmp], **kwargs)
+
+
+def write_csv(path, rows):
+    lines = [' Destination Port, Flow Duration'] + [f'{80 + i},{i * 10}' for i in range(rows)]
+    Path(path).write_text('\n'.join(lines) + '\n')
+    return Path(path)
+
+
+def add_job(manager, input_path, job_id='job1', owner=None):
+    manager.store.create({
+        'id': job_id, 'status': job_manager.QUEUED, 'source': str(input_path),
+        'input_path': str(input_path), 'result_path': str(manager.jobs_dir / f'{job_id}.result.csv'),
+        'owner_pid': owner or manager.pid, 'created_at': time.time(),
+        'bytes_total': Path(input_path).stat().st_size
+    })
+
+
+def test_run_job_writes_result_and_progress():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp)
+        add_job(manager, write_csv(os.path.join(tmp, 'flows.csv'), 25))
+        job_manager._worker_firewall = FakeFirewall()
+        try:
+            assert run_job(manager.store.db_path, 'job1', chunk_rows=10) == job_manager.COMPLETED
+        finally:
+            job_manager._worker_firewall = None
+
+        status = manager.status('job1')
+        assert status['status'] == 'completed' and status['progress'] == 1.0
+        assert status['rows_done'] == 25 and status['malicious_count'] == 19
+        lines = Path(manager.get('job1')['result_path']).read_text().splitlines()
+        # Eén header, kolomnamen gestript
+        assert lines[0] == 'Destination Port,Flow Duration,Prediction,Prediction_Label'
+        assert len(lines) == 26
+        manager.shutdown()
+
+
+def test_status_reports_rate_and_eta():
+    job = {
+        'id': 'j', 'status': 'running', 'source': 'x', 'created_at': 1000.0,
+        'started_at': 1000.0, 'finished_at': None, 'bytes_total': 1000, 'bytes_done': 250,
+        'rows_done': 5000, 'malicious_count': 0, 'cancel_requested': 0, 'error': None
+    }
+    status = job_status(job, now=1010.0)
+    assert status['progress'] == 0.25
+    assert status['rows_per_second'] == 500.0
+    assert status['eta_seconds'] == 30.0
+
+
+def test_cancel_queued_and_running():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp)
+        csv = write_csv(os.path.join(tmp, 'flows.csv'), 25)
+
+        add_job(manager, csv, 'queued')
+        assert manager.cancel('queued')['status'] == 'cancelled'
+
+        # Lopende job ziet de vlag bij de volgende chunk
+        add_job(manager, csv, 'running')
+        manager.store.update('running', cancel_requested=1)
+        job_manager._worker_firewall = FakeFirewall()
+        try:
+            assert run_job(manager.store.db_path, 'running', chunk_rows=10) == job_manager.CANCELLED
+        finally:
+            job_manager._worker_firewall = None
+        job = manager.get('running')
+        assert not os.path.exists(job['result_path'] + '.part')
+        manager.shutdown()
+
+
+def test_recover_claims_jobs_of_dead_process():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp)
+        submitted = []
+        manager._submit = submitted.append
+        csv = write_csv(os.path.join(tmp, 'flows.csv'), 5)
+
+        dead_pid = 2 ** 22 + 12345  # boven pid_max: bestaat niet
+        add_job(manager, csv, 'orphan', owner=dead_pid)
+        manager.store.update('orphan', status='running', rows_done=3)
+        add_job(manager, csv, 'alive', owner=os.getppid())
+
+        assert manager.recover() == 1
+        assert submitted == ['orphan']
+        job = manager.get('orphan')
+        assert job['status'] == 'queued' and job['rows_done'] == 0 and job['owner_pid'] == os.getpid()
+        manager.shutdown()
+
+
+def test_lease_decides_orphaned_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp, lease_seconds=30)
+        submitted = []
+        manager._submit = submitted.append
+        csv = write_csv(os.path.join(tmp, 'flows.csv'), 5)
+
+        # Eigenaar niet zichtbaar (andere host of container), lease nog geldig
+        add_job(manager, csv, 'remote', owner=2 ** 22 + 12345)
+        manager.store.update('remote', owner_start='other-boot:1', lease_expires=time.time() + 30)
+        # Zelfde pid als dit process, maar een eerdere incarnatie (pid 1 in een container)
+        add_job(manager, csv, 'previous')
+        manager.store.update('previous', owner_start='other-boot:1', lease_expires=time.time() - 1)
+        assert manager.recover() == 1 and submitted == ['previous']
+
+        manager.store.update('remote', lease_expires=time.time() - 1)
+        assert manager.recover() == 1 and submitted == ['previous', 'remote']
+        job = manager.get('remote')
+        assert job['owner_start'] == manager.start_id and job['lease_expires'] > time.time()
+
+        # De heartbeat verlengt de lease van eigen jobs
+        manager.store.update('remote', lease_expires=time.time() + 1)
+        assert manager.store.renew(manager.pid, manager.start_id, time.time() + 30) == 2
+        assert manager.get('remote')['lease_expires'] > time.time() + 20
+        manager.shutdown()
+
+
+def test_expired_lease_is_taken_over_without_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp, lease_seconds=0.3)
+        submitted = []
+        manager._submit = submitted.append
+        csv = write_csv(os.path.join(tmp, 'flows.csv'), 5)
+        assert manager.recover() == 0
+
+        # Worker crasht na onze start; zijn lease verloopt pas daarna
+        add_job(manager, csv, 'crashed', owner=2 ** 22 + 12345)
+        manager.store.update('crashed', status='running', owner_start='other-boot:1',
+                             lease_expires=time.time() + 0.2)
+
+        deadline = time.time() + 5
+        while not submitted and time.time() < deadline:
+            time.sleep(0.05)
+        assert submitted == ['crashed']
+        job = manager.get('crashed')
+        assert job['owner_pid'] == manager.pid and job['status'] == 'queued'
+        manager.shutdown()
+
+
+def test_shutdown_stops_children_and_releases_leases():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp)
+        add_job(manager, write_csv(os.path.join(tmp, 'flows.csv'), 5))
+        manager.store.update('job1', owner_start=manager.start_id, lease_expires=time.time() + 60)
+
+        future = manager._executor().submit(time.sleep, 60)
+        processes = list(manager._pool._processes.values())
+        assert processes
+
+        started = time.time()
+        manager.shutdown()
+        assert time.time() - started < 10
+        assert not any(process.is_alive() for process in processes)
+        assert future.done()
+
+        store = JobStore(os.path.join(tmp, 'jobs.db'))
+        job = store.get('job1')
+        assert job['status'] == 'queued' and job['lease_expires'] == 0
+        store.close()
+
+
+def test_server_side_paths_are_restricted():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp)
+        for path, error in [('/etc/passwd', PermissionError),
+                            (os.path.join(tmp, 'missing.csv'), FileNotFoundError),
+                            (str(write_csv(os.path.join(tmp, 'capture.pcap'), 1)), ValueError)]:
+            try:
+                manager.resolve_path(path)
+                assert False, f"expected {error.__name__}"
+            except error:
+                pass
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_run_job_writes_result_and_progress,
+        test_status_reports_rate_and_eta,
+        test_cancel_queued_and_running,
+        test_recover_claims_jobs_of_dead_process,
+        test_lease_decides_orphaned_jobs,
+        test_expired_lease_is_taken_over_without_restart,
+        test_shutdown_stops_children_and_releases_leases,
+        test_server_side_paths_are_restricted,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Job manager tests geslaagd!")
@@ -0,0 +1,81 @@
+"""
+Test JSON Stream Parser
+Controleert incrementeel parsen van JSON arrays en NDJSON over chunk grenzen
+"""
+
+import asyncio
+import json
+
+from json_stream import JsonRecordParser, JsonStreamError, aiter_records, iter_records
+
+
+def split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+FLOWS = [{' Destination Port': 80 + i, 'src_ip': f'203.0.113.{i}', 'attack_type': 'DDoS ✓'}
+         for i in range(50)]
+
+
+def test_json_array_across_chunks():
+    body = json.dumps(FLOWS).encode('utf-8')
+    # 3 byte chunks: records én multi-byte UTF-8 tekens vallen over grenzen
+    assert list(iter_records(split(body, 3))) == FLOWS
+
+
+def test_ndjson_across_chunks():
+    body = ''.join(json.dumps(flow) + '\n' for flow in FLOWS).encode('utf-8')
+    assert list(iter_records(split(body, 7))) == FLOWS
+
+
+def test_records_are_yielded_before_stream_ends():
+    parser = JsonRecordParser()
+    assert parser.feed(b'[{"a": 1}, {"a"') == [{'a': 1}]
+    assert parser.feed(b': 2}') == [{'a': 2}]
+    assert parser.feed(b']', final=True) == []
+
+
+def test_buffer_is_bounded():
+    parser = JsonRecordParser(max_record_bytes=100)
+    try:
+        parser.feed(b'{"payload": "' + b'x' * 200)
+        assert False, "Oversized record should raise"
+    except JsonStreamError:
+        pass
+
+
+def test_truncated_or_invalid_stream_raises():
+    for body in (b'[{"a": 1}, {"a": ', b'{"a": 1}\n[1, 2]'):
+        try:
+            list(iter_records([body]))
+            assert False, f"{body!r} should raise"
+        except JsonStreamError:
+            pass
+
+
+def test_async_stream():
+    async def body():
+        for chunk in split(json.dumps(FLOWS[:5]).encode(), 10):
+            yield chunk
+
+    async def collect():
+        return [record async for record in aiter_records(body())]
+
+    assert asyncio.run(collect()) == FLOWS[:5]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_json_array_across_chunks,
+        test_ndjson_across_chunks,
+        test_records_are_yielded_before_stream_ends,
+        test_buffer_is_bounded,
+        test_truncated_or_invalid_stream_raises,
+        test_async_stream,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ JSON stream tests geslaagd!")
@@ -0,0 +1,158 @@
+"""
+Test Metrics
+Controleert de log-linear buckets, lock-free tellen vanuit meerdere threads,
+optellen over processen (per proces identiteit, niet per PID) en het
+Prometheus text format
+"""
+
+import fcntl
+import multiprocessing
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from metrics import BOUNDS, SLOTS, MetricsRegistry, bucket_index
+
+
+def test_bucket_bounds():
+    previous = -1
+    for seconds in [1e-7, 2e-5, 1e-4, 0.001, 0.0123, 0.5, 1.0, 7.5, 31.0]:
+        index = bucket_index(seconds)
+        assert index >= previous
+        previous = index
+        if 0 < index < len(BOUNDS):
+            # Waarde valt in (vorige grens, grens]; relatieve fout max 25%
+            assert BOUNDS[index - 1] <= seconds < BOUNDS[index]
+            assert BOUNDS[index] / BOUNDS[index - 1] <= 1.25 + 1e-9
+    assert bucket_index(1000.0) == len(BOUNDS)
+
+
+def test_threads_count_without_losing_updates():
+    registry = MetricsRegistry()
+
+    def work():
+        for _ in range(2000):
+            registry.inc('predictions_total', 'benign')
+            registry.observe('xgboost', 0.002)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert registry.counter_value('predictions_total', 'benign') == 16000
+    text = registry.render()
+    assert 'ai_firewall_stage_seconds_count{stage="xgboost"} 16000' in text
+    assert 'ai_firewall_stage_seconds_bucket{stage="xgboost",le="+Inf"} 16000' in text
+
+
+def test_scrape_sums_live_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = MetricsRegistry(tmp)
+        registry.inc('blocks_total', 'ok', 3)
+
+        # Andere worker (levend: de parent) en een gestopt process van een oudere versie
+        other = np.zeros((SLOTS, registry.cells))
+        other[1, registry._counter_offset['blocks_total', 'ok']] = 4
+        other.tofile(os.path.join(tmp, registry._file_name(os.getppid())))
+        other.tofile(os.path.join(tmp, f'{2 ** 22 + 12345}.metrics'))
+
+        total, processes = registry.totals()
+        assert processes == 2
+        # Het gestopte process telt mee via het archief
+        assert registry.counter_value('blocks_total', 'ok') == 11
+
+
+def test_dead_process_is_archived():
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = MetricsRegistry(tmp)
+        registry.inc('blocks_total', 'ok', 3)
+
+        dead = np.zeros((SLOTS, registry.cells))
+        dead[1, registry._counter_offset['blocks_total', 'ok']] = 4
+        dead[1, registry._stage_base['xgboost'] + bucket_index(0.01)] = 2
+        _, _, gauges = registry.gauges['queue_depth']
+        dead[0, gauges[(('queue', 'ws_clients'),)]] = 9
+        # Vorige incarnatie met hetzelfde PID (bijv. pid 1 in een container)
+        dead_path = os.path.join(tmp, f'{registry._namespace}-{os.getpid()}-000000000000.metrics')
+        dead.tofile(dead_path)
+
+        text = registry.render()
+        assert not os.path.exists(dead_path)
+        assert os.path.exists(os.path.join(tmp, 'archive.metrics'))
+        assert 'ai_firewall_blocks_total{result="ok"} 7' in text
+        assert 'ai_firewall_stage_seconds_count{stage="xgboost"} 2' in text
+        # Gauges van een gestopt process vervallen
+        assert 'ai_firewall_queue_depth{queue="ws_clients"} 0' in text
+
+        # Een volgende scrape telt het archief niet dubbel
+        assert registry.counter_value('blocks_total', 'ok') == 7
+
+
+def _hold_metrics_file(path, ready, release):
+    fd = os.open(path, os.O_RDONLY)
+    fcntl.flock(fd, fcntl.LOCK_SH)
+    ready.set()
+    release.wait(10)
+
+
+def test_other_namespace_is_alive_while_locked():
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = MetricsRegistry(tmp)
+        registry.inc('blocks_total', 'ok', 3)
+
+        # Ander container: zelfde PID als wij, PID niet te controleren, wel de flock
+        path = os.path.join(tmp, f'ffffffff-{os.getpid()}-0123456789ab.metrics')
+        other = np.zeros((SLOTS, registry.cells))
+        other[1, registry._counter_offset['blocks_total', 'ok']] = 4
+        other.tofile(path)
+
+        context = multiprocessing.get_context('fork')
+        ready, release = context.Event(), context.Event()
+        holder = context.Process(target=_hold_metrics_file, args=(path, ready, release))
+        holder.start()
+        assert ready.wait(10)
+
+        assert registry.totals()[1] == 2 and os.path.exists(path)
+        assert registry.counter_value('blocks_total', 'ok') == 7
+
+        release.set()
+        holder.join(10)
+        assert registry.totals()[1] == 1 and not os.path.exists(path)
+        assert registry.counter_value('blocks_total', 'ok') == 7
+
+
+def test_render_format():
+    registry = MetricsRegistry()
+    registry.observe('parse', 0.001)
+    registry.observe('parse', 0.004)
+    registry.gauge_callback(lambda: registry.set_gauge('queue_depth', 'ws_clients', 5))
+    lines = registry.render(['ai_firewall_model_info{version="x"} 1']).splitlines()
+
+    assert '# TYPE ai_firewall_stage_seconds histogram' in lines
+    assert 'ai_firewall_queue_depth{queue="ws_clients"} 5' in lines
+    assert lines[-1] == 'ai_firewall_model_info{version="x"} 1'
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in lines
+               if line.startswith('ai_firewall_stage_seconds_bucket{stage="parse"')]
+    assert buckets == sorted(buckets) and buckets[-1] == 2
+    assert 'ai_firewall_stage_seconds_sum{stage="parse"} 0.005' in lines
+
+
+if __name__ == "__main__":
+    tests = [
+        test_bucket_bounds,
+        test_threads_count_without_losing_updates,
+        test_scrape_sums_live_processes,
+        test_dead_process_is_archived,
+        test_other_namespace_is_alive_while_locked,
+        test_render_format,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Metrics tests geslaagd!")
@@ -0,0 +1,91 @@
+"""
+Test Netlink Backend
+Draait NetlinkIpsetBackend tegen FakeIPSet (geen root of pyroute2 nodig)
+"""
+
+import time
+from fake_netlink import FakeIPSet
+from firewall_backends import NetlinkIpsetBackend
+
+
+def make_backend(**kwargs):
+    fake = FakeIPSet(**kwargs)
+    backend = NetlinkIpsetBackend(ipset=fake, manage_rule=False)
+    assert backend.setup()
+    return backend, fake
+
+
+def test_block_and_unblock_use_persistent_socket():
+    backend, fake = make_backend()
+
+    assert backend.block('203.0.113.45')
+    assert fake.test('ai-firewall', '203.0.113.45')
+
+    assert backend.unblock('203.0.113.45')
+    assert not fake.test('ai-firewall', '203.0.113.45')
+
+    # Alle operaties over hetzelfde (niet heropende) object
+    assert backend.connection() is fake
+
+
+def test_ipv6_goes_to_separate_set():
+    backend, fake = make_backend()
+    assert backend.block('2001:db8::1')
+    assert fake.list('ai-firewall6') == ['2001:db8::1/128']
+    assert fake.list('ai-firewall') == []
+
+
+def test_block_is_idempotent_and_unblock_reports_missing():
+    backend, _ = make_backend()
+    assert backend.block('198.51.100.7')
+    assert backend.block('198.51.100.7')
+    assert backend.unblock('198.51.100.7')
+    assert not backend.unblock('198.51.100.7')
+
+
+def test_kernel_timeout_expires_entry():
+    backend, fake = make_backend()
+    backend.block('192.0.2.1', timeout=1)
+    members = fake.sets['ai-firewall']['members']
+    members['192.0.2.1/32'] = time.monotonic() - 1  # Simuleer verstreken timeout
+    assert not fake.test('ai-firewall', '192.0.2.1')
+
+
+def test_batch_reports_per_operation():
+    backend, _ = make_backend()
+    results = backend.apply_batch([
+        {'action': 'block', 'ip': '192.0.2.10'},
+        {'action': 'unblock', 'ip': '192.0.2.99'},
+        {'action': 'unblock', 'ip': '192.0.2.10'},
+    ])
+    assert results == [True, False, True]
+
+
+def test_operation_latency_is_microseconds():
+    backend, _ = make_backend()
+    samples = []
+    for i in range(1000):
+        start = time.perf_counter()
+        backend.block(f'10.1.{i // 256}.{i % 256}')
+        samples.append(time.perf_counter() - start)
+
+    samples.sort()
+    # Userspace overhead hoort ruim onder de ~10ms van een sudo iptables spawn
+    assert samples[len(samples) // 2] < 0.001
+
+
+if __name__ == "__main__":
+    tests = [
+        test_block_and_unblock_use_persistent_socket,
+        test_ipv6_goes_to_separate_set,
+        test_block_is_idempotent_and_unblock_reports_missing,
+        test_kernel_timeout_expires_entry,
+        test_batch_reports_per_operation,
+        test_operation_latency_is_microseconds,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Netlink backend tests geslaagd!")
@@ -0,0 +1,78 @@
+"""
+Test Prediction Ring Buffer
+Controleert sequence numbers, since queries en de fell-behind melding
+"""
+
+from prediction_buffer import PredictionRing
+
+
+def fill(ring, n):
+    for i in range(n):
+        ring.append({'i': i})
+
+
+def test_sequence_numbers_are_monotonic():
+    ring = PredictionRing(capacity=4)
+    fill(ring, 10)
+
+    assert ring.last_seq == 10 and len(ring) == 4
+    assert [e['seq'] for e in ring.latest(10)] == [7, 8, 9, 10]
+    assert ring.oldest_seq == 7
+
+
+def test_since_returns_only_newer_entries():
+    ring = PredictionRing(capacity=10)
+    fill(ring, 5)
+
+    result = ring.since(3)
+    assert [e['seq'] for e in result['entries']] == [4, 5]
+    assert result['last_seq'] == 5 and not result['fell_behind']
+
+    # Niets nieuws: zelfde since blijft geldig
+    assert ring.since(5)['entries'] == [] and ring.since(5)['last_seq'] == 5
+
+    # Trimming verschuift niets: seq 4 blijft seq 4
+    fill(ring, 7)
+    assert [e['seq'] for e in ring.since(10)['entries']] == [11, 12]
+
+
+def test_fell_behind_is_reported():
+    ring = PredictionRing(capacity=5)
+    fill(ring, 20)
+
+    result = ring.since(3)
+    assert result['fell_behind'] and result['missed'] == 12
+    assert [e['seq'] for e in result['entries']] == [16, 17, 18, 19, 20]
+
+
+def test_limit_pages_through_ring():
+    ring = PredictionRing(capacity=10)
+    fill(ring, 10)
+
+    first = ring.since(0, limit=4)
+    assert [e['seq'] for e in first['entries']] == [1, 2, 3, 4]
+    second = ring.since(first['last_seq'], limit=4)
+    assert [e['seq'] for e in second['entries']] == [5, 6, 7, 8]
+
+
+def test_since_ahead_of_server_restarts_from_oldest():
+    ring = PredictionRing(capacity=10)
+    fill(ring, 3)
+    # Client heeft seq 50 gezien van een vorige API instantie
+    assert [e['seq'] for e in ring.since(50)['entries']] == [1, 2, 3]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_sequence_numbers_are_monotonic,
+        test_since_returns_only_newer_entries,
+        test_fell_behind_is_reported,
+        test_limit_pages_through_ring,
+        test_since_ahead_of_server_restarts_from_oldest,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Prediction buffer tests geslaagd!")
@@ -0,0 +1,130 @@
+"""
+Test Prediction Stream
+Controleert fan-out, resume na reconnect en eviction van trage SSE clients
+"""
+
+import asyncio
+import json
+import threading
+
+from prediction_buffer import PredictionRing
+from prediction_stream import PredictionBroadcaster
+
+
+def prediction(i, label='BENIGN'):
+    return {'prediction': label, 'ensemble_score': 0.1, 'src_ip': f'10.0.0.{i}'}
+
+
+def parse(frame):
+    """SSE frame -> (event, data, id)"""
+    fields = dict(line.split(': ', 1) for line in frame.decode().strip().split('\n'))
+    return fields.get('event'), json.loads(fields['data']), fields.get('id')
+
+
+def drain(subscriber):
+    frames = []
+    while not subscriber.queue.empty():
+        frame = subscriber.queue.get_nowait()
+        frames.append(None if frame is None else parse(frame))
+    return frames
+
+
+def test_publish_fans_out_to_all_subscribers():
+    async def run():
+        broadcaster = PredictionBroadcaster(PredictionRing(100))
+        broadcaster.bind(asyncio.get_running_loop())
+        first, _ = broadcaster.subscribe()
+        second, _ = broadcaster.subscribe()
+
+        broadcaster.publish([prediction(1), prediction(2, 'MALICIOUS')])
+
+        for subscriber in (first, second):
+            frames = drain(subscriber)
+            assert [f[0] for f in frames] == ['prediction', 'prediction', 'stats']
+            assert [f[2] for f in frames[:2]] == ['1', '2']
+            assert frames[2][1]['delta'] == {'predictions': 2, 'malicious': 1, 'benign': 1}
+
+    asyncio.run(run())
+
+
+def test_resume_replays_missed_predictions_once():
+    async def run():
+        broadcaster = PredictionBroadcaster(PredictionRing(100))
+        broadcaster.bind(asyncio.get_running_loop())
+        broadcaster.publish([prediction(i) for i in range(5)])
+
+        # Reconnect met Last-Event-ID 3: alleen seq 4 en 5 opnieuw
+        subscriber, replay = broadcaster.subscribe(since=3)
+        assert [parse(f)[2] for f in replay] == ['4', '5']
+
+        broadcaster.publish([prediction(6)])
+        frames = drain(subscriber)
+        assert [f[2] for f in frames if f[0] == 'prediction'] == ['6']
+
+    asyncio.run(run())
+
+
+def test_resume_past_ring_reports_gap():
+    broadcaster = PredictionBroadcaster(PredictionRing(4))
+    broadcaster.publish([prediction(i) for i in range(10)])
+
+    _, replay = broadcaster.subscribe(since=2)
+    event, data, _ = parse(replay[0])
+    assert event == 'gap' and data['missed'] == 4
+    assert [parse(f)[2] for f in replay[1:]] == ['7', '8', '9', '10']
+
+
+def test_slow_consumer_is_evicted():
+    async def run():
+        broadcaster = PredictionBroadcaster(PredictionRing(100), queue_size=5)
+        broadcaster.bind(asyncio.get_running_loop())
+        slow, _ = broadcaster.subscribe()
+        fast, _ = broadcaster.subscribe()
+
+        broadcaster.publish([prediction(i) for i in range(3)])
+        drain(fast)
+        broadcaster.publish([prediction(i) for i in range(3)])
+
+        assert slow.evicted and slow not in broadcaster.subscribers
+        frames = drain(slow)
+        assert frames[0][0] == 'evicted' and frames[-1] is None
+        # Andere clients merken niets
+        assert not fast.evicted and len(drain(fast)) == 4
+        assert broadcaster.get_stats()['evicted'] == 1
+
+    asyncio.run(run())
+
+
+def test_publish_from_worker_thread():
+    async def run():
+        broadcaster = PredictionBroadcaster(PredictionRing(100))
+        broadcaster.bind(asyncio.get_running_loop())
+        stream = broadcaster.stream(heartbeat=5)
+        assert (await stream.__anext__()).startswith(b'retry:')
+
+        worker = threading.Thread(target=broadcaster.publish, args=([prediction(1)],))
+        worker.start()
+        worker.join()
+
+        event, data, event_id = parse(await asyncio.wait_for(stream.__anext__(), 1))
+        assert event == 'prediction' and event_id == '1' and data['src_ip'] == '10.0.0.1'
+        await stream.aclose()
+        assert broadcaster.subscribers == []
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_publish_fans_out_to_all_subscribers,
+        test_resume_replays_missed_predictions_once,
+        test_resume_past_ring_reports_gap,
+        test_slow_consumer_is_evicted,
+        test_publish_from_worker_thread,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Prediction stream tests geslaagd!")
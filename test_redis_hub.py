@@ -0,0 +1,178 @@
+"""
+Test Redis Fan-out Hub
+Eén gedeelde subscription, bursts als batch frames en eviction van trage
+websocket clients (met een in-memory pubsub i.p.v. een Redis server)
+"""
+
+import asyncio
+import json
+
+from redis_hub import CLOSE_TRY_AGAIN_LATER, RedisFanoutHub
+
+
+class FakePubSub:
+    def __init__(self):
+        self.messages = asyncio.Queue()
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.remove(channel)
+
+    async def aclose(self):
+        pass
+
+    async def listen(self):
+        yield {'type': 'subscribe', 'data': 1}
+        while True:
+            yield await self.messages.get()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.pubsubs = []
+
+    def pubsub(self):
+        self.pubsubs.append(FakePubSub())
+        return self.pubsubs[-1]
+
+    async def publish(self, data):
+        for pubsub in self.pubsubs:
+            await pubsub.messages.put({'type': 'message', 'data': json.dumps(data)})
+
+    async def aclose(self):
+        pass
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+        self.close_code = None
+        self.disconnected = asyncio.Event()
+
+    async def send_text(self, text):
+        self.frames.append(json.loads(text))
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'websocket.disconnect'}
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def test_clients_share_one_subscription():
+    async def run():
+        redis = FakeRedis()
+        hub = RedisFanoutHub(client=redis, batch_window=0)
+        sockets = [FakeWebSocket() for _ in range(5)]
+        tasks = [asyncio.create_task(hub.serve(ws)) for ws in sockets]
+        await settle()
+
+        await redis.publish({'type': 'alert', 'src_ip': '10.0.0.1'})
+        await settle()
+
+        assert len(redis.pubsubs) == 1
+        assert all(ws.frames == [{'type': 'alert', 'src_ip': '10.0.0.1'}] for ws in sockets)
+
+        for ws in sockets:
+            ws.disconnected.set()
+        await asyncio.gather(*tasks)
+        assert hub.get_stats()['clients'] == 0
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_burst_is_coalesced_into_batch_frame():
+    async def run():
+        hub = RedisFanoutHub(client=FakeRedis(), batch_max=4, batch_window=0)
+        client = hub.register()
+        for i in range(6):
+            hub.publish(json.dumps({'i': i}))
+
+        first = json.loads(await hub.next_frame(client))
+        second = json.loads(await hub.next_frame(client))
+        assert [m['i'] for m in first] == [0, 1, 2, 3]
+        assert [m['i'] for m in second] == [4, 5]
+        assert client.frames_sent == 2 and client.messages_sent == 6
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_slow_client_is_evicted():
+    async def run():
+        hub = RedisFanoutHub(client=FakeRedis(), queue_size=3, batch_window=0)
+        slow = FakeWebSocket()
+        slow_client = hub.register()
+        fast = hub.register()
+
+        for i in range(5):
+            hub.publish(json.dumps({'i': i}))
+            await hub.next_frame(fast)
+
+        assert slow_client.evicted and slow_client not in hub.clients
+        assert await hub.next_frame(slow_client) is None
+        assert fast in hub.clients and hub.get_stats()['evicted'] == 1
+        await hub.stop()
+
+        # serve() sluit een evicted client met 1013
+        hub = RedisFanoutHub(client=FakeRedis(), queue_size=1, batch_window=0)
+        task = asyncio.create_task(hub.serve(slow))
+        await settle()
+        slow.send_text = lambda text: asyncio.sleep(3600)
+        hub.publish('{}')
+        await settle()
+        hub.publish('{}')
+        hub.publish('{}')
+        await asyncio.wait_for(task, 1)
+        assert slow.close_code == CLOSE_TRY_AGAIN_LATER
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+def test_subscriber_reconnects_after_error():
+    async def run():
+        class FlakyRedis(FakeRedis):
+            def pubsub(self):
+                if not self.pubsubs:
+                    self.pubsubs.append(None)
+                    raise ConnectionError("connection refused")
+                return super().pubsub()
+
+        redis = FlakyRedis()
+        hub = RedisFanoutHub(client=redis, reconnect_delay=0.01, batch_window=0)
+        client = hub.register()
+        await asyncio.sleep(0.05)
+
+        redis.pubsubs = [p for p in redis.pubsubs if p]
+        await redis.publish({'ok': True})
+        assert json.loads(await asyncio.wait_for(hub.next_frame(client), 1)) == {'ok': True}
+        assert hub.get_stats()['reconnects'] == 1
+        await hub.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    tests = [
+        test_clients_share_one_subscription,
+        test_burst_is_coalesced_into_batch_frame,
+        test_slow_client_is_evicted,
+        test_subscriber_reconnects_after_error,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Redis hub tests geslaagd!")
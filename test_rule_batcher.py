@@ -0,0 +1,152 @@
+"""
+Test Rule Batcher
+Controleert coalescing, batch grootte, per-operatie resultaten en dat losse
+blocks uit meerdere threads in één batch van de blocker terechtkomen
+"""
+
+import threading
+import time
+from firewall_backends import FirewallBackend
+from rule_batcher import RuleBatcher
+from test_block_store import KernelBackend, make_blocker
+
+
+class FakeBackend(FirewallBackend):
+    """Backend die batches registreert i.p.v. de kernel aan te passen"""
+
+    name = 'fake'
+
+    def __init__(self, fail_ips=()):
+        super().__init__(use_sudo=False)
+        self.batches = []
+        self.fail_ips = set(fail_ips)
+
+    def apply_batch(self, ops):
+        self.batches.append([(op['action'], op['ip']) for op in ops])
+        return [op['ip'] not in self.fail_ips for op in ops]
+
+
+def test_burst_is_one_batch():
+    backend = FakeBackend()
+    batcher = RuleBatcher(backend, flush_interval=0.2, max_batch_size=1000)
+
+    futures = [batcher.submit('block', f'10.0.0.{i}') for i in range(50)]
+    assert all(f.result(timeout=2) for f in futures)
+    assert len(backend.batches) == 1
+    assert len(backend.batches[0]) == 50
+    batcher.stop()
+
+
+def test_max_batch_size_splits():
+    backend = FakeBackend()
+    batcher = RuleBatcher(backend, flush_interval=0.2, max_batch_size=10)
+
+    futures = [batcher.submit('block', f'10.0.1.{i}') for i in range(25)]
+    for f in futures:
+        f.result(timeout=2)
+    assert [len(b) for b in backend.batches] == [10, 10, 5]
+    batcher.stop()
+
+
+def test_last_operation_per_ip_wins():
+    backend = FakeBackend()
+    batcher = RuleBatcher(backend, flush_interval=0.2)
+
+    first = batcher.submit('block', '10.0.2.1')
+    second = batcher.submit('unblock', '10.0.2.1')
+    # De block is nooit toegepast: alleen de unblock krijgt het backend resultaat
+    assert first.result(timeout=2) is False
+    assert second.result(timeout=2) is True
+    assert backend.batches == [[('unblock', '10.0.2.1')]]
+    assert batcher.get_stats()['coalesced'] == 1
+    batcher.stop()
+
+
+def test_per_operation_results():
+    backend = FakeBackend(fail_ips={'10.0.3.2'})
+    batcher = RuleBatcher(backend, flush_interval=0.05)
+
+    ok = batcher.submit('block', '10.0.3.1')
+    failed = batcher.submit('block', '10.0.3.2')
+    assert ok.result(timeout=2) is True
+    assert failed.result(timeout=2) is False
+    batcher.stop()
+
+
+def test_stop_flushes_pending():
+    backend = FakeBackend()
+    batcher = RuleBatcher(backend, flush_interval=10.0)
+
+    future = batcher.submit('block', '10.0.4.1')
+    time.sleep(0.05)
+    batcher.stop()
+    assert future.result(timeout=1)
+
+
+class BatchCountingBackend(KernelBackend):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def apply_batch(self, ops):
+        self.batches.append(len(ops))
+        return super().apply_batch(ops)
+
+
+def test_blocker_single_blocks_share_batch(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    blocker.backend = BatchCountingBackend()
+    blocker.batching_enabled = True
+    blocker.flush_interval = 0.2
+
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(blocker.block_ip(f'10.0.5.{i}')))
+               for i in range(20)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # De lock wordt niet vastgehouden tijdens de flush: één batch, niet 20 na elkaar
+    assert results == [True] * 20
+    assert blocker.backend.batches == [20]
+    assert time.perf_counter() - started < 2.0
+    assert len(blocker.get_blocked_ips()) == 20
+    blocker.close()
+
+
+def test_blocker_superseded_block_not_recorded(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    blocker.batching_enabled = True
+    blocker.flush_interval = 0.2
+
+    blocked = []
+    thread = threading.Thread(target=lambda: blocked.append(blocker.block_ip('10.0.6.1')))
+    thread.start()
+    time.sleep(0.05)
+    assert blocker.unblock_ips(['10.0.6.1'])[0]['ip'] == '10.0.6.1'
+    thread.join()
+
+    assert blocked == [False]
+    assert not blocker.is_blocked('10.0.6.1')
+    assert blocker.store.get_active('10.0.6.1') is None
+    blocker.close()
+
+
+if __name__ == "__main__":
+    tests = [
+        test_burst_is_one_batch,
+        test_max_batch_size_splits,
+        test_last_operation_per_ip_wins,
+        test_per_operation_results,
+        test_stop_flushes_pending,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Rule batcher tests geslaagd!")
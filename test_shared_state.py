@@ -0,0 +1,189 @@
+"""
+Test Shared State
+Controleert de mmap ring en counters die uvicorn workers delen: dezelfde
+semantiek als PredictionRing, één doorlopende sequence over processen en de
+fan-out van predictions van andere workers naar SSE subscribers
+"""
+
+import asyncio
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+
+from prediction_stream import PredictionBroadcaster
+import shared_state
+from prediction_buffer import PredictionRing
+from shared_state import SharedCounters, SharedPredictionRing, open_shared_state
+from utils import process_identity
+
+
+def writer(path, worker, batches):
+    ring = SharedPredictionRing(path, capacity=1000)
+    counters = SharedCounters(path + '.counters')
+    for batch in range(batches):
+        ring.extend([{'worker': worker, 'n': batch * 10 + i} for i in range(10)])
+        counters.add(predictions=10, malicious=1)
+    ring.close()
+    counters.close()
+
+
+def test_same_semantics_as_prediction_ring():
+    with tempfile.TemporaryDirectory() as tmp:
+        ring = SharedPredictionRing(os.path.join(tmp, 'p.ring'), capacity=5)
+        assert ring.last_seq == 0 and ring.latest(3) == []
+        for i in range(20):
+            ring.append({'n': i})
+
+        result = ring.since(3)
+        assert result['fell_behind'] and result['missed'] == 12
+        assert [e['seq'] for e in result['entries']] == [16, 17, 18, 19, 20]
+        assert ring.since(20)['entries'] == []
+        # Client voor de server: opnieuw vanaf het begin van de ring
+        assert ring.since(99)['last_seq'] == 20
+        assert [e['n'] for e in ring.latest(2)] == [18, 19]
+        ring.close()
+
+
+def test_sequence_shared_between_workers_and_restarts():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'p.ring')
+        a = SharedPredictionRing(path, capacity=10)
+        b = SharedPredictionRing(path, capacity=10)
+        a.extend([{'w': 'a'}, {'w': 'a'}])
+        b.extend([{'w': 'b'}])
+        assert [(e['seq'], e['w']) for e in a.since(0)['entries']] == [(1, 'a'), (2, 'a'), (3, 'b')]
+        a.close()
+        b.close()
+
+        # Na een restart loopt de sequence door
+        c = SharedPredictionRing(path, capacity=10)
+        assert c.append({'w': 'c'}) == 4
+        c.close()
+
+
+def test_concurrent_processes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'p.ring')
+        ctx = multiprocessing.get_context('spawn')
+        procs = [ctx.Process(target=writer, args=(path, w, 20)) for w in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+
+        ring = SharedPredictionRing(path, capacity=1000)
+        result = ring.since(0)
+        assert result['last_seq'] == 600 and not result['fell_behind']
+        assert [e['seq'] for e in result['entries']] == list(range(1, 601))
+        for w in range(3):
+            assert sorted(e['n'] for e in result['entries'] if e['worker'] == w) == list(range(200))
+
+        counters = SharedCounters(path + '.counters')
+        assert counters.totals() == {'predictions': 600, 'malicious': 60}
+        assert counters.rolling(60) == {'predictions': 600, 'malicious': 60}
+        ring.close()
+        counters.close()
+
+
+def test_stalled_writer_is_skipped():
+    with tempfile.TemporaryDirectory() as tmp:
+        ring = SharedPredictionRing(os.path.join(tmp, 'p.ring'), capacity=10, stall_timeout=0.05)
+        ring.append({'n': 1})
+        # Writer die seq 2 reserveerde en crashte; seq 3 is wel geschreven
+        struct.pack_into('<Q', ring._map, 24, 3)
+        ring.append({'n': 3})
+
+        assert ring.last_seq == 1
+        time.sleep(0.06)
+        result = ring.since(1)
+        assert result['last_seq'] == 3 and result['missed'] == 1
+        assert [e['n'] for e in result['entries']] == [3]
+        ring.close()
+
+
+def test_oversized_entry_is_shrunk_not_cut():
+    with tempfile.TemporaryDirectory() as tmp:
+        ring = SharedPredictionRing(os.path.join(tmp, 'p.ring'), capacity=4, slot_bytes=256)
+        ring.append({'prediction': 'MALICIOUS', 'flow': {'bytes': list(range(100))},
+                     'attack_type': 'x' * 1000, 'src_ip': '203.0.113.7'})
+        ring.append({'prediction': 'BENIGN', 'note': 'é' * 500})
+
+        # Beide slots blijven leesbaar JSON, met de truncated vlag
+        first, second = ring.latest(2)
+        assert first['truncated'] and 'flow' not in first
+        assert first['prediction'] == 'MALICIOUS' and first['src_ip'] == '203.0.113.7'
+        assert first['attack_type'].startswith('xxx')
+        assert second['truncated'] and second['prediction'] == 'BENIGN'
+        assert ring.since(0)['missed'] == 0
+        ring.close()
+
+
+def test_counter_regions_belong_to_a_process_not_a_pid():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'counters.bin')
+        first = SharedCounters(path, regions=3)
+        first.add(predictions=7)
+        # Vorige incarnatie met ons PID (pid 1 in een container) en een levende worker
+        first._data[0, 1] = 12345.0
+        first._data[1, 0] = os.getppid()
+        first._data[1, 1] = shared_state._identity_cell(process_identity(os.getppid()))
+        assert first.workers() == 1
+
+        # Het hergebruikte PID zet de regio van de gestopte worker voort
+        second = SharedCounters(path, regions=3)
+        assert second._data[0, 1] == shared_state._identity_cell(process_identity())
+        second.add(predictions=1)
+        assert second.totals()['predictions'] == 8 and second.workers() == 2
+        first.close()
+        second.close()
+
+
+def test_without_fcntl_falls_back_to_worker_state(monkeypatch):
+    class StubConfig:
+        def get(self, key, default=None):
+            return default
+
+    monkeypatch.setattr(shared_state, 'fcntl', None)
+    ring, counters = open_shared_state(StubConfig())
+    assert isinstance(ring, PredictionRing) and counters._fd is None
+
+
+def test_follow_pushes_predictions_of_other_workers():
+    async def run(path):
+        other = PredictionBroadcaster(SharedPredictionRing(path, capacity=50), shared=True)
+        local = PredictionBroadcaster(SharedPredictionRing(path, capacity=50), shared=True)
+        local.bind(asyncio.get_running_loop())
+        follower = asyncio.create_task(local.follow(interval=0.01))
+        subscriber, _ = local.subscribe()
+
+        await asyncio.sleep(0.02)
+        other.publish([{'prediction': 'MALICIOUS'}, {'prediction': 'BENIGN'}])
+        frames = [await asyncio.wait_for(subscriber.queue.get(), 1) for _ in range(3)]
+        follower.cancel()
+        return frames
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = asyncio.run(run(os.path.join(tmp, 'p.ring')))
+    assert frames[0].startswith(b'id: 1\nevent: prediction')
+    assert frames[1].startswith(b'id: 2\nevent: prediction')
+    assert b'event: stats' in frames[2] and b'"malicious": 1' in frames[2]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_same_semantics_as_prediction_ring,
+        test_sequence_shared_between_workers_and_restarts,
+        test_concurrent_processes,
+        test_stalled_writer_is_skipped,
+        test_oversized_entry_is_shrunk_not_cut,
+        test_counter_regions_belong_to_a_process_not_a_pid,
+        test_follow_pushes_predictions_of_other_workers,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Shared state tests geslaagd!")
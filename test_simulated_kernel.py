@@ -0,0 +1,122 @@
+"""
+Test Simulated Kernel
+Controleert het chain vs set kostenmodel, operatie registratie, timeouts en
+het volledige blocking pad via SimulatedBackend
+"""
+
+from firewall_backends import SimulatedBackend, create_backend
+from simulated_kernel import SimulatedKernel
+from test_block_store import make_blocker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fill(kernel, n):
+    for i in range(n):
+        assert kernel.add(f'10.0.{i // 256}.{i % 256}', 'bench')
+
+
+def test_chain_scans_linearly_set_probes_once():
+    chain, hashed = SimulatedKernel('chain'), SimulatedKernel('set')
+    fill(chain, 1000)
+    fill(hashed, 1000)
+
+    # Miss: chain loopt alle regels af, set doet één probe
+    assert chain.packet_cost_ns('192.0.2.1') == 1000 * chain.rule_cost_ns
+    assert hashed.packet_cost_ns('192.0.2.1') == hashed.probe_cost_ns
+
+    # Hit: eerste regel is goedkoop, laatste kost de hele chain
+    assert chain.match('10.0.0.0')
+    assert chain.ops[-1]['evaluations'] == 1
+    assert chain.match('10.0.3.231')
+    assert chain.ops[-1]['evaluations'] == 1000
+
+
+def test_every_operation_is_recorded():
+    kernel = SimulatedKernel('chain')
+    kernel.add('203.0.113.1')
+    kernel.add('203.0.113.2')
+    kernel.delete('203.0.113.1')
+    kernel.delete('203.0.113.1')
+    kernel.match('203.0.113.2')
+
+    assert [(op['action'], op['ok']) for op in kernel.ops] == [
+        ('block', True), ('block', True), ('unblock', True), ('unblock', False), ('match', True)
+    ]
+    # Chain update herschrijft de ruleset: kosten groeien met het aantal regels
+    assert [op['evaluations'] for op in kernel.ops[:3]] == [1, 1, 2]
+    assert kernel.get_stats()['failed'] == 1
+
+
+def test_set_timeouts_expire_and_chain_rejects_them():
+    clock = FakeClock()
+    kernel = SimulatedKernel('set', clock=clock)
+    assert kernel.add('203.0.113.1', timeout=60)
+    assert kernel.add('198.51.100.0/24')
+    assert kernel.match('198.51.100.7')
+
+    clock.now += 61
+    assert not kernel.match('203.0.113.1')
+    assert kernel.list() == ['198.51.100.0/24']
+
+    assert not SimulatedKernel('chain').add('203.0.113.1', timeout=60)
+
+
+def test_transaction_is_all_or_nothing():
+    kernel = SimulatedKernel('chain')
+    fill(kernel, 10)
+
+    assert not kernel.transaction([
+        {'action': 'block', 'ip': '203.0.113.1'},
+        {'action': 'unblock', 'ip': '203.0.113.99'},
+    ])
+    assert len(kernel) == 10
+
+    assert kernel.transaction([
+        {'action': 'block', 'ip': '203.0.113.1'},
+        {'action': 'unblock', 'ip': '10.0.0.0'},
+    ])
+    assert len(kernel) == 10 and kernel.ops[-1]['evaluations'] == 10
+
+
+def test_blocker_runs_against_simulated_backend(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    blocker.aggregation.enabled = False
+    blocker.backend = create_backend('simulated', mode='chain')
+    assert isinstance(blocker.backend, SimulatedBackend)
+    assert not blocker.backend.supports_timeout
+
+    ips = [f'203.0.113.{i}' for i in range(1, 51)]
+    results = blocker.block_ips(ips, 'storm')
+    assert all(r['success'] for r in results)
+
+    kernel = blocker.backend.kernel
+    assert kernel.list() == ips
+    assert kernel.get_stats()['transactions'] == 1
+
+    blocker.unblock_ips(ips[:25])
+    assert kernel.list() == ips[25:]
+    summary = blocker.reconcile()
+    assert summary['adopted'] == 0 and summary['restored'] == 0
+
+
+if __name__ == "__main__":
+    tests = [
+        test_chain_scans_linearly_set_probes_once,
+        test_every_operation_is_recorded,
+        test_set_timeouts_expire_and_chain_rejects_them,
+        test_transaction_is_all_or_nothing,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Simulated kernel tests geslaagd!")
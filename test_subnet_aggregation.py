@@ -0,0 +1,120 @@
+"""
+Test Subnet Aggregation
+Controleert aggregatie van host blocks, whitelist bescherming, nieuwe
+offenders binnen een aggregaat en opsplitsen bij expiry
+"""
+
+import time
+
+from cidr_table import CidrTable
+from subnet_aggregation import AggregationPolicy
+from test_block_store import make_blocker
+
+
+def make_aggregating_blocker(tmp_path, **policy):
+    blocker = make_blocker(str(tmp_path / 'blocks.db'))
+    blocker.aggregation = AggregationPolicy(enabled=True, **{'min_members': 4, **policy})
+    blocker.refresh(force=True)
+    return blocker
+
+
+def test_policy_parent_prefix():
+    policy = AggregationPolicy(enabled=True, ipv4_prefix=24, ipv6_prefix=64)
+
+    assert policy.parent('198.51.100.77') == '198.51.100.0/24'
+    assert policy.parent('2001:db8::1') == '2001:db8::/64'
+    assert policy.parent('198.51.100.0/24') is None
+    assert not AggregationPolicy(enabled=False).should_aggregate(1000)
+
+
+def test_dense_prefix_becomes_one_rule(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_aggregating_blocker(tmp_path)
+
+    for i in range(1, 5):
+        assert blocker.block_ip(f'198.51.100.{i}', 'scan')
+
+    assert blocker.backend.kernel == {'198.51.100.0/24'}
+    assert blocker.is_blocked('198.51.100.200')
+    assert sorted(blocker.members_of('198.51.100.0/24')) == [f'198.51.100.{i}' for i in range(1, 5)]
+
+    stats = blocker.get_stats()
+    assert stats['kernel_rules'] == 1
+    assert stats['aggregation']['rules_saved'] == 3
+
+
+def test_never_swallows_whitelist(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_aggregating_blocker(tmp_path)
+    blocker.whitelist = CidrTable(['198.51.100.250'])
+
+    for i in range(1, 6):
+        assert blocker.block_ip(f'198.51.100.{i}', 'scan')
+
+    assert '198.51.100.0/24' not in blocker.backend.kernel
+    assert len(blocker.backend.kernel) == 5
+
+
+def test_expiry_splits_aggregate(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_aggregating_blocker(tmp_path, split_below=3)
+
+    for i in range(1, 5):
+        assert blocker.block_ip(f'198.51.100.{i}', 'scan')
+
+    # Twee members verlopen: 2 < split_below -> losse regels terug
+    past = time.time() - 1
+    blocker.store.add_blocks([{'ip': f'198.51.100.{i}', 'reason': 'scan', 'method': 'fake',
+                               'expires_at': past} for i in (1, 2)])
+    blocker.expire_blocks(['198.51.100.1', '198.51.100.2'])
+
+    assert blocker.backend.kernel == {'198.51.100.3', '198.51.100.4'}
+    assert not blocker.is_blocked('198.51.100.1')
+    assert blocker.get_stats()['aggregation']['aggregates'] == 0
+
+
+def test_manual_unblock_of_member_splits(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_aggregating_blocker(tmp_path)
+
+    for i in range(1, 5):
+        assert blocker.block_ip(f'198.51.100.{i}', 'scan')
+    assert blocker.unblock_ip('198.51.100.2')
+
+    assert blocker.backend.kernel == {'198.51.100.1', '198.51.100.3', '198.51.100.4'}
+    assert not blocker.is_blocked('198.51.100.2')
+
+
+def test_new_offender_in_aggregate_is_member(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    blocker = make_aggregating_blocker(tmp_path, split_below=3)
+    blocker.block_duration_hours = 1
+
+    for i in range(1, 5):
+        assert blocker.block_ip(f'198.51.100.{i}', 'scan')
+    blocker.escalation_enabled = False
+    blocker.block_duration_hours = 2
+
+    # Valt onder de prefix: geen eigen kernel regel, wel een member record
+    assert blocker.block_ip('198.51.100.77', 'ddos')
+    assert blocker.backend.kernel == {'198.51.100.0/24'}
+    member = blocker.store.get_active('198.51.100.77')
+    assert member['aggregate'] == '198.51.100.0/24'
+    assert len(blocker.store.history('198.51.100.77')) == 1
+    # De prefix loopt mee met zijn langste member
+    prefix = blocker.store.get_active('198.51.100.0/24')
+    assert prefix['expires_ts'] == member['expires_ts']
+
+    # Split: het nieuwe member houdt zijn eigen regel
+    past = time.time() - 1
+    blocker.store.add_blocks([{'ip': f'198.51.100.{i}', 'reason': 'scan', 'method': 'fake',
+                               'expires_at': past} for i in (1, 2, 3)])
+    blocker.expire_blocks(['198.51.100.1', '198.51.100.2', '198.51.100.3'])
+    assert blocker.backend.kernel == {'198.51.100.4', '198.51.100.77'}
+    assert blocker.is_blocked('198.51.100.77')
+
+
+if __name__ == "__main__":
+    test_policy_parent_prefix()
+    print("  ✓ test_policy_parent_prefix")
+    print("\n✅ Subnet aggregation tests geslaagd!")
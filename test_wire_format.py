@@ -0,0 +1,144 @@
+"""
+Test Wire Formats
+Controleert Arrow IPC / msgpack round trips, incrementeel decoderen, summary
+frames, format negotiatie en client decoding
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+import wire_format
+from firewall_client import AIFirewallClient
+
+
+def make_frame(n=5):
+    return pd.DataFrame({
+        'Destination Port': np.arange(n) + 80,
+        'Flow Bytes/s': np.linspace(0.5, 9.5, n),
+        'src_ip': [f'203.0.113.{i}' for i in range(n)],
+        'attack_type': ['DDoS'] * n,
+    })
+
+
+def test_media_type_negotiation():
+    assert wire_format.media_type('application/vnd.apache.arrow.stream') == wire_format.ARROW
+    assert wire_format.media_type('application/x-msgpack; charset=binary') == wire_format.MSGPACK
+    assert wire_format.media_type('text/html, application/msgpack') == wire_format.MSGPACK
+    assert wire_format.media_type('application/json') == wire_format.JSON
+    assert wire_format.media_type(None) is None
+
+
+def test_columnar_round_trip():
+    df = make_frame()
+    for fmt in wire_format.BINARY_FORMATS:
+        decoded = pd.concat(list(wire_format.iter_frames(wire_format.encode_frame(df, fmt), fmt)))
+        pd.testing.assert_frame_equal(decoded.reset_index(drop=True), df, check_dtype=False)
+
+
+def test_decoder_yields_frames_as_bytes_arrive():
+    import pyarrow as pa
+
+    df = make_frame(50)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=10):
+            writer.write_batch(batch)
+    bodies = {wire_format.ARROW: sink.getvalue().to_pybytes(),
+              wire_format.MSGPACK: b''.join(wire_format.encode_frame(df.iloc[i:i + 10], wire_format.MSGPACK)
+                                            for i in range(0, 50, 10))}
+
+    for fmt, body in bodies.items():
+        decoder = wire_format.FrameDecoder(fmt)
+        seen = []
+        for i in range(0, len(body), 64):
+            # Frames komen vrij zodra ze compleet zijn, niet pas aan het einde
+            seen.append(len(decoder.feed(body[i:i + 64])))
+        decoder.close()
+        assert sum(seen) == 5 and seen[-1] <= 1
+
+        decoder = wire_format.FrameDecoder(fmt)
+        decoder.feed(body[:-7])
+        try:
+            decoder.close()
+            assert False, "Truncated body should fail"
+        except ValueError:
+            pass
+
+
+def test_summary_frame_round_trip():
+    encoder = wire_format.ArrowStreamEncoder({'prediction': 'string', 'score': 'float64'})
+    body = encoder.write({'prediction': ['benign'], 'score': [0.1]})
+    body += encoder.close({'total_flows': 1, 'error': 'model failed'})
+    verdicts = wire_format.decode_response(body, wire_format.ARROW)
+    assert verdicts['prediction'].tolist() == ['benign']
+    assert verdicts.attrs['summary']['error'] == 'model failed'
+
+    body = (wire_format.encode_columns({'prediction': ['benign']}, wire_format.MSGPACK) +
+            wire_format.encode_summary({'total_flows': 1}, wire_format.MSGPACK))
+    verdicts = wire_format.decode_response(body, wire_format.MSGPACK)
+    assert len(verdicts) == 1 and verdicts.attrs['summary'] == {'total_flows': 1}
+
+
+def test_metadata_is_split_from_features():
+    features, metadata = wire_format.split_metadata(make_frame())
+    assert list(features.columns) == ['Destination Port', 'Flow Bytes/s']
+    assert list(metadata.columns) == ['src_ip', 'attack_type']
+
+
+def test_arrow_stream_encoder_keeps_schema_across_chunks():
+    encoder = wire_format.ArrowStreamEncoder({'prediction': 'string', 'score': 'float64',
+                                              'src_ip': 'string', 'alert': 'bool'})
+    body = encoder.write({'prediction': np.array(['benign', 'malicious']), 'score': np.array([0.1, 0.9]),
+                          'src_ip': [None, None], 'alert': np.array([False, True])})
+    body += encoder.write({'prediction': ['benign'], 'score': [0.2], 'src_ip': ['203.0.113.1'],
+                           'alert': [False]})
+    body += encoder.close()
+
+    verdicts = wire_format.decode_response(body, wire_format.ARROW)
+    assert verdicts['prediction'].tolist() == ['benign', 'malicious', 'benign']
+    assert verdicts['src_ip'].tolist()[2] == '203.0.113.1'
+
+
+def test_client_decodes_every_format():
+    client = AIFirewallClient(wire_format='json')
+    ndjson = (json.dumps({'prediction': 'benign', 'ensemble_score': 0.1}) + '\n' +
+              json.dumps({'summary': {'total_flows': 1}}) + '\n').encode()
+    assert client.decode(ndjson, 'application/x-ndjson')['prediction'].tolist() == ['benign']
+
+    columns = {'prediction': ['malicious'], 'ensemble_score': [0.9]}
+    body = wire_format.encode_columns(columns, wire_format.MSGPACK) * 2
+    assert client.decode(body, wire_format.MSGPACK)['ensemble_score'].tolist() == [0.9, 0.9]
+
+    try:
+        client.decode(json.dumps({'summary': {'error': 'bad json'}}).encode(), 'application/x-ndjson')
+        assert False, "Stream error should raise"
+    except RuntimeError:
+        pass
+
+    body += wire_format.encode_summary({'error': 'model failed'}, wire_format.MSGPACK)
+    try:
+        client.decode(body, wire_format.MSGPACK)
+        assert False, "Columnar error summary should raise"
+    except RuntimeError:
+        pass
+
+
+if __name__ == "__main__":
+    tests = [
+        test_media_type_negotiation,
+        test_columnar_round_trip,
+        test_decoder_yields_frames_as_bytes_arrive,
+        test_summary_frame_round_trip,
+        test_metadata_is_split_from_features,
+        test_arrow_stream_encoder_keeps_schema_across_chunks,
+        test_client_decodes_every_format,
+    ]
+
+    for test in tests:
+        test()
+        print(f"  ✓ {test.__name__}")
+
+    print("\n✅ Wire format tests geslaagd!")
@@ -5,11 +5,12 @@ Simulates various wireless network attacks for AI-Firewall detection
 Uses real CIC-IDS2017 data patterns adapted for wireless attack scenarios
 """
 
-import requests
-import time
+import asyncio
 import random
 import pandas as pd
 
+from firewall_client import AsyncAIFirewallClient
+
 API_URL = "http://localhost:8000"
 
 # Load real attack data patterns from CIC-IDS2017
@@ -119,7 +120,7 @@ def load_attack_samples(file_path, n_samples=3, benign=False):
         return []
 
 
-def send_flow(flow_data, traffic_name, is_attack=True):
+async def send_flow(client, flow_data, traffic_name, is_attack=True):
     """Send flow to API"""
     try:
         src_ip = generate_wireless_ip()
@@ -134,15 +135,7 @@ def send_flow(flow_data, traffic_name, is_attack=True):
         flow_data["dst_ip"] = dst_ip
         flow_data["attack_type"] = traffic_name if is_attack else "BENIGN"
         
-        response = requests.post(
-            f"{API_URL}/predict/raw",
-            json=flow_data,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        return None
+        return await client.predict(flow_data)
     except Exception as e:
         return None
 
@@ -170,20 +163,27 @@ def generate_wireless_ip():
     return f"{network}.{random.randint(1, 254)}"
 
 
-def main():
+async def main():
     print_banner()
     
-    # Check API
-    try:
-        response = requests.get(f"{API_URL}/health", timeout=5)
-        if response.status_code != 200:
-            print("\033[91m❌ API not available\033[0m")
+    # Eén client (keep-alive pool, micro-batching, retries) voor de hele run
+    async with AsyncAIFirewallClient(API_URL, timeout=10) as client:
+        # Check API
+        try:
+            await client.health()
+            print("\033[92m✅ API Connected\033[0m")
+        except Exception:
+            print("\033[91m❌ Cannot connect to API\033[0m")
             return
-        print("\033[92m✅ API Connected\033[0m")
-    except:
-        print("\033[91m❌ Cannot connect to API\033[0m")
-        return
-    
+        
+        await run_simulation(client)
+        
+        stats = client.get_stats()
+        print(f"\033[90mClient: {stats['flows']} flows, {stats['retries']} retries, "
+              f"p50 {stats.get('latency_p50_ms', 0):.1f}ms, p99 {stats.get('latency_p99_ms', 0):.1f}ms\033[0m\n")
+
+
+async def run_simulation(client):
     print(f"\n\033[93m📡 Watch the dashboard at: http://localhost:80\033[0m")
     print("\033[90m" + "─" * 60 + "\033[0m")
     
@@ -209,7 +209,7 @@ def main():
             continue
         
         for i, sample in enumerate(samples):
-            result = send_flow(sample.copy(), name, is_attack=True)
+            result = await send_flow(client, sample.copy(), name, is_attack=True)
             total_attacks += 1
             
             if result:
@@ -224,7 +224,7 @@ def main():
             else:
                 print(f"    \033[91m❌ Error sending attack\033[0m")
             
-            time.sleep(0.4)
+            await asyncio.sleep(0.4)
         
         print()
     
@@ -245,7 +245,7 @@ def main():
             continue
         
         for i, sample in enumerate(samples):
-            result = send_flow(sample.copy(), name, is_attack=False)
+            result = await send_flow(client, sample.copy(), name, is_attack=False)
             total_benign += 1
             
             if result:
@@ -260,7 +260,7 @@ def main():
             else:
                 print(f"    \033[91m❌ Error sending traffic\033[0m")
             
-            time.sleep(0.4)
+            await asyncio.sleep(0.4)
         
         print()
     
@@ -290,4 +290,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
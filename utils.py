@@ -4,9 +4,11 @@ Bevat helper functies voor logging, configuratie, en algemene utilities.
 """
 
 import os
+import socket
 import yaml
 import json
 import logging
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
@@ -137,6 +139,8 @@ class PredictionLogger:
             log_file: Pad naar JSON log bestand
         """
         self.log_file = log_file
+        # Read-modify-write van het JSON bestand: calls uit de API inference pool serialiseren
+        self._lock = threading.Lock()
         Path(log_file).parent.mkdir(parents=True, exist_ok=True)
         
         # Initialiseer log bestand als het niet bestaat
@@ -172,19 +176,20 @@ class PredictionLogger:
             'flow_summary': self._summarize_flow(flow_data)
         }
         
-        # Lees bestaande logs
-        try:
-            with open(self.log_file, 'r') as f:
-                logs = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            logs = []
-        
-        # Voeg nieuwe log toe
-        logs.append(log_entry)
-        
-        # Schrijf terug (limiteer tot laatste 10000 entries)
-        with open(self.log_file, 'w') as f:
-            json.dump(logs[-10000:], f, indent=2)
+        with self._lock:
+            # Lees bestaande logs
+            try:
+                with open(self.log_file, 'r') as f:
+                    logs = json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                logs = []
+            
+            # Voeg nieuwe log toe
+            logs.append(log_entry)
+            
+            # Schrijf terug (limiteer tot laatste 10000 entries)
+            with open(self.log_file, 'w') as f:
+                json.dump(logs[-10000:], f, indent=2)
     
     def _summarize_flow(self, flow_data: Dict[str, Any]) -> Dict[str, Any]:
         """Creëert samenvatting van flow data voor logging."""
@@ -276,6 +281,87 @@ def format_bytes(num_bytes: float) -> str:
     return f"{num_bytes:.2f} PB"
 
 
+def pid_alive(pid: int) -> bool:
+    """
+    Check of een proces met dit PID bestaat (signal 0, niets wordt verstuurd).
+    
+    Args:
+        pid: Process ID
+        
+    Returns:
+        True als het proces bestaat (ook als het van een andere gebruiker is)
+    """
+    if os.name == 'nt':
+        # Op Windows is signal 0 CTRL_C_EVENT (of TerminateProcess), geen probe
+        import psutil
+        return psutil.pid_exists(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_start_id(pid: int) -> Optional[str]:
+    """
+    Identiteit van een proces die niet hergebruikt wordt zoals een PID:
+    boot id plus de starttijd uit /proc/<pid>/stat (veld 22, clock ticks sinds boot).
+    
+    Args:
+        pid: Process ID
+        
+    Returns:
+        '<boot_id>:<starttime>', of None als het proces niet bestaat of er geen /proc is
+    """
+    if not os.path.exists('/proc/self/stat'):
+        # Geen /proc (Windows, macOS): boot tijd en create time via psutil
+        import psutil
+        try:
+            return f"{psutil.boot_time():.0f}:{psutil.Process(pid).create_time():.6f}"
+        except psutil.Error:
+            return None
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            boot_id = f.read().strip()
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # comm (veld 2) kan spaties en haakjes bevatten: tel vanaf de laatste ')'
+    return f"{boot_id}:{stat.rsplit(')', 1)[1].split()[19]}"
+
+
+def pid_namespace() -> str:
+    """
+    Id van de PID namespace van dit proces. Containers die een directory delen
+    (bijv. ./logs) kunnen elk een proces met hetzelfde PID hebben.
+    
+    Returns:
+        Bijv. 'pid:[4026531836]'; zonder /proc de hostname
+    """
+    try:
+        return os.readlink('/proc/self/ns/pid')
+    except OSError:
+        return socket.gethostname()
+
+
+def process_identity(pid: Optional[int] = None) -> Optional[str]:
+    """
+    Identiteit van een proces over PID hergebruik en containers heen.
+    
+    Args:
+        pid: Process ID in de namespace van dit proces (None = dit proces)
+        
+    Returns:
+        '<namespace>/<pid>/<start id>', of None als het proces niet bestaat
+    """
+    pid = os.getpid() if pid is None else pid
+    start = process_start_id(pid)
+    return f"{pid_namespace()}/{pid}/{start}" if start else None
+
+
 def get_timestamp() -> str:
     """Geeft huidige timestamp als string."""
     return datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -0,0 +1,365 @@
+"""
+Wire Formats voor bulk scoring
+Columnar encodings (Arrow IPC stream, msgpack) naast JSON voor de batch
+endpoints en AIFirewallClient. Kolommen gaan direct een DataFrame in, zonder
+per-rij dicts.
+"""
+
+import json
+import struct
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+JSON = 'application/json'
+NDJSON = 'application/x-ndjson'
+ARROW = 'application/vnd.apache.arrow.stream'
+MSGPACK = 'application/msgpack'
+
+BINARY_FORMATS = (ARROW, MSGPACK)
+
+# Metadata kolommen die niet naar het model gaan
+METADATA_COLUMNS = ('src_ip', 'dst_ip', 'attack_type')
+
+# Laatste frame van een columnar response (zelfde velden als de NDJSON summary):
+# msgpack map {"summary": {...}}, Arrow: lege record batch met custom metadata
+SUMMARY_KEY = 'summary'
+
+# Arrow IPC: header types in het Message flatbuffer
+_ARROW_RECORD_BATCH = 3
+
+_ALIASES = {
+    'application/x-msgpack': MSGPACK,
+    'application/vnd.msgpack': MSGPACK,
+    'application/vnd.apache.arrow.file': ARROW,
+}
+
+
+def media_type(header: Optional[str]) -> Optional[str]:
+    """Content-Type / Accept header naar een ondersteund format (of None)"""
+    if not header:
+        return None
+    for part in header.split(','):
+        value = part.split(';')[0].strip().lower()
+        value = _ALIASES.get(value, value)
+        if value in (JSON, NDJSON, ARROW, MSGPACK):
+            return value
+    return None
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Arrow wire format requires pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError("Msgpack wire format requires msgpack (pip install msgpack)")
+    return msgpack
+
+
+def split_metadata(df: pd.DataFrame):
+    """(features, metadata) DataFrames; metadata alleen met aanwezige kolommen"""
+    present = [column for column in METADATA_COLUMNS if column in df.columns]
+    return df.drop(columns=present), df[present]
+
+
+# === Decoding ===
+
+def _arrow_message_header(metadata: bytes):
+    """(header_type, bodyLength) uit een Arrow IPC Message flatbuffer"""
+    try:
+        (table,) = struct.unpack_from('<I', metadata, 0)
+        (vtable_offset,) = struct.unpack_from('<i', metadata, table)
+        vtable = table - vtable_offset
+        (vtable_size,) = struct.unpack_from('<H', metadata, vtable)
+
+        def field(index):
+            slot = 4 + 2 * index
+            return struct.unpack_from('<H', metadata, vtable + slot)[0] if slot < vtable_size else 0
+
+        header_offset, length_offset = field(1), field(3)
+        header_type = metadata[table + header_offset] if header_offset else 0
+        body_length = struct.unpack_from('<q', metadata, table + length_offset)[0] if length_offset else 0
+    except (struct.error, IndexError):
+        raise ValueError("Invalid Arrow IPC message")
+    if body_length < 0:
+        raise ValueError("Invalid Arrow IPC message")
+    return header_type, body_length
+
+
+class FrameDecoder:
+    """
+    Push-based decoder voor columnar bodies
+
+    feed() accepteert willekeurige stukken bytes en geeft de DataFrames terug
+    die compleet zijn; een body hoeft dus nooit in zijn geheel in memory.
+    Arrow IPC wordt per message geframed (schema en dictionaries blijven
+    bewaard, elke record batch wordt los gedecodeerd), msgpack via
+    Unpacker.feed(). Een summary frame (responses) komt in self.summary.
+    """
+
+    def __init__(self, fmt: str, max_frame_bytes: int = 64 << 20):
+        """
+        Args:
+            fmt: ARROW of MSGPACK
+            max_frame_bytes: Max grootte van één record batch / column map
+        """
+        if fmt not in BINARY_FORMATS:
+            raise ValueError(f"Unsupported wire format: {fmt}")
+        self.fmt = fmt
+        self.max_frame_bytes = max_frame_bytes
+        self.summary: Optional[Dict] = None
+        self.frames = 0
+
+        if fmt == ARROW:
+            self.pa = _pyarrow()
+            self._buffer = bytearray()
+            self._preamble = b''
+            self._ended = False
+        else:
+            msgpack = _msgpack()
+            self._unpacker = msgpack.Unpacker(raw=False, max_buffer_size=max_frame_bytes)
+            self._buffer_full = msgpack.exceptions.BufferFull
+            self._fed = 0
+
+    def feed(self, data: bytes) -> List[pd.DataFrame]:
+        """Voeg bytes toe; returns de frames die nu compleet zijn"""
+        if self.fmt == ARROW:
+            return self._feed_arrow(data)
+        return self._feed_msgpack(data)
+
+    def close(self):
+        """Einde van de body; ValueError als er een half frame over is"""
+        if self.fmt == ARROW:
+            if self._buffer and not self._ended:
+                raise ValueError("Truncated Arrow IPC stream")
+        elif self._unpacker.tell() != self._fed:
+            raise ValueError("Truncated msgpack body")
+
+    # --- Arrow IPC ---
+
+    def _feed_arrow(self, data: bytes) -> List[pd.DataFrame]:
+        if self._ended:
+            return []
+        self._buffer += data
+        frames = []
+        while True:
+            message = self._next_arrow_message()
+            if message is None:
+                return frames
+            header_type, raw = message
+            if header_type != _ARROW_RECORD_BATCH:
+                # Schema en dictionary batches: nodig voor elke volgende batch
+                self._preamble += raw
+                continue
+            batch, metadata = self.pa.ipc.open_stream(self._preamble + raw) \
+                .read_next_batch_with_custom_metadata()
+            if metadata and SUMMARY_KEY.encode() in metadata:
+                self.summary = json.loads(metadata[SUMMARY_KEY.encode()])
+            if batch.num_rows or not metadata:
+                self.frames += 1
+                frames.append(batch.to_pandas())
+
+    def _next_arrow_message(self):
+        buffer = self._buffer
+        if len(buffer) < 4:
+            return None
+        (length,) = struct.unpack_from('<i', buffer, 0)
+        prefix = 4
+        if length == -1:  # Continuation marker (Arrow >= 0.15)
+            if len(buffer) < 8:
+                return None
+            (length,) = struct.unpack_from('<i', buffer, 4)
+            prefix = 8
+        if length == 0:  # End-of-stream
+            self._ended = True
+            del buffer[:]
+            return None
+        if length < 0 or length > self.max_frame_bytes:
+            raise ValueError(f"Arrow IPC message exceeds {self.max_frame_bytes} bytes")
+        if len(buffer) < prefix + length:
+            return None
+
+        header_type, body_length = _arrow_message_header(bytes(buffer[prefix:prefix + length]))
+        total = prefix + length + body_length
+        if total > self.max_frame_bytes:
+            raise ValueError(f"Arrow IPC message exceeds {self.max_frame_bytes} bytes")
+        if len(buffer) < total:
+            return None
+        raw = bytes(buffer[:total])
+        del buffer[:total]
+        return header_type, raw
+
+    # --- msgpack ---
+
+    def _feed_msgpack(self, data: bytes) -> List[pd.DataFrame]:
+        try:
+            self._unpacker.feed(data)
+        except self._buffer_full:
+            raise ValueError(f"Msgpack frame exceeds {self.max_frame_bytes} bytes")
+        self._fed += len(data)
+
+        frames = []
+        for columns in self._unpacker:
+            if not isinstance(columns, dict):
+                raise ValueError("Msgpack body must contain column maps {name: [values]}")
+            if set(columns) == {SUMMARY_KEY} and isinstance(columns[SUMMARY_KEY], dict):
+                self.summary = columns[SUMMARY_KEY]
+                continue
+            self.frames += 1
+            frames.append(pd.DataFrame(columns))
+        return frames
+
+
+def iter_frames(body: bytes, fmt: str) -> Iterator[pd.DataFrame]:
+    """
+    Decodeer een volledige binaire body naar DataFrames
+
+    Arrow: één DataFrame per record batch. Msgpack: één DataFrame per
+    top-level map {kolom: [waarden]} (meerdere maps mogen achter elkaar).
+    """
+    decoder = FrameDecoder(fmt, max_frame_bytes=max(len(body), 1))
+    yield from decoder.feed(body)
+    decoder.close()
+
+
+# === Encoding ===
+
+def _arrow_stream(table) -> bytes:
+    pa = _pyarrow()
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_columns(columns: Dict[str, List], fmt: str) -> bytes:
+    """Eén columnar frame (alle kolommen even lang) als msgpack map of Arrow stream"""
+    if fmt == MSGPACK:
+        return _msgpack().packb(
+            {name: values.tolist() if isinstance(values, np.ndarray) else list(values)
+             for name, values in columns.items()},
+            use_bin_type=True
+        )
+    if fmt == ARROW:
+        return _arrow_stream(_pyarrow().Table.from_pydict(dict(columns)))
+    raise ValueError(f"Unsupported wire format: {fmt}")
+
+
+def encode_summary(summary: Dict, fmt: str) -> bytes:
+    """Summary frame voor het einde van een msgpack response"""
+    if fmt != MSGPACK:
+        raise ValueError("Arrow summaries go through ArrowStreamEncoder.close()")
+    return _msgpack().packb({SUMMARY_KEY: summary}, use_bin_type=True)
+
+
+def encode_frame(df: pd.DataFrame, fmt: str) -> bytes:
+    """DataFrame als request body"""
+    if fmt == ARROW:
+        return _arrow_stream(_pyarrow().Table.from_pandas(df, preserve_index=False))
+    return encode_columns({column: df[column].to_numpy() for column in df.columns}, fmt)
+
+
+class _ChunkSink:
+    """Write-only file object; take() geeft alles sinds de vorige take()"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class ArrowStreamEncoder:
+    """
+    Incrementele Arrow IPC stream: schema bij de eerste batch, daarna alleen
+    record batches. Elke write() geeft de bytes die verstuurd kunnen worden.
+    """
+
+    def __init__(self, types: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            types: Vaste kolom types ('string', 'float64', 'bool', ...), zodat
+                   een chunk met alleen nulls het schema niet verandert
+        """
+        self.pa = _pyarrow()
+        self.schema = None
+        if types:
+            self.schema = self.pa.schema([
+                (name, self.pa.bool_() if type_name == 'bool' else getattr(self.pa, type_name)())
+                for name, type_name in types.items()
+            ])
+        self._sink = _ChunkSink()
+        self._writer = None
+
+    def write(self, columns: Dict[str, List]) -> bytes:
+        batch = self.pa.RecordBatch.from_pydict(dict(columns), schema=self.schema)
+        if self._writer is None:
+            self.schema = batch.schema
+            self._writer = self.pa.ipc.new_stream(self.pa.PythonFile(self._sink, mode='w'), batch.schema)
+        self._writer.write_batch(batch)
+        return self._sink.take()
+
+    def close(self, summary: Optional[Dict] = None) -> bytes:
+        """
+        Sluit de stream af
+
+        Args:
+            summary: Als laatste een lege record batch met deze summary als
+                     custom metadata (vereist vaste types of een eerdere write)
+        """
+        if summary is not None:
+            if self.schema is None:
+                raise ValueError("Summary needs a schema: pass types or write a batch first")
+            batch = self.pa.RecordBatch.from_pylist([], schema=self.schema)
+            if self._writer is None:
+                self._writer = self.pa.ipc.new_stream(self.pa.PythonFile(self._sink, mode='w'), self.schema)
+            self._writer.write_batch(batch, custom_metadata={SUMMARY_KEY: json.dumps(summary)})
+        if self._writer is None:
+            return b''
+        self._writer.close()
+        return self._sink.take()
+
+
+def decode_response(body: bytes, fmt: str) -> pd.DataFrame:
+    """
+    Columnar response (alle frames) als één DataFrame
+
+    Een summary frame staat daarna in df.attrs['summary'].
+    """
+    if fmt == JSON or fmt == NDJSON:
+        raise ValueError("Use JSON decoding for JSON responses")
+    decoder = FrameDecoder(fmt, max_frame_bytes=max(len(body), 1))
+    frames = decoder.feed(body)
+    decoder.close()
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if decoder.summary is not None:
+        df.attrs[SUMMARY_KEY] = decoder.summary
+    return df